@@ -6,10 +6,18 @@ from fastapi.middleware.cors import CORSMiddleware
 from backend.db.database import engine, Base, ensure_alert_columns
 from backend.api.routers import alerts, analytics, video, stream, archive, stream_vlm, intelligence, settings, smart_bin, chatbot
 from backend.services.retention_scheduler import RetentionScheduler
+from backend.services.baseline_service import BaselineService
+from backend.services.inference_executor import inference_executor
+from backend.utils.jpeg_codec import jpeg_codec
 from backend.services.ml_service import ml_service
 import os
 import shutil
 
+try:
+    import config
+except Exception:
+    config = None
+
 # 3 dirname calls: main.py → api/ → backend/ → project root
 _PROJECT_ROOT = os.path.dirname(
     os.path.dirname(
@@ -55,6 +63,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 # Initialize Models on Startup
 _retention_scheduler = RetentionScheduler()
+_baseline_service = BaselineService(flush_seconds=getattr(config, 'CROWD_BASELINE_FLUSH_SECONDS', 60.0) if config else 60.0)
 
 @app.on_event("startup")
 async def startup_event():
@@ -69,6 +78,15 @@ async def startup_event():
         raise e
     await _retention_scheduler.start()
     print("STARTUP: RetentionScheduler started.")
+    await _baseline_service.start(ml_service.baselines)
+    print("STARTUP: BaselineService started.")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await _baseline_service.stop()
+    ml_service.shutdown()
+    inference_executor.shutdown()
 
 # Routers are included below using 'app.include_router'
 
@@ -161,6 +179,10 @@ async def health_check():
         "model_load_error": ml_service.load_error,
         "model_device": ml_service.device_in_use,
         "gpu_available": getattr(ml_service.detector, 'device', 'cpu') == 'cuda' if ml_service.detector else False,
+        "risk_engine_memory": ml_service.camera_engines.memory_stats() if ml_service.camera_engines else None,
+        "inference_pool": inference_executor.stats(),
+        "inference_scheduler": ml_service.scheduler.stats() if ml_service.scheduler else None,
+        "jpeg_codec": jpeg_codec.backend,
         "database": "connected",
         "ai_models": ai_model_status,
         "optional_features": {
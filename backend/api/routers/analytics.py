@@ -1,7 +1,10 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from backend.db.models import Alert
 from backend.api.deps import get_db
+from models.scoring.diagnostics import scoring_diagnostics
 
 router = APIRouter()
 
@@ -27,3 +30,16 @@ async def get_dashboard_analytics(db: Session = Depends(get_db)):
         }
     except Exception as e:
         return {"error": str(e)}
+
+
+@router.get("/scoring-diagnostics")
+async def get_scoring_diagnostics(camera_id: Optional[str] = None):
+    """Per-camera risk engine counters: frames, score, escalation events, factor activity"""
+    return scoring_diagnostics.snapshot(camera_id)
+
+
+@router.delete("/scoring-diagnostics")
+async def reset_scoring_diagnostics(camera_id: Optional[str] = None):
+    """Reset the counters of one camera (or all)"""
+    scoring_diagnostics.reset(camera_id)
+    return {"status": "reset", "camera_id": camera_id}
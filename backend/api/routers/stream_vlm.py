@@ -3,18 +3,19 @@ import json
 import os
 import sys
 import time
+import uuid
 from collections import deque
 from datetime import datetime
 
 import cv2
-import numpy as np
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from PIL import Image
 
 from backend.db.database import SessionLocal
 from backend.db.models import Alert
 from backend.services.alert_service import AlertService
-from backend.services.ml_service import ml_service
+from backend.services.inference_executor import inference_executor
+from backend.services.ml_service import live_camera_id, ml_service
 from backend.services.scoring_service import TwoTierScoringService
 from backend.services.system_settings_service import (
     get_vlm_interval_seconds,
@@ -22,6 +23,10 @@ from backend.services.system_settings_service import (
 )
 from backend.services.video_storage_service import video_storage_service
 from backend.services.vlm_service import vlm_service
+from backend.utils.frame_pipeline import FramePipeline
+from backend.utils.jpeg_codec import jpeg_codec, live_decode_scale
+from backend.utils.output_control import OutputControl, apply_output_message, fit_frame
+from models.detection.cascade import motion_metrics
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 try:
@@ -35,21 +40,9 @@ router = APIRouter()
 def _motion_metrics(frame, prev_gray_small, ema_motion: float):
     """
     Returns: (gray_small, diff_mean, ema_motion, is_motion_spike, is_scene_change)
-    Uses mean absolute difference on a downscaled grayscale frame.
+    Shared with the detector's specialist cascade (models/detection/cascade.py).
     """
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    gray_small = cv2.resize(gray, (160, 90), interpolation=cv2.INTER_AREA)
-
-    if prev_gray_small is None:
-        return gray_small, 0.0, 0.0, False, False
-
-    diff_mean = float(np.mean(cv2.absdiff(gray_small, prev_gray_small)))
-    alpha = 0.12
-    ema_motion = (1 - alpha) * float(ema_motion) + alpha * diff_mean
-
-    spike_th = max(10.0, ema_motion * 2.5)
-    scene_th = max(22.0, ema_motion * 4.0)
-    return gray_small, diff_mean, ema_motion, diff_mean > spike_th, diff_mean > scene_th
+    return motion_metrics(frame, prev_gray_small, ema_motion)
 
 
 def _infer_scene_type_from_text(text: str) -> str:
@@ -63,14 +56,85 @@ def _infer_scene_type_from_text(text: str) -> str:
     return "normal"
 
 
-def save_alert_sync(alert_data):
+def _analyze_scene(frame, prompt: str, risk_score: float):
+    """VLM analysis of a BGR frame; runs in a worker thread."""
+    pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    return vlm_service.analyze_scene(pil_img, prompt, risk_score)
+
+
+def _process_vlm_frame(data, stream_id, camera_id, run_ml, prev_gray_small, ema_motion, cached_detection, render):
+    """
+    The per-frame CPU/GPU work of the VLM feed; runs on the inference pool.
+
+    Decodes the frame, computes its motion metrics, runs detection and ML
+    risk scoring when run_ml, then anonymizes, scales it down to the client's
+    display size, draws the overlays and JPEG-encodes it (with
+    cached_detection when ML did not run). stream_id keys the connection's
+    detector state, camera_id its scoring (crowd baseline); render is the
+    connection's OutputControl.render_options().
+
+    Returns None for an undecodable frame, else a dict with
+    frame, motion (_motion_metrics result, None if it failed),
+    ml ((detection, ml_score, ml_factors), None when skipped or failed)
+    and jpeg.
+    """
+    # A new array per frame: frames are kept for VLM calls and the recording
+    frame = jpeg_codec.decode(data, scale=live_decode_scale())
+    if frame is None:
+        return None
+
+    try:
+        motion = _motion_metrics(frame, prev_gray_small, ema_motion)
+    except Exception:
+        motion = None
+
+    ml = None
+    detection = cached_detection
+    if run_ml:
+        try:
+            detection = ml_service.detect(frame, stream_id)
+            ml_score, ml_factors = ml_service.calculate_risk(detection, camera_id=camera_id, stream_id=stream_id)
+            ml = (detection, float(ml_score or 0.0), ml_factors or {})
+        except Exception as e:
+            print(f"ML Processing Failed: {e}")
+            detection = cached_detection
+
+    anon_frame = frame
+    if ml_service.anonymizer:
+        try:
+            anon_frame = ml_service.anonymizer.anonymize_frame(
+                frame, detection.get("poses", []), mode="blur"
+            )
+        except Exception:
+            pass
+
+    width, height, quality = render
+    anon_frame, scale = fit_frame(anon_frame, width, height)
+
+    if detection:
+        if anon_frame is frame:
+            # frame still goes to the VLM and the recording without overlays
+            anon_frame = frame.copy()
+        for obj in detection.get("objects", []):
+            x1, y1, x2, y2 = (int(v * scale) for v in obj["bbox"])
+            cv2.rectangle(anon_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+    return {
+        "frame": frame,
+        "motion": motion,
+        "ml": ml,
+        "jpeg": jpeg_codec.encode(anon_frame, quality=quality),
+    }
+
+
+def save_alert_sync(alert_data, camera_id):
     try:
         db = SessionLocal()
         risk_score = float(alert_data.get("risk_score", alert_data.get("score", 0.0)))
         new_alert = Alert(
             level=str(alert_data.get("level", "HIGH")).upper(),
             risk_score=risk_score,
-            camera_id=alert_data.get("camera_id", "CAM-01"),
+            camera_id=camera_id,
             location=alert_data.get("location", "Main Feed"),
             risk_factors=alert_data.get("risk_factors", alert_data.get("top_factors", [])),
             status=alert_data.get("status", "pending"),
@@ -100,12 +164,18 @@ async def websocket_vlm_feed(websocket: WebSocket):
     - rolling VLM narrative context
     - two-tier score aggregation in live loop
     - persisted VLM interval runtime control
+    - per-client output size / frame rate / JPEG quality (set_output)
+    - latest-frame-wins: receiving and sending run in the FramePipeline's
+      tasks, frames arriving while one is processed replace each other
     """
     await websocket.accept()
-    print("WebSocket connected (VLM Mode)")
+    # Scored (and crowd baseline kept) under a stable camera id; detector
+    # state (tracker / cascade) is per connection (see stream.py)
+    camera_id = live_camera_id(websocket.query_params.get("camera_id"))
+    stream_id = f"{camera_id}/vlm-{uuid.uuid4().hex[:8]}"
+    print(f"WebSocket connected (VLM Mode) stream={stream_id}")
 
     frame_count = 0
-    skip_frames = 1
     session_started_recording = False
 
     alert_cooldown = getattr(config, "ALERT_COOLDOWN_SECONDS", 10) if config else 10
@@ -136,6 +206,10 @@ async def websocket_vlm_feed(websocket: WebSocket):
     latest_ml_score = 0.0
     latest_ml_factors = {}
 
+    inference = inference_executor.connection()
+    # Display size / frame rate / quality requested by the client (set_output)
+    output = OutputControl()
+
     cached_result = {
         "detection": {"poses": [], "objects": [], "weapons": []},
         "risk_score": 0.0,
@@ -143,123 +217,129 @@ async def websocket_vlm_feed(websocket: WebSocket):
         "alert": None,
     }
 
-    try:
-        while True:
+    async def receive_frame():
+        """Next frame's bytes for the pipeline; runtime control messages are handled here."""
+        nonlocal vlm_interval
+        packet = await websocket.receive()
+        if packet.get("type") == "websocket.disconnect":
+            raise WebSocketDisconnect(packet.get("code", 1000))
+
+        # Runtime control message path.
+        if packet.get("text") is not None:
             try:
-                packet = await websocket.receive()
-            except Exception:
-                break
+                payload = json.loads(packet["text"])
+                if payload.get("type") == "set_vlm_interval":
+                    requested = int(payload.get("seconds", vlm_interval))
+                    if interval_min <= requested <= interval_max:
+                        vlm_interval = set_vlm_interval_seconds(requested)
+                        await pipeline.send_json(
+                            {
+                                "type": "config_ack",
+                                "vlm_interval_seconds": int(vlm_interval),
+                            }
+                        )
+                    else:
+                        await pipeline.send_json(
+                            {
+                                "type": "config_error",
+                                "message": f"seconds must be between {interval_min} and {interval_max}",
+                            }
+                        )
+                elif payload.get("type") == "set_output":
+                    await apply_output_message(output, pipeline, payload)
+            except Exception as e:
+                print(f"[VLM] Control message parse error: {e}")
+            return None
 
-            if packet.get("type") == "websocket.disconnect":
-                break
+        return packet.get("bytes")
 
-            # Runtime control message path.
-            if packet.get("text") is not None:
-                try:
-                    payload = json.loads(packet["text"])
-                    if payload.get("type") == "set_vlm_interval":
-                        requested = int(payload.get("seconds", vlm_interval))
-                        if interval_min <= requested <= interval_max:
-                            vlm_interval = set_vlm_interval_seconds(requested)
-                            await websocket.send_json(
-                                {
-                                    "type": "config_ack",
-                                    "vlm_interval_seconds": int(vlm_interval),
-                                }
-                            )
-                        else:
-                            await websocket.send_json(
-                                {
-                                    "type": "config_error",
-                                    "message": f"seconds must be between {interval_min} and {interval_max}",
-                                }
-                            )
-                except Exception as e:
-                    print(f"[VLM] Control message parse error: {e}")
-                continue
+    pipeline = FramePipeline(websocket, receive=receive_frame).start()
 
-            data = packet.get("bytes")
+    try:
+        while True:
+            data = await pipeline.next_frame()
             if data is None:
-                continue
+                break
 
             if not ml_service.detector:
-                if ml_service.load_error:
-                    await websocket.send_json({"error": f"Model load failed: {ml_service.load_error}"})
-                else:
-                    await websocket.send_json({"error": "Models Loading..."})
+                try:
+                    if ml_service.load_error:
+                        await pipeline.send_json({"error": f"Model load failed: {ml_service.load_error}"})
+                    else:
+                        await pipeline.send_json({"error": "Models Loading..."})
+                except Exception:
+                    break
                 await asyncio.sleep(0.5)
                 continue
 
-            nparr = np.frombuffer(data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if frame is None:
-                continue
-
             risk_score = float(cached_result.get("risk_score", 0.0) or 0.0)
             risk_factors = dict(cached_result.get("risk_factors", {}) or {})
             alert = cached_result.get("alert")
             detection = cached_result.get("detection", {"poses": [], "objects": [], "weapons": []})
 
-            start_proc = time.time()
+            # Consume completed VLM task.
+            if vlm_task and vlm_task.done():
+                try:
+                    vlm_result = vlm_task.result()
+                    current_narrative = vlm_result.get("description", "Analysis Failed")
+                    narrative_history.append(
+                        {
+                            "timestamp": time.time(),
+                            "narrative": current_narrative,
+                            "risk_score": float(vlm_result.get("risk_score", 0) or 0),
+                        }
+                    )
 
-            try:
-                prev_gray_small, last_motion_diff, ema_motion, is_motion_spike, is_scene_change = _motion_metrics(
-                    frame, prev_gray_small, ema_motion
-                )
+                    ai_score = float(vlm_result.get("risk_score", 0) or 0)
+                    ai_scene_type = vlm_result.get("scene_type") or _infer_scene_type_from_text(
+                        current_narrative
+                    )
+                    ai_confidence = min(1.0, max(0.0, ai_score / 100.0))
+                    latest_scoring_result = two_tier_service.aggregate_existing_scores(
+                        ml_score=latest_ml_score,
+                        ml_factors=latest_ml_factors,
+                        ai_score=ai_score,
+                        ai_explanation=current_narrative,
+                        ai_scene_type=ai_scene_type,
+                        ai_confidence=ai_confidence,
+                        ai_provider=vlm_result.get("provider", "vlm"),
+                        nemotron_verification=vlm_result.get("nemotron_verification"),
+                    )
+                    risk_score = float(latest_scoring_result.get("final_score", risk_score))
+                    risk_factors = latest_scoring_result.get("ml_factors", risk_factors)
+                except Exception as e:
+                    print(f"VLM Task Error: {e}")
+                finally:
+                    vlm_task = None
+
+            is_vlm_running = vlm_task is not None
+
+            # Decode, motion, detection, ML score, anonymize, draw and encode off the event loop
+            processed = await inference.run(
+                _process_vlm_frame, data, stream_id, camera_id, not is_vlm_running, prev_gray_small, ema_motion,
+                cached_result["detection"], output.render_options(),
+            )
+            if processed is None:
+                continue
+            frame = processed["frame"]
+
+            if processed["motion"] is not None:
+                prev_gray_small, last_motion_diff, ema_motion, is_motion_spike, is_scene_change = processed["motion"]
                 last_scene_change = bool(is_scene_change)
-            except Exception:
+            else:
                 is_motion_spike = False
                 is_scene_change = False
 
-            if frame_count % (skip_frames + 1) == 0:
+            # A failed ML pass was logged on the pool; the cached result stands
+            if is_vlm_running or processed["ml"] is not None:
                 try:
-                    # Consume completed VLM task.
-                    if vlm_task and vlm_task.done():
-                        try:
-                            vlm_result = vlm_task.result()
-                            current_narrative = vlm_result.get("description", "Analysis Failed")
-                            narrative_history.append(
-                                {
-                                    "timestamp": time.time(),
-                                    "narrative": current_narrative,
-                                    "risk_score": float(vlm_result.get("risk_score", 0) or 0),
-                                }
-                            )
-
-                            ai_score = float(vlm_result.get("risk_score", 0) or 0)
-                            ai_scene_type = vlm_result.get("scene_type") or _infer_scene_type_from_text(
-                                current_narrative
-                            )
-                            ai_confidence = min(1.0, max(0.0, ai_score / 100.0))
-                            latest_scoring_result = two_tier_service.aggregate_existing_scores(
-                                ml_score=latest_ml_score,
-                                ml_factors=latest_ml_factors,
-                                ai_score=ai_score,
-                                ai_explanation=current_narrative,
-                                ai_scene_type=ai_scene_type,
-                                ai_confidence=ai_confidence,
-                                ai_provider=vlm_result.get("provider", "vlm"),
-                                nemotron_verification=vlm_result.get("nemotron_verification"),
-                            )
-                            risk_score = float(latest_scoring_result.get("final_score", risk_score))
-                            risk_factors = latest_scoring_result.get("ml_factors", risk_factors)
-                        except Exception as e:
-                            print(f"VLM Task Error: {e}")
-                        finally:
-                            vlm_task = None
-
-                    is_vlm_running = vlm_task is not None
-
                     if is_vlm_running:
                         detection = cached_result["detection"]
                         risk_score = float(cached_result["risk_score"] or 0.0)
                         risk_factors = cached_result.get("risk_factors", {}) or {}
                         current_narrative = "AI Thinking... (Video smooth)"
                     else:
-                        detection = ml_service.detector.process_frame(frame)
-                        latest_ml_score, latest_ml_factors = ml_service.risk_engine.calculate_risk(detection)
-                        latest_ml_score = float(latest_ml_score or 0.0)
-                        latest_ml_factors = latest_ml_factors or {}
+                        detection, latest_ml_score, latest_ml_factors = processed["ml"]
 
                         latest_scoring_result = two_tier_service.aggregate_existing_scores(
                             ml_score=latest_ml_score,
@@ -285,8 +365,6 @@ async def websocket_vlm_feed(websocket: WebSocket):
                         )
 
                         if should_trigger:
-                            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                            pil_img = Image.fromarray(rgb_frame)
                             context_lines = []
                             for entry in list(narrative_history):
                                 context_lines.append(
@@ -303,8 +381,9 @@ async def websocket_vlm_feed(websocket: WebSocket):
 
                             risk_for_prompt = max(float(risk_score), 35.0) if (is_motion_spike or is_scene_change) else float(risk_score)
                             loop = asyncio.get_event_loop()
-                            vlm_task = loop.create_task(
-                                loop.run_in_executor(None, vlm_service.analyze_scene, pil_img, prompt, risk_for_prompt)
+                            # run_in_executor returns a Future, which create_task rejects
+                            vlm_task = asyncio.ensure_future(
+                                loop.run_in_executor(None, _analyze_scene, frame, prompt, risk_for_prompt)
                             )
                             last_vlm_time = now
                             if is_motion_spike or is_scene_change:
@@ -318,7 +397,7 @@ async def websocket_vlm_feed(websocket: WebSocket):
                             alert = alert_service.generate_alert(
                                 latest_scoring_result,
                                 {
-                                    "camera_id": "CAM-01",
+                                    "camera_id": camera_id,
                                     "location": "Main Feed",
                                     "timestamp": datetime.utcnow(),
                                 },
@@ -332,18 +411,20 @@ async def websocket_vlm_feed(websocket: WebSocket):
 
                         recording_th = getattr(config, "RECORDING_THRESHOLD", 50) if config else 50
                         if risk_score > recording_th:
-                            if not video_storage_service.is_recording("CAM-01"):
+                            if not video_storage_service.is_recording(camera_id):
                                 frame_h, frame_w = frame.shape[:2]
-                                video_storage_service.start_recording("CAM-01", frame_size=(frame_w, frame_h))
+                                video_storage_service.start_recording(camera_id, frame_size=(frame_w, frame_h))
                                 session_started_recording = True
 
                         now_ts = datetime.utcnow().timestamp()
                         if alert and (now_ts - last_alert_time > alert_cooldown):
                             loop = asyncio.get_event_loop()
-                            await loop.run_in_executor(None, save_alert_sync, alert)
+                            await loop.run_in_executor(None, save_alert_sync, alert, camera_id)
                             last_alert_time = now_ts
 
-                    video_storage_service.add_frame("CAM-01", frame)
+                    if video_storage_service.is_recording(camera_id):
+                        # Video encoding, on the pool as well
+                        await inference.run(video_storage_service.add_frame, camera_id, frame)
 
                     cached_result.update(
                         {
@@ -355,77 +436,54 @@ async def websocket_vlm_feed(websocket: WebSocket):
                     )
                 except Exception as e:
                     print(f"ML Processing Failed: {e}")
-            else:
-                detection = cached_result["detection"]
-                risk_score = float(cached_result["risk_score"] or 0.0)
-                risk_factors = cached_result.get("risk_factors", {}) or {}
-                alert = cached_result["alert"]
-
-            if time.time() - start_proc > 0.05:
-                skip_frames = 1
-            else:
-                skip_frames = 0
 
             frame_count += 1
 
-            anon_frame = frame
-            if ml_service.anonymizer:
-                try:
-                    anon_frame = ml_service.anonymizer.anonymize_frame(
-                        frame, detection.get("poses", []), mode="blur"
-                    )
-                except Exception:
-                    pass
-
-            if detection:
-                for obj in detection.get("objects", []):
-                    x1, y1, x2, y2 = map(int, obj["bbox"])
-                    cv2.rectangle(anon_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-            _, buffer = cv2.imencode(".jpg", anon_frame)
-
-            try:
-                if frame_count % 3 == 0 or alert:
-                    active_threats = set()
-                    for w in detection.get("weapons", []):
-                        active_threats.add(w.get("sub_class", "weapon"))
-                    for f in detection.get("fire", []):
-                        active_threats.add(f.get("class", "fire"))
-                    for o in detection.get("objects", []):
-                        cls = o.get("class", "")
-                        if cls in ["knife", "baseball bat", "scissors", "gun", "fire"]:
-                            active_threats.add(cls)
-                    await websocket.send_json(
-                        {
-                            "risk_score": risk_score,
-                            "risk_factors": risk_factors,
-                            "vlm_narrative": current_narrative,
-                            "alert": alert,
-                            "provider": vlm_service.provider_name,
-                            "motion_diff": round(float(last_motion_diff or 0), 2),
-                            "scene_change": bool(last_scene_change),
-                            "vlm_interval_seconds": int(vlm_interval),
-                            "ml_score": (latest_scoring_result or {}).get("ml_score", latest_ml_score),
-                            "ai_score": (latest_scoring_result or {}).get("ai_score", 0.0),
-                            "final_score": (latest_scoring_result or {}).get("final_score", risk_score),
-                            "detections": {
-                                "person_count": len(detection.get("poses", [])),
-                                "object_count": len(detection.get("objects", [])),
-                                "weapon_count": len(detection.get("weapons", [])),
-                                "fire_count": len(detection.get("fire", [])),
-                                "active_threats": list(active_threats),
-                            },
-                        }
-                    )
-                await websocket.send_bytes(buffer.tobytes())
-            except Exception:
-                break
+            payload = None
+            if frame_count % 3 == 0 or alert:
+                active_threats = set()
+                for w in detection.get("weapons", []):
+                    active_threats.add(w.get("sub_class", "weapon"))
+                for f in detection.get("fire", []):
+                    active_threats.add(f.get("class", "fire"))
+                for o in detection.get("objects", []):
+                    cls = o.get("class", "")
+                    if cls in ["knife", "baseball bat", "scissors", "gun", "fire"]:
+                        active_threats.add(cls)
+                payload = {
+                    "risk_score": risk_score,
+                    "risk_factors": risk_factors,
+                    "vlm_narrative": current_narrative,
+                    "alert": alert,
+                    "provider": vlm_service.provider_name,
+                    "motion_diff": round(float(last_motion_diff or 0), 2),
+                    "scene_change": bool(last_scene_change),
+                    "vlm_interval_seconds": int(vlm_interval),
+                    "ml_score": (latest_scoring_result or {}).get("ml_score", latest_ml_score),
+                    "ai_score": (latest_scoring_result or {}).get("ai_score", 0.0),
+                    "final_score": (latest_scoring_result or {}).get("final_score", risk_score),
+                    "detections": {
+                        "person_count": len(detection.get("poses", [])),
+                        "object_count": len(detection.get("objects", [])),
+                        "weapon_count": len(detection.get("weapons", [])),
+                        "fire_count": len(detection.get("fire", [])),
+                        "active_threats": list(active_threats),
+                    },
+                    "pipeline": pipeline.stats(),
+                    "output": output.settings(),
+                }
+            pipeline.emit(payload, processed["jpeg"])
+            # Auto quality follows how fast results leave the socket
+            output.observe(pipeline.send_ms)
 
     except WebSocketDisconnect:
         print("VLM WebSocket disconnected")
     finally:
+        await pipeline.close()
+        print(f"VLM WebSocket closed stream={stream_id} frames={pipeline.stats()}")
+        ml_service.release_camera(stream_id)
         if session_started_recording:
-            video_storage_service.stop_recording("CAM-01")
+            video_storage_service.stop_recording(camera_id)
         try:
             await websocket.close()
         except Exception:
@@ -6,6 +6,7 @@ from datetime import datetime
 import tempfile
 import shutil
 import subprocess
+import uuid
 from backend.services.ml_service import ml_service
 from models.scoring.risk_engine import RiskScoringEngine
 from backend.services.scoring_service import TwoTierScoringService
@@ -14,8 +15,14 @@ from backend.db.database import SessionLocal
 from backend.db.models import Alert
 from backend.services.offline_processor import offline_processor
 from backend.services.search_service import search_service
+from models.detection.detection_store import DetectionRecorder
 from PIL import Image
 
+try:
+    import config
+except Exception:
+    config = None
+
 router = APIRouter()
 
 # Initialize services for two-tier scoring
@@ -55,6 +62,19 @@ async def process_video_file_task(video_path: str, context_params: dict = None):
     # Initialize a FRESH local engine for this specific forensic analysis
     # Use bypass_calibration=True for forensic analysis to get results immediately
     video_engine = RiskScoringEngine(fps=fps, bypass_calibration=True)
+
+    # Keep the scored detections for threshold replays (scripts/replay_scoring.py)
+    recorder = None
+    if getattr(config, 'DETECTION_STORE_ENABLED', False):
+        try:
+            recorder = DetectionRecorder(
+                os.path.abspath(getattr(config, 'DETECTION_STORE_PATH', 'storage/detections')),
+                os.path.splitext(os.path.basename(video_path))[0],
+                fps=fps, source=video_path, engine={'bypass_calibration': True},
+                chunk_frames=getattr(config, 'DETECTION_STORE_CHUNK_FRAMES', 1024),
+            )
+        except OSError as e:
+            print(f"[VideoProcess] Detection store unavailable: {e}")
     
     w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     
@@ -96,68 +116,97 @@ async def process_video_file_task(video_path: str, context_params: dict = None):
     frame_queue = queue.Queue(maxsize=16)
     results = {"alerts": [], "max_p": 0, "patterns": set()}
     
+    # Every 2nd frame goes through the detector. Inferred frames are buffered
+    # and sent to the detector as one batch; frames are still annotated,
+    # scored and written strictly in order.
+    batch_size = max(1, getattr(ml_service.detector, 'batch_size', 1) or 1)
+    stream_id = f"upload-{uuid.uuid4().hex[:8]}"
+
+    def handle_frame(f, f_count, det):
+        try:
+            if det is not None:
+                ts = f_count / fps
+                # ENHANCED FIGHT DETECTION: Two-Tier Scoring Integration Point
+                # When ENABLE_TWO_TIER_SCORING is true, use TwoTierScoringService
+                # instead of direct risk_engine.calculate_risk()
+                #
+                # Example integration:
+                # if ENABLE_TWO_TIER_SCORING:
+                #     scoring_service = TwoTierScoringService(video_engine, ai_client=None)
+                #     scoring_result = await scoring_service.calculate_scores(
+                #         frame=f, detection_data=det, context=context_params
+                #     )
+                #     risk = scoring_result['final_score']
+                #     facts = scoring_result['ml_factors']
+                #     # Store additional fields: ml_score, ai_score, detection_source, etc.
+                # else:
+                #     risk, facts = video_engine.calculate_risk(det, context_params)
+                
+                ctx = context_params or {
+                    'hour': datetime.now().hour,
+                    'timestamp': ts
+                }
+                if recorder is not None:
+                    try:
+                        recorder.add(f_count, det, ctx)
+                    except Exception as e:
+                        print(f"[VideoProcess] Detection store error on frame {f_count}: {e}")
+                risk, facts = video_engine.calculate_risk(det, ctx, camera_id=stream_id)
+                
+                # Motion Patterns
+                pats = video_engine.detect_motion_patterns(det['poses'])
+                for p in pats: results["patterns"].add(p)
+                
+                # Visual Feedback
+                for obj in det['objects']:
+                    b = obj['bbox']
+                    cv2.rectangle(f, (int(b[0]), int(b[1])), (int(b[2]), int(b[3])), (255, 0, 0), 2)
+                
+                if 'weapons' in det:
+                    for weapon in det['weapons']:
+                        b, c = weapon['bbox'], weapon['confidence']
+                        cv2.rectangle(f, (int(b[0]), int(b[1])), (int(b[2]), int(b[3])), (0, 0, 255), 3)
+                        cv2.putText(f, f"WEAPON {int(c*100)}%", (int(b[0]), int(b[1])-10), 
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+                for p in det['poses']:
+                    draw_skeleton(f, np.array(p['keypoints']), np.array(p['confidence']))
+                
+                if risk > 35:
+                    alt = video_engine.generate_alert(risk, facts)
+                    alt.update({'level': alt['level'].upper(), 'timestamp_seconds': ts})
+                    results["alerts"].append(alt)
+                
+                results["max_p"] = max(results["max_p"], len(det['poses']))
+
+            out.write(f)
+        except Exception as e:
+            print(f"Worker Error on frame {f_count}: {e}")
+
+    def flush(pending):
+        inferred = [f for f, c in pending if c % 2 == 0]
+        try:
+            dets = iter(ml_service.detector.process_batch(inferred, stream_id=stream_id))
+        except Exception as e:
+            print(f"Worker Error on batch ending at frame {pending[-1][1]}: {e}")
+            dets = iter(())
+        for f, c in pending:
+            handle_frame(f, c, next(dets, None) if c % 2 == 0 else None)
+
     def ml_worker():
+        pending = []
         while True:
             item = frame_queue.get()
-            if item is None: break
-            
-            f, f_count = item
             try:
-                if f_count % 2 == 0:
-                    det = ml_service.detector.process_frame(f)
-                    ts = f_count / fps
-                    # ENHANCED FIGHT DETECTION: Two-Tier Scoring Integration Point
-                    # When ENABLE_TWO_TIER_SCORING is true, use TwoTierScoringService
-                    # instead of direct risk_engine.calculate_risk()
-                    #
-                    # Example integration:
-                    # if ENABLE_TWO_TIER_SCORING:
-                    #     scoring_service = TwoTierScoringService(video_engine, ai_client=None)
-                    #     scoring_result = await scoring_service.calculate_scores(
-                    #         frame=f, detection_data=det, context=context_params
-                    #     )
-                    #     risk = scoring_result['final_score']
-                    #     facts = scoring_result['ml_factors']
-                    #     # Store additional fields: ml_score, ai_score, detection_source, etc.
-                    # else:
-                    #     risk, facts = video_engine.calculate_risk(det, context_params)
-                    
-                    risk, facts = video_engine.calculate_risk(det, context_params or {
-                        'hour': datetime.now().hour,
-                        'timestamp': ts
-                    })
-                    
-                    # Motion Patterns
-                    pats = video_engine.detect_motion_patterns(det['poses'])
-                    for p in pats: results["patterns"].add(p)
-                    
-                    # Visual Feedback
-                    for obj in det['objects']:
-                        b = obj['bbox']
-                        cv2.rectangle(f, (int(b[0]), int(b[1])), (int(b[2]), int(b[3])), (255, 0, 0), 2)
-                    
-                    if 'weapons' in det:
-                        for weapon in det['weapons']:
-                            b, c = weapon['bbox'], weapon['confidence']
-                            cv2.rectangle(f, (int(b[0]), int(b[1])), (int(b[2]), int(b[3])), (0, 0, 255), 3)
-                            cv2.putText(f, f"WEAPON {int(c*100)}%", (int(b[0]), int(b[1])-10), 
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-
-                    for p in det['poses']:
-                        draw_skeleton(f, np.array(p['keypoints']), np.array(p['confidence']))
-                    
-                    if risk > 35:
-                        alt = video_engine.generate_alert(risk, facts)
-                        alt.update({'level': alt['level'].upper(), 'timestamp_seconds': ts})
-                        results["alerts"].append(alt)
-                    
-                    results["max_p"] = max(results["max_p"], len(det['poses']))
-                
-                out.write(f)
-            except Exception as e:
-                print(f"Worker Error on frame {f_count}: {e}")
+                if item is not None:
+                    pending.append(item)
+                n_inferred = sum(1 for _, c in pending if c % 2 == 0)
+                if pending and (item is None or n_inferred >= batch_size):
+                    flush(pending)
+                    pending = []
             finally:
                 frame_queue.task_done()
+            if item is None: break
 
     worker_thread = threading.Thread(target=ml_worker, daemon=True)
     worker_thread.start()
@@ -179,6 +228,7 @@ async def process_video_file_task(video_path: str, context_params: dict = None):
             
         frame_queue.put(None) # Sentinel
         worker_thread.join()
+        ml_service.detector.release_stream(stream_id)
         
         alerts = results["alerts"]
         max_p = results["max_p"]
@@ -190,6 +240,11 @@ async def process_video_file_task(video_path: str, context_params: dict = None):
         cap.release()
         out.release()
         db.close()
+        if recorder is not None:
+            try:
+                recorder.close()
+            except Exception as e:
+                print(f"[VideoProcess] Detection store error: {e}")
 
     # Transcode the raw mp4v temp file → H.264 + faststart (required for browser playback).
     # mp4v encoded files play on desktop players but show blank in all browsers.
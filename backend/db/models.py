@@ -51,3 +51,11 @@ class ClipRecord(Base):
     duration_sec = Column(Integer, nullable=False)
     captured_at  = Column(DateTime, nullable=False, default=datetime.utcnow)
     expires_at   = Column(DateTime, nullable=False, index=True)
+
+
+class CameraBaseline(Base):
+    __tablename__ = "camera_baselines"
+
+    camera_id  = Column(String, primary_key=True, index=True)
+    histogram  = Column(JSON, nullable=False)  # CrowdBaseline.to_dict(): per-hour mean / weight / updated
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from backend.db.models import CameraBaseline
+
+logger = logging.getLogger(__name__)
+
+
+class BaselineService:
+    """
+    Persists the risk engine's per-camera crowd baselines (models/scoring/baselines.py).
+
+    Baselines are loaded into the BaselineStore at startup, so known cameras
+    skip the calibration phase, and the ones that changed are written back
+    every flush_seconds and at shutdown. The engine only touches memory.
+    """
+
+    def __init__(self, flush_seconds: float = 60.0):
+        self.flush_seconds = flush_seconds
+        self.store = None
+        self._task = None
+
+    async def start(self, store) -> None:
+        """Called at FastAPI startup — loads stored baselines, then saves changes in the background."""
+        if store is None:
+            return
+        self.store = store
+        loaded = await self._in_session(self.load)
+        logger.info("BaselineService: loaded %d camera baseline(s).", loaded)
+        self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        """Called at FastAPI shutdown — saves what changed since the last flush."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.store is not None:
+            await self._in_session(self.flush)
+
+    async def _run_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self._in_session(self.flush)
+            except Exception:
+                logger.exception("BaselineService: unexpected error during flush.")
+
+    async def _in_session(self, fn) -> int:
+        """Run fn(db) in a worker thread with its own session."""
+        from backend.db.database import SessionLocal
+
+        def run():
+            db: Session = SessionLocal()
+            try:
+                return fn(db)
+            finally:
+                db.close()
+
+        return await asyncio.get_running_loop().run_in_executor(None, run)
+
+    def load(self, db: Session) -> int:
+        """Install every stored baseline into the store; returns how many were loaded."""
+        loaded = 0
+        for record in db.query(CameraBaseline).all():
+            try:
+                self.store.load(record.camera_id, record.histogram)
+                loaded += 1
+            except (ValueError, TypeError, KeyError) as exc:
+                logger.warning("BaselineService: ignoring invalid baseline for camera %s: %s",
+                               record.camera_id, exc)
+        return loaded
+
+    def flush(self, db: Session) -> int:
+        """Write the baselines changed since the last flush; returns how many were written."""
+        changed = self.store.drain_dirty()
+        if not changed:
+            return 0
+        try:
+            now = datetime.utcnow()
+            for camera_id, histogram in changed.items():
+                record = db.query(CameraBaseline).filter(CameraBaseline.camera_id == camera_id).first()
+                if record is None:
+                    db.add(CameraBaseline(camera_id=camera_id, histogram=histogram, updated_at=now))
+                else:
+                    record.histogram = histogram
+                    record.updated_at = now
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.store.mark_dirty(changed)   # retry on the next flush
+            raise
+        return len(changed)
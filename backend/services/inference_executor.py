@@ -0,0 +1,102 @@
+import asyncio
+import sys
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+try:
+    import config
+except Exception:
+    config = None
+
+
+class InferenceExecutor:
+    """
+    Dedicated, bounded worker pool for the live feeds' per-frame pipeline
+    (decode, detection, face detection, risk scoring, anonymization, overlay
+    drawing, JPEG encoding), so the event loop only moves bytes.
+
+    Threads rather than processes: the models live in this process (and on
+    the GPU), and torch / OpenCV release the GIL while they work.
+
+    - max_workers: frames processed at the same time
+    - max_pending: frames running or queued over all connections; callers
+      beyond that wait on the event loop instead of piling up in the pool
+    - per_connection: frames one connection may have running or queued
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 8, per_connection: int = 1):
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(self.max_workers, int(max_pending))
+        self.per_connection = max(1, int(per_connection))
+        self._pool = None
+        self._pending = asyncio.Semaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'running': 0}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="inference")
+            return self._pool
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool and return its result; waits while max_pending frames are in flight."""
+        async with self._pending:
+            self._count('submitted')
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._executor(), self._call, fn, args)
+            except Exception:
+                self._count('failed')
+                raise
+            self._count('completed')
+            return result
+
+    def _call(self, fn, args):
+        self._count('running')
+        try:
+            return fn(*args)
+        finally:
+            self._count('running', -1)
+
+    def _count(self, key: str, delta: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += delta
+
+    def connection(self, limit: int = None) -> "ConnectionLimiter":
+        """Limiter for one WebSocket connection (per_connection frames in flight unless limit is given)."""
+        return ConnectionLimiter(self, limit or self.per_connection)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'max_workers': self.max_workers, 'max_pending': self.max_pending, **self._stats}
+
+    def shutdown(self) -> None:
+        """Called at FastAPI shutdown — waits for the frames being processed."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+class ConnectionLimiter:
+    """Caps the frames one connection has in the shared InferenceExecutor."""
+
+    def __init__(self, executor: InferenceExecutor, limit: int):
+        self.executor = executor
+        self.limit = limit
+        self._slots = asyncio.Semaphore(limit)
+
+    async def run(self, fn, *args):
+        async with self._slots:
+            return await self.executor.run(fn, *args)
+
+
+inference_executor = InferenceExecutor(
+    max_workers=getattr(config, 'INFERENCE_WORKERS', 4) if config else 4,
+    max_pending=getattr(config, 'INFERENCE_MAX_PENDING', 8) if config else 8,
+    per_connection=getattr(config, 'INFERENCE_PER_CONNECTION', 1) if config else 1,
+)
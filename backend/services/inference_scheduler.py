@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class _Request:
+    __slots__ = ('frame', 'stream_id', 'future', 'enqueued')
+
+    def __init__(self, frame, stream_id):
+        self.frame = frame
+        self.stream_id = stream_id
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class InferenceScheduler:
+    """
+    Cross-camera micro-batching of live detection.
+
+    Live sessions submit frames from their worker threads; one dispatcher
+    thread collects the pending frames of all cameras into a micro-batch and
+    runs the detector once over it (UnifiedDetector.process_streams), then
+    hands each result back through its future. Instead of N cameras making
+    N uncoordinated predict calls, the models see one batched call.
+
+    A batch is dispatched when it is full (max_batch cameras), when every
+    camera seen in the last active_window seconds has a frame waiting (a
+    single camera never waits), or max_wait_ms after its oldest frame
+    arrived. A batch holds at most one frame per camera, the oldest, so a
+    camera's frames stay in order. When more cameras are waiting than fit,
+    cameras in elevated risk go first, then the longest-waiting ones; a frame
+    waiting longer than starvation_ms counts as elevated so no camera starves.
+
+    Args:
+        detect_batch: callable(frames, stream_ids) -> one detection per frame
+        max_batch:    cameras per batch
+        max_wait_ms:  longest a frame waits for others to join its batch
+        priority:     callable(stream_id) -> True while the camera is in elevated risk
+        starvation_ms: wait after which any frame is scheduled as elevated
+        active_window: seconds a camera counts as live after its last frame
+    """
+
+    def __init__(self, detect_batch, max_batch=8, max_wait_ms=10.0, priority=None,
+                 starvation_ms=100.0, active_window=1.0):
+        self.detect_batch = detect_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.priority = priority
+        self.starvation = max(0.0, float(starvation_ms)) / 1000.0
+        self.active_window = active_window
+
+        self._queue = deque()
+        self._last_seen = {}    # stream id -> monotonic time of its last frame
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._stats = {'batches': 0, 'frames': 0, 'max_batch_size': 0, 'wait_ms_total': 0.0,
+                       'elevated_frames': 0, 'errors': 0}
+
+    def submit(self, frame, stream_id) -> Future:
+        """Queue a frame of stream_id; the future resolves to its detection dict."""
+        request = _Request(frame, stream_id)
+        with self._cond:
+            if not self._running:
+                self._start()
+            self._queue.append(request)
+            self._last_seen[stream_id] = request.enqueued
+            self._cond.notify()
+        return request.future
+
+    def detect(self, frame, stream_id, timeout=None):
+        """Blocking submit(): the detection of frame (raises what the detector raised)."""
+        return self.submit(frame, stream_id).result(timeout=timeout)
+
+    def _start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the dispatcher; frames still queued fail with RuntimeError."""
+        with self._cond:
+            self._running = False
+            pending, self._queue = list(self._queue), deque()
+            self._cond.notify_all()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+        for request in pending:
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(RuntimeError("inference scheduler stopped"))
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queued'] = len(self._queue)
+        batches = stats['batches']
+        stats['avg_batch_size'] = round(stats['frames'] / batches, 2) if batches else 0.0
+        stats['avg_wait_ms'] = round(stats.pop('wait_ms_total') / stats['frames'], 2) if stats['frames'] else 0.0
+        return stats
+
+    # ── Dispatcher ──────────────────────────────────────────────────────────
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                deadline = self._queue[0].enqueued + self.max_wait
+                while self._running and not self._ready():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._running:
+                    return
+                batch, elevated = self._take_batch()
+            self._dispatch(batch, elevated)
+
+    def _ready(self) -> bool:
+        """Dispatch without waiting: the batch is full or every live camera has a frame queued."""
+        waiting = {r.stream_id for r in self._queue}
+        if len(waiting) >= self.max_batch:
+            return True
+        now = time.monotonic()
+        for stream_id, seen in list(self._last_seen.items()):
+            if now - seen > self.active_window:
+                del self._last_seen[stream_id]
+        return self._last_seen.keys() <= waiting
+
+    def _take_batch(self):
+        """Oldest frame of up to max_batch cameras: elevated (or starving) first, then by age."""
+        now = time.monotonic()
+        oldest = {}
+        for request in self._queue:
+            oldest.setdefault(request.stream_id, request)
+
+        def elevated(request):
+            if now - request.enqueued >= self.starvation:
+                return True
+            try:
+                return bool(self.priority and self.priority(request.stream_id))
+            except Exception:
+                return False
+
+        ranked = sorted(oldest.values(), key=lambda r: (not elevated(r), r.enqueued))
+        batch = ranked[:self.max_batch]
+        chosen = set(map(id, batch))
+        self._queue = deque(r for r in self._queue if id(r) not in chosen)
+        return batch, sum(1 for r in batch if elevated(r))
+
+    def _dispatch(self, batch, elevated) -> None:
+        batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.monotonic()
+        try:
+            results = self.detect_batch([r.frame for r in batch], [r.stream_id for r in batch])
+        except Exception as exc:
+            with self._cond:
+                self._stats['errors'] += 1
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+
+        with self._cond:
+            self._stats['batches'] += 1
+            self._stats['frames'] += len(batch)
+            self._stats['elevated_frames'] += elevated
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], len(batch))
+            self._stats['wait_ms_total'] += sum((started - r.enqueued) * 1000.0 for r in batch)
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
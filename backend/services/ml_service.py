@@ -7,15 +7,129 @@ sys.path.append(os.getcwd())
 try:
     from models.detection.detector import UnifiedDetector
     from models.scoring.risk_engine import RiskScoringEngine
+    from models.scoring.diagnostics import scoring_diagnostics
+    from models.scoring.baselines import BaselineStore
+    from models.scoring.camera_engines import CameraEngines
     from models.privacy.anonymizer import PrivacyAnonymizer
 except ImportError:
     print("Warning: Could not import machine learning models.")
     UnifiedDetector = None
     RiskScoringEngine = None
+    scoring_diagnostics = None
+    BaselineStore = None
+    CameraEngines = None
     PrivacyAnonymizer = None
 
+try:
+    import config
+except Exception:
+    config = None
+
+import re
 import threading
 
+from backend.services.inference_scheduler import InferenceScheduler
+
+
+def _parse_device_map(raw):
+    """Parse 'pose=cuda:1,fire=cpu' into {'pose': 'cuda:1', 'fire': 'cpu'}."""
+    devices = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        key, dev = item.split("=", 1)
+        if key.strip() and dev.strip():
+            devices[key.strip()] = dev.strip()
+    return devices
+
+
+def _cascade_options():
+    """SpecialistCascade options from config.py, or None when the cascade is disabled."""
+    if not (getattr(config, 'DETECTOR_CASCADE', True) if config else True):
+        return None
+    return {
+        'motion_threshold': getattr(config, 'DETECTOR_CASCADE_MOTION_THRESHOLD', 3.0) if config else 3.0,
+        'idle_interval': getattr(config, 'DETECTOR_CASCADE_IDLE_INTERVAL', 10) if config else 10,
+        'hold_frames': getattr(config, 'DETECTOR_CASCADE_HOLD_FRAMES', 15) if config else 15,
+    }
+
+
+def _roi_weapon_options():
+    """Person-crop weapon detection options from config.py, or None for full-frame scans."""
+    if not (getattr(config, 'DETECTOR_ROI_WEAPONS', False) if config else False):
+        return None
+    return {
+        'padding': getattr(config, 'DETECTOR_ROI_PADDING', 0.25),
+        'max_rois': getattr(config, 'DETECTOR_ROI_MAX', 8),
+    }
+
+
+def _detector_options():
+    """UnifiedDetector keyword options taken from config.py (defaults when absent)."""
+    return {
+        'fused': getattr(config, 'DETECTOR_FUSED_COCO', True) if config else True,
+        'parallel': getattr(config, 'DETECTOR_PARALLEL', False) if config else False,
+        'max_workers': getattr(config, 'DETECTOR_WORKERS', 3) if config else 3,
+        'batch_size': getattr(config, 'DETECTOR_BATCH_SIZE', 8) if config else 8,
+        'backend': getattr(config, 'DETECTOR_BACKEND', 'torch') if config else 'torch',
+        'precision': getattr(config, 'DETECTOR_PRECISION', 'fp32') if config else 'fp32',
+        'calibration_data': getattr(config, 'DETECTOR_CALIBRATION_DATA', None) if config else None,
+        'cascade': _cascade_options(),
+        'roi_weapons': _roi_weapon_options(),
+        'stream_idle_ttl': getattr(config, 'DETECTOR_STREAM_IDLE_TTL', 300.0) if config else 300.0,
+        'model_devices': _parse_device_map(getattr(config, 'DETECTOR_DEVICE_MAP', "") if config else ""),
+    }
+
+
+def _diagnostics_options():
+    """ScoringDiagnostics log settings taken from config.py (defaults when absent)."""
+    return {
+        'log': getattr(config, 'SCORING_DIAGNOSTICS_LOG', True) if config else True,
+        'sample_every': getattr(config, 'SCORING_DIAGNOSTICS_SAMPLE_EVERY', 1) if config else 1,
+        'max_per_second': getattr(config, 'SCORING_DIAGNOSTICS_MAX_PER_SECOND', 1.0) if config else 1.0,
+        'log_frames': getattr(config, 'SCORING_DIAGNOSTICS_LOG_FRAMES', False) if config else False,
+    }
+
+
+# Camera ids a client may send: they name recording files and DB rows
+_CAMERA_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+
+def live_camera_id(requested=None):
+    """
+    Camera a live feed is scored, recorded and alerted under: the client's
+    ?camera_id=, else LIVE_DEFAULT_CAMERA_ID (also used for an id that is not
+    1-64 letters, digits, '-' or '_').
+    """
+    default = getattr(config, 'LIVE_DEFAULT_CAMERA_ID', 'CAM-01') if config else 'CAM-01'
+    if not requested:
+        return default
+    if not _CAMERA_ID.fullmatch(requested):
+        print(f"Ignoring invalid camera_id {requested!r}, using {default}")
+        return default
+    return requested
+
+
+def _baseline_store():
+    """Per-camera crowd baselines configured from config.py (None when disabled)."""
+    if BaselineStore is None or not (getattr(config, 'CROWD_BASELINES_ENABLED', True) if config else True):
+        return None
+    return BaselineStore(
+        half_life_days=getattr(config, 'CROWD_BASELINE_HALF_LIFE_DAYS', 7.0) if config else 7.0,
+        min_samples=getattr(config, 'CROWD_BASELINE_MIN_SAMPLES', 300) if config else 300,
+    )
+
+
+def _scheduler_options():
+    """InferenceScheduler options from config.py, or None when live batching is disabled."""
+    if not (getattr(config, 'INFERENCE_BATCHING', True) if config else True):
+        return None
+    return {
+        'max_batch': getattr(config, 'INFERENCE_MAX_BATCH', 8) if config else 8,
+        'max_wait_ms': getattr(config, 'INFERENCE_MAX_WAIT_MS', 10.0) if config else 10.0,
+    }
+
+
 class MLService:
     _instance = None
     _lock = threading.Lock()
@@ -23,11 +137,19 @@ class MLService:
     def __init__(self):
         self.detector = None
         self.risk_engine = None
+        # One engine per live camera, made from risk_engine (see calculate_risk)
+        self.camera_engines = None
         self.anonymizer = None
         self.loaded = False
         self.load_error = None
         self.device_in_use = None
         self.models_ready = threading.Event()
+        # Cross-camera micro-batching of live detection (None = direct calls)
+        self.scheduler = None
+        self.priority_risk = getattr(config, 'INFERENCE_PRIORITY_RISK', 50.0) if config else 50.0
+        self._camera_risk = {}
+        # Loaded from / saved to the DB by BaselineService (backend/api/main.py)
+        self.baselines = _baseline_store()
 
     @classmethod
     def get_instance(cls):
@@ -56,6 +178,46 @@ class MLService:
         """Block until models are loaded or timeout is reached. Returns True if ready."""
         return self.models_ready.wait(timeout=timeout)
 
+    def detect(self, frame, stream_id=None):
+        """
+        Live detection of one frame of stream_id. Frames of all cameras are
+        micro-batched by the scheduler when it is enabled; blocks until the
+        frame's detection is ready.
+        """
+        if self.scheduler is None:
+            return self.detector.process_frame(frame, stream_id=stream_id)
+        return self.scheduler.detect(frame, stream_id)
+
+    def calculate_risk(self, detection, camera_id=None, stream_id=None):
+        """
+        Risk score of a live frame from camera_id's own engine (calibration,
+        histories and smoothing are per camera); frames of one camera are
+        scored one at a time, different cameras in parallel.
+
+        camera_id selects that engine and the crowd baseline and labels
+        diagnostics; stream_id is the connection's detector stream (defaults
+        to camera_id).
+        """
+        score, factors = self.camera_engines.calculate_risk(detection, camera_id=camera_id)
+        # Latest score per stream: the scheduler serves elevated streams first
+        self._camera_risk[camera_id if stream_id is None else stream_id] = score or 0.0
+        return score, factors
+
+    def is_elevated(self, stream_id):
+        """True while the stream's latest risk score is at least INFERENCE_PRIORITY_RISK."""
+        return self._camera_risk.get(stream_id, 0.0) >= self.priority_risk
+
+    def release_camera(self, stream_id):
+        """Forget a live connection's state (detector stream and scheduling priority)."""
+        self._camera_risk.pop(stream_id, None)
+        if self.detector:
+            self.detector.release_stream(stream_id)
+
+    def shutdown(self):
+        """Stop the live inference scheduler (app shutdown)."""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+
     def _load_models_internal(self):
         print("=" * 50)
         print("Loading ML Models...")
@@ -67,13 +229,13 @@ class MLService:
 
                 try:
                     print("  Loading YOLO detector...")
-                    self.detector = UnifiedDetector(device=preferred_device)
+                    self.detector = UnifiedDetector(device=preferred_device, **_detector_options())
                     self.device_in_use = preferred_device
                 except Exception as gpu_exc:
                     # If GPU init fails (OOM/driver), fall back to CPU.
                     if preferred_device == 'cuda':
                         print(f"  Warning: CUDA detector init failed, falling back to CPU. Error: {gpu_exc}")
-                        self.detector = UnifiedDetector(device='cpu')
+                        self.detector = UnifiedDetector(device='cpu', **{**_detector_options(), 'model_devices': None})
                         self.device_in_use = 'cpu'
                     else:
                         raise
@@ -81,7 +243,20 @@ class MLService:
                 print("  Warming up models...")
                 self.detector.warmup()
                 print("  Loading Risk Engine...")
-                self.risk_engine = RiskScoringEngine()
+                scoring_diagnostics.configure(**_diagnostics_options())
+                # Drop a track's history once the tracker would have dropped the track
+                self.risk_engine = RiskScoringEngine(track_max_age=self.detector.tracker.max_age,
+                                                     baselines=self.baselines)
+                self.camera_engines = CameraEngines(
+                    self.risk_engine,
+                    max_cameras=getattr(config, 'RISK_ENGINE_MAX_CAMERAS', 64) if config else 64,
+                )
+                options = _scheduler_options()
+                if options is not None:
+                    self.scheduler = InferenceScheduler(self.detector.process_streams,
+                                                        priority=self.is_elevated, **options)
+                    print(f"  Live inference batching: up to {options['max_batch']} cameras, "
+                          f"{options['max_wait_ms']} ms max wait")
                 print("  Loading Anonymizer...")
                 self.anonymizer = PrivacyAnonymizer()
                 self.loaded = True
@@ -102,7 +277,9 @@ class MLService:
             traceback.print_exc()
             self.detector = None
             self.risk_engine = None
+            self.camera_engines = None
             self.anonymizer = None
+            self.scheduler = None
             self.loaded = False
             self.device_in_use = None
             self.load_error = str(e)
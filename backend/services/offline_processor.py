@@ -207,20 +207,21 @@ class OfflineProcessor:
         current_frame = 0
         next_sample_frame = 0  # adaptive sampling cursor
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if current_frame >= next_sample_frame:
-                timestamp = current_frame / fps
-
-                # --- Motion score vs previous frame ---
-                motion = compute_motion_score(prev_frame, frame)
+        # Sampling only depends on frame motion, so sampled frames are queued
+        # and sent to the detector in batches; the VLM pass still walks them
+        # in timestamp order.
+        batch_size = max(1, getattr(ml_service.detector, 'batch_size', 1) or 1)
+        pending = []  # (frame, timestamp, motion)
+        stream_id = f"offline-{video_filename}"
+
+        def analyze_samples(samples):
+            nonlocal prev_description
+            # --- ML fast filter ---
+            detections = ml_service.detector.process_batch(
+                [s[0] for s in samples], stream_id=stream_id
+            )
+            for (frame, timestamp, motion), ml_results in zip(samples, detections):
                 is_high_motion = motion > HIGH_MOTION_THRESHOLD
-
-                # --- ML fast filter ---
-                ml_results = ml_service.detector.process_frame(frame)
                 yolo_objects = ml_results.get('objects', [])
                 yolo_weapons = ml_results.get('weapons', [])
                 yolo_poses = ml_results.get('poses', [])
@@ -301,6 +302,23 @@ class OfflineProcessor:
                     events.append(event)
                     print(f"  [{timestamp:.1f}s] {severity.upper()} | risk={suggested_risk} | motion={motion:.2f} | threats={detected_threats} | {result.get('provider','?')}")
 
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            if current_frame >= next_sample_frame:
+                timestamp = current_frame / fps
+
+                # --- Motion score vs previous frame ---
+                motion = compute_motion_score(prev_frame, frame)
+                is_high_motion = motion > HIGH_MOTION_THRESHOLD
+
+                pending.append((frame, timestamp, motion))
+                if len(pending) >= batch_size:
+                    analyze_samples(pending)
+                    pending = []
+
                 # Adaptive next sample: high motion → sample faster
                 interval = HIGH_MOTION_INTERVAL if is_high_motion else BASE_INTERVAL
                 next_sample_frame = current_frame + max(1, int(fps * interval))
@@ -308,6 +326,10 @@ class OfflineProcessor:
 
             current_frame += 1
 
+        if pending:
+            analyze_samples(pending)
+        ml_service.detector.release_stream(stream_id)
+
         cap.release()
 
         # Audio analysis
@@ -27,6 +27,9 @@ class Recording:
         self.path = path
         self.start_time = start_time
         self.last_frame_time = start_time
+        # Live feeds write frames from the inference pool's threads
+        self.lock = threading.Lock()
+        self.closed = False
 
 class VideoStorageService:
     def __init__(self, base_path=None):
@@ -49,18 +52,17 @@ class VideoStorageService:
         self._start_cleanup_thread()
 
     def start_recording(self, camera_id, frame_size=(640, 480)):
+        # Held while the writer is created: feeds may start the same camera concurrently
         with self.recordings_lock:
             if camera_id in self.active_recordings:
                 return
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{camera_id}_{timestamp}.mp4"
-        filepath = os.path.join(self.clips_path, filename)
-        
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        writer = cv2.VideoWriter(filepath, fourcc, 10.0, frame_size)
 
-        with self.recordings_lock:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{camera_id}_{timestamp}.mp4"
+            filepath = os.path.join(self.clips_path, filename)
+
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            writer = cv2.VideoWriter(filepath, fourcc, 10.0, frame_size)
             self.active_recordings[camera_id] = Recording(writer, filepath, time.time())
         print(f"Started smart recording for {camera_id}: {filename}")
 
@@ -70,7 +72,10 @@ class VideoStorageService:
         if recording is None:
             return
 
-        recording.writer.write(frame)
+        with recording.lock:
+            if recording.closed:
+                return
+            recording.writer.write(frame)
         recording.last_frame_time = time.time()
         
         # Auto-stop after 30 seconds of recording to chunk files
@@ -85,7 +90,9 @@ class VideoStorageService:
         if recording is None:
             return
 
-        recording.writer.release()
+        with recording.lock:
+            recording.closed = True
+            recording.writer.release()
         
         # Verify the file was written properly
         try:
@@ -162,7 +169,7 @@ class VideoStorageService:
         try:
             candidates = [
                 f for f in os.listdir(self.clips_path)
-                if f.startswith(camera_id) and f.endswith(".mp4")
+                if f.startswith(f"{camera_id}_") and f.endswith(".mp4")
                 and os.path.join(self.clips_path, f) not in active_paths
             ]
         except OSError as e:
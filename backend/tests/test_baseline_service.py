@@ -0,0 +1,99 @@
+"""
+Unit tests for BaselineService.
+
+Covers:
+- flush writes only the baselines that changed, insert then update
+- load installs stored baselines so a new store knows the camera
+- invalid stored rows are skipped
+- a failed flush re-queues the baselines
+"""
+
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.db.models import CameraBaseline
+from backend.db.database import Base
+from backend.services.baseline_service import BaselineService
+from models.scoring.baselines import BaselineStore
+
+T0 = 1700000000.0
+
+
+def make_test_db():
+    """In-memory SQLite with a unique name so tests are fully isolated."""
+    db_name = f"test_{uuid.uuid4().hex}"
+    db_url = f"sqlite:///file:{db_name}?mode=memory&cache=shared&uri=true"
+    engine = create_engine(
+        db_url,
+        connect_args={"check_same_thread": False, "uri": True},
+    )
+    Base.metadata.create_all(bind=engine)
+    TestSession = sessionmaker(bind=engine)
+    return engine, TestSession
+
+
+def make_service(**store_kwargs):
+    service = BaselineService()
+    service.store = BaselineStore(**store_kwargs)
+    return service
+
+
+def test_flush_writes_changed_baselines():
+    _, TestSession = make_test_db()
+    service = make_service()
+    service.store.update("cam1", 9, 4, T0)
+    service.store.update("cam2", 9, 6, T0)
+
+    with TestSession() as db:
+        assert service.flush(db) == 2
+        assert service.flush(db) == 0
+
+        service.store.update("cam1", 9, 8, T0 + 1)
+        assert service.flush(db) == 1
+        row = db.query(CameraBaseline).filter(CameraBaseline.camera_id == "cam1").one()
+        assert row.histogram["weight"][9] == pytest.approx(2.0, rel=1e-4)
+        assert db.query(CameraBaseline).count() == 2
+
+
+def test_load_restores_baselines():
+    _, TestSession = make_test_db()
+    service = make_service(min_samples=1)
+    service.store.update("cam1", 14, 5, T0)
+    with TestSession() as db:
+        service.flush(db)
+
+    restarted = make_service(min_samples=1)
+    with TestSession() as db:
+        assert restarted.load(db) == 1
+    assert restarted.store.expected("cam1", 14, T0) == pytest.approx(5.0)
+    assert restarted.store.drain_dirty() == {}
+
+
+def test_load_skips_invalid_rows():
+    _, TestSession = make_test_db()
+    with TestSession() as db:
+        db.add(CameraBaseline(camera_id="broken", histogram={"mean": [1.0]}))
+        db.commit()
+
+        service = make_service()
+        assert service.load(db) == 0
+    assert service.store.snapshot() == {}
+
+
+def test_failed_flush_requeues():
+    service = make_service()
+    service.store.update("cam1", 9, 4, T0)
+
+    class FailingSession:
+        def query(self, *args):
+            raise RuntimeError("db down")
+
+        def rollback(self):
+            pass
+
+    with pytest.raises(RuntimeError):
+        service.flush(FailingSession())
+    assert list(service.store.drain_dirty()) == ["cam1"]
@@ -0,0 +1,132 @@
+"""
+Unit tests for FramePipeline.
+
+Covers:
+- only the newest received frame reaches the loop, older ones are counted as dropped
+- an unsent result is replaced by the newer one, keeping its metadata
+- packets that are not frames are skipped and a disconnect ends the pipeline
+- min_interval paces the frames taken, newer ones replacing those waiting
+"""
+
+import asyncio
+import time
+
+from backend.utils.frame_pipeline import FramePipeline, LatestSlot
+
+
+class FakeSocket:
+    """Feeds queued packets to the pipeline (None = disconnect) and records what is sent."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    async def receive_bytes(self):
+        item = await self.incoming.get()
+        if item is None:
+            raise RuntimeError("disconnected")
+        return item
+
+    async def send_json(self, message):
+        self.sent.append(("json", message))
+
+    async def send_bytes(self, data):
+        self.sent.append(("bytes", data))
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_latest_slot():
+    async def main():
+        slot = LatestSlot()
+        assert slot.put(1) is False
+        assert slot.put(2) is True
+        assert await slot.get() == 2
+        slot.put(3)
+        slot.close()
+        return await slot.get(), await slot.get()
+
+    assert asyncio.run(main()) == (3, None)
+
+
+def test_newest_frame_wins():
+    async def main():
+        socket = FakeSocket()
+        pipeline = FramePipeline(socket).start()
+        for i in range(5):
+            socket.incoming.put_nowait(b"frame%d" % i)
+        await settle()
+        frame = await pipeline.next_frame()
+        socket.incoming.put_nowait(None)
+        end = await pipeline.next_frame()
+        await pipeline.close()
+        return frame, end, pipeline.stats()
+
+    frame, end, stats = asyncio.run(main())
+    assert frame == b"frame4"
+    assert end is None
+    assert (stats["received"], stats["dropped_in"], stats["processed"]) == (5, 4, 1)
+
+
+def test_unsent_result_is_replaced_keeping_metadata():
+    async def main():
+        socket = FakeSocket()
+        pipeline = FramePipeline(socket).start()
+        socket.incoming.put_nowait(b"frame")
+        await pipeline.next_frame()
+        pipeline.emit({"risk_score": 70}, b"jpeg0")
+        pipeline.emit(None, b"jpeg1")
+        await settle()
+        socket.incoming.put_nowait(None)
+        await pipeline.close()
+        return socket.sent, pipeline.stats()
+
+    sent, stats = asyncio.run(main())
+    assert sent == [("json", {"risk_score": 70}), ("bytes", b"jpeg1")]
+    assert (stats["sent"], stats["dropped_out"]) == (1, 1)
+    assert stats["latency_ms"] >= 0.0
+
+
+def test_non_frame_packets_are_skipped():
+    async def main():
+        socket = FakeSocket()
+        packets = iter([None, b"frame"])
+
+        async def receive():
+            item = next(packets, "end")
+            if item == "end":
+                await asyncio.sleep(3600)
+            return item
+
+        pipeline = FramePipeline(socket, receive=receive).start()
+        frame = await asyncio.wait_for(pipeline.next_frame(), timeout=5)
+        await pipeline.close()
+        return frame, pipeline.stats()["received"], pipeline.closed
+
+    assert asyncio.run(main()) == (b"frame", 1, True)
+
+
+def test_min_interval_paces_frames():
+    async def main():
+        socket = FakeSocket()
+        pipeline = FramePipeline(socket).start()
+        pipeline.min_interval = 0.2
+        socket.incoming.put_nowait(b"frame0")
+        await pipeline.next_frame()
+        pipeline.emit({"n": 0}, b"jpeg0")
+        started = time.monotonic()
+        socket.incoming.put_nowait(b"frame1")
+        socket.incoming.put_nowait(b"frame2")
+        frame = await pipeline.next_frame()
+        waited = time.monotonic() - started
+        await pipeline.close()
+        return frame, waited, pipeline.stats()
+
+    frame, waited, stats = asyncio.run(main())
+    assert frame == b"frame2"
+    assert waited >= 0.15
+    assert stats["dropped_in"] == 1
+    assert stats["sent"] == 1 and stats["send_ms"] >= 0.0
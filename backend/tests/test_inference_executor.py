@@ -0,0 +1,109 @@
+"""
+Unit tests for InferenceExecutor.
+
+Covers:
+- work runs on the pool's threads, not the event loop's
+- a connection never has more than its limit of frames in flight
+- frames in flight over all connections stay within max_pending
+- errors reach the caller and free the slot
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.services.inference_executor import InferenceExecutor
+
+
+class Probe:
+    """Blocking job that records how many copies of itself run at once."""
+
+    def __init__(self, executor=None, seconds=0.02):
+        self.executor = executor
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.max_in_flight = 0
+
+    def __call__(self, value):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            if self.executor is not None:
+                stats = self.executor.stats()
+                in_flight = stats["submitted"] - stats["completed"] - stats["failed"]
+                self.max_in_flight = max(self.max_in_flight, in_flight)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running -= 1
+        return value
+
+
+def test_runs_on_pool_threads():
+    executor = InferenceExecutor(max_workers=2)
+
+    async def main():
+        return await executor.connection().run(lambda: threading.current_thread().name)
+
+    try:
+        name = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert name.startswith("inference")
+    assert name != threading.current_thread().name
+    assert executor.stats()["completed"] == 1
+
+
+def test_connection_limit():
+    executor = InferenceExecutor(max_workers=4, max_pending=8, per_connection=1)
+    probe = Probe()
+
+    async def main():
+        connection = executor.connection()
+        return await asyncio.gather(*(connection.run(probe, i) for i in range(5)))
+
+    try:
+        assert asyncio.run(main()) == list(range(5))
+    finally:
+        executor.shutdown()
+    assert probe.max_running == 1
+
+
+def test_max_pending_over_connections():
+    executor = InferenceExecutor(max_workers=2, max_pending=3, per_connection=2)
+    probe = Probe(executor)
+
+    async def main():
+        connections = [executor.connection() for _ in range(4)]
+        return await asyncio.gather(*(c.run(probe, i) for i, c in enumerate(connections * 2)))
+
+    try:
+        assert asyncio.run(main()) == list(range(8))
+    finally:
+        executor.shutdown()
+    assert probe.max_running == 2
+    assert probe.max_in_flight <= 3
+    assert executor.stats()["completed"] == 8
+
+
+def test_errors_propagate_and_free_the_slot():
+    executor = InferenceExecutor(max_workers=1, max_pending=1)
+
+    def fail():
+        raise RuntimeError("bad frame")
+
+    async def main():
+        connection = executor.connection()
+        with pytest.raises(RuntimeError):
+            await connection.run(fail)
+        return await asyncio.wait_for(connection.run(lambda: "next"), timeout=5)
+
+    try:
+        assert asyncio.run(main()) == "next"
+    finally:
+        executor.shutdown()
+    stats = executor.stats()
+    assert (stats["failed"], stats["completed"], stats["running"]) == (1, 1, 0)
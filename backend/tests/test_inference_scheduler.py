@@ -0,0 +1,121 @@
+"""
+Unit tests for InferenceScheduler.
+
+Covers:
+- frames of several cameras are detected in one batched call
+- a batch holds one frame per camera and a camera's frames stay in order
+- cameras in elevated risk are scheduled before the others
+- detector errors reach every caller of the batch
+- a single camera does not wait for max_wait_ms
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.services.inference_scheduler import InferenceScheduler
+
+
+class FakeBatchDetector:
+    """Records each batch; the detection of a frame is (stream_id, frame)."""
+
+    def __init__(self, seconds=0.0, gate=None):
+        self.seconds = seconds
+        self.gate = gate
+        self.batches = []
+
+    def __call__(self, frames, stream_ids):
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        self.batches.append(list(zip(stream_ids, frames)))
+        time.sleep(self.seconds)
+        return [{'stream_id': sid, 'frame': f} for sid, f in zip(stream_ids, frames)]
+
+
+def test_cameras_share_a_batch():
+    detector = FakeBatchDetector()
+    scheduler = InferenceScheduler(detector, max_batch=8, max_wait_ms=200)
+    cameras = ['cam-%d' % i for i in range(4)]
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda sid: scheduler.detect('f0', sid, timeout=5), cameras))
+    finally:
+        scheduler.stop()
+
+    assert [r['stream_id'] for r in results] == cameras
+    assert len(detector.batches) < 4
+    assert scheduler.stats()['max_batch_size'] > 1
+
+
+def test_one_frame_per_camera_in_order():
+    gate = threading.Event()
+    detector = FakeBatchDetector(gate=gate)
+    scheduler = InferenceScheduler(detector, max_batch=8, max_wait_ms=0)
+    try:
+        blocker = scheduler.submit('x', 'cam-z')
+        time.sleep(0.05)    # dispatcher is now held inside the first batch
+        futures = [scheduler.submit(i, 'cam-a') for i in range(3)] + [scheduler.submit(0, 'cam-b')]
+        gate.set()
+        blocker.result(timeout=5)
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        scheduler.stop()
+
+    assert [r['frame'] for r in results] == [0, 1, 2, 0]
+    for batch in detector.batches:
+        ids = [sid for sid, _ in batch]
+        assert len(ids) == len(set(ids))
+    frames_a = [f for batch in detector.batches for sid, f in batch if sid == 'cam-a']
+    assert frames_a == [0, 1, 2]
+
+
+def test_elevated_cameras_go_first():
+    gate = threading.Event()
+    detector = FakeBatchDetector(gate=gate)
+    scheduler = InferenceScheduler(detector, max_batch=1, max_wait_ms=0,
+                                   priority=lambda sid: sid == 'cam-hot', starvation_ms=10000)
+    try:
+        blocker = scheduler.submit('x', 'cam-z')
+        time.sleep(0.05)
+        futures = [scheduler.submit('f', sid) for sid in ('cam-a', 'cam-b', 'cam-hot')]
+        gate.set()
+        blocker.result(timeout=5)
+        for f in futures:
+            f.result(timeout=5)
+    finally:
+        scheduler.stop()
+
+    order = [batch[0][0] for batch in detector.batches[1:]]
+    assert order == ['cam-hot', 'cam-a', 'cam-b']
+    assert scheduler.stats()['elevated_frames'] == 1
+
+
+def test_errors_reach_every_caller():
+    def fail(frames, stream_ids):
+        raise RuntimeError("model crashed")
+
+    scheduler = InferenceScheduler(fail, max_wait_ms=50)
+    try:
+        futures = [scheduler.submit('f', sid) for sid in ('cam-a', 'cam-b')]
+        for f in futures:
+            with pytest.raises(RuntimeError):
+                f.result(timeout=5)
+        assert scheduler.stats()['errors'] >= 1
+    finally:
+        scheduler.stop()
+
+
+def test_single_camera_does_not_wait():
+    scheduler = InferenceScheduler(FakeBatchDetector(), max_wait_ms=1000)
+    try:
+        scheduler.detect('f0', 'cam-a', timeout=5)
+        started = time.monotonic()
+        for i in range(5):
+            scheduler.detect(i, 'cam-a', timeout=5)
+        elapsed = time.monotonic() - started
+    finally:
+        scheduler.stop()
+    assert elapsed < 0.5
+    assert scheduler.stats()['frames'] == 6
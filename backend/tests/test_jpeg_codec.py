@@ -0,0 +1,71 @@
+"""
+Unit tests for JpegCodec.
+
+Covers:
+- encode/decode round trip and encode quality
+- scaled decode at 1/2, 1/4 and 1/8 resolution
+- undecodable data, unsupported scales and unknown backends
+- the turbojpeg backend falls back to OpenCV when PyTurboJPEG is missing
+- DecodeBuffer decodes consecutive frames of a connection
+"""
+
+import numpy as np
+import pytest
+
+import backend.utils.jpeg_codec as jpeg_module
+from backend.utils.jpeg_codec import DecodeBuffer, JpegCodec
+
+
+def make_frame(height=480, width=640):
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, : width // 2] = (40, 120, 200)
+    frame[height // 4: height // 2, width // 4: width // 2] = 255
+    return frame
+
+
+def test_round_trip():
+    codec = JpegCodec(backend="opencv", quality=90)
+    frame = make_frame()
+    decoded = codec.decode(codec.encode(frame))
+    assert decoded.shape == frame.shape
+    assert np.abs(decoded.astype(int) - frame.astype(int)).mean() < 3
+
+
+def test_quality_controls_size():
+    codec = JpegCodec(backend="opencv")
+    frame = np.random.RandomState(0).randint(0, 255, (240, 320, 3), dtype=np.uint8)
+    assert len(codec.encode(frame, quality=30)) < len(codec.encode(frame, quality=95))
+    assert codec.encode(frame) == codec.encode(frame, quality=95)
+
+
+@pytest.mark.parametrize("scale", [2, 4, 8])
+def test_scaled_decode(scale):
+    codec = JpegCodec(backend="opencv")
+    data = codec.encode(make_frame(480, 640))
+    assert codec.decode(data, scale=scale).shape == (480 // scale, 640 // scale, 3)
+
+
+def test_invalid_input():
+    codec = JpegCodec(backend="opencv")
+    assert codec.decode(b"not an image") is None
+    with pytest.raises(ValueError):
+        codec.decode(codec.encode(make_frame()), scale=3)
+    with pytest.raises(ValueError):
+        JpegCodec(backend="nvjpeg")
+
+
+def test_turbojpeg_falls_back_to_opencv(monkeypatch):
+    monkeypatch.setattr(jpeg_module, "TurboJPEG", None)
+    codec = JpegCodec(backend="turbojpeg")
+    assert codec.backend == "opencv"
+    assert codec.decode(codec.encode(make_frame())).shape == (480, 640, 3)
+
+
+def test_decode_buffer():
+    codec = JpegCodec(backend="opencv")
+    decoder = DecodeBuffer(codec, scale=2)
+    first = decoder.decode(codec.encode(make_frame()))
+    second = decoder.decode(codec.encode(make_frame(240, 320)))
+    assert first.shape == (240, 320, 3)
+    assert second.shape == (120, 160, 3)
+    assert decoder.decode(b"broken") is None
@@ -0,0 +1,69 @@
+"""
+Unit tests for the live feed's camera id.
+
+Covers:
+- live_camera_id keeps valid ids and falls back to the default for missing or
+  invalid ones (they end up in recording file names)
+- /ws/live-feed files its alerts and rolling recording under ?camera_id=
+"""
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.routers import stream
+from backend.services import ml_service as ml_module
+from backend.services.ml_service import live_camera_id, ml_service
+from backend.services.video_storage_service import video_storage_service
+from models.scoring.risk_engine import RiskScoringEngine
+
+
+@pytest.mark.parametrize("requested, expected", [
+    ("CAM-03", "CAM-03"),
+    ("lobby_2", "lobby_2"),
+    (None, "CAM-01"),
+    ("", "CAM-01"),
+    ("../etc", "CAM-01"),
+    ("cam 1", "CAM-01"),
+    ("-cam", "CAM-01"),
+    ("c" * 65, "CAM-01"),
+])
+def test_live_camera_id(monkeypatch, requested, expected):
+    monkeypatch.setattr(ml_module, "config", None)
+    assert live_camera_id(requested) == expected
+
+
+class _Detector:
+    def process_frame(self, frame, stream_id=None):
+        return {"poses": [], "objects": [], "weapons": [], "fire": []}
+
+    def release_stream(self, stream_id):
+        pass
+
+
+def test_live_feed_files_alerts_and_recordings_under_camera_id(monkeypatch):
+    saved, recorded = [], []
+    monkeypatch.setattr(ml_service, "detector", _Detector())
+    monkeypatch.setattr(ml_service, "scheduler", None)
+    monkeypatch.setattr(ml_service, "anonymizer", None)
+    monkeypatch.setattr(ml_service, "risk_engine", RiskScoringEngine(bypass_calibration=True))
+    monkeypatch.setattr(ml_service, "calculate_risk", lambda detection, camera_id=None, stream_id=None: (80.0, {}))
+    # No alert id, so no clip capture is scheduled
+    monkeypatch.setattr(stream, "save_alert_sync", lambda alert, camera_id: saved.append(camera_id))
+    monkeypatch.setattr(video_storage_service, "start_recording",
+                        lambda camera_id, frame_size=None: recorded.append(("start", camera_id)))
+    monkeypatch.setattr(video_storage_service, "add_frame",
+                        lambda camera_id, frame: recorded.append(("frame", camera_id)))
+
+    app = FastAPI()
+    app.include_router(stream.router, prefix="/ws")
+    data = cv2.imencode(".jpg", np.zeros((120, 160, 3), np.uint8))[1].tobytes()
+    with TestClient(app).websocket_connect("/ws/live-feed?camera_id=CAM-07") as ws:
+        ws.send_bytes(data)
+        while not ws.receive().get("bytes"):
+            pass
+
+    assert saved == ["CAM-07"]
+    assert recorded and {camera_id for _, camera_id in recorded} == {"CAM-07"}
@@ -0,0 +1,84 @@
+"""
+Unit tests for OutputControl.
+
+Covers:
+- set_output messages update size, frame rate and quality; invalid ones change nothing
+- fit_frame scales down to the display size, never up
+- auto quality backs off while sends are slow and recovers when they are fast
+- apply_output_message paces the pipeline and acknowledges or reports errors
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from backend.utils.output_control import OutputControl, apply_output_message, fit_frame
+
+
+def test_update_and_validation():
+    output = OutputControl(max_quality=80)
+    settings = output.update({"type": "set_output", "width": 480, "height": 270, "max_fps": 10, "quality": 60})
+    assert settings == {"width": 480, "height": 270, "max_fps": 10, "quality": 60, "auto_quality": False}
+    assert output.min_interval == pytest.approx(0.1)
+
+    with pytest.raises(ValueError):
+        output.update({"width": 320, "quality": 101})
+    assert output.render_options() == (480, 270, 60)
+
+    output.update({"width": None, "max_fps": None, "quality": None})
+    assert output.render_options() == (None, 270, 80)
+    assert output.min_interval == 0.0
+
+
+def test_fit_frame():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    small, scale = fit_frame(frame, 320, 320)
+    assert small.shape == (240, 320, 3) and scale == pytest.approx(0.5)
+
+    same, scale = fit_frame(frame, 1280, None)
+    assert same is frame and scale == 1.0
+    assert fit_frame(frame)[0] is frame
+
+
+def test_auto_quality():
+    output = OutputControl(max_quality=80, min_quality=40, target_ms=100, quality_step=10, adjust_interval=1.0)
+    output.update({"quality": "auto"})
+
+    for t in range(1, 6):
+        output.observe(250.0, now=float(t))
+    assert output.quality == 40                  # backed off to the floor
+
+    output.observe(250.0, now=5.5)               # within adjust_interval: unchanged
+    assert output.quality == 40
+
+    for t in range(6, 30):
+        output.observe(10.0, now=float(t))
+    assert output.quality == 80                  # recovered, capped at max_quality
+
+    output.observe(70.0, now=40.0)               # between half and full target: hold
+    assert output.quality == 80
+
+    output.update({"quality": 50})
+    output.observe(500.0, now=50.0)
+    assert output.quality == 50                  # fixed quality is never adapted
+
+
+class FakePipeline:
+    def __init__(self):
+        self.min_interval = 0.0
+        self.sent = []
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+
+def test_apply_output_message():
+    output, pipeline = OutputControl(max_quality=80), FakePipeline()
+    asyncio.run(apply_output_message(output, pipeline, {"type": "set_output", "max_fps": 5}))
+    asyncio.run(apply_output_message(output, pipeline, {"type": "set_output", "max_fps": 500}))
+
+    assert pipeline.min_interval == pytest.approx(0.2)
+    assert pipeline.sent[0]["type"] == "output_ack" and pipeline.sent[0]["max_fps"] == 5
+    assert pipeline.sent[1]["type"] == "config_error"
+    assert output.max_fps == 5
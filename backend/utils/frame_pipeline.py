@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+
+class LatestSlot:
+    """
+    Single-item mailbox where the newest item wins: put() replaces an item
+    nobody has taken yet, get() waits for the next one.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._full = False
+        self._closed = False
+        self._ready = asyncio.Event()
+
+    def put(self, item) -> bool:
+        """Store item; returns True if it replaced (dropped) an unread one."""
+        replaced = self._full
+        self._item = item
+        self._full = True
+        self._ready.set()
+        return replaced
+
+    def peek(self):
+        """The unread item, or None."""
+        return self._item if self._full else None
+
+    async def get(self):
+        """The newest item, or None once the slot is closed and empty."""
+        while not self._full:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        item, self._item, self._full = self._item, None, False
+        return item
+
+    def close(self) -> None:
+        self._closed = True
+        self._ready.set()
+
+
+class FramePipeline:
+    """
+    Per-connection receive → infer → send pipeline of a live WebSocket feed.
+
+    A receiver task reads the socket as fast as the client sends and keeps
+    only the newest frame; the feed's loop takes frames with next_frame(),
+    processes them and hands the result to emit(); a sender task writes the
+    newest result to the socket. When inference is slower than the client,
+    frames are dropped at the inbox instead of queueing in the socket, so
+    latency stays one frame deep. A result not sent yet is replaced by the
+    next one too (its metadata is kept if the newer result has none).
+
+    receive: coroutine returning a frame's bytes, None for a packet that is
+        not a frame; raising (e.g. WebSocketDisconnect) ends the pipeline
+
+    min_interval (seconds, settable at any time) paces next_frame(): frames
+    arriving in between replace each other, which caps the processed and
+    sent frame rate without leaving a stop-and-wait client without a reply.
+    """
+
+    def __init__(self, websocket, receive=None):
+        self.websocket = websocket
+        self._receive = receive or websocket.receive_bytes
+        self._inbox = LatestSlot()
+        self._outbox = LatestSlot()
+        self._send_lock = asyncio.Lock()
+        self._tasks = []
+        self._received_at = None
+        self._taken_at = None
+        self.min_interval = 0.0
+        self.closed = False
+        self.counters = {
+            'received': 0,
+            'processed': 0,
+            'sent': 0,
+            'dropped_in': 0,     # replaced by a newer frame before inference
+            'dropped_out': 0,    # result replaced by a newer one before it was sent
+        }
+        self.latency_ms = 0.0    # receive → sent, exponential moving average
+        self.send_ms = 0.0       # emit → sent (socket backpressure), moving average
+
+    def start(self) -> "FramePipeline":
+        self._tasks = [asyncio.create_task(self._receiver()), asyncio.create_task(self._sender())]
+        return self
+
+    async def next_frame(self):
+        """Newest frame received since the last call, or None once the connection is gone."""
+        if self.min_interval and self._taken_at is not None:
+            delay = self._taken_at + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        item = await self._inbox.get()
+        self._taken_at = time.monotonic()
+        if item is None:
+            return None
+        data, self._received_at = item
+        self.counters['processed'] += 1
+        return data
+
+    def emit(self, payload=None, frame_bytes=None) -> None:
+        """Queue the current frame's metadata (JSON) and/or image bytes for sending."""
+        if self.closed:
+            return
+        pending = self._outbox.peek()
+        if pending is not None and payload is None:
+            payload = pending[0]
+        if self._outbox.put((payload, frame_bytes, self._received_at, time.monotonic())):
+            self.counters['dropped_out'] += 1
+
+    async def send_json(self, message) -> None:
+        """Send a message outside the frame flow (errors, control acks) without interleaving a frame."""
+        async with self._send_lock:
+            await self.websocket.send_json(message)
+
+    def stats(self) -> dict:
+        return {**self.counters, 'latency_ms': round(self.latency_ms, 1), 'send_ms': round(self.send_ms, 1)}
+
+    async def close(self) -> None:
+        self._stop()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _stop(self) -> None:
+        self.closed = True
+        self._inbox.close()
+        self._outbox.close()
+
+    async def _receiver(self) -> None:
+        try:
+            while True:
+                data = await self._receive()
+                if data is None:
+                    continue
+                self.counters['received'] += 1
+                if self._inbox.put((data, time.time())):
+                    self.counters['dropped_in'] += 1
+        except Exception:
+            pass    # client disconnected
+        finally:
+            self._stop()
+
+    async def _sender(self) -> None:
+        try:
+            while True:
+                item = await self._outbox.get()
+                if item is None:
+                    return
+                payload, frame_bytes, received_at, emitted_at = item
+                async with self._send_lock:
+                    if payload is not None:
+                        await self.websocket.send_json(payload)
+                    if frame_bytes is not None:
+                        await self.websocket.send_bytes(frame_bytes)
+                self.counters['sent'] += 1
+                first = self.counters['sent'] == 1
+                send_ms = (time.monotonic() - emitted_at) * 1000.0
+                self.send_ms = send_ms if first else 0.9 * self.send_ms + 0.1 * send_ms
+                if received_at is not None:
+                    elapsed = (time.time() - received_at) * 1000.0
+                    self.latency_ms = elapsed if first else 0.9 * self.latency_ms + 0.1 * elapsed
+        except Exception:
+            pass    # socket closed during send
+        finally:
+            self._stop()
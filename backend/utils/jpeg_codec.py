@@ -0,0 +1,136 @@
+import inspect
+
+import cv2
+import numpy as np
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+except Exception:
+    TurboJPEG = None
+    TJPF_BGR = None
+
+try:
+    import config
+except Exception:
+    config = None
+
+
+# 1/N decode scales: libjpeg scales during the IDCT, so a reduced frame
+# costs a fraction of a full decode (OpenCV exposes the same via IMREAD_REDUCED_*)
+_CV2_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class JpegCodec:
+    """
+    JPEG decode/encode of the live feeds' frames.
+
+    Uses libjpeg-turbo through PyTurboJPEG when it is installed (and its
+    shared library loads), otherwise OpenCV; a frame the turbo decoder
+    rejects (e.g. a PNG) is retried with OpenCV.
+
+    Args:
+        backend:  "auto" (turbojpeg if available), "turbojpeg" or "opencv"
+        quality:  default encode quality (1-100)
+        lib_path: explicit path of libturbojpeg (None = PyTurboJPEG's search)
+    """
+
+    def __init__(self, backend="auto", quality=95, lib_path=None):
+        self.quality = _clamp_quality(quality)
+        self.backend = "opencv"
+        self._turbo = None
+        if backend not in ("auto", "turbojpeg", "opencv"):
+            raise ValueError(f"Unknown JPEG backend: {backend!r}")
+        if backend != "opencv":
+            if TurboJPEG is None:
+                if backend == "turbojpeg":
+                    print("[JPEG] PyTurboJPEG not installed, using OpenCV")
+            else:
+                try:
+                    self._turbo = TurboJPEG(lib_path) if lib_path else TurboJPEG()
+                    self.backend = "turbojpeg"
+                except Exception as e:
+                    print(f"[JPEG] libjpeg-turbo unavailable ({e}), using OpenCV")
+        # Decoding into a caller's array needs a PyTurboJPEG with decode(dst=)
+        self._decode_into = self._turbo is not None and "dst" in inspect.signature(self._turbo.decode).parameters
+
+    def decode(self, data, scale=1, out=None):
+        """
+        BGR frame of an encoded image at 1/scale resolution, None if undecodable.
+
+        scale: 1, 2, 4 or 8
+        out:   array to decode into when its shape matches (turbojpeg only);
+               only pass it when no earlier frame decoded into it is still used
+        """
+        if scale not in _CV2_DECODE_FLAGS:
+            raise ValueError(f"Unsupported decode scale 1/{scale} (expected 1, 2, 4 or 8)")
+        if self._turbo is not None:
+            try:
+                return self._turbo_decode(data, scale, out)
+            except Exception:
+                pass    # not a JPEG libjpeg-turbo accepts: OpenCV handles the rest
+        return cv2.imdecode(np.frombuffer(data, np.uint8), _CV2_DECODE_FLAGS[scale])
+
+    def encode(self, frame, quality=None) -> bytes:
+        """JPEG bytes of a BGR frame (quality None = the codec's default)."""
+        quality = self.quality if quality is None else _clamp_quality(quality)
+        if self._turbo is not None:
+            return self._turbo.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return buffer.tobytes()
+
+    def _turbo_decode(self, data, scale, out):
+        kwargs = {"pixel_format": TJPF_BGR}
+        if scale != 1:
+            kwargs["scaling_factor"] = (1, scale)
+        if out is not None and self._decode_into:
+            width, height = self._turbo.decode_header(data)[:2]
+            # libjpeg rounds scaled sizes up
+            shape = ((height + scale - 1) // scale, (width + scale - 1) // scale, 3)
+            if out.shape == shape and out.dtype == np.uint8:
+                kwargs["dst"] = out
+        return self._turbo.decode(data, **kwargs)
+
+
+class DecodeBuffer:
+    """
+    Reusable decode target of one connection: decode() writes each frame
+    into the same array while the stream's resolution stays the same,
+    instead of allocating a new frame per packet. Only for connections
+    whose frames are not kept after the next one is decoded.
+    """
+
+    def __init__(self, codec, scale=1):
+        self.codec = codec
+        self.scale = scale
+        self._frame = None
+
+    def decode(self, data):
+        frame = self.codec.decode(data, scale=self.scale, out=self._frame)
+        if frame is not None:
+            self._frame = frame
+        return frame
+
+
+def _clamp_quality(quality):
+    return max(1, min(100, int(quality)))
+
+
+def live_decode_scale():
+    """LIVE_DECODE_SCALE from config.py (1 = full resolution)."""
+    scale = getattr(config, "LIVE_DECODE_SCALE", 1) if config else 1
+    return scale if scale in _CV2_DECODE_FLAGS else 1
+
+
+# Shared codec of the live feeds
+jpeg_codec = JpegCodec(
+    backend=(getattr(config, "LIVE_JPEG_BACKEND", "auto") if config else "auto"),
+    quality=(getattr(config, "LIVE_JPEG_QUALITY", 95) if config else 95),
+    lib_path=(getattr(config, "TURBOJPEG_LIB_PATH", None) if config else None) or None,
+)
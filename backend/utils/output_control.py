@@ -0,0 +1,133 @@
+import time
+
+import cv2
+
+try:
+    import config
+except Exception:
+    config = None
+
+
+class OutputControl:
+    """
+    What one live-feed client wants back: display size, frame rate and JPEG
+    quality, negotiated with a `set_output` control message:
+
+        {"type": "set_output", "width": 480, "height": 270, "max_fps": 10, "quality": 70}
+
+    Every field is optional; null clears a limit and "quality": "auto" lets
+    the server pick it from the connection's send latency. Frames are scaled
+    down to fit width x height (never up) before overlays are drawn and the
+    frame is encoded.
+
+    Auto quality backs off by quality_step when the send latency (result
+    ready → written to the socket) stays over target_ms, and creeps back up
+    towards max_quality while it is under half the target.
+    """
+
+    def __init__(self, max_quality=None, min_quality=None, target_ms=None, quality_step=10,
+                 adjust_interval=1.0):
+        default_quality = getattr(config, "LIVE_JPEG_QUALITY", 95) if config else 95
+        self.max_quality = int(max_quality or default_quality)
+        self.min_quality = int(min_quality or (getattr(config, "LIVE_AUTO_QUALITY_MIN", 35) if config else 35))
+        self.target_ms = float(target_ms or (getattr(config, "LIVE_AUTO_QUALITY_TARGET_MS", 80) if config else 80))
+        self.quality_step = quality_step
+        self.adjust_interval = adjust_interval
+
+        self.width = None
+        self.height = None
+        self.max_fps = None
+        self.quality = self.max_quality
+        self.auto_quality = False
+        self._adjusted_at = 0.0
+
+    def update(self, message) -> dict:
+        """Apply a set_output message; raises ValueError (nothing applied) for an invalid one."""
+        width = _optional_int(message, "width", self.width, 16, 7680)
+        height = _optional_int(message, "height", self.height, 16, 4320)
+        max_fps = _optional_int(message, "max_fps", self.max_fps, 1, 60)
+        quality, auto = self.quality, self.auto_quality
+        if "quality" in message:
+            requested = message["quality"]
+            if requested == "auto":
+                quality, auto = self.max_quality, True
+            elif requested is None:
+                quality, auto = self.max_quality, False
+            else:
+                quality, auto = _optional_int(message, "quality", None, 1, 100), False
+
+        self.width, self.height, self.max_fps = width, height, max_fps
+        self.quality, self.auto_quality = quality, auto
+        return self.settings()
+
+    def settings(self) -> dict:
+        return {
+            "width": self.width,
+            "height": self.height,
+            "max_fps": self.max_fps,
+            "quality": self.quality,
+            "auto_quality": self.auto_quality,
+        }
+
+    @property
+    def min_interval(self) -> float:
+        """Seconds between processed frames (0 = as fast as the client sends)."""
+        return 1.0 / self.max_fps if self.max_fps else 0.0
+
+    def observe(self, send_ms, now=None) -> None:
+        """Feed the connection's send latency (ms) to auto quality."""
+        if not self.auto_quality:
+            return
+        now = time.monotonic() if now is None else now
+        if now - self._adjusted_at < self.adjust_interval:
+            return
+        if send_ms > self.target_ms:
+            self.quality = max(self.min_quality, self.quality - self.quality_step)
+        elif send_ms < self.target_ms / 2:
+            self.quality = min(self.max_quality, self.quality + self.quality_step // 2)
+        else:
+            return
+        self._adjusted_at = now
+
+    def render_options(self) -> tuple:
+        """(width, height, quality) snapshot handed to the frame's worker thread."""
+        return self.width, self.height, self.quality
+
+
+def fit_frame(frame, width=None, height=None):
+    """
+    Frame scaled down to fit width x height (aspect kept, never enlarged).
+    Returns (frame, scale); the same frame and 1.0 when it already fits.
+    """
+    h, w = frame.shape[:2]
+    scale = min(
+        1.0,
+        width / w if width else 1.0,
+        height / h if height else 1.0,
+    )
+    if scale >= 1.0:
+        return frame, 1.0
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+
+
+def _optional_int(message, key, current, low, high):
+    if key not in message:
+        return current
+    value = message[key]
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+        raise ValueError(f"{key} must be between {low} and {high}")
+    return int(value)
+
+
+async def apply_output_message(output, pipeline, message) -> None:
+    """Apply a client's set_output message to its feed and acknowledge it (or report the error)."""
+    try:
+        settings = output.update(message)
+    except ValueError as e:
+        await pipeline.send_json({"type": "config_error", "message": str(e)})
+        return
+    pipeline.min_interval = output.min_interval
+    await pipeline.send_json({"type": "output_ack", **settings})
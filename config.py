@@ -33,6 +33,115 @@ EMBEDDING_MODEL_ID = os.getenv("EMBEDDING_MODEL_ID", "all-MiniLM-L6-v2")
 NEMOTRON_MODEL_ID = os.getenv("NEMOTRON_MODEL_ID", "nvidia/nemotron-colembed-vl-4b-v2")
 PIX2STRUCT_MODEL_ID = os.getenv("PIX2STRUCT_MODEL_ID", "google/pix2struct-chartqa-base")
 
+# -------------------------------------------------------------------
+# DETECTOR PIPELINE
+# -------------------------------------------------------------------
+
+# Run yolov8n once per frame for objects + COCO vehicle/weapon fallbacks
+DETECTOR_FUSED_COCO = os.getenv("DETECTOR_FUSED_COCO", "true").lower() == "true"
+
+# Run the independent detector models of a frame concurrently on a thread pool
+DETECTOR_PARALLEL = os.getenv("DETECTOR_PARALLEL", "false").lower() == "true"
+DETECTOR_WORKERS = int(os.getenv("DETECTOR_WORKERS", "3"))
+
+# Per-model device placement, e.g. "pose=cuda:1,fire=cpu" (unlisted -> default device)
+DETECTOR_DEVICE_MAP = os.getenv("DETECTOR_DEVICE_MAP", "")
+
+# Seconds before an unused per-camera/session detector context is evicted
+DETECTOR_STREAM_IDLE_TTL = float(os.getenv("DETECTOR_STREAM_IDLE_TTL", "300"))
+
+# Frames per model call for batched (offline / forensic) processing
+DETECTOR_BATCH_SIZE = int(os.getenv("DETECTOR_BATCH_SIZE", "8"))
+
+# Inference backend for all detector models: torch | onnxruntime | openvino.
+# Exports are cached next to the .pt weights, keyed by weight hash.
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "torch").lower()
+DETECTOR_PRECISION = os.getenv("DETECTOR_PRECISION", "fp32").lower()  # fp32 | int8
+# int8 calibration images: a dataset YAML or an image directory (ideally
+# frames from the site's cameras); Ultralytics' coco8 set when unset
+DETECTOR_CALIBRATION_DATA = os.getenv("DETECTOR_CALIBRATION_DATA") or None
+
+# Motion-gated specialists: fire/weapon/vehicle models run every frame only
+# while the scene has motion or people, otherwise every N frames (cached between)
+DETECTOR_CASCADE = os.getenv("DETECTOR_CASCADE", "true").lower() == "true"
+DETECTOR_CASCADE_MOTION_THRESHOLD = float(os.getenv("DETECTOR_CASCADE_MOTION_THRESHOLD", "3.0"))
+DETECTOR_CASCADE_IDLE_INTERVAL = int(os.getenv("DETECTOR_CASCADE_IDLE_INTERVAL", "10"))
+DETECTOR_CASCADE_HOLD_FRAMES = int(os.getenv("DETECTOR_CASCADE_HOLD_FRAMES", "15"))
+
+# Two-stage weapon detection on padded person crops instead of full frames
+DETECTOR_ROI_WEAPONS = os.getenv("DETECTOR_ROI_WEAPONS", "false").lower() == "true"
+DETECTOR_ROI_PADDING = float(os.getenv("DETECTOR_ROI_PADDING", "0.25"))
+DETECTOR_ROI_MAX = int(os.getenv("DETECTOR_ROI_MAX", "8"))
+
+# Persist the detections of uploaded videos so they can be re-scored with
+# other thresholds without re-running the detectors (scripts/replay_scoring.py)
+DETECTION_STORE_ENABLED = os.getenv("DETECTION_STORE_ENABLED", "false").lower() == "true"
+DETECTION_STORE_PATH = os.getenv("DETECTION_STORE_PATH", "storage/detections")
+DETECTION_STORE_CHUNK_FRAMES = int(os.getenv("DETECTION_STORE_CHUNK_FRAMES", "1024"))
+
+# Scoring diagnostics (escalation / grappling / blur events of the risk engine).
+# Per-camera counters are always kept (GET /analytics/scoring-diagnostics);
+# log lines are sampled (every Nth event per camera) and rate-limited per
+# camera and event. SCORING_DIAGNOSTICS_LOG_FRAMES adds a per-frame score line.
+SCORING_DIAGNOSTICS_LOG = os.getenv("SCORING_DIAGNOSTICS_LOG", "true").lower() == "true"
+SCORING_DIAGNOSTICS_SAMPLE_EVERY = int(os.getenv("SCORING_DIAGNOSTICS_SAMPLE_EVERY", "1"))
+SCORING_DIAGNOSTICS_MAX_PER_SECOND = float(os.getenv("SCORING_DIAGNOSTICS_MAX_PER_SECOND", "1.0"))
+SCORING_DIAGNOSTICS_LOG_FRAMES = os.getenv("SCORING_DIAGNOSTICS_LOG_FRAMES", "false").lower() == "true"
+
+# Per-camera crowd baselines: an hour-of-day histogram of crowd size for each
+# camera, exponentially decayed, kept in the DB (camera_baselines) so that a
+# restarted node skips the calibration phase for cameras it has seen before.
+# A bin is used once its decayed sample weight reaches MIN_SAMPLES frames.
+CROWD_BASELINES_ENABLED = os.getenv("CROWD_BASELINES_ENABLED", "true").lower() == "true"
+CROWD_BASELINE_HALF_LIFE_DAYS = float(os.getenv("CROWD_BASELINE_HALF_LIFE_DAYS", "7"))
+CROWD_BASELINE_MIN_SAMPLES = int(os.getenv("CROWD_BASELINE_MIN_SAMPLES", "300"))
+CROWD_BASELINE_FLUSH_SECONDS = float(os.getenv("CROWD_BASELINE_FLUSH_SECONDS", "60"))
+# Camera a live feed is scored (and its baseline kept) under when the client
+# does not send ?camera_id=; its alerts and recordings are filed as CAM-01 too.
+LIVE_DEFAULT_CAMERA_ID = os.getenv("LIVE_DEFAULT_CAMERA_ID", "CAM-01")
+# Live cameras are scored by their own RiskScoringEngine (calibration, track
+# histories, smoothed score); at most this many are kept, least recently
+# scored dropped first.
+RISK_ENGINE_MAX_CAMERAS = int(os.getenv("RISK_ENGINE_MAX_CAMERAS", "64"))
+
+# Live-feed inference pool (backend/services/inference_executor.py): the
+# WebSocket feeds run their per-frame pipeline on INFERENCE_WORKERS threads
+# instead of the event loop. At most INFERENCE_MAX_PENDING frames are running
+# or queued over all connections, INFERENCE_PER_CONNECTION per connection.
+# Workers mostly wait on the batching scheduler below, so keep at least one
+# per live camera or cameras cannot share a batch.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "16"))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "32"))
+INFERENCE_PER_CONNECTION = int(os.getenv("INFERENCE_PER_CONNECTION", "1"))
+
+# Cross-camera micro-batching (backend/services/inference_scheduler.py): the
+# detection of the frames of all live cameras runs as one batched model call
+# of up to INFERENCE_MAX_BATCH cameras; a frame waits at most
+# INFERENCE_MAX_WAIT_MS for others to join. Cameras whose latest risk score
+# is at least INFERENCE_PRIORITY_RISK are scheduled first.
+INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "true").lower() == "true"
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+INFERENCE_PRIORITY_RISK = float(os.getenv("INFERENCE_PRIORITY_RISK", "50"))
+
+# JPEG codec of the live feeds (backend/utils/jpeg_codec.py): auto | turbojpeg | opencv.
+# "auto" uses libjpeg-turbo through PyTurboJPEG when installed, else OpenCV.
+# LIVE_DECODE_SCALE decodes client frames at 1/N resolution (1, 2, 4 or 8),
+# scaled inside the JPEG decoder; detection runs at model scale (640 px)
+# anyway, so 2 suits 1080p cameras, but overlays and recordings shrink too.
+# LIVE_JPEG_QUALITY defaults to 95, the quality cv2.imencode used before, so
+# frames are unchanged unless a client asks for less (set_output).
+LIVE_JPEG_BACKEND = os.getenv("LIVE_JPEG_BACKEND", "auto").lower()
+LIVE_JPEG_QUALITY = int(os.getenv("LIVE_JPEG_QUALITY", "95"))
+LIVE_DECODE_SCALE = int(os.getenv("LIVE_DECODE_SCALE", "1"))
+TURBOJPEG_LIB_PATH = os.getenv("TURBOJPEG_LIB_PATH", "")
+
+# Auto JPEG quality of clients that send {"type": "set_output", "quality": "auto"}:
+# quality drops (not below LIVE_AUTO_QUALITY_MIN) while the send latency of
+# results exceeds LIVE_AUTO_QUALITY_TARGET_MS and recovers up to LIVE_JPEG_QUALITY.
+LIVE_AUTO_QUALITY_MIN = int(os.getenv("LIVE_AUTO_QUALITY_MIN", "35"))
+LIVE_AUTO_QUALITY_TARGET_MS = float(os.getenv("LIVE_AUTO_QUALITY_TARGET_MS", "80"))
+
 # -------------------------------------------------------------------
 # SCORING THRESHOLDS
 # -------------------------------------------------------------------
@@ -9,7 +9,7 @@ import { WS_BASE_URL } from '../config';
 // Global Event Emitter for high-frequency, low-latency UI updates without React layout thrashing
 export const threatEventEmitter = new EventTarget();
 
-const LiveFeed = ({ isExpanded }) => {
+const LiveFeed = ({ isExpanded, cameraId = 'CAM-01' }) => {
     const { addNotification } = useNotifications();
     const [metadata, setMetadata] = useState(null);
     const [isConnected, setIsConnected] = useState(false);
@@ -28,6 +28,8 @@ const LiveFeed = ({ isExpanded }) => {
     const requestRef = useRef(null);
     const isWaitingRef = useRef(false);
     const lastFrameTimeRef = useRef(0);
+    const outputSizeRef = useRef(null); // Display size last sent on the open socket
+    const resizeTimerRef = useRef(null);
 
     // Vitality Pulse
     useEffect(() => {
@@ -88,15 +90,58 @@ const LiveFeed = ({ isExpanded }) => {
         startCamera();
     }, [selectedDeviceId]);
 
+    // Ask for frames no larger than the tile shows (device pixels); skipped
+    // until the tile is laid out, and when the size has not changed
+    const sendOutputSize = () => {
+        const ws = wsRef.current;
+        const tile = displayCanvasRef.current?.parentElement;
+        if (!ws || ws.readyState !== WebSocket.OPEN || !tile?.clientWidth || !tile?.clientHeight) return;
+        const dpr = window.devicePixelRatio || 1;
+        const size = {
+            width: Math.min(7680, Math.max(16, Math.round(tile.clientWidth * dpr))),
+            height: Math.min(4320, Math.max(16, Math.round(tile.clientHeight * dpr))),
+        };
+        const last = outputSizeRef.current;
+        if (last && last.width === size.width && last.height === size.height) return;
+        ws.send(JSON.stringify({ type: 'set_output', ...size }));
+        outputSizeRef.current = size;
+    };
+
+    // Resend the size when the tile is laid out or resized (debounced)
+    useEffect(() => {
+        const tile = displayCanvasRef.current?.parentElement;
+        if (!tile || typeof ResizeObserver === 'undefined') return;
+        const observer = new ResizeObserver(() => {
+            clearTimeout(resizeTimerRef.current);
+            resizeTimerRef.current = setTimeout(sendOutputSize, 150);
+        });
+        observer.observe(tile);
+        return () => {
+            observer.disconnect();
+            clearTimeout(resizeTimerRef.current);
+        };
+    }, []);
+
+    useEffect(() => {
+        sendOutputSize();
+    }, [isExpanded]);
+
     // WebSocket & Loop
     useEffect(() => {
         const connect = () => {
-            // Dynamic URL based on mode
-            const url = vlmMode ? `${WS_BASE_URL}/vlm/vlm-feed` : `${WS_BASE_URL}/ws/live-feed`;
+            // Dynamic URL based on mode; the camera id keys the server's crowd baseline
+            const path = vlmMode ? '/vlm/vlm-feed' : '/ws/live-feed';
+            const url = `${WS_BASE_URL}${path}?camera_id=${encodeURIComponent(cameraId)}`;
             const ws = new WebSocket(url);
             wsRef.current = ws;
 
-            ws.onopen = () => setIsConnected(true);
+            ws.onopen = () => {
+                setIsConnected(true);
+                // Quality adapted to the link; the frame size follows the tile (sendOutputSize)
+                outputSizeRef.current = null;
+                ws.send(JSON.stringify({ type: 'set_output', quality: 'auto' }));
+                sendOutputSize();
+            };
             ws.onclose = () => {
                 setIsConnected(false);
                 setTimeout(connect, 3000);
@@ -123,6 +168,7 @@ const LiveFeed = ({ isExpanded }) => {
                 } else {
                     try {
                         const data = JSON.parse(event.data);
+                        if (data?.type === 'output_ack' || data?.type === 'config_error') return;
                         setMetadata(data);
                         
                         // Fire event so separate components (like HotThreatsCard) can listen without triggering a global re-render loop
@@ -141,7 +187,7 @@ const LiveFeed = ({ isExpanded }) => {
             if (wsRef.current) wsRef.current.close();
             if (requestRef.current) cancelAnimationFrame(requestRef.current);
         };
-    }, [performanceMode, vlmMode]); // Re-connect when mode changes
+    }, [performanceMode, vlmMode, cameraId]); // Re-connect when mode or camera changes
 
     const lastAlertTimeRef = useRef(0);
 
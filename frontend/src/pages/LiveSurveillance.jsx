@@ -48,7 +48,7 @@ const LiveSurveillance = () => {
                                 position: 'relative',
                                 '&:hover .camera-label': { opacity: 1 }
                             }}>
-                                <LiveFeed />
+                                <LiveFeed cameraId={cam.id} />
                                 <Box className="camera-label" sx={{
                                     position: 'absolute',
                                     top: 15,
@@ -0,0 +1,191 @@
+"""
+Inference backends for the detector's YOLO models.
+
+With the default ``torch`` backend the detector loads the ``.pt`` weights
+directly. With ``onnxruntime`` or ``openvino`` the weights are exported once
+with Ultralytics' exporter and the artifact is cached next to the weights,
+keyed by a hash of the ``.pt`` file and the precision:
+
+    yolov8n.pt  ->  yolov8n.<sha256[:16]>.fp32.onnx
+                    yolov8n.<sha256[:16]>.int8_openvino_model/
+
+Retraining or replacing the weights changes the hash, so a stale export is
+never picked up. UnifiedDetector falls back to PyTorch when an export or
+load fails.
+"""
+
+import glob
+import hashlib
+import os
+import shutil
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+BACKENDS   = ('torch', 'onnxruntime', 'openvino')
+PRECISIONS = ('fp32', 'int8')
+
+_HASH_CACHE = {}   # (path, size, mtime) -> hex digest
+
+# int8 calibration: Ultralytics' own default set unless *calibration_data*
+# names a dataset YAML or an image directory; images are letterboxed to
+# _CALIBRATION_SIZE like Ultralytics' preprocessing
+_DEFAULT_CALIBRATION_DATA = 'coco8.yaml'
+_CALIBRATION_IMAGES = 64
+_CALIBRATION_SIZE = 640
+_IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def weights_hash(path, length=16):
+    """sha256 of the weight file (memoised on path/size/mtime)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _HASH_CACHE:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b''):
+                digest.update(chunk)
+        _HASH_CACHE[key] = digest.hexdigest()
+    return _HASH_CACHE[key][:length]
+
+
+def export_path(weights, backend, precision):
+    """Cache location of the *backend*/*precision* export of *weights*."""
+    stem, _ = os.path.splitext(weights)
+    tag = f"{stem}.{weights_hash(weights)}.{precision}"
+    if backend == 'onnxruntime':
+        return tag + '.onnx'
+    if backend == 'openvino':
+        # Ultralytics recognises OpenVINO models by the "_openvino_model" suffix.
+        return tag + '_openvino_model'
+    raise ValueError(f"No export format for backend '{backend}'")
+
+
+def validate_backend(backend, precision):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend '{backend}' (expected one of {BACKENDS})")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown detector precision '{precision}' (expected one of {PRECISIONS})")
+
+
+def calibration_images(calibration_data=None, limit=_CALIBRATION_IMAGES):
+    """
+    Image paths for int8 calibration: *calibration_data* is a directory of
+    images or an Ultralytics dataset YAML (its val split, else train), the
+    same ``data`` the OpenVINO export takes. At most *limit* images.
+    """
+    source = calibration_data or _DEFAULT_CALIBRATION_DATA
+    if os.path.isdir(source):
+        dirs = [source]
+    else:
+        from ultralytics.data.utils import check_det_dataset
+        dataset = check_det_dataset(source)
+        split = dataset.get('val') or dataset['train']
+        dirs = split if isinstance(split, (list, tuple)) else [split]
+    paths = sorted(
+        path for directory in dirs
+        for path in glob.glob(os.path.join(str(directory), '**', '*'), recursive=True)
+        if path.lower().endswith(_IMAGE_SUFFIXES)
+    )
+    if not paths:
+        raise ValueError(f"No calibration images found in '{source}'")
+    return paths[:limit]
+
+
+def _letterbox(image, size=_CALIBRATION_SIZE):
+    """BGR image -> float32 NCHW RGB in [0, 1], resized and padded to size x size."""
+    h, w = image.shape[:2]
+    scale = size / max(h, w)
+    resized = cv2.resize(image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top = (size - resized.shape[0]) // 2
+    left = (size - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+class _CalibrationReader:
+    """onnxruntime CalibrationDataReader over letterboxed calibration images."""
+
+    def __init__(self, input_name, paths):
+        self.input_name = input_name
+        self._paths = iter(paths)
+
+    def get_next(self):
+        for path in self._paths:
+            image = cv2.imread(path)
+            if image is not None:
+                return {self.input_name: _letterbox(image)}
+        return None
+
+
+def _export_onnx(weights, target, precision, calibration_data=None):
+    exported = YOLO(weights).export(format='onnx', dynamic=True, verbose=False)
+    if precision == 'int8':
+        try:
+            _quantize_onnx(exported, target, calibration_data)
+        finally:
+            os.remove(exported)
+    else:
+        os.replace(exported, target)
+
+
+def _quantize_onnx(source, target, calibration_data=None):
+    """
+    Static (QDQ) int8 quantization calibrated on *calibration_data*.
+
+    Dynamic quantization (ConvInteger with per-call activation scales) runs
+    YOLO slower than fp32 on CPU, so activations are calibrated up front.
+    Only Conv / Gemm / MatMul are quantized: the detection head's decode
+    mixes box pixels and class scores, and one int8 scale for both rounds
+    the scores to zero.
+    """
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    graph = onnx.load(source).graph
+    input_name = graph.input[0].name
+    exclude = [node.name for node in graph.node if node.op_type not in ('Conv', 'Gemm', 'MatMul')]
+    del graph
+    quantize_static(
+        source, target, _CalibrationReader(input_name, calibration_images(calibration_data)),
+        quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+        per_channel=True, nodes_to_exclude=exclude,
+    )
+
+
+def _export_openvino(weights, target, precision, calibration_data=None):
+    kwargs = {'format': 'openvino', 'dynamic': True, 'verbose': False}
+    if precision == 'int8':
+        # NNCF post-training quantisation; Ultralytics uses its default
+        # calibration set when *calibration_data* is None.
+        kwargs['int8'] = True
+        if calibration_data:
+            kwargs['data'] = calibration_data
+    exported = YOLO(weights).export(**kwargs)
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(exported, target)
+
+
+def ensure_exported(weights, backend, precision='fp32', calibration_data=None):
+    """
+    Return the path of the cached *backend* export of *weights*, exporting
+    it first when no export for the current weight hash exists yet.
+    """
+    validate_backend(backend, precision)
+    if backend == 'torch':
+        return weights
+
+    target = export_path(weights, backend, precision)
+    if os.path.exists(target):
+        return target
+
+    print(f"[INFO] Exporting '{os.path.basename(weights)}' to {backend} ({precision})...")
+    if backend == 'onnxruntime':
+        _export_onnx(weights, target, precision, calibration_data)
+    else:
+        _export_openvino(weights, target, precision, calibration_data)
+    print(f"[INFO] Cached {backend} export at '{os.path.basename(target)}'.")
+    return target
@@ -0,0 +1,111 @@
+"""
+Motion-gated scheduling for the detector's specialist models.
+
+The fire, weapon and vehicle models are expensive and mostly useless on a
+static, empty scene. ``SpecialistCascade`` watches a cheap motion metric
+(mean absolute difference of a downscaled grayscale frame, shared with the
+VLM feed) plus whether people were in the last frame. It lets the
+specialists run every frame while the scene is active and only every
+``idle_interval`` frames otherwise. Skipped frames reuse the last
+detections of that specialist.
+"""
+
+import cv2
+import numpy as np
+
+# Stages of UnifiedDetector that the cascade may skip. The fused yolov8n
+# pass and pose model always run.
+SPECIALIST_STAGES = ('fire', 'weapons', 'vehicles')
+
+
+def motion_metrics(frame, prev_gray_small, ema_motion: float):
+    """
+    Returns: (gray_small, diff_mean, ema_motion, is_motion_spike, is_scene_change)
+    Uses mean absolute difference on a downscaled grayscale frame.
+    *frame* may be BGR or already grayscale.
+    """
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray_small = cv2.resize(gray, (160, 90), interpolation=cv2.INTER_AREA)
+
+    if prev_gray_small is None:
+        return gray_small, 0.0, 0.0, False, False
+
+    diff_mean = float(np.mean(cv2.absdiff(gray_small, prev_gray_small)))
+    alpha = 0.12
+    ema_motion = (1 - alpha) * float(ema_motion) + alpha * diff_mean
+
+    spike_th = max(10.0, ema_motion * 2.5)
+    scene_th = max(22.0, ema_motion * 4.0)
+    return gray_small, diff_mean, ema_motion, diff_mean > spike_th, diff_mean > scene_th
+
+
+class SpecialistCascade:
+    """
+    Per-stream duty-cycle scheduler for the specialist models.
+
+    Args:
+        motion_threshold: mean abs grayscale difference (0-255) above which a
+                          frame counts as moving
+        idle_interval:    run each specialist every N frames while idle
+        hold_frames:      stay active this many frames after the last motion
+                          or person, so brief pauses do not drop the duty cycle
+    """
+
+    def __init__(self, motion_threshold=3.0, idle_interval=10, hold_frames=15):
+        self.motion_threshold = motion_threshold
+        self.idle_interval = max(1, int(idle_interval))
+        self.hold_frames = max(0, int(hold_frames))
+
+        self.prev_gray_small = None
+        self.ema_motion = 0.0
+        self.last_motion = 0.0
+        self.people_present = False
+        self._quiet_frames = self.hold_frames + 1   # start idle until something happens
+        self._since_run = {}                        # stage -> frames since last run
+        self._cache = {}                            # stage -> last detections
+
+        self.counters = {'active_frames': 0, 'idle_frames': 0, 'runs': {}, 'skips': {}}
+
+    def observe(self, frame):
+        """Update the motion state with *frame* (BGR or gray); returns True when the scene is active."""
+        self.prev_gray_small, self.last_motion, self.ema_motion, is_spike, _ = motion_metrics(
+            frame, self.prev_gray_small, self.ema_motion
+        )
+        if self.people_present or is_spike or self.last_motion > self.motion_threshold:
+            self._quiet_frames = 0
+        else:
+            self._quiet_frames += 1
+
+        active = self._quiet_frames <= self.hold_frames
+        self.counters['active_frames' if active else 'idle_frames'] += 1
+        return active
+
+    def should_run(self, stage, active):
+        """True when *stage* must run on this frame, False to reuse its cache."""
+        since = self._since_run.get(stage)
+        run = active or since is None or since + 1 >= self.idle_interval
+        self._since_run[stage] = 0 if run else since + 1
+
+        bucket = self.counters['runs' if run else 'skips']
+        bucket[stage] = bucket.get(stage, 0) + 1
+        return run
+
+    def store(self, stage, detections):
+        self._cache[stage] = detections
+
+    def cached(self, stage):
+        """Copies of the last *stage* detections (callers may mutate them)."""
+        return [dict(d) for d in self._cache.get(stage, [])]
+
+    def update_people(self, objects):
+        """Record whether the last processed frame had anyone in it."""
+        self.people_present = any(o.get('class') == 'person' for o in objects)
+
+    def stats(self):
+        return {
+            'active_frames': self.counters['active_frames'],
+            'idle_frames':   self.counters['idle_frames'],
+            'runs':          dict(self.counters['runs']),
+            'skips':         dict(self.counters['skips']),
+            'ema_motion':    round(self.ema_motion, 3),
+        }
@@ -0,0 +1,352 @@
+"""
+Columnar on-disk store of UnifiedDetector outputs, for re-scoring footage
+without re-running the detectors.
+
+Tuning RiskScoringEngine thresholds otherwise means running every YOLO
+model over the archive again. ``DetectionRecorder`` persists each scored
+frame's detection dict (and the scoring context it was scored with);
+``DetectionStore`` reads them back either as the same dicts (to stream
+into calculate_risk) or directly as a DetectionSequence for
+score_sequence. See scripts/replay_scoring.py.
+
+Layout::
+
+    <root>/<video_id>/manifest.json      fps, engine settings, chunk list
+    <root>/<video_id>/chunk_000000.npz   up to chunk_frames frames
+
+A chunk has one row per frame (frame index, detector timestamp, scoring
+context as JSON) and one row per detection, pointing at its frame's row:
+
+    poses       row, keypoints (n, 17, 2), keypoint confidence (n, 17),
+                keypoint / confidence counts, bbox, track id
+    objects, weapons, vehicles, fire
+                row, class, sub_class, confidence, bbox, track id, is_blurry
+
+Optional keys have a ``has_*`` mask, so the dicts read back have the keys
+that were written (``center`` is recomputed from the bbox, as the tracker
+does). Float columns are stored as float32 when that is lossless (model
+outputs are float32) and as float64 otherwise, so values round-trip
+exactly. Keys the scoring code does not use are not stored, nor are
+keypoints beyond the 17th.
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from models.scoring.pose_features import N_KEYPOINTS
+from models.scoring.sequence import DetectionSequence
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+
+BOX_KINDS = ('objects', 'weapons', 'vehicles', 'fire')
+_NO_BOX = [np.nan] * 4
+
+
+def _compact(values, shape_tail=()):
+    """float32 array when that is lossless, float64 otherwise."""
+    wide = np.asarray(values, dtype=np.float64).reshape((-1,) + shape_tail)
+    narrow = wide.astype(np.float32)
+    return narrow if np.array_equal(narrow, wide, equal_nan=True) else wide
+
+
+def _strings(values):
+    return np.array(values, dtype=str) if values else np.zeros(0, dtype='<U1')
+
+
+class _Columns:
+    """Row lists of one chunk, filled as frames are added."""
+
+    def __init__(self):
+        self.frames, self.timestamps, self.contexts = [], [], []
+        self.poses = {k: [] for k in ('row', 'keypoints', 'conf', 'n_keypoints', 'n_conf',
+                                      'bbox', 'has_bbox', 'track_id', 'has_track')}
+        self.boxes = {kind: {k: [] for k in ('row', 'class', 'sub_class', 'has_sub_class', 'confidence',
+                                             'bbox', 'has_bbox', 'track_id', 'has_track', 'is_blurry',
+                                             'has_blurry', 'has_center')}
+                      for kind in BOX_KINDS}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def add(self, frame_index, detections, context):
+        row = len(self.frames)
+        self.frames.append(frame_index)
+        ts = detections.get('timestamp')
+        self.timestamps.append(np.nan if ts is None else ts)
+        self.contexts.append(json.dumps(context, default=str))
+
+        cols = self.poses
+        for pose in detections.get('poses', []) or []:
+            kpts = np.zeros((N_KEYPOINTS, 2))
+            conf = np.zeros(N_KEYPOINTS)
+            xy = np.asarray(pose.get('keypoints', []), dtype=np.float64)
+            xy = xy[:N_KEYPOINTS, :2] if xy.ndim == 2 else np.zeros((0, 2))
+            c = np.asarray(pose.get('confidence', []), dtype=np.float64).ravel()[:N_KEYPOINTS]
+            kpts[:len(xy)] = xy
+            conf[:len(c)] = c
+            cols['row'].append(row)
+            cols['keypoints'].append(kpts)
+            cols['conf'].append(conf)
+            cols['n_keypoints'].append(len(xy))
+            cols['n_conf'].append(len(c))
+            cols['has_bbox'].append('bbox' in pose)
+            cols['bbox'].append(pose.get('bbox', _NO_BOX))
+            self._add_track(cols, pose)
+
+        for kind in BOX_KINDS:
+            cols = self.boxes[kind]
+            for det in detections.get(kind, []) or []:
+                cols['row'].append(row)
+                cols['class'].append(det.get('class') or '')
+                cols['has_sub_class'].append('sub_class' in det)
+                cols['sub_class'].append(det.get('sub_class') or '')
+                cols['confidence'].append(det.get('confidence', 0))
+                cols['has_bbox'].append('bbox' in det)
+                cols['bbox'].append(det.get('bbox', _NO_BOX))
+                cols['has_blurry'].append('is_blurry' in det)
+                cols['is_blurry'].append(bool(det.get('is_blurry', False)))
+                cols['has_center'].append('center' in det)
+                self._add_track(cols, det)
+
+    @staticmethod
+    def _add_track(cols, det):
+        tid = det.get('track_id')
+        cols['has_track'].append('track_id' in det)
+        cols['track_id'].append(-1 if tid is None else tid)
+
+    def arrays(self):
+        out = {
+            'frame_index': np.asarray(self.frames, dtype=np.int64),
+            'timestamp': np.asarray(self.timestamps, dtype=np.float64),
+            'context': _strings(self.contexts),
+        }
+        p = self.poses
+        out.update({
+            'poses_row': np.asarray(p['row'], dtype=np.int32),
+            'poses_keypoints': _compact(p['keypoints'], (N_KEYPOINTS, 2)),
+            'poses_conf': _compact(p['conf'], (N_KEYPOINTS,)),
+            'poses_n_keypoints': np.asarray(p['n_keypoints'], dtype=np.int8),
+            'poses_n_conf': np.asarray(p['n_conf'], dtype=np.int8),
+            'poses_bbox': _compact(p['bbox'], (4,)),
+            'poses_has_bbox': np.asarray(p['has_bbox'], dtype=bool),
+            'poses_track_id': np.asarray(p['track_id'], dtype=np.int64),
+            'poses_has_track': np.asarray(p['has_track'], dtype=bool),
+        })
+        for kind, b in self.boxes.items():
+            out.update({
+                f'{kind}_row': np.asarray(b['row'], dtype=np.int32),
+                f'{kind}_class': _strings(b['class']),
+                f'{kind}_sub_class': _strings(b['sub_class']),
+                f'{kind}_has_sub_class': np.asarray(b['has_sub_class'], dtype=bool),
+                f'{kind}_confidence': _compact(b['confidence']),
+                f'{kind}_bbox': _compact(b['bbox'], (4,)),
+                f'{kind}_has_bbox': np.asarray(b['has_bbox'], dtype=bool),
+                f'{kind}_track_id': np.asarray(b['track_id'], dtype=np.int64),
+                f'{kind}_has_track': np.asarray(b['has_track'], dtype=bool),
+                f'{kind}_is_blurry': np.asarray(b['is_blurry'], dtype=bool),
+                f'{kind}_has_blurry': np.asarray(b['has_blurry'], dtype=bool),
+                f'{kind}_has_center': np.asarray(b['has_center'], dtype=bool),
+            })
+        return out
+
+
+class DetectionRecorder:
+    """
+    Writes one video's detections to ``<root>/<video_id>/``.
+
+    Frames are buffered and written as a compressed chunk every
+    *chunk_frames* frames; the manifest is rewritten after each chunk, so
+    an interrupted recording is still readable up to its last chunk.
+    Recording an existing video id replaces it.
+    """
+
+    def __init__(self, root, video_id, fps=None, source=None, engine=None, chunk_frames=1024):
+        self.path = os.path.join(root, video_id)
+        os.makedirs(self.path, exist_ok=True)
+        for name in os.listdir(self.path):
+            if name.startswith('chunk_') and name.endswith('.npz'):
+                os.remove(os.path.join(self.path, name))
+
+        self.chunk_frames = max(1, int(chunk_frames))
+        self.manifest = {
+            'format': FORMAT_VERSION,
+            'video_id': video_id,
+            'source': source,
+            'fps': fps,
+            'engine': engine or {},
+            'created': datetime.now().isoformat(),
+            'frames': 0,
+            'chunks': [],
+            'complete': False,
+        }
+        self._columns = _Columns()
+        self._write_manifest()
+
+    def add(self, frame_index, detections, context=None):
+        """Record the detections of frame *frame_index* and the context they are scored with."""
+        self._columns.add(int(frame_index), detections, context)
+        if len(self._columns) >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        columns = self._columns
+        if not len(columns):
+            return
+        name = f"chunk_{len(self.manifest['chunks']):06d}.npz"
+        tmp = os.path.join(self.path, name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **columns.arrays())
+        os.replace(tmp, os.path.join(self.path, name))
+
+        self.manifest['chunks'].append({
+            'file': name,
+            'frames': len(columns),
+            'first_frame': columns.frames[0],
+            'last_frame': columns.frames[-1],
+        })
+        self.manifest['frames'] += len(columns)
+        self._columns = _Columns()
+        self._write_manifest()
+
+    def close(self):
+        self.flush()
+        self.manifest['complete'] = True
+        self._write_manifest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_manifest(self):
+        tmp = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+
+class DetectionStore:
+    """Reads recordings written by DetectionRecorder under *root*."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def videos(self):
+        """Ids of the recorded videos, sorted."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isfile(os.path.join(self.root, name, MANIFEST)))
+
+    def manifest(self, video_id):
+        with open(os.path.join(self.root, video_id, MANIFEST)) as f:
+            return json.load(f)
+
+    def chunks(self, video_id):
+        """The chunk arrays of a recording, in frame order."""
+        for chunk in self.manifest(video_id)['chunks']:
+            with np.load(os.path.join(self.root, video_id, chunk['file'])) as data:
+                yield {k: data[k] for k in data.files}
+
+    def iter_frames(self, video_id):
+        """Yield (frame_index, detections, context) in recording order."""
+        for data in self.chunks(video_id):
+            frames = data['frame_index'].tolist()
+            detections = [{'poses': [], **{kind: [] for kind in BOX_KINDS}} for _ in frames]
+            for det, ts in zip(detections, data['timestamp'].tolist()):
+                if not np.isnan(ts):
+                    det['timestamp'] = ts
+            for row, pose in _decode_poses(data):
+                detections[row]['poses'].append(pose)
+            for kind in BOX_KINDS:
+                for row, det in _decode_boxes(data, kind):
+                    detections[row][kind].append(det)
+
+            for frame, det, ctx in zip(frames, detections, data['context'].tolist()):
+                yield frame, det, json.loads(ctx)
+
+    def load_sequence(self, video_id):
+        """
+        (DetectionSequence, frame indices, contexts) of a recording, built
+        from the columns without going through per-frame dicts.
+        """
+        data = list(self.chunks(video_id))
+        if not data:
+            return DetectionSequence.from_detections([]), [], []
+        cols = {k: np.concatenate([d[k] for d in data]) for k in data[0]}
+
+        # frame rows are numbered per chunk; the sequence numbers them across chunks
+        chunk_start = np.cumsum([0] + [len(d['frame_index']) for d in data])
+
+        def positions(kind):
+            return np.concatenate([start + d[f'{kind}_row'].astype(np.int64)
+                                   for start, d in zip(chunk_start, data)])
+
+        n_poses = len(cols['poses_row'])
+        keypoints = np.zeros((n_poses, N_KEYPOINTS, 3))
+        keypoints[..., :2] = cols['poses_keypoints']
+        keypoints[..., 2] = cols['poses_conf']
+        n_conf = cols['poses_n_conf'].astype(np.int64)
+        conf = cols['poses_conf'].astype(np.float64)
+        conf_mean = np.full(n_poses, np.nan)
+        full = n_conf == N_KEYPOINTS
+        conf_mean[full] = conf[full].mean(axis=1)
+        for i in np.flatnonzero(~full & (n_conf > 0)):
+            conf_mean[i] = conf[i, :n_conf[i]].mean()
+        bboxes = np.where(cols['poses_has_bbox'][:, None], cols['poses_bbox'], np.nan)
+
+        seq = DetectionSequence(
+            cols['timestamp'],
+            positions('poses'), np.where(cols['poses_has_track'], cols['poses_track_id'], -1),
+            keypoints, cols['poses_n_keypoints'], conf_mean, bboxes,
+            positions('objects'), cols['objects_class'], cols['objects_confidence'],
+            np.where(cols['objects_has_bbox'][:, None], cols['objects_bbox'], np.nan),
+            np.where(cols['objects_has_track'], cols['objects_track_id'], -1),
+            cols['objects_has_track'], cols['objects_is_blurry'],
+            positions('weapons'), cols['weapons_confidence'],
+            positions('fire'), cols['fire_class'], cols['fire_confidence'],
+        )
+        contexts = [json.loads(ctx) for ctx in cols['context'].tolist()]
+        return seq, cols['frame_index'].tolist(), contexts
+
+
+def _decode_poses(data):
+    n_kpts = data['poses_n_keypoints'].tolist()
+    n_conf = data['poses_n_conf'].tolist()
+    keypoints = data['poses_keypoints'].astype(np.float64).tolist()
+    conf = data['poses_conf'].astype(np.float64).tolist()
+    bboxes = data['poses_bbox'].astype(np.float64).tolist()
+    for i, row in enumerate(data['poses_row'].tolist()):
+        pose = {'keypoints': keypoints[i][:n_kpts[i]], 'confidence': conf[i][:n_conf[i]]}
+        if data['poses_has_bbox'][i]:
+            pose['bbox'] = bboxes[i]
+        if data['poses_has_track'][i]:
+            pose['track_id'] = int(data['poses_track_id'][i])
+        yield row, pose
+
+
+def _decode_boxes(data, kind):
+    classes = data[f'{kind}_class'].tolist()
+    sub_classes = data[f'{kind}_sub_class'].tolist()
+    confidence = data[f'{kind}_confidence'].astype(np.float64).tolist()
+    bboxes = data[f'{kind}_bbox'].astype(np.float64)
+    centers = ((bboxes[:, :2] + bboxes[:, 2:]) / 2).tolist()
+    bboxes = bboxes.tolist()
+    for i, row in enumerate(data[f'{kind}_row'].tolist()):
+        det = {'class': classes[i], 'confidence': confidence[i]}
+        if data[f'{kind}_has_sub_class'][i]:
+            det['sub_class'] = sub_classes[i]
+        if data[f'{kind}_has_bbox'][i]:
+            det['bbox'] = bboxes[i]
+        if data[f'{kind}_has_blurry'][i]:
+            det['is_blurry'] = bool(data[f'{kind}_is_blurry'][i])
+        if data[f'{kind}_has_center'][i]:
+            det['center'] = centers[i]
+        if data[f'{kind}_has_track'][i]:
+            det['track_id'] = int(data[f'{kind}_track_id'][i])
+        yield row, det
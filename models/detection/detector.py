@@ -4,8 +4,21 @@ import os
 from ultralytics import YOLO
 import torch
 from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import functools
+import itertools
+import threading
 import time
 
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+from models.detection.backends import ensure_exported, validate_backend
+from models.detection.cascade import SPECIALIST_STAGES, SpecialistCascade
+from models.detection.preprocess import is_blurry, prepare_frames, rescale_results
+
 # ---------------------------------------------------------------------------
 # Model file paths — resolved relative to this script's directory so the
 # detector works regardless of the current working directory.
@@ -101,31 +114,75 @@ _COCO_VEHICLE_IDS = {
     7:  'truck',
 }
 
+# Per-path confidence floors. The fused yolov8n pass runs at the lowest of
+# these (Ultralytics default 0.25) and each output is filtered afterwards.
+_OBJECT_CONF  = 0.30
+_VEHICLE_CONF = 0.35
+_WEAPON_CONF  = 0.40
+
+# Two-stage (ROI) weapon detection: person boxes are padded by *padding* of
+# their width/height per side, grown to at least *min_size* px, and at most
+# *max_rois* crops (most confident persons first) are scanned per frame.
+# Weapon boxes found in overlapping crops are merged above *dedupe_iou*.
+_ROI_DEFAULTS = {'padding': 0.25, 'min_size': 96, 'max_rois': 8, 'dedupe_iou': 0.5}
+
 
-def _try_load_model(path: str, tag: str, device: str):
+def _load_yolo(path, task, device, backend='torch', precision='fp32', calibration_data=None):
+    """
+    Load a YOLO model on the requested inference backend.
+
+    Non-torch backends load the cached ONNX / OpenVINO export of *path*
+    (exported on first use) and fall back to the PyTorch weights when the
+    export or runtime is unavailable. Returns (model, backend_in_use).
+    """
+    if backend != 'torch':
+        try:
+            return YOLO(ensure_exported(path, backend, precision, calibration_data), task=task), backend
+        except Exception as exc:
+            print(
+                f"[WARN] {backend} backend unavailable for '{os.path.basename(path)}' "
+                f"({exc}) — falling back to PyTorch."
+            )
+    model = YOLO(path)
+    model.to(device)
+    return model, 'torch'
+
+
+def _try_load_model(path: str, tag: str, device: str, backend='torch', precision='fp32',
+                    calibration_data=None):
     """
     Attempt to load a YOLO model from *path*.
-    Returns the loaded model on success, or None on failure (e.g. LFS stub).
+    Returns (model, backend_in_use) on success, or (None, None) on failure
+    (e.g. LFS stub).
     """
     if not os.path.isfile(path):
         print(f"[WARN] {tag} model not found at '{path}' — skipping.")
-        return None
+        return None, None
     if _is_lfs_pointer(path):
         print(
             f"[WARN] {tag} model at '{path}' is a Git-LFS pointer, not real weights. "
             "Run 'git lfs pull' (or copy the actual .pt file) and restart."
         )
-        return None
+        return None, None
     try:
-        model = YOLO(path)
-        model.to(device)
-        print(f"[INFO] Loaded {tag} model from '{os.path.basename(path)}'.")
-        return model
+        model, used = _load_yolo(path, 'detect', device, backend, precision, calibration_data)
+        print(f"[INFO] Loaded {tag} model from '{os.path.basename(path)}' ({used}).")
+        return model, used
     except Exception as exc:
         print(f"[WARN] Could not load {tag} model ('{path}'): {exc}")
-        return None
+        return None, None
 
 
+
+def _iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy arrays, shape (N, M)."""
+    top_left     = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter  = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-6)
+
 class UnifiedDetector:
     """
     Combines object detection, pose estimation, fire/smoke detection,
@@ -140,48 +197,200 @@ class UnifiedDetector:
     wepon.pt         — custom weapon detector        (Git-LFS stub — loads if available)
     """
 
-    def __init__(self, device=None):
+    def __init__(self, device=None, fused=True, parallel=False, max_workers=3, model_devices=None,
+                 batch_size=8, backend='torch', precision='fp32', cascade=None,
+                 roi_weapons=None, stream_idle_ttl=300.0, calibration_data=None):
+        """
+        Args:
+            device:        'cuda' / 'cpu' (auto-detected when None)
+            fused:         run yolov8n once per frame for critical objects and the
+                           COCO vehicle/weapon fallbacks instead of once per path
+            parallel:      run the independent model calls of a frame concurrently
+                           on the detector thread pool
+            max_workers:   thread pool size used by the parallel pipeline
+            model_devices: optional per-model placement, e.g. {'pose': 'cuda:1',
+                           'fire': 'cpu'}; keys follow _MODEL_PATHS, unlisted
+                           models use *device*
+            batch_size:    default chunk size for process_batch()
+            backend:       'torch', 'onnxruntime' or 'openvino' for all models;
+                           exports are cached next to the weights (see backends.py)
+            precision:     'fp32' or 'int8' variant of the exported models
+            cascade:       motion-gate the fire/weapon/vehicle models; True for
+                           defaults or a dict of SpecialistCascade options
+                           (motion_threshold, idle_interval, hold_frames)
+            roi_weapons:   run the weapon model (or COCO weapon fallback) on
+                           padded person crops instead of full frames; True for
+                           defaults or a dict with padding / min_size / max_rois
+            stream_idle_ttl: seconds after which an unused per-stream context
+                           (tracker, cascade state) is evicted
+            calibration_data: int8 calibration set (dataset YAML or image
+                           directory) for new exports; Ultralytics' default
+                           when None
+        """
         if device is None:
             self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         else:
             self.device = device
 
-        if self.device == 'cuda':
+        validate_backend(backend, precision)
+
+        unknown = set(model_devices or {}) - set(_MODEL_PATHS)
+        if unknown:
+            raise ValueError(f"Unknown model keys in model_devices: {sorted(unknown)}")
+        self.model_devices = {
+            key: (model_devices or {}).get(key, self.device) for key in _MODEL_PATHS
+        }
+
+        if any(str(d).startswith('cuda') for d in self.model_devices.values()):
             torch.backends.cudnn.benchmark = True
 
         print(f"Initializing UnifiedDetector on {self.device}...")
 
         # ── Core models (always required) ──────────────────────────────────
-        print("Loading models...")
-        self.object_model  = YOLO(_MODEL_PATHS['object'])
-        self.object_model.to(self.device)
-
-        self.pose_model    = YOLO(_MODEL_PATHS['pose'])
-        self.pose_model.to(self.device)
+        print(f"Loading models (backend={backend}, precision={precision})...")
+        self.model_backends = {}
+        self.object_model, self.model_backends['object'] = _load_yolo(
+            _MODEL_PATHS['object'], 'detect', self.model_devices['object'], backend, precision, calibration_data
+        )
+        self.pose_model, self.model_backends['pose'] = _load_yolo(
+            _MODEL_PATHS['pose'], 'pose', self.model_devices['pose'], backend, precision, calibration_data
+        )
 
         # ── Specialist models (optional — degrade gracefully if LFS stubs) ─
-        self.fire_model    = _try_load_model(_MODEL_PATHS['fire'],    'fire',    self.device)
-        self.vehicle_model = _try_load_model(_MODEL_PATHS['vehicle'], 'vehicle', self.device)
-        self.weapon_model  = _try_load_model(_MODEL_PATHS['weapon'],  'weapon',  self.device)
+        for key in ('fire', 'vehicle', 'weapon'):
+            model, used = _try_load_model(
+                _MODEL_PATHS[key], key, self.model_devices[key], backend, precision, calibration_data
+            )
+            setattr(self, f'{key}_model', model)
+            if model is not None:
+                self.model_backends[key] = used
 
         # COCO class mappings
         self.critical_objects = _COCO_CRITICAL
+        self.fused = fused
+        self.batch_size = batch_size
+
+        # Specialist duty cycling (None when every model runs on every frame)
+        self._cascade_options = ({} if cascade is True else dict(cascade)) if cascade else None
+
+        # Two-stage weapon detection on person crops (None = full-frame scan)
+        self.roi_weapons = (
+            {**_ROI_DEFAULTS, **({} if roi_weapons is True else dict(roi_weapons))}
+            if roi_weapons else None
+        )
 
-        # Tracker & thread pool
-        self.tracker  = SimpleTracker()
-        self.executor = ThreadPoolExecutor(max_workers=3)
+        # Per-stream state (tracker, cascade). Model weights are shared; every
+        # camera / session gets its own context, keyed by stream id. Track ids
+        # come from one counter so they never collide across streams.
+        self.stream_idle_ttl = stream_idle_ttl
+        self._track_ids = itertools.count()
+        self._streams = {}
+        self._streams_lock = threading.Lock()
+        self.stream_context(None)
+
+        # Thread pool. A model instance is not safe to call from two threads
+        # at once, so every predict goes through its per-model lock.
+        self.parallel = parallel
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='detector')
+        self._model_locks = {key: threading.Lock() for key in _MODEL_PATHS}
 
         # Always use FP32 for stability (FP16 causes dtype mismatches on some GPUs)
         self.use_half = False
         print("[INFO] Using FP32 (Full Precision) for stability.")
+        if parallel:
+            print(f"[INFO] Parallel detection pipeline enabled ({max_workers} workers).")
+
+    # ── Per-stream contexts ─────────────────────────────────────────────────
+
+    @property
+    def tracker(self):
+        """Tracker of the default stream (callers that pass no stream_id)."""
+        return self._streams[_DEFAULT_STREAM].tracker
+
+    @property
+    def cascade(self):
+        """Specialist cascade of the default stream (None when disabled)."""
+        return self._streams[_DEFAULT_STREAM].cascade
+
+    def stream_context(self, stream_id=None):
+        """
+        Per-stream state for *stream_id* (None = default stream), created on
+        first use. Contexts idle for longer than ``stream_idle_ttl`` are
+        evicted here as a side effect.
+        """
+        key = _DEFAULT_STREAM if stream_id is None else str(stream_id)
+        now = time.monotonic()
+        with self._streams_lock:
+            self._evict_idle_streams(now)
+            ctx = self._streams.get(key)
+            if ctx is None:
+                ctx = self._streams[key] = StreamContext(
+                    key,
+                    SimpleTracker(id_counter=self._track_ids),
+                    SpecialistCascade(**self._cascade_options) if self._cascade_options is not None else None,
+                )
+            ctx.last_used = now
+            return ctx
+
+    def release_stream(self, stream_id):
+        """Drop the state of a stream (e.g. on WebSocket disconnect)."""
+        key = _DEFAULT_STREAM if stream_id is None else str(stream_id)
+        with self._streams_lock:
+            self._streams.pop(key, None)
+        if key == _DEFAULT_STREAM:
+            self.stream_context(None)
+
+    def stream_stats(self):
+        """{stream_id: {'frames', 'tracks', 'idle_seconds'}} for the live contexts."""
+        now = time.monotonic()
+        with self._streams_lock:
+            return {
+                key: {
+                    'frames':       ctx.frames,
+                    'tracks':       len(ctx.tracker.tracks),
+                    'idle_seconds': round(now - ctx.last_used, 1),
+                }
+                for key, ctx in self._streams.items()
+            }
+
+    def _evict_idle_streams(self, now):
+        for key, ctx in list(self._streams.items()):
+            if key == _DEFAULT_STREAM or ctx.lock.locked():
+                continue
+            if now - ctx.last_used > self.stream_idle_ttl:
+                del self._streams[key]
+                print(f"[INFO] Evicted idle detector stream '{key}'.")
 
     # ── Internal helpers ────────────────────────────────────────────────────
 
+    def _predict(self, key, source, **kwargs):
+        """Run one model under its lock on its assigned device."""
+        model = getattr(self, f'{key}_model')
+        with self._model_locks[key]:
+            return model.predict(
+                source,
+                verbose=False,
+                device=self.model_devices[key],
+                half=self.use_half,
+                **kwargs,
+            )
+
+    def _predict_batch(self, key, frames, **kwargs):
+        """
+        One predict call over a list of PreparedFrames on their model-scale
+        images; returns one Results per frame in frame coordinates.
+        """
+        images = [f.model_image for f in frames]
+        source = images[0] if len(images) == 1 else images
+        results = self._predict(key, source, **kwargs)
+        for frame, r in zip(frames, results):
+            if frame.scale is not None:
+                rescale_results(r, frame.scale, frame.shape[:2])
+        return results
+
     def _check_blur(self, frame):
-        """Blur detection via Laplacian variance (Innovation #16)."""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        variance = cv2.Laplacian(gray, cv2.CV_64F).var()
-        return variance < 100
+        """Blur detection via Laplacian variance (Innovation #16) on the full-resolution gray image."""
+        return is_blurry(prepare_frames([frame])[0].full_gray)
 
     def _calculate_iou(self, boxA, boxB):
         xA = max(boxA[0], boxB[0]);  yA = max(boxA[1], boxB[1])
@@ -196,76 +405,42 @@ class UnifiedDetector:
         return [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2]
 
     # ── Per-modality detection methods ──────────────────────────────────────
+    #
+    # Each detect_* method is the single-frame form of a *_batch method that
+    # runs its model once over a list of frames and returns one result per
+    # frame, in frame order.
 
     def detect_objects(self, frame):
         """
         Detect and track critical COCO objects (persons, bags, blunt/bladed
         weapons) using yolov8n.pt + SimpleTracker.
         """
-        is_blurry = self._check_blur(frame)
+        return self._objects_batch([frame])[0]
 
-        results = self.object_model.predict(
-            frame,
-            verbose=False,
-            device=self.device,
-            classes=list(self.critical_objects.keys()),
-            half=self.use_half,
-        )[0]
-
-        raw_boxes = []
-        if results.boxes is not None:
-            for box in results.boxes:
-                cls  = int(box.cls[0])
-                conf = float(box.conf[0])
-                xyxy = box.xyxy[0].cpu().numpy()
-
-                if cls in self.critical_objects and conf > 0.3:
-                    raw_boxes.append({
-                        'class':      self.critical_objects[cls],
-                        'confidence': conf,
-                        'bbox':       xyxy.tolist(),
-                        'is_blurry':  is_blurry,
-                    })
-
-        return self.tracker.update(raw_boxes)
+    def detect_general(self, frame):
+        """
+        Fused yolov8n pass shared by the object, vehicle and weapon paths.
+
+        Runs the general detector once over the union of critical COCO ids
+        and the vehicle ids (weapon ids are already a subset of the critical
+        set), then splits the boxes per path with each path's own confidence
+        floor. Ultralytics NMS is class-aware and assigns every box its argmax
+        class before the ``classes`` filter, so the split output matches the
+        separate per-path runs.
+
+        Returns
+        -------
+        (objects, vehicles, weapons) — vehicles/weapons are None when the
+        matching specialist model is loaded and must be run separately.
+        """
+        return self._general_batch([frame])[0]
 
     def detect_poses(self, frame):
         """
         Detect human poses using yolov8n-pose.pt.
         Returns a list of dicts with 'keypoints', 'confidence', and 'bbox'.
         """
-        results = self.pose_model(
-            frame, verbose=False, device=self.device, half=self.use_half
-        )[0]
-
-        poses = []
-        if results.keypoints is not None:
-            for i, keypoints in enumerate(results.keypoints):
-                if hasattr(keypoints, 'xy'):
-                    kpts = keypoints.xy[0].cpu().numpy()
-                    conf = (
-                        keypoints.conf[0].cpu().numpy()
-                        if keypoints.conf is not None
-                        else np.ones(len(kpts))
-                    )
-                elif hasattr(keypoints, 'data'):
-                    data = keypoints.data[0].cpu().numpy()
-                    kpts = data[:, :2]
-                    conf = data[:, 2] if data.shape[1] > 2 else np.ones(len(kpts))
-                else:
-                    continue
-
-                bbox = [0, 0, 0, 0]
-                if results.boxes is not None and i < len(results.boxes):
-                    bbox = results.boxes[i].xyxy[0].cpu().numpy().tolist()
-
-                poses.append({
-                    'keypoints':  kpts.tolist(),
-                    'confidence': conf.tolist(),
-                    'bbox':       bbox,
-                })
-
-        return poses
+        return self._poses_batch([frame])[0]
 
     def detect_fire(self, frame):
         """
@@ -276,40 +451,7 @@ class UnifiedDetector:
 
         Falls back to an empty list when fir.pt is unavailable.
         """
-        if self.fire_model is None:
-            return []
-
-        results = self.fire_model.predict(
-            frame,
-            verbose=False,
-            device=self.device,
-            conf=0.35,
-            half=self.use_half,
-        )[0]
-
-        detections = []
-        if results.boxes is not None:
-            names = results.names or {}
-            for box in results.boxes:
-                cls_id = int(box.cls[0])
-                conf   = float(box.conf[0])
-                xyxy   = box.xyxy[0].cpu().numpy()
-                raw_name = str(names.get(cls_id, '')).strip().lower()
-
-                if raw_name in {'fire', 'flame', 'burning', '火'} or 'fire' in raw_name:
-                    label = 'fire'
-                elif raw_name in {'smoke', 'fume', '烟'} or 'smoke' in raw_name:
-                    label = 'smoke'
-                else:
-                    label = _FIRE_CLASS_REMAP.get(cls_id, raw_name if raw_name else f'fire_cls_{cls_id}')
-
-                detections.append({
-                    'class':      label,           # 'fire' or 'smoke'
-                    'confidence': conf,
-                    'bbox':       xyxy.tolist(),
-                })
-
-        return detections
+        return self._fire_batch([frame])[0]
 
     def detect_vehicles(self, frame):
         """
@@ -320,54 +462,7 @@ class UnifiedDetector:
         When unavailable, falls back to COCO vehicle classes from yolov8n.pt
         (bicycle, car, motorcycle, bus, truck).
         """
-        if self.vehicle_model is not None:
-            # Use the specialist model — trust its own class names
-            results = self.vehicle_model.predict(
-                frame,
-                verbose=False,
-                device=self.device,
-                conf=0.35,
-                half=self.use_half,
-            )[0]
-
-            vehicles = []
-            if results.boxes is not None:
-                names = results.names
-                for box in results.boxes:
-                    cls_id   = int(box.cls[0])
-                    cls_name = names.get(cls_id, f'vehicle_{cls_id}').lower()
-                    conf     = float(box.conf[0])
-                    xyxy     = box.xyxy[0].cpu().numpy()
-                    vehicles.append({
-                        'class':      cls_name,
-                        'confidence': conf,
-                        'bbox':       xyxy.tolist(),
-                    })
-            return vehicles
-
-        # ── Fallback: COCO vehicle classes from the general detector ───────
-        results = self.object_model.predict(
-            frame,
-            verbose=False,
-            device=self.device,
-            classes=list(_COCO_VEHICLE_IDS.keys()),
-            conf=0.35,
-            half=self.use_half,
-        )[0]
-
-        vehicles = []
-        if results.boxes is not None:
-            for box in results.boxes:
-                cls_id = int(box.cls[0])
-                conf   = float(box.conf[0])
-                xyxy   = box.xyxy[0].cpu().numpy()
-                if cls_id in _COCO_VEHICLE_IDS:
-                    vehicles.append({
-                        'class':      _COCO_VEHICLE_IDS[cls_id],
-                        'confidence': conf,
-                        'bbox':       xyxy.tolist(),
-                    })
-        return vehicles
+        return self._vehicles_batch([frame])[0]
 
     def detect_weapons(self, frame):
         """
@@ -379,66 +474,321 @@ class UnifiedDetector:
         When unavailable, falls back to COCO weapon classes (knife, baseball
         bat, scissors) detected by yolov8n.pt.
         """
+        return self._weapons_batch([frame])[0]
+
+    # ── Batched model calls ─────────────────────────────────────────────────
+
+    def _frame_trackers(self, frames, tracker):
+        """
+        One tracker per frame: *tracker* is a tracker (None = default stream)
+        shared by every frame, or a list with one tracker per frame.
+        """
+        if isinstance(tracker, list):
+            return tracker
+        return [self.tracker if tracker is None else tracker] * len(frames)
+
+    def _objects_batch(self, frames, tracker=None):
+        frames   = prepare_frames(frames)
+        trackers = self._frame_trackers(frames, tracker)
+        blurry   = [is_blurry(f.full_gray) for f in frames]
+        results  = self._predict_batch(
+            'object',
+            frames,
+            classes=list(self.critical_objects.keys()),
+        )
+        # Tracker state is sequential — update strictly in frame order.
+        return [
+            t.update(self._parse_critical_objects(r, b))
+            for r, b, t in zip(results, blurry, trackers)
+        ]
+
+    def _general_batch(self, frames, tracker=None):
+        frames   = prepare_frames(frames)
+        trackers = self._frame_trackers(frames, tracker)
+        need_vehicles = self.vehicle_model is None
+        need_weapons  = self.weapon_model is None and self.roi_weapons is None
+
+        class_ids = set(self.critical_objects)
+        if need_vehicles:
+            class_ids |= set(_COCO_VEHICLE_IDS)
+
+        blurry  = [is_blurry(f.full_gray) for f in frames]
+        results = self._predict_batch(
+            'object',
+            frames,
+            classes=sorted(class_ids),
+        )
+
+        outputs = []
+        for r, b, t in zip(results, blurry, trackers):
+            objects  = t.update(self._parse_critical_objects(r, b))
+            vehicles = self._parse_coco_vehicles(r) if need_vehicles else None
+            weapons  = self._parse_coco_weapons(r) if need_weapons else None
+            outputs.append((objects, vehicles, weapons))
+        return outputs
+
+    def _poses_batch(self, frames):
+        frames = prepare_frames(frames)
+        return [self._parse_poses(r) for r in self._predict_batch('pose', frames)]
+
+    def _fire_batch(self, frames):
+        if self.fire_model is None:
+            return [[] for _ in frames]
+        frames  = prepare_frames(frames)
+        results = self._predict_batch('fire', frames, conf=0.35)
+        return [self._parse_fire(r) for r in results]
+
+    def _vehicles_batch(self, frames):
+        frames = prepare_frames(frames)
+        if self.vehicle_model is not None:
+            # Use the specialist model — trust its own class names
+            results = self._predict_batch('vehicle', frames, conf=0.35)
+            return [self._parse_vehicle_model(r) for r in results]
+
+        # ── Fallback: COCO vehicle classes from the general detector ───────
+        results = self._predict_batch(
+            'object',
+            frames,
+            classes=list(_COCO_VEHICLE_IDS.keys()),
+            conf=_VEHICLE_CONF,
+        )
+        return [self._parse_coco_vehicles(r) for r in results]
+
+    def _weapons_batch(self, frames):
+        frames = prepare_frames(frames)
         if self.weapon_model is not None:
-            results = self.weapon_model.predict(
-                frame,
-                verbose=False,
-                device=self.device,
-                conf=0.40,
-                half=self.use_half,
-            )[0]
-
-            weapons = []
-            if results.boxes is not None:
-                names = results.names
-                for box in results.boxes:
-                    cls_id   = int(box.cls[0])
-                    cls_name = names.get(cls_id, 'unknown').lower()
-                    conf     = float(box.conf[0])
-                    xyxy     = box.xyxy[0].cpu().numpy()
-
-                    is_weapon = any(
-                        w in cls_name
-                        for w in ['gun', 'weapon', 'firearm', 'handgun', 'pistol', 'rifle', 'shotgun', 'knife',
-                                  'machete', 'sword', 'bat', 'scissors']
-                    )
-
-                    if is_weapon and conf > 0.45:
-                        weapons.append({
-                            'class':     'weapon',
-                            'sub_class': cls_name if cls_name != 'unknown' else 'unidentified_threat',
-                            'confidence': conf,
-                            'bbox':       xyxy.tolist(),
-                        })
-            return weapons
+            results = self._predict_batch('weapon', frames, conf=0.40)
+            return [self._parse_weapon_model(r) for r in results]
 
         # ── Fallback: COCO weapon classes from the general detector ────────
-        results = self.object_model.predict(
-            frame,
-            verbose=False,
-            device=self.device,
+        results = self._predict_batch(
+            'object',
+            frames,
             classes=list(_COCO_WEAPON_IDS),
-            conf=0.40,
-            half=self.use_half,
-        )[0]
+            conf=_WEAPON_CONF,
+        )
+        return [self._parse_coco_weapons(r) for r in results]
+
+    def _roi_weapons_batch(self, frames, objects_per_frame):
+        """
+        Two-stage weapon detection: crop padded regions around the tracked
+        persons of every frame, run the weapon path once over all crops of
+        the chunk and map the boxes back to frame coordinates.
+        """
+        crops, owners = [], []   # owners[i] = (frame index, x offset, y offset)
+        for i, (frame, objects) in enumerate(zip(prepare_frames(frames), objects_per_frame)):
+            for x0, y0, x1, y1 in self._person_rois(frame.shape, objects):
+                # Crop the full-resolution frame so small weapons keep their detail
+                crops.append(np.ascontiguousarray(frame.image[y0:y1, x0:x1]))
+                owners.append((i, x0, y0))
+
+        weapons = [[] for _ in frames]
+        if not crops:
+            return weapons
+
+        for (i, x0, y0), detections in zip(owners, self._weapons_batch(crops)):
+            for det in detections:
+                b = det['bbox']
+                det['bbox'] = [b[0] + x0, b[1] + y0, b[2] + x0, b[3] + y0]
+                weapons[i].append(det)
+
+        return [self._dedupe_boxes(w, self.roi_weapons['dedupe_iou']) for w in weapons]
+
+    def _person_rois(self, frame_shape, objects):
+        """Padded, clipped integer crop boxes around the most confident persons."""
+        persons = [o for o in objects if o['class'] == 'person']
+        if not persons:
+            return []
+        persons.sort(key=lambda o: o['confidence'], reverse=True)
+        boxes = np.array([o['bbox'] for o in persons[:self.roi_weapons['max_rois']]], dtype=np.float32)
+
+        h, w = frame_shape[:2]
+        size = boxes[:, 2:] - boxes[:, :2]
+        pad = size * self.roi_weapons['padding']
+        # Grow small boxes symmetrically up to min_size
+        pad += np.maximum(self.roi_weapons['min_size'] - (size + 2 * pad), 0) / 2
+
+        x0y0 = np.floor(boxes[:, :2] - pad)
+        x1y1 = np.ceil(boxes[:, 2:] + pad)
+        x0y0 = np.clip(x0y0, 0, [w, h]).astype(int)
+        x1y1 = np.clip(x1y1, 0, [w, h]).astype(int)
 
+        keep = np.all(x1y1 - x0y0 >= 2, axis=1)
+        return np.hstack([x0y0, x1y1])[keep].tolist()
+
+    @staticmethod
+    def _dedupe_boxes(detections, iou_threshold):
+        """Greedy NMS over dicts with 'bbox'/'confidence' (overlapping crops)."""
+        if len(detections) < 2:
+            return detections
+        order = sorted(range(len(detections)), key=lambda i: detections[i]['confidence'], reverse=True)
+        boxes = np.array([detections[i]['bbox'] for i in order], dtype=np.float32)
+        iou = _iou_matrix(boxes, boxes)
+
+        suppressed = np.zeros(len(order), dtype=bool)
+        kept = []
+        for k in range(len(order)):
+            if suppressed[k]:
+                continue
+            kept.append(detections[order[k]])
+            suppressed |= iou[k] > iou_threshold
+        return kept
+
+    # ── Result decoding ─────────────────────────────────────────────────────
+    #
+    # Box tensors are pulled to NumPy once per result and filtered with
+    # boolean masks; output dicts are only built for boxes that survive.
+
+    @staticmethod
+    def _box_arrays(results):
+        """(xyxy, conf, cls) NumPy arrays of a result, or None when it has no boxes."""
+        boxes = results.boxes
+        if boxes is None or len(boxes) == 0:
+            return None
+        data = boxes.data.cpu().numpy()   # x1, y1, x2, y2, [track_id,] conf, cls
+        return data[:, :4], data[:, -2], data[:, -1].astype(np.int64)
+
+    @staticmethod
+    def _parse_poses(results):
+        """Pose dicts ('keypoints', 'confidence', 'bbox') from a yolov8n-pose result."""
+        if results.keypoints is None or len(results.keypoints) == 0:
+            return []
+
+        data = results.keypoints.data.cpu().numpy()   # (N, 17, 2|3)
+        kpts = data[..., :2].tolist()
+        conf = (data[..., 2] if data.shape[-1] > 2 else np.ones(data.shape[:2])).tolist()
+
+        n_boxes = len(results.boxes) if results.boxes is not None else 0
+        bboxes = results.boxes.xyxy.cpu().numpy().tolist() if n_boxes else []
+        bboxes += [[0, 0, 0, 0]] * (len(kpts) - n_boxes)
+
+        return [
+            {'keypoints': k, 'confidence': c, 'bbox': b}
+            for k, c, b in zip(kpts, conf, bboxes)
+        ]
+
+    @staticmethod
+    def _parse_fire(results):
+        """Fire/smoke detections from a fir.pt result, labels remapped to English."""
+        arrays = UnifiedDetector._box_arrays(results)
+        if arrays is None:
+            return []
+        xyxy, conf, cls = arrays
+
+        names = results.names or {}
+        labels = {}
+        for cls_id in np.unique(cls).tolist():
+            raw_name = str(names.get(cls_id, '')).strip().lower()
+            if raw_name in {'fire', 'flame', 'burning', '火'} or 'fire' in raw_name:
+                labels[cls_id] = 'fire'
+            elif raw_name in {'smoke', 'fume', '烟'} or 'smoke' in raw_name:
+                labels[cls_id] = 'smoke'
+            else:
+                labels[cls_id] = _FIRE_CLASS_REMAP.get(cls_id, raw_name if raw_name else f'fire_cls_{cls_id}')
+
+        return [
+            {'class': labels[c], 'confidence': p, 'bbox': b}   # 'fire' or 'smoke'
+            for c, p, b in zip(cls.tolist(), conf.tolist(), xyxy.tolist())
+        ]
+
+    @staticmethod
+    def _parse_vehicle_model(results):
+        """Vehicle detections from a vehicle.pt result."""
+        arrays = UnifiedDetector._box_arrays(results)
+        if arrays is None:
+            return []
+        xyxy, conf, cls = arrays
+
+        names = results.names
+        return [
+            {'class': names.get(c, f'vehicle_{c}').lower(), 'confidence': p, 'bbox': b}
+            for c, p, b in zip(cls.tolist(), conf.tolist(), xyxy.tolist())
+        ]
+
+    @staticmethod
+    def _parse_weapon_model(results):
+        """Weapon detections from a wepon.pt result, filtered to weapon class names."""
+        arrays = UnifiedDetector._box_arrays(results)
+        if arrays is None:
+            return []
+        xyxy, conf, cls = arrays
+
+        names = results.names
+        weapon_ids = [
+            cls_id for cls_id in np.unique(cls).tolist()
+            if any(
+                w in names.get(cls_id, 'unknown').lower()
+                for w in ['gun', 'weapon', 'firearm', 'handgun', 'pistol', 'rifle', 'shotgun', 'knife',
+                          'machete', 'sword', 'bat', 'scissors']
+            )
+        ]
+
+        keep = np.isin(cls, weapon_ids) & (conf > 0.45)
         weapons = []
-        if results.boxes is not None:
-            names = results.names
-            for box in results.boxes:
-                cls_id   = int(box.cls[0])
-                cls_name = names.get(cls_id, 'unknown').lower()
-                conf     = float(box.conf[0])
-                xyxy     = box.xyxy[0].cpu().numpy()
-                if cls_id in _COCO_WEAPON_IDS and conf > 0.40:
-                    weapons.append({
-                        'class':      'weapon',
-                        'sub_class':  cls_name,
-                        'confidence': conf,
-                        'bbox':       xyxy.tolist(),
-                    })
+        for c, p, b in zip(cls[keep].tolist(), conf[keep].tolist(), xyxy[keep].tolist()):
+            cls_name = names.get(c, 'unknown').lower()
+            weapons.append({
+                'class':     'weapon',
+                'sub_class': cls_name if cls_name != 'unknown' else 'unidentified_threat',
+                'confidence': p,
+                'bbox':       b,
+            })
         return weapons
 
+    # ── General-detector result parsing ─────────────────────────────────────
+
+    def _parse_critical_objects(self, results, is_blurry):
+        """Untracked critical-object dicts from a yolov8n result."""
+        arrays = self._box_arrays(results)
+        if arrays is None:
+            return []
+        xyxy, conf, cls = arrays
+
+        keep = np.isin(cls, list(self.critical_objects)) & (conf > _OBJECT_CONF)
+        return [
+            {
+                'class':      self.critical_objects[c],
+                'confidence': p,
+                'bbox':       b,
+                'is_blurry':  is_blurry,
+            }
+            for c, p, b in zip(cls[keep].tolist(), conf[keep].tolist(), xyxy[keep].tolist())
+        ]
+
+    @staticmethod
+    def _parse_coco_vehicles(results):
+        """COCO vehicle fallback detections from a yolov8n result."""
+        arrays = UnifiedDetector._box_arrays(results)
+        if arrays is None:
+            return []
+        xyxy, conf, cls = arrays
+
+        keep = np.isin(cls, list(_COCO_VEHICLE_IDS)) & (conf > _VEHICLE_CONF)
+        return [
+            {'class': _COCO_VEHICLE_IDS[c], 'confidence': p, 'bbox': b}
+            for c, p, b in zip(cls[keep].tolist(), conf[keep].tolist(), xyxy[keep].tolist())
+        ]
+
+    @staticmethod
+    def _parse_coco_weapons(results):
+        """COCO weapon fallback detections (knife, bat, scissors) from a yolov8n result."""
+        arrays = UnifiedDetector._box_arrays(results)
+        if arrays is None:
+            return []
+        xyxy, conf, cls = arrays
+
+        names = results.names
+        keep = np.isin(cls, list(_COCO_WEAPON_IDS)) & (conf > _WEAPON_CONF)
+        return [
+            {
+                'class':      'weapon',
+                'sub_class':  names.get(c, 'unknown').lower(),
+                'confidence': p,
+                'bbox':       b,
+            }
+            for c, p, b in zip(cls[keep].tolist(), conf[keep].tolist(), xyxy[keep].tolist())
+        ]
+
     # ── Pose ↔ track assignment ─────────────────────────────────────────────
 
     def _assign_tracks_to_poses(self, objects, poses):
@@ -467,9 +817,17 @@ class UnifiedDetector:
 
     # ── Main pipeline ───────────────────────────────────────────────────────
 
-    def process_frame(self, frame):
+    def process_frame(self, frame, stream_id=None):
         """
-        Complete sequential detection pipeline.
+        Complete detection pipeline.
+
+        *stream_id* (camera / session id) selects the per-stream tracker and
+        cascade state; frames of one stream are processed one at a time.
+
+        In fused mode (default) yolov8n runs once and feeds objects plus the
+        COCO vehicle/weapon fallbacks; specialist models still run on their own.
+        In parallel mode the independent model calls are submitted to the
+        detector thread pool and joined before pose ↔ track assignment.
 
         Returns
         -------
@@ -481,29 +839,200 @@ class UnifiedDetector:
             fire      — fire / smoke detections (fir.pt)
             timestamp — Unix timestamp (float)
         """
-        objects  = self.detect_objects(frame)
-        poses    = self.detect_poses(frame)
-        weapons  = self.detect_weapons(frame)
-        vehicles = self.detect_vehicles(frame)
-        fire     = self.detect_fire(frame)
-
-        self._assign_tracks_to_poses(objects, poses)
-
-        return {
-            'objects':   objects,
-            'poses':     poses,
-            'weapons':   weapons,
-            'vehicles':  vehicles,
-            'fire':      fire,
-            'timestamp': time.time(),
-        }
+        ctx = self.stream_context(stream_id)
+        with ctx.lock:
+            return self._process_chunk([frame], ctx)[0]
+
+    def process_batch(self, frames, batch_size=None, stream_id=None):
+        """
+        Batched detection pipeline for offline / forensic callers.
+
+        Every model runs once per chunk of up to *batch_size* frames
+        (default: the detector's ``batch_size``) instead of once per frame.
+        Tracker updates still happen in frame order, so the output is the
+        same as calling process_frame() on each frame in turn.
+
+        Returns a list with one process_frame()-style dict per input frame.
+        """
+        frames = list(frames)
+        size = max(1, batch_size or self.batch_size or len(frames) or 1)
+
+        ctx = self.stream_context(stream_id)
+        results = []
+        with ctx.lock:
+            for start in range(0, len(frames), size):
+                results.extend(self._process_chunk(frames[start:start + size], ctx))
+        return results
+
+    def process_streams(self, frames, stream_ids):
+        """
+        One detection pass over the current frames of several streams.
+
+        ``frames[i]`` belongs to ``stream_ids[i]``; each stream appears at
+        most once. Every model runs once over all the frames (cross-camera
+        micro-batching, see backend/services/inference_scheduler.py) while
+        tracking and cascade gating stay per stream, so each result is the
+        same as process_frame(frames[i], stream_id=stream_ids[i]).
+
+        Returns a list with one process_frame()-style dict per input frame.
+        """
+        if len(set(stream_ids)) != len(stream_ids):
+            raise ValueError("process_streams() takes at most one frame per stream")
+        ctxs = [self.stream_context(sid) for sid in stream_ids]
+        with contextlib.ExitStack() as held:
+            # Fixed lock order so concurrent callers cannot deadlock
+            for ctx in sorted(ctxs, key=lambda c: c.stream_id):
+                held.enter_context(ctx.lock)
+            return self._process_chunk(list(frames), ctxs)
+
+    def _process_chunk(self, frames, ctx):
+        """
+        Run every stage once over *frames* and assemble per-frame dicts.
+        *ctx* is the StreamContext of all the frames, or a list with one
+        context per frame.
+        """
+        ctxs = ctx if isinstance(ctx, list) else [ctx] * len(frames)
+        # Resize / grayscale once per frame; every stage and the cascade share it.
+        frames = prepare_frames(frames)
+        stages = self._frame_stages([c.tracker for c in ctxs])
+        cascades = [c.cascade for c in ctxs]
+        if any(c is not None for c in cascades):
+            stages = self._gate_specialists(stages, frames, cascades)
+        outputs = self._run_stages(stages, frames)
+
+        if 'general' in outputs:
+            general = outputs.pop('general')
+            outputs['objects'] = [objects for objects, _, _ in general]
+            if general and general[0][1] is not None:
+                outputs['vehicles'] = [vehicles for _, vehicles, _ in general]
+            if general and general[0][2] is not None:
+                outputs['weapons'] = [weapons for _, _, weapons in general]
+
+        detections = []
+        for i in range(len(frames)):
+            objects, poses = outputs['objects'][i], outputs['poses'][i]
+            self._assign_tracks_to_poses(objects, poses)
+            detections.append({
+                'objects':   objects,
+                'poses':     poses,
+                'weapons':   outputs['weapons'][i],
+                'vehicles':  outputs['vehicles'][i],
+                'fire':      outputs['fire'][i],
+                'timestamp': time.time(),
+            })
+
+        last = {}   # stream id -> (context, its last detection)
+        for c, detection in zip(ctxs, detections):
+            c.frames += 1
+            last[c.stream_id] = (c, detection)
+        now = time.monotonic()
+        for c, detection in last.values():
+            c.last_used = now
+            if c.cascade is not None:
+                c.cascade.update_people(detection['objects'])
+        return detections
+
+    def _gate_specialists(self, stages, frames, cascades):
+        """
+        Wrap the specialist stages so they only run on the frames the cascade
+        selects; the other frames get the stage's cached detections.
+        *cascades* has one cascade per frame (None = always run).
+
+        Motion is measured per frame; "people present" comes from the last
+        frame of the previous chunk (the previous frame in live use).
+        """
+        active = [c.observe(f.gray) if c is not None else True for f, c in zip(frames, cascades)]
+
+        gated = dict(stages)
+        for name in SPECIALIST_STAGES:
+            if name in stages:
+                run_mask = [c.should_run(name, a) if c is not None else True
+                            for c, a in zip(cascades, active)]
+                gated[name] = self._gated_stage(name, stages[name], run_mask, cascades)
+        return gated
+
+    @staticmethod
+    def _gated_stage(name, fn, run_mask, cascades):
+        def run(frames, *per_frame):
+            idx = [i for i, needed in enumerate(run_mask) if needed]
+            selected = [[arg[i] for i in idx] for arg in per_frame]
+            fresh = iter(fn([frames[i] for i in idx], *selected) if idx else ())
+
+            outputs = []
+            for needed, cascade in zip(run_mask, cascades):
+                if cascade is None:
+                    outputs.append(next(fresh))
+                    continue
+                if needed:
+                    cascade.store(name, next(fresh))
+                outputs.append(cascade.cached(name))
+            return outputs
+        return run
+
+    def _frame_stages(self, tracker):
+        """
+        Ordered {name: callable(frames)} of the independent model calls for a
+        chunk; *tracker* as in _frame_trackers().
+        """
+        stages = {}
+        if self.fused:
+            stages['general'] = functools.partial(self._general_batch, tracker=tracker)
+        else:
+            stages['objects'] = functools.partial(self._objects_batch, tracker=tracker)
+        stages['poses'] = self._poses_batch
+        if self.roi_weapons is not None:
+            stages['weapons'] = self._roi_weapons_batch
+        elif not self.fused or self.weapon_model is not None:
+            stages['weapons'] = self._weapons_batch
+        if not self.fused or self.vehicle_model is not None:
+            stages['vehicles'] = self._vehicles_batch
+        stages['fire'] = self._fire_batch
+        return stages
+
+    def _chained_stages(self):
+        """Stages that also take the chunk's tracked objects (run after the object stage)."""
+        return {'weapons'} if self.roi_weapons is not None else set()
+
+    def _run_stages(self, stages, frames):
+        """
+        Run stages in order, or concurrently on the pool in parallel mode.
+        Chained stages wait for the object stage (always first) and receive
+        its per-frame objects as a second argument.
+        """
+        chained = self._chained_stages() & set(stages)
+        source = 'general' if 'general' in stages else 'objects'
+
+        def objects_of(output):
+            return [o[0] for o in output] if source == 'general' else output
+
+        if not self.parallel:
+            outputs = {}
+            for name, fn in stages.items():
+                if name in chained:
+                    outputs[name] = fn(frames, objects_of(outputs[source]))
+                else:
+                    outputs[name] = fn(frames)
+            return outputs
+
+        futures = {}
+        for name, fn in stages.items():
+            if name in chained:
+                upstream = futures[source]
+                futures[name] = self.executor.submit(
+                    lambda fn=fn, upstream=upstream: fn(frames, objects_of(upstream.result()))
+                )
+            else:
+                futures[name] = self.executor.submit(fn, frames)
+        return {name: future.result() for name, future in futures.items()}
 
     def warmup(self):
         """Run dummy frames through models to initialise CUDA/weights."""
         print("Warming up models...")
         dummy = np.zeros((640, 640, 3), dtype=np.uint8)
         # One pass is enough to initialize kernels while keeping startup latency manageable.
-        self.process_frame(dummy)
+        # A throwaway stream keeps the dummy frame out of real tracker/cascade state.
+        self.process_frame(dummy, stream_id='__warmup__')
+        self.release_stream('__warmup__')
         print("Model warmup complete.")
 
 
@@ -512,79 +1041,171 @@ class UnifiedDetector:
 # ---------------------------------------------------------------------------
 
 class SimpleTracker:
-    def __init__(self):
-        self.tracks    = {}   # track_id -> bbox
-        self.next_id   = 0
-        self.max_age   = 30
-        self.track_age = {}   # track_id -> frames since last match
+    """
+    Centroid + IoU tracker.
+
+    Track state lives in preallocated NumPy arrays (grown by doubling).
+    Each update builds the detection × track IoU and centre-distance
+    matrices in one shot and solves the assignment globally with the
+    Hungarian algorithm (scipy), or a greedy best-score-first fallback.
+    A pair is admissible when IoU > 0.3, or when the centres are closer
+    than 0.8 × the track height; IoU matches always outrank
+    distance-only matches.
+    """
+
+    IOU_MATCH  = 0.3
+    DIST_MATCH = 0.8   # max centre distance as a fraction of track height
+
+    def __init__(self, capacity=64, id_counter=None):
+        self.next_id = 0
+        self.id_counter = id_counter   # shared itertools.count across streams (optional)
+        self.max_age = 30
+        self._boxes  = np.zeros((capacity, 4), dtype=np.float64)
+        self._ids    = np.zeros(capacity, dtype=np.int64)
+        self._ages   = np.zeros(capacity, dtype=np.int64)   # frames since last match
+        self._count  = 0
+
+    @property
+    def tracks(self):
+        """track_id -> bbox of the live tracks."""
+        n = self._count
+        return dict(zip(self._ids[:n].tolist(), self._boxes[:n].tolist()))
+
+    @property
+    def track_age(self):
+        """track_id -> frames since the track was last matched."""
+        n = self._count
+        return dict(zip(self._ids[:n].tolist(), self._ages[:n].tolist()))
 
     def update(self, detections):
         if not detections:
             self._increment_ages()
             return []
 
-        for det in detections:
-            det['center']   = self._get_center(det['bbox'])
+        boxes   = np.asarray([det['bbox'] for det in detections], dtype=np.float64).reshape(-1, 4)
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        for det, center in zip(detections, centers.tolist()):
+            det['center']   = center
             det['track_id'] = -1
 
-        matched_tracks = set()
+        n = self._count
+        matched = np.zeros(n, dtype=bool)
+        if n:
+            det_idx, trk_idx = self._associate(boxes, centers)
+            for d, t in zip(det_idx.tolist(), trk_idx.tolist()):
+                detections[d]['track_id'] = int(self._ids[t])
+            self._boxes[trk_idx] = boxes[det_idx]
+            matched[trk_idx] = True
+
+        ages = self._ages[:n]
+        ages[matched] = 0
+        ages[~matched] += 1
+        self._keep(ages <= self.max_age)
+
+        new = [i for i, det in enumerate(detections) if det['track_id'] == -1]
+        if new:
+            ids = self._append(boxes[new])
+            for i, tid in zip(new, ids):
+                detections[i]['track_id'] = tid
 
-        for det in detections:
-            best_iou, best_tid = 0, -1
+        return detections
 
-            for tid, track_box in self.tracks.items():
-                if tid in matched_tracks:
-                    continue
-                iou          = self._calculate_iou(det['bbox'], track_box)
-                track_center = self._get_center(track_box)
-                dist         = np.linalg.norm(
-                    np.array(det['center']) - np.array(track_center)
-                )
-                h = track_box[3] - track_box[1]
+    def _associate(self, boxes, centers):
+        """(detection indices, track indices) of the admissible optimal assignment."""
+        tracks = self._boxes[:self._count]
+        iou = _iou_matrix(boxes, tracks)
 
-                if (iou > 0.3 and iou > best_iou) or (iou <= 0.3 and dist < h * 0.8):
-                    best_iou = iou if iou > 0.3 else 0.31
-                    best_tid = tid
+        track_centers = (tracks[:, :2] + tracks[:, 2:]) / 2
+        dist  = np.linalg.norm(centers[:, None, :] - track_centers[None, :, :], axis=2)
+        reach = np.maximum(self.DIST_MATCH * (tracks[:, 3] - tracks[:, 1]), 1e-6)[None, :]
 
-            if best_tid != -1:
-                det['track_id']        = best_tid
-                self.tracks[best_tid]  = det['bbox']
-                self.track_age[best_tid] = 0
-                matched_tracks.add(best_tid)
-            else:
-                det['track_id']              = self.next_id
-                self.tracks[self.next_id]    = det['bbox']
-                self.track_age[self.next_id] = 0
-                self.next_id += 1
-
-        for tid in list(self.tracks.keys()):
-            if tid not in matched_tracks:
-                self.track_age[tid] += 1
-                if self.track_age[tid] > self.max_age:
-                    del self.tracks[tid]
-                    del self.track_age[tid]
+        # IoU pairs score in (1.3, 2]; distance-only pairs in (0, 1]; 0 = inadmissible
+        score = np.where(
+            iou > self.IOU_MATCH,
+            1.0 + iou,
+            np.where(dist < reach, 1.0 - dist / reach, 0.0),
+        )
 
-        return detections
+        if linear_sum_assignment is not None:
+            rows, cols = linear_sum_assignment(score, maximize=True)
+        else:
+            rows, cols = _greedy_assignment(score)
+        ok = score[rows, cols] > 0
+        return rows[ok], cols[ok]
+
+    def _append(self, boxes):
+        """Add new tracks for *boxes*; returns their ids."""
+        needed = self._count + len(boxes)
+        if needed > len(self._ids):
+            capacity = max(needed, 2 * len(self._ids))
+            self._boxes = np.resize(self._boxes, (capacity, 4))
+            self._ids   = np.resize(self._ids, capacity)
+            self._ages  = np.resize(self._ages, capacity)
+
+        if self.id_counter is not None:
+            ids = [next(self.id_counter) for _ in range(len(boxes))]
+        else:
+            ids = list(range(self.next_id, self.next_id + len(boxes)))
+        self.next_id = ids[-1] + 1
+
+        sl = slice(self._count, needed)
+        self._boxes[sl] = boxes
+        self._ids[sl]   = ids
+        self._ages[sl]  = 0
+        self._count = needed
+        return ids
+
+    def _keep(self, mask):
+        """Compact the live tracks down to those where *mask* is True."""
+        if mask.all():
+            return
+        kept = int(mask.sum())
+        n = self._count
+        self._boxes[:kept] = self._boxes[:n][mask]
+        self._ids[:kept]   = self._ids[:n][mask]
+        self._ages[:kept]  = self._ages[:n][mask]
+        self._count = kept
 
     def _increment_ages(self):
-        for tid in list(self.tracks.keys()):
-            self.track_age[tid] += 1
-            if self.track_age[tid] > self.max_age:
-                del self.tracks[tid]
-                del self.track_age[tid]
+        ages = self._ages[:self._count]
+        ages += 1
+        self._keep(ages <= self.max_age)
 
-    @staticmethod
-    def _get_center(bbox):
-        return [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2]
 
-    @staticmethod
-    def _calculate_iou(boxA, boxB):
-        xA = max(boxA[0], boxB[0]);  yA = max(boxA[1], boxB[1])
-        xB = min(boxA[2], boxB[2]);  yB = min(boxA[3], boxB[3])
-        interArea = max(0, xB - xA) * max(0, yB - yA)
-        boxAArea  = (boxA[2] - boxA[0]) * (boxA[3] - boxA[1])
-        boxBArea  = (boxB[2] - boxB[0]) * (boxB[3] - boxB[1])
-        return interArea / float(boxAArea + boxBArea - interArea + 1e-6)
+def _greedy_assignment(score):
+    """Best-score-first matching, used when scipy is unavailable."""
+    rows, cols = np.nonzero(score > 0)
+    order = np.argsort(-score[rows, cols], kind='stable')
+
+    used_rows = np.zeros(score.shape[0], dtype=bool)
+    used_cols = np.zeros(score.shape[1], dtype=bool)
+    keep = []
+    for k in order.tolist():
+        r, c = rows[k], cols[k]
+        if not used_rows[r] and not used_cols[c]:
+            used_rows[r] = used_cols[c] = True
+            keep.append(k)
+    keep = np.asarray(keep, dtype=np.int64)
+    return rows[keep], cols[keep]
+
+
+# ---------------------------------------------------------------------------
+# Per-stream detector state
+# ---------------------------------------------------------------------------
+
+_DEFAULT_STREAM = 'default'
+
+
+class StreamContext:
+    """Tracker and cascade state of one camera / session on a shared detector."""
+
+    def __init__(self, stream_id, tracker, cascade=None):
+        self.stream_id = stream_id
+        self.tracker   = tracker
+        self.cascade   = cascade
+        self.lock      = threading.Lock()   # frames of one stream run in order
+        self.last_used = time.monotonic()
+        self.frames    = 0
 
 
 # ---------------------------------------------------------------------------
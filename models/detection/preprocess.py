@@ -0,0 +1,107 @@
+"""
+Shared per-frame preprocessing for the detector's models.
+
+Every stage of UnifiedDetector used to hand the full-resolution BGR frame to
+Ultralytics, which letterboxed it again for each model. ``PreparedFrame``
+does the expensive part once per frame:
+
+* ``model_image`` — the frame resized (INTER_LINEAR, same rounding as
+  Ultralytics' LetterBox) so its long side equals the model input size.
+  Ultralytics' own letterbox then only pads it, and normalisation runs on
+  the inference device.
+* ``gray`` — grayscale of ``model_image``, used by the specialist
+  cascade's motion metric.
+* ``full_gray`` — grayscale of the frame itself, used by the blur check:
+  Laplacian variance depends on resolution (downscaling sharpens), so
+  ``BLUR_VARIANCE`` only holds at the frame's own resolution.
+
+Boxes and keypoints predicted on ``model_image`` are mapped back to frame
+coordinates with ``rescale_results``. Frames that are already small enough
+are passed through untouched.
+"""
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Boxes, Keypoints
+
+# Default Ultralytics inference size (imgsz) of every detector model.
+INFER_SIZE = 640
+
+# Laplacian variance below which a frame is flagged blurry (full resolution).
+BLUR_VARIANCE = 100.0
+
+
+class PreparedFrame:
+    """A frame plus the model-scale image and grayscale shared by every stage."""
+
+    __slots__ = ('image', 'model_image', 'scale', '_gray', '_full_gray')
+
+    def __init__(self, image, infer_size=INFER_SIZE):
+        self.image = image
+        h, w = image.shape[:2]
+        r = infer_size / max(h, w)
+        if r < 1.0:
+            size = (round(w * r), round(h * r))
+            self.model_image = cv2.resize(image, size, interpolation=cv2.INTER_LINEAR)
+            self.scale = (w / size[0], h / size[1])
+        else:
+            self.model_image = image
+            self.scale = None
+        self._gray = None
+        self._full_gray = None
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def gray(self):
+        """Grayscale of the model-scale image (computed on first use)."""
+        if self._gray is None:
+            img = self.model_image
+            self._gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def full_gray(self):
+        """Grayscale of the full-resolution frame (same array as gray when not downscaled)."""
+        if self.scale is None:
+            return self.gray
+        if self._full_gray is None:
+            img = self.image
+            self._full_gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return self._full_gray
+
+
+def prepare_frames(frames, infer_size=INFER_SIZE):
+    """Wrap raw frames in PreparedFrame (already prepared frames pass through)."""
+    return [f if isinstance(f, PreparedFrame) else PreparedFrame(f, infer_size) for f in frames]
+
+
+def is_blurry(gray, threshold=BLUR_VARIANCE):
+    """
+    Blur detection via Laplacian variance of a full-resolution grayscale image.
+    The float32 Laplacian of uint8 input is exact and meanStdDev accumulates
+    in double, so this matches the former CV_64F computation.
+    """
+    _, std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+    return float(std[0, 0]) ** 2 < threshold
+
+
+def rescale_results(results, scale, orig_shape):
+    """Map the boxes/keypoints of a model-scale Results back to frame coordinates."""
+    sx, sy = scale
+    with torch.inference_mode():
+        if results.boxes is not None:
+            data = results.boxes.data.clone()
+            data[:, [0, 2]] *= sx
+            data[:, [1, 3]] *= sy
+            results.boxes = Boxes(data, orig_shape)
+        if results.keypoints is not None:
+            data = results.keypoints.data.clone()
+            data[..., 0] *= sx
+            data[..., 1] *= sy
+            results.keypoints = Keypoints(data, orig_shape)
+    results.orig_shape = orig_shape
+    return results
@@ -1,3 +1,5 @@
+import threading
+
 import cv2
 import numpy as np
 
@@ -15,6 +17,8 @@ class PrivacyAnonymizer:
         except Exception as e:
             print(f"Error loading face cascade: {e}")
             self.face_cascade = None
+        # One CascadeClassifier is shared by the threads anonymizing live frames
+        self._cascade_lock = threading.Lock()
         
     def detect_faces(self, frame, poses=None):
         """Detect faces using YOLO keypoints (primary) or Haar (fallback)"""
@@ -55,9 +59,10 @@ class PrivacyAnonymizer:
         # 2. Add Haar detections if YOLO missed or wasn't provided
         if self.face_cascade is not None and not face_rects:
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            haar_faces = self.face_cascade.detectMultiScale(
-                gray, scaleFactor=1.2, minNeighbors=5, minSize=(30, 30)
-            )
+            with self._cascade_lock:
+                haar_faces = self.face_cascade.detectMultiScale(
+                    gray, scaleFactor=1.2, minNeighbors=5, minSize=(30, 30)
+                )
             for (x, y, w, h) in haar_faces:
                 # Apply padding to Haar too!
                 padding = h * 0.3 
@@ -1,145 +1,298 @@
+import itertools
 import numpy as np
+from collections import OrderedDict
 from sklearn.ensemble import IsolationForest
 import pickle
 import os
 
+from models.scoring.sequence import DetectionSequence
+
+# Columns of the feature matrix. Speeds are bbox-centre displacements (px/s)
+# of tracks seen in both the previous and the current frame.
+FEATURES = ('people', 'objects', 'x_variance', 'y_variance', 'pose_confidence', 'object_types',
+            'speed_mean', 'speed_max', 'speed_std')
+
+
+def _normalize(scores):
+    """Map IsolationForest.score_samples to 0-1 (0 = normal, 1 = anomaly)."""
+    # Isolation forest scores are typically around -0.5 to 0.5; rough heuristic
+    return np.clip(1 - (scores + 0.5) * 2, 0, 1)
+
+
+class _CameraState:
+    """Online model of one camera: reservoir sample of its features and the model fitted on it."""
+
+    __slots__ = ('model', 'reservoir', 'seen', 'since_fit', 'previous', 'rng')
+
+    def __init__(self, reservoir_size, seed):
+        self.model = None
+        self.reservoir = np.empty((reservoir_size, len(FEATURES)))
+        self.seen = 0
+        self.since_fit = 0
+        self.previous = None    # last frame, for track speeds
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, features):
+        """Reservoir sampling (algorithm R): every frame seen so far is kept with equal probability."""
+        size = len(self.reservoir)
+        if self.seen < size:
+            self.reservoir[self.seen] = features
+        else:
+            j = self.rng.integers(0, self.seen + 1)
+            if j < size:
+                self.reservoir[j] = features
+        self.seen += 1
+        self.since_fit += 1
+
+    def sample(self):
+        return self.reservoir[:min(self.seen, len(self.reservoir))]
+
+
 class AnomalyDetector:
     """
     Detect unusual patterns using unsupervised learning
     """
-    def __init__(self, model_path=None):
-        self.model = IsolationForest(
+    def __init__(self, model_path=None, fps=30, reservoir_size=2048, retrain_every=1024, min_samples=256,
+                 max_cameras=64):
+        """
+        Args:
+            model_path: pickled IsolationForest to load (optional)
+            fps: frame rate assumed for track speeds when frames have no timestamps
+            reservoir_size: frames kept per camera for online retraining (observe())
+            retrain_every: frames between refits of a camera's model, counted
+                from its first fit
+            min_samples: frames a camera must have seen before its first fit
+                (the first fit does not wait for retrain_every)
+            max_cameras: cameras with an online model (least recently seen dropped)
+        """
+        self.model = self._new_model()
+        self.is_trained = False
+        self.fps = fps
+        self.reservoir_size = reservoir_size
+        self.retrain_every = retrain_every
+        self.min_samples = min_samples
+        self.max_cameras = max_cameras
+        self._cameras = OrderedDict()
+        self._seeds = itertools.count(42)
+
+        if model_path and os.path.exists(model_path):
+            self.load_model(model_path)
+
+    @staticmethod
+    def _new_model():
+        return IsolationForest(
             contamination=0.1,  # Expect 10% anomalies
             random_state=42,
             n_estimators=100
         )
-        self.is_trained = False
-        
-        if model_path and os.path.exists(model_path):
-            self.load_model(model_path)
-    
-    def extract_features(self, detection_data):
+
+    def extract_features(self, detection_data, previous=None):
         """
         Extract feature vector from detection data
+
+        Track speeds need the previous frame; they are 0 without it.
+        Returns a (1, len(FEATURES)) array.
         """
-        features = []
-        
-        # Number of people
-        features.append(len(detection_data.get('poses', [])))
-        
-        # Number of objects
-        features.append(len(detection_data.get('objects', [])))
-        
-        # Spatial distribution (variance of positions)
-        if detection_data.get('poses'):
-            # Flatten lists of bboxes to get all coordinates
-            # But we need positions (centers)
-            # Assuming 'poses' has bbox
-            positions = []
-            for pose in detection_data['poses']:
-                bbox = pose['bbox'] 
-                # bbox is [x1, y1, x2, y2]
-                cx = (bbox[0] + bbox[2]) / 2
-                cy = (bbox[1] + bbox[3]) / 2
-                positions.append([cx, cy])
-            
-            positions = np.array(positions)
-            
-            if len(positions) > 1:
-                features.append(np.var(positions[:, 0]))  # X variance
-                features.append(np.var(positions[:, 1]))  # Y variance
-            else:
-                features.extend([0, 0])
-        else:
-            features.extend([0, 0])
-        
-        # Average confidence scores
-        if detection_data.get('poses'):
-            # poses[i]['confidence'] is a list of keypoint confidences
-            # We want overall pose confidence? or average keypoint conf
-            avg_conf = np.mean([
-                np.mean(pose['confidence'])
-                for pose in detection_data['poses']
-            ])
-            features.append(avg_conf)
-        else:
-            features.append(0)
-        
+        frames = [detection_data] if previous is None else [previous, detection_data]
+        return self.extract_features_batch(frames)[-1:]
+
+    def extract_features_batch(self, detections):
+        """
+        Feature matrix of a whole sequence of frames.
+
+        Args:
+            detections: detection dicts in frame order, or a DetectionSequence
+
+        Returns:
+            (N, len(FEATURES)) array, one row per frame (columns in FEATURES order)
+        """
+        if not isinstance(detections, DetectionSequence):
+            detections = DetectionSequence.from_detections(
+                [det if 'poses' in det else {**det, 'poses': []} for det in detections])
+        seq = detections
+        n_frames = len(seq)
+        X = np.zeros((n_frames, len(FEATURES)))
+        if not n_frames:
+            return X
+
+        # Number of people / objects
+        people = np.bincount(seq.pose_frame, minlength=n_frames)
+        X[:, 0] = people
+        X[:, 1] = np.bincount(seq.object_frame, minlength=n_frames)
+
+        # Spatial distribution (variance of bbox centres), frames with 2+ people
+        centers = seq.centers
+        has_bbox = ~np.isnan(centers).any(axis=1)
+        frame, centers = seq.pose_frame[has_bbox], centers[has_bbox]
+        count = np.bincount(frame, minlength=n_frames)
+        spread = count > 1
+        for col, axis in ((2, 0), (3, 1)):
+            mean = np.bincount(frame, centers[:, axis], minlength=n_frames)[frame] / count[frame]
+            var = np.bincount(frame, (centers[:, axis] - mean) ** 2, minlength=n_frames)
+            X[spread, col] = var[spread] / count[spread]
+
+        # Average confidence scores (mean keypoint confidence per pose, averaged)
+        has_people = people > 0
+        conf = np.bincount(seq.pose_frame, seq.conf_mean, minlength=n_frames)
+        X[has_people, 4] = conf[has_people] / people[has_people]
+
         # Object diversity (number of unique object types)
-        if detection_data.get('objects'):
-            unique_objects = len(set(
-                obj['class'] for obj in detection_data['objects']
-            ))
-            features.append(unique_objects)
-        else:
-            features.append(0)
-        
-        return np.array(features).reshape(1, -1)
-    
+        if len(seq.object_frame):
+            _, class_code = np.unique(seq.object_class, return_inverse=True)
+            pairs = np.unique(seq.object_frame * (class_code.max() + 1) + class_code)
+            X[:, 5] = np.bincount(pairs // (class_code.max() + 1), minlength=n_frames)
+
+        X[:, 6:9] = self._track_speeds(seq, has_bbox)
+        return X
+
+    def _track_speeds(self, seq, has_bbox):
+        """(N, 3) mean / max / std speed of the tracks seen in a frame and the one before."""
+        n_frames = len(seq)
+        out = np.zeros((n_frames, 3))
+        tracked = np.flatnonzero(has_bbox & (seq.track_ids >= 0))
+        order = tracked[np.lexsort((seq.pose_frame[tracked], seq.track_ids[tracked]))]
+        prev, cur = order[:-1], order[1:]
+        step = (seq.track_ids[prev] == seq.track_ids[cur]) & (seq.pose_frame[cur] - seq.pose_frame[prev] == 1)
+        prev, cur = prev[step], cur[step]
+        if not len(cur):
+            return out
+
+        frame = seq.pose_frame[cur]
+        dt = seq.timestamps[frame] - seq.timestamps[frame - 1]
+        dt = np.where(np.isfinite(dt) & (dt > 0), dt, 1.0 / self.fps)
+        centers = seq.centers
+        speed = np.hypot(*(centers[cur] - centers[prev]).T) / dt
+
+        count = np.bincount(frame, minlength=n_frames)
+        moving = count > 0
+        mean = np.bincount(frame, speed, minlength=n_frames)
+        mean[moving] /= count[moving]
+        peak = np.zeros(n_frames)
+        np.maximum.at(peak, frame, speed)
+        var = np.bincount(frame, (speed - mean[frame]) ** 2, minlength=n_frames)
+        var[moving] /= count[moving]
+        out[:, 0], out[:, 1], out[:, 2] = mean, peak, np.sqrt(var)
+        return out
+
     def train(self, detection_history):
         """
         Train on normal surveillance footage
-        
+
         Args:
-            detection_history: List of detection_data dicts
+            detection_history: List of detection_data dicts (in frame order)
+                or a DetectionSequence
         """
-        features_list = [
-            self.extract_features(data).flatten()
-            for data in detection_history
-        ]
-        
-        if not features_list:
+        if not len(detection_history):
             print("No data to train on!")
             return
-            
-        X = np.vstack(features_list)
+
+        X = self.extract_features_batch(detection_history)
         self.model.fit(X)
         self.is_trained = True
-        
-        print(f"Anomaly detector trained on {len(detection_history)} samples")
-    
-    def predict(self, detection_data):
+
+        print(f"Anomaly detector trained on {len(X)} samples")
+
+    def predict(self, detection_data, previous=None):
         """
         Predict if current frame is anomalous
-        
+
         Returns:
             is_anomaly (bool), anomaly_score (float 0 to 1)
         """
-        if not self.is_trained:
+        is_anomaly, scores = self.predict_batch(self.extract_features(detection_data, previous))
+        return bool(is_anomaly[0]), float(scores[0])
+
+    def predict_batch(self, detections):
+        """
+        Score many frames with one sklearn call.
+
+        Args:
+            detections: detection dicts in frame order, a DetectionSequence,
+                or an (N, len(FEATURES)) feature matrix
+
+        Returns:
+            is_anomaly (N,) bool, anomaly_score (N,) float 0 to 1
+        """
+        X = detections if isinstance(detections, np.ndarray) else self.extract_features_batch(detections)
+        return self._score(self.model if self.is_trained else None, X)
+
+    @staticmethod
+    def _score(model, X):
+        if model is None:
             # Not trained yet, assume normal
-            return False, 0.0
-        
-        features = self.extract_features(detection_data)
-        
-        # Predict (-1 for anomaly, 1 for normal)
-        prediction = self.model.predict(features)[0]
-        
-        # Get anomaly score (lower = more anomalous in raw sklearn, but score_samples returns negative offset)
-        # decision_function returns negative for outliers, positive for inliers.
-        # score_samples returns anomaly score. 
-        # For IsolationForest, "The lower, the more abnormal." (closer to -1?)
-        # Read docs: "The anomaly score of the input samples. The lower, the more abnormal."
-        score = self.model.score_samples(features)[0]
-        
-        is_anomaly = (prediction == -1)
-        
-        # Normalize score to 0-1 (0 = normal, 1 = anomaly)
-        # Isolation forest scores are typically around -0.5 to 0.5
-        # We can just map it roughly or Use decision function
-        
-        normalized_score = max(0, min(1, 1 - (score + 0.5)*2 )) # Rough heuristic
-        
-        return is_anomaly, normalized_score
-    
+            return np.zeros(len(X), dtype=bool), np.zeros(len(X))
+        # score_samples: "The lower, the more abnormal." predict() is -1 where
+        # score_samples - offset_ < 0, so both come from one call.
+        raw = model.score_samples(X)
+        return raw < model.offset_, _normalize(raw)
+
+    def observe(self, detection_data, camera_id=None):
+        """
+        Score a live frame against its camera's own model, then learn from it.
+
+        Each camera keeps a reservoir sample of reservoir_size frames out of
+        everything it has seen, fits its model on it once min_samples frames
+        have been seen and refits every retrain_every frames after that, so
+        memory stays bounded however long the camera runs. Until its first
+        fit a camera is scored with the trained global model, if any.
+
+        Fits run synchronously in the observing call: an IsolationForest of
+        100 trees (256 rows subsampled per tree, so roughly the same for any
+        reservoir_size) takes about 0.25 s on one CPU core, so the frame that
+        triggers it is that much late. Call from a worker thread, not the
+        event loop.
+
+        Returns:
+            is_anomaly (bool), anomaly_score (float 0 to 1)
+        """
+        state = self._camera(camera_id)
+        features = self.extract_features(detection_data, state.previous)
+        state.previous = detection_data
+
+        model = state.model if state.model is not None else (self.model if self.is_trained else None)
+        is_anomaly, scores = self._score(model, features)
+
+        state.add(features[0])
+        if state.model is None:
+            due = state.seen >= self.min_samples
+        else:
+            due = state.since_fit >= self.retrain_every
+        if due:
+            state.model = self._new_model().fit(state.sample())
+            state.since_fit = 0
+        return bool(is_anomaly[0]), float(scores[0])
+
+    def camera_stats(self):
+        """Per camera: frames seen, reservoir fill and whether it has its own model."""
+        return {
+            cam: {'seen': s.seen, 'reservoir': len(s.sample()), 'fitted': s.model is not None}
+            for cam, s in self._cameras.items()
+        }
+
+    def _camera(self, camera_id):
+        state = self._cameras.get(camera_id)
+        if state is None:
+            state = self._cameras[camera_id] = _CameraState(self.reservoir_size, seed=next(self._seeds))
+            while len(self._cameras) > self.max_cameras:
+                self._cameras.popitem(last=False)
+        else:
+            self._cameras.move_to_end(camera_id)
+        return state
+
     def save_model(self, path):
         """Save trained model"""
         with open(path, 'wb') as f:
             pickle.dump(self.model, f)
         print(f"Model saved to {path}")
-    
+
     def load_model(self, path):
         """Load trained model"""
         with open(path, 'rb') as f:
-            self.model = pickle.load(f)
+            model = pickle.load(f)
+        n_features = getattr(model, 'n_features_in_', len(FEATURES))
+        if n_features != len(FEATURES):
+            raise ValueError(f"Model at {path} expects {n_features} features, "
+                             f"AnomalyDetector extracts {len(FEATURES)}; retrain it")
+        self.model = model
         self.is_trained = True
         print(f"Model loaded from {path}")
@@ -0,0 +1,154 @@
+"""
+Per-camera crowd baselines for RiskScoringEngine.
+
+The engine's calibration phase learns crowd_limit from the first 30 seconds
+after every start and scores nothing but fire/weapons meanwhile. A
+``CrowdBaseline`` remembers instead what a camera normally sees: a 24-bin
+hour-of-day histogram of the number of people in frame, each bin an
+exponentially decayed mean
+
+    weight <- weight * 0.5 ** (dt / half_life) + 1
+    mean   <- mean + (count - mean) / weight
+
+where dt is the time since the bin was last updated. An update is O(1),
+early samples are not biased towards zero, and a bin forgets what it saw
+with the given half-life, so the baseline follows slow changes in how busy
+a place is.
+
+A bin is trusted once its decayed weight reaches ``min_samples``; until
+then the camera's whole-day mean is used if that has enough weight. The
+``BaselineStore`` keeps one baseline per camera and tracks which ones
+changed, so backend/services/baseline_service.py can persist them and load
+them on the next start, when the engine skips calibration for cameras it
+already knows.
+"""
+
+import threading
+from collections import OrderedDict
+
+HOURS = 24
+DEFAULT_CAMERA = 'default'
+SECONDS_PER_DAY = 86400.0
+
+
+class CrowdBaseline:
+    """Hour-of-day histogram of crowd size with exponentially decayed bins."""
+
+    __slots__ = ('mean', 'weight', 'updated')
+
+    def __init__(self):
+        self.mean = [0.0] * HOURS
+        self.weight = [0.0] * HOURS
+        self.updated = [None] * HOURS    # timestamp of each bin's last sample
+
+    def update(self, hour, count, timestamp, half_life):
+        """Add one frame with *count* people, seen at *timestamp* (seconds)."""
+        weight = self._decayed(hour, timestamp, half_life) + 1.0
+        self.mean[hour] += (count - self.mean[hour]) / weight
+        self.weight[hour] = weight
+        if self.updated[hour] is None or timestamp > self.updated[hour]:
+            self.updated[hour] = timestamp
+
+    def expected(self, hour, timestamp, half_life, min_samples):
+        """Usual crowd size at *hour*, or None while the baseline has too few samples."""
+        weight = self._decayed(hour, timestamp, half_life)
+        if weight >= min_samples:
+            return self.mean[hour]
+        total = mean = 0.0
+        for h in range(HOURS):
+            w = self._decayed(h, timestamp, half_life)
+            total += w
+            mean += w * self.mean[h]
+        return mean / total if total >= min_samples else None
+
+    def _decayed(self, hour, timestamp, half_life):
+        weight, updated = self.weight[hour], self.updated[hour]
+        if weight and updated is not None and timestamp > updated:
+            weight *= 0.5 ** ((timestamp - updated) / half_life)
+        return weight
+
+    def to_dict(self):
+        return {'mean': list(self.mean), 'weight': list(self.weight), 'updated': list(self.updated)}
+
+    @classmethod
+    def from_dict(cls, data):
+        for name in cls.__slots__:
+            if len(data.get(name) or []) != HOURS:
+                raise ValueError(f"Crowd baseline '{name}' needs {HOURS} values")
+        baseline = cls()
+        baseline.mean = [float(v) for v in data['mean']]
+        baseline.weight = [float(v) for v in data['weight']]
+        baseline.updated = [None if v is None else float(v) for v in data['updated']]
+        return baseline
+
+
+class BaselineStore:
+    """Crowd baselines of every camera, plus which of them changed since the last drain."""
+
+    def __init__(self, half_life_days=7.0, min_samples=300, max_cameras=256):
+        """
+        Args:
+            half_life_days: days after which a sample counts half
+            min_samples: decayed sample weight a bin (or the whole day)
+                needs before its mean is used
+            max_cameras: baselines kept in memory (least recently seen are dropped)
+        """
+        if half_life_days <= 0:
+            raise ValueError(f"half_life_days must be positive, got {half_life_days}")
+        self.half_life = float(half_life_days) * SECONDS_PER_DAY
+        self.min_samples = float(min_samples)
+        self.max_cameras = max_cameras
+        self._lock = threading.Lock()
+        self._baselines = OrderedDict()
+        self._dirty = set()
+
+    def update(self, camera_id, hour, count, timestamp):
+        camera_id = DEFAULT_CAMERA if camera_id is None else camera_id
+        with self._lock:
+            baseline = self._baselines.get(camera_id)
+            if baseline is None:
+                baseline = self._baselines[camera_id] = CrowdBaseline()
+                while len(self._baselines) > self.max_cameras:
+                    dropped, _ = self._baselines.popitem(last=False)
+                    self._dirty.discard(dropped)
+            else:
+                self._baselines.move_to_end(camera_id)
+            baseline.update(hour, count, timestamp, self.half_life)
+            self._dirty.add(camera_id)
+
+    def expected(self, camera_id, hour, timestamp):
+        """Usual crowd size of *camera_id* at *hour*, or None if not known yet."""
+        camera_id = DEFAULT_CAMERA if camera_id is None else camera_id
+        with self._lock:
+            baseline = self._baselines.get(camera_id)
+            if baseline is None:
+                return None
+            return baseline.expected(hour, timestamp, self.half_life, self.min_samples)
+
+    def load(self, camera_id, data):
+        """Install a persisted baseline (CrowdBaseline.to_dict() output)."""
+        baseline = CrowdBaseline.from_dict(data)
+        with self._lock:
+            self._baselines[camera_id] = baseline
+            self._baselines.move_to_end(camera_id)
+            self._dirty.discard(camera_id)
+
+    def drain_dirty(self):
+        """{camera_id: baseline dict} of the baselines changed since the last call."""
+        with self._lock:
+            changed = {cam: self._baselines[cam].to_dict() for cam in self._dirty if cam in self._baselines}
+            self._dirty.clear()
+        return changed
+
+    def mark_dirty(self, camera_ids):
+        """Re-queue baselines whose save failed."""
+        with self._lock:
+            self._dirty.update(cam for cam in camera_ids if cam in self._baselines)
+
+    def snapshot(self):
+        """Per camera: the decayed-mean crowd size and sample weight of each hour."""
+        with self._lock:
+            return {
+                cam: {'mean': list(b.mean), 'weight': list(b.weight)}
+                for cam, b in self._baselines.items()
+            }
@@ -0,0 +1,80 @@
+"""
+One RiskScoringEngine per live camera.
+
+Everything a RiskScoringEngine remembers between frames belongs to one
+scene: track histories, the calibration phase (start time, crowd samples,
+crowd_limit) and the risk window whose mean is the returned score. Shared
+by several cameras, a fight on one camera would be averaged down by the
+calm frames of another, and a camera connecting after the first 30 s would
+never calibrate. ``CameraEngines`` keeps an engine per camera id instead,
+made with ``RiskScoringEngine.camera_engine()`` so all of them share the
+template engine's thresholds, weights, diagnostics and crowd baselines.
+
+At most ``max_cameras`` engines are kept; the least recently scored camera
+is dropped first (it starts over, calibration included, if it comes back).
+Frames of one camera are scored one at a time, different cameras in
+parallel.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class CameraEngines:
+    """LRU-bounded {camera_id: RiskScoringEngine} made from a template engine."""
+
+    def __init__(self, template, max_cameras=64):
+        if max_cameras < 1:
+            raise ValueError(f"max_cameras must be at least 1, got {max_cameras}")
+        self.template = template
+        self.max_cameras = max_cameras
+        self._lock = threading.Lock()
+        self._engines = OrderedDict()    # {camera_id: (engine, lock)}
+        self._evicted = 0
+
+    def engine(self, camera_id):
+        """The engine of *camera_id*, created on first use."""
+        return self._entry(camera_id)[0]
+
+    def calculate_risk(self, detection, context=None, camera_id=None):
+        """RiskScoringEngine.calculate_risk on the camera's own engine."""
+        engine, lock = self._entry(camera_id)
+        with lock:
+            return engine.calculate_risk(detection, context, camera_id=camera_id)
+
+    def release(self, camera_id):
+        """Forget a camera's scoring state."""
+        with self._lock:
+            self._engines.pop(camera_id, None)
+
+    def memory_stats(self):
+        """Cameras held, and the summed per-track state of their engines."""
+        with self._lock:
+            engines = [engine for engine, _ in self._engines.values()]
+            evicted = self._evicted
+        stats = {'cameras': len(engines), 'max_cameras': self.max_cameras, 'evicted_cameras': evicted}
+        for engine in engines:
+            for key, value in engine.memory_stats().items():
+                if key not in ('max_tracks', 'track_max_age'):
+                    stats[key] = stats.get(key, 0) + value
+        return stats
+
+    def __len__(self):
+        with self._lock:
+            return len(self._engines)
+
+    def __contains__(self, camera_id):
+        with self._lock:
+            return camera_id in self._engines
+
+    def _entry(self, camera_id):
+        with self._lock:
+            entry = self._engines.get(camera_id)
+            if entry is None:
+                entry = self._engines[camera_id] = (self.template.camera_engine(), threading.Lock())
+                while len(self._engines) > self.max_cameras:
+                    self._engines.popitem(last=False)
+                    self._evicted += 1
+            else:
+                self._engines.move_to_end(camera_id)
+            return entry
@@ -0,0 +1,188 @@
+"""
+Structured, rate-limited diagnostics for RiskScoringEngine.
+
+The engine used to print a DEBUG line for every frame that escalated,
+grappled, hit a contradiction or was blurry, and the live stream printed
+one line per scored frame. ``ScoringDiagnostics`` replaces those prints:
+
+    counters   per camera: frames scored, score mean / max, how often each
+               event fired, and per factor the frames it was active in
+               plus its mean / max. Always kept, read with snapshot().
+    log lines  optional. An event is logged on its 1st, (1 + n)th, ...
+               occurrence per camera (sample_every = n) and at most
+               max_per_second times per second per camera and event.
+               Messages are %-format strings plus arguments and are only
+               formatted when a line is actually written, so a disabled
+               log costs a counter increment.
+
+Cameras are kept in least-recently-seen order and capped at max_cameras.
+All engines share the module-level ``scoring_diagnostics`` unless given
+their own; MLService configures it from config.py.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+
+DEFAULT_CAMERA = 'default'
+
+
+class _CameraStats:
+    __slots__ = ('frames', 'score_sum', 'score_max', 'events', 'active', 'factor_sum', 'factor_max',
+                 'logged', 'dropped', 'buckets', 'last_seen')
+
+    def __init__(self):
+        self.frames = 0
+        self.score_sum = 0.0
+        self.score_max = 0.0
+        self.events = Counter()
+        self.active = Counter()
+        self.factor_sum = Counter()
+        self.factor_max = {}
+        self.logged = 0
+        self.dropped = 0
+        self.buckets = {}   # {event: [tokens, last refill]}
+        self.last_seen = None
+
+
+class ScoringDiagnostics:
+    """Per-camera scoring counters plus a sampled, rate-limited log."""
+
+    def __init__(self, log=True, sample_every=1, max_per_second=1.0, log_frames=False,
+                 max_cameras=256, sink=print, clock=time.monotonic):
+        """
+        Args:
+            log: write log lines at all (counters are kept either way)
+            sample_every: log every n-th occurrence of an event per camera
+            max_per_second: log lines per second per camera and event
+            log_frames: also log a per-frame score summary (event 'frame')
+            max_cameras: cameras whose counters are kept
+            sink: callable receiving each log line
+            clock: monotonic clock used for rate limiting
+        """
+        self._lock = threading.Lock()
+        self._cameras = OrderedDict()
+        self.max_cameras = max_cameras
+        self.sink = sink
+        self.clock = clock
+        self.configure(log=log, sample_every=sample_every, max_per_second=max_per_second, log_frames=log_frames)
+
+    def configure(self, log=None, sample_every=None, max_per_second=None, log_frames=None):
+        """Change log settings; counters are kept."""
+        if log is not None:
+            self.log = bool(log)
+        if sample_every is not None:
+            self.sample_every = max(1, int(sample_every))
+        if max_per_second is not None:
+            self.max_per_second = max(0.0, float(max_per_second))
+        if log_frames is not None:
+            self.log_frames = bool(log_frames)
+
+    def event(self, camera_id, name, message='', *args):
+        """Count event *name* for *camera_id*; log ``message % args`` if sampled and within the rate."""
+        with self._lock:
+            stats = self._stats(camera_id)
+            stats.events[name] += 1
+            if not self.log or not self._admit(stats, name, stats.events[name]):
+                return
+        self._write(camera_id, name, message, args)
+
+    def record_frame(self, camera_id, score, factors):
+        """Count a scored frame: score (0-100) and factor values."""
+        with self._lock:
+            stats = self._stats(camera_id)
+            stats.frames += 1
+            stats.score_sum += score
+            if score > stats.score_max:
+                stats.score_max = score
+            for name, value in factors.items():
+                if not value:
+                    continue
+                stats.active[name] += 1
+                stats.factor_sum[name] += value
+                if value > stats.factor_max.get(name, 0.0):
+                    stats.factor_max[name] = value
+            if not (self.log and self.log_frames and self._admit(stats, 'frame', stats.frames)):
+                return
+        self._write(camera_id, 'frame', 'score=%.1f active=%s', (score, sorted(k for k, v in factors.items() if v)))
+
+    def snapshot(self, camera_id=None):
+        """Counters of every camera (or one), plus the log settings."""
+        with self._lock:
+            cameras = {cam: self._camera_snapshot(stats) for cam, stats in self._cameras.items()
+                       if camera_id is None or cam == camera_id}
+            return {
+                'log': {
+                    'enabled': self.log,
+                    'sample_every': self.sample_every,
+                    'max_per_second': self.max_per_second,
+                    'log_frames': self.log_frames,
+                },
+                'cameras': cameras,
+            }
+
+    def reset(self, camera_id=None):
+        with self._lock:
+            if camera_id is None:
+                self._cameras.clear()
+            else:
+                self._cameras.pop(camera_id, None)
+
+    def _stats(self, camera_id):
+        camera_id = DEFAULT_CAMERA if camera_id is None else camera_id
+        stats = self._cameras.get(camera_id)
+        if stats is None:
+            stats = self._cameras[camera_id] = _CameraStats()
+            while len(self._cameras) > self.max_cameras:
+                self._cameras.popitem(last=False)
+        else:
+            self._cameras.move_to_end(camera_id)
+        stats.last_seen = time.time()
+        return stats
+
+    def _admit(self, stats, name, occurrence):
+        """Sampling, then a token bucket per camera and event (burst of one second)."""
+        if (occurrence - 1) % self.sample_every:
+            return False
+        now = self.clock()
+        rate = self.max_per_second
+        bucket = stats.buckets.get(name)
+        if bucket is None:
+            bucket = stats.buckets[name] = [max(1.0, rate), now]
+        else:
+            bucket[0] = min(max(1.0, rate), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] < 1.0:
+            stats.dropped += 1
+            return False
+        bucket[0] -= 1.0
+        stats.logged += 1
+        return True
+
+    def _write(self, camera_id, name, message, args):
+        text = message % args if args else message
+        camera = DEFAULT_CAMERA if camera_id is None else camera_id
+        self.sink(f"[ScoringDiag] camera={camera} {name}" + (f": {text}" if text else ""))
+
+    @staticmethod
+    def _camera_snapshot(stats):
+        return {
+            'frames': stats.frames,
+            'score_mean': stats.score_sum / stats.frames if stats.frames else 0.0,
+            'score_max': stats.score_max,
+            'events': dict(stats.events),
+            'factors': {
+                name: {
+                    'active_frames': count,
+                    'mean_when_active': stats.factor_sum[name] / count,
+                    'max': stats.factor_max.get(name, 0.0),
+                }
+                for name, count in stats.active.items()
+            },
+            'log_lines': stats.logged,
+            'log_dropped': stats.dropped,
+            'last_seen': stats.last_seen,
+        }
+
+
+scoring_diagnostics = ScoringDiagnostics()
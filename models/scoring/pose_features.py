@@ -0,0 +1,225 @@
+"""
+Struct-of-arrays view of a frame's poses for RiskScoringEngine.
+
+The detector hands the engine one dict per person with nested keypoint
+lists. ``PoseBatch`` converts them once per frame into:
+
+    keypoints  (N, 17, 3)  x, y, keypoint confidence (zero-padded)
+    bboxes     (N, 4)      x1, y1, x2, y2 (NaN when a pose has no bbox)
+    heights    (N,)        bbox height, 100 when a pose has no bbox
+
+``near_pairs`` lists the person pairs the pairwise factors (proximity,
+grappling) have to look at, with their bbox-centre distances. In crowds it
+sorts the centres along one axis and only pairs persons within reach of
+each other (``grid_pairs``), so far-apart pairs are never generated. ``features`` holds per-frame values
+the engine derives from the batch (aggression, strike indicators), so each
+is computed once.
+
+``posture_masks`` then evaluates the posture features used by aggression
+scoring (raised wrists, wide stance, hands near head, extended arms) for
+all persons at once.
+"""
+
+import numpy as np
+
+N_KEYPOINTS = 17
+
+# YOLO pose keypoint indices
+NOSE = 0
+L_SHOULDER, R_SHOULDER = 5, 6
+L_WRIST, R_WRIST = 9, 10
+L_ANKLE, R_ANKLE = 15, 16
+
+DEFAULT_HEIGHT = 100.0   # person height assumed when a pose has no bbox
+
+# Below this many persons all pairs are checked densely (measured to be
+# cheaper than the sorted search of grid_pairs)
+GRID_MIN_PERSONS = 40
+
+_NO_PAIRS = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+
+class PoseBatch:
+    """Per-frame keypoint / bbox arrays built from the detector's pose dicts."""
+
+    def __init__(self, poses):
+        n = len(poses)
+        self.poses = poses
+        self.track_ids = [p.get('track_id') for p in poses]
+        self.keypoints = np.zeros((n, N_KEYPOINTS, 3), dtype=np.float64)
+        self.n_keypoints = np.zeros(n, dtype=np.int64)
+        self.conf_mean = np.zeros(n, dtype=np.float64)
+        self.bboxes = np.full((n, 4), np.nan, dtype=np.float64)
+        self.features = {}
+        self._near_pairs = {}
+
+        if n and not self._fill_regular(poses):
+            self._fill_irregular(poses)
+
+        has_bbox = np.array(['bbox' in p for p in poses], dtype=bool)
+        if has_bbox.any():
+            self.bboxes[has_bbox] = np.array([p['bbox'] for p in poses if 'bbox' in p], dtype=np.float64)
+        self.heights = np.where(has_bbox, self.bboxes[:, 3] - self.bboxes[:, 1], DEFAULT_HEIGHT)
+
+    def __len__(self):
+        return len(self.poses)
+
+    @property
+    def xy(self):
+        return self.keypoints[..., :2]
+
+    @property
+    def conf(self):
+        return self.keypoints[..., 2]
+
+    @property
+    def centers(self):
+        """(N, 2) bbox centres."""
+        return (self.bboxes[:, :2] + self.bboxes[:, 2:]) / 2
+
+    def pair_distances(self, i, j):
+        """Euclidean distances between the bbox centres of persons i[k] and j[k]."""
+        c = self.centers
+        d = c[i] - c[j]
+        return np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1])
+
+    def near_pairs(self, radius_factor):
+        """
+        (i, j, dist) of the pairs, i < j in row-major order, whose centres may
+        be closer than *radius_factor* x their average height.
+
+        This is a superset of the pairs passing that gate (callers still
+        apply the exact test), so no qualifying pair is ever dropped. Cached
+        per *radius_factor*.
+        """
+        if radius_factor not in self._near_pairs:
+            i, j = candidate_pairs(self.centers, self.heights, radius_factor)
+            self._near_pairs[radius_factor] = (i, j, self.pair_distances(i, j))
+        return self._near_pairs[radius_factor]
+
+    @property
+    def tracked(self):
+        """Mask of poses with a usable track id."""
+        return np.array([('track_id' in p and p['track_id'] != -1) for p in self.poses], dtype=bool)
+
+    def _fill_regular(self, poses):
+        """Fast path: every pose has 17 (x, y) keypoints and 17 confidences."""
+        try:
+            xy = np.asarray([p['keypoints'] for p in poses], dtype=np.float64)
+            conf = np.asarray([p['confidence'] for p in poses], dtype=np.float64)
+        except (ValueError, TypeError):
+            return False
+        if xy.shape[1:] != (N_KEYPOINTS, 2) or conf.shape[1:] != (N_KEYPOINTS,):
+            return False
+        self.keypoints[..., :2] = xy
+        self.keypoints[..., 2] = conf
+        self.n_keypoints[:] = N_KEYPOINTS
+        self.conf_mean[:] = conf.mean(axis=1)
+        return True
+
+    def _fill_irregular(self, poses):
+        for i, pose in enumerate(poses):
+            kpts = np.asarray(pose['keypoints'], dtype=np.float64)
+            kpts = kpts[:, :2] if kpts.ndim == 2 else np.zeros((0, 2))
+            conf = np.asarray(pose['confidence'], dtype=np.float64)
+            k = min(len(kpts), N_KEYPOINTS)
+            self.keypoints[i, :k, :2] = kpts[:k]
+            self.keypoints[i, :min(conf.size, N_KEYPOINTS), 2] = conf.ravel()[:N_KEYPOINTS]
+            self.n_keypoints[i] = len(kpts)
+            self.conf_mean[i] = conf.mean() if conf.size else np.nan
+
+
+def candidate_pairs(centers, heights, radius_factor):
+    """
+    (i, j), i < j in row-major order, of the persons whose (N, 2) centres
+    may be closer than *radius_factor* x their average height: every pair
+    below GRID_MIN_PERSONS persons, otherwise grid_pairs().
+    """
+    if len(centers) < GRID_MIN_PERSONS:
+        return np.triu_indices(len(centers), 1)
+    return grid_pairs(centers, heights, radius_factor)
+
+
+def grid_pairs(centers, heights, radius_factor):
+    """
+    (i, j), i < j in row-major order, of the persons whose (N, 2) centres
+    may be closer than *radius_factor* x their average height.
+
+    The centres are sorted along the image's longer axis and each is paired
+    with the ones less than the gate's reach ahead of it (a one-dimensional
+    grid with cells as wide as that reach), then pairs further apart than
+    the reach on the other axis are dropped. See PoseBatch.near_pairs.
+    """
+    valid = np.flatnonzero(np.isfinite(centers).all(axis=1) & np.isfinite(heights))
+    n = len(valid)
+    if n < 2:
+        return _NO_PAIRS
+
+    # Two persons can only pass the gate when their centres are closer
+    # than radius_factor x the tallest height.
+    reach = radius_factor * heights[valid].max()
+    if reach <= 0:
+        return _NO_PAIRS
+    xy = centers[valid]
+    axis = int(np.ptp(xy[:, 1]) > np.ptp(xy[:, 0]))
+    order = np.argsort(xy[:, axis], kind='stable')
+    along, across = xy[order, axis], xy[order, 1 - axis]
+
+    # Partners of sorted person k: positions k + 1 .. end[k] - 1, all
+    # generated at once as runs of consecutive positions.
+    end = np.searchsorted(along, along + reach, side='right')
+    counts = end - np.arange(1, n + 1)
+    total = int(counts.sum())
+    if not total:
+        return _NO_PAIRS
+    first = np.repeat(np.arange(n), counts)
+    second = np.arange(total) + np.repeat(np.arange(1, n + 1) - (np.cumsum(counts) - counts), counts)
+    keep = np.abs(across[first] - across[second]) <= reach
+
+    found_i, found_j = valid[order[first[keep]]], valid[order[second[keep]]]
+    i, j = np.minimum(found_i, found_j), np.maximum(found_i, found_j)
+    order = np.lexsort((j, i))
+    return i[order], j[order]
+
+
+def planar_norm(d):
+    """
+    Length of (..., 2) vectors as sqrt(x*x + y*y).
+
+    Used instead of np.linalg.norm wherever per-frame and whole-sequence
+    scoring must agree bit for bit (BLAS dot products may round differently).
+    """
+    d = np.asarray(d, dtype=np.float64)
+    return np.sqrt(d[..., 0] * d[..., 0] + d[..., 1] * d[..., 1])
+
+
+def _dist(a, b):
+    """Row-wise Euclidean distance of (N, 2) arrays."""
+    return planar_norm(a - b)
+
+
+def posture_masks(batch):
+    """
+    Boolean (N,) posture features of every person in *batch*.
+
+    ``eligible`` marks poses with enough keypoints (>= 11) and a mean
+    keypoint confidence of at least 0.35; the other masks are only
+    meaningful where it is set.
+    """
+    xy, h = batch.xy, batch.heights
+
+    has_ankles = batch.n_keypoints > R_ANKLE
+    ankle_dist = np.where(has_ankles, np.abs(xy[:, L_ANKLE, 0] - xy[:, R_ANKLE, 0]), 0.0)
+
+    near_head = h * 0.25
+    arm_reach = h * 0.4
+    return {
+        'eligible':        (batch.n_keypoints >= 11) & ~(batch.conf_mean < 0.35),
+        'wide_stance':     ankle_dist > h * 0.3,
+        'left_wrist_up':   xy[:, L_WRIST, 1] < xy[:, L_SHOULDER, 1],
+        'right_wrist_up':  xy[:, R_WRIST, 1] < xy[:, R_SHOULDER, 1],
+        'hands_near_head': (_dist(xy[:, L_WRIST], xy[:, NOSE]) < near_head)
+                           | (_dist(xy[:, R_WRIST], xy[:, NOSE]) < near_head),
+        'left_arm_ext':    _dist(xy[:, L_WRIST], xy[:, L_SHOULDER]) > arm_reach,
+        'right_arm_ext':   _dist(xy[:, R_WRIST], xy[:, R_SHOULDER]) > arm_reach,
+    }
@@ -1,17 +1,45 @@
 import numpy as np
-from collections import deque, defaultdict
+from collections import OrderedDict, defaultdict
 import math
+import operator
+import time
 import yaml
 import os
 from pathlib import Path
 
+from models.scoring.diagnostics import scoring_diagnostics
+from models.scoring.pose_features import (
+    L_ANKLE, L_WRIST, N_KEYPOINTS, R_ANKLE, R_WRIST, PoseBatch, candidate_pairs, planar_norm,
+    posture_masks,
+)
+from models.scoring.sequence import DetectionSequence, SegmentRows, frame_pairs, track_segments
+from models.scoring.track_history import LEFT, RIGHT, KeypointTrack, RiskWindow, TrackRing
+
+# Samples kept per track: positions (10 seconds at 30fps) and wrist/ankle keypoints
+_POSITION_SAMPLES = 300
+_KEYPOINT_SAMPLES = 10
+
+# Factors in the order calculate_risk() adds them (and sums the weighted score)
+_FACTOR_ORDER = ('weapon_detection', 'aggressive_posture', 'fire_smoke', 'proximity_violation',
+                 'loitering', 'unattended_object', 'crowd_density', 'contextual')
+_WEAPON_CLASSES = ['knife', 'baseball bat', 'scissors']
+_BAG_CLASSES = ['backpack', 'suitcase', 'handbag']
+
+
+# A chase needs mag_to < 0.7 * |s1 - s2| <= 0.7 * (e1 + mag_to + e2), e being
+# how far each person moved since the start of their history, so
+# mag_to < 7/3 * (e1 + e2): a pair gate on e with radius factor 14/3,
+# rounded up so float rounding cannot drop a pair
+_CHASE_RADIUS = 5.0
+
 class RiskScoringEngine:
     """
     Advanced Multi-Factor Risk Scoring Engine
     Combines behavioral signals, context, and temporal tracking
     to calculate a unified threat score.
     """
-    def __init__(self, fps=30, bypass_calibration=False, config_path=None):
+    def __init__(self, fps=30, bypass_calibration=False, config_path=None, track_max_age=None, diagnostics=None,
+                 baselines=None, thresholds=None):
         """
         Initialize Risk Scoring Engine.
         
@@ -19,13 +47,31 @@ class RiskScoringEngine:
             fps: Frames per second of video
             bypass_calibration: Skip calibration phase
             config_path: Path to YAML config file (optional)
+            track_max_age: Frames a track may go unseen before its history is
+                evicted (optional; pass the tracker's max_age, defaults to
+                history.track_max_age from the config)
+            diagnostics: ScoringDiagnostics receiving escalation events and
+                per-frame counters (defaults to the shared scoring_diagnostics)
+            baselines: BaselineStore of per-camera crowd baselines (optional).
+                When given, every frame updates its camera's baseline, and
+                a camera with a known baseline gets its crowd_limit from it
+                and skips the calibration phase (other cameras still go
+                through it)
+            thresholds: threshold dict to use as is, shared with the engine
+                that passes it (see camera_engine()); config_path and
+                track_max_age are then ignored
         """
-        # Track person positions over time for behavior analysis
-        self.person_history = defaultdict(lambda: deque(maxlen=300))  # 10 seconds at 30fps
-        self.person_last_seen = {} # {tid: timestamp}
+        # Track person positions over time for behavior analysis:
+        # {tid: TrackRing of (x, y, t)}, 10 seconds at 30fps
+        self.person_history = {}
+        # {tid: (frame index, timestamp)} in least-recently-seen order
+        self.person_last_seen = OrderedDict()
+        self._frame_index = 0
+        self._evicted_tracks = 0
         
         # Track risk scores for temporal validation (enhanced: 20-frame window)
-        self.risk_history = deque(maxlen=20)
+        # with the count above 0.4 and the mean kept up to date on append
+        self.risk_history = RiskWindow(maxlen=20, high=0.4)
         
         # Performance/Context Settings
         self.fps = fps
@@ -40,25 +86,28 @@ class RiskScoringEngine:
             'proximity_median': 0
         }
         
-        # Load thresholds from config file or use defaults
-        self.thresholds = self._load_thresholds(config_path)
-        
-        # Log loaded thresholds
-        print(f"Risk Engine initialized with thresholds:")
-        print(f"  Temporal: {self.thresholds['temporal_validation_ratio']*100:.0f}% ratio, "
-              f"{self.thresholds['temporal_window_size']} frames, "
-              f"{self.thresholds['temporal_suppression_max']} max suppression")
-        print(f"  Proximity: {self.thresholds['proximity_distance']*100:.0f}% distance, "
-              f"{self.thresholds['proximity_escalation']}x escalation")
-        print(f"  Aggression: raised_arms={self.thresholds['aggression_raised_arms']}, "
-              f"strike={self.thresholds['aggression_strike']}, "
-              f"fighting_stance={self.thresholds['aggression_fighting_stance']}")
+        if thresholds is not None:
+            self.thresholds = thresholds
+        else:
+            # Load thresholds from config file or use defaults
+            self.thresholds = self._load_thresholds(config_path)
+            if track_max_age is not None:
+                self.thresholds['track_max_age'] = track_max_age
+                self._validate_thresholds(self.thresholds)
+        
+            # Log loaded thresholds
+            print(f"Risk Engine initialized with thresholds:")
+            print(f"  Temporal: {self.thresholds['temporal_validation_ratio']*100:.0f}% ratio, "
+                  f"{self.thresholds['temporal_window_size']} frames, "
+                  f"{self.thresholds['temporal_suppression_max']} max suppression")
+            print(f"  Proximity: {self.thresholds['proximity_distance']*100:.0f}% distance, "
+                  f"{self.thresholds['proximity_escalation']}x escalation")
+            print(f"  Aggression: raised_arms={self.thresholds['aggression_raised_arms']}, "
+                  f"strike={self.thresholds['aggression_strike']}, "
+                  f"fighting_stance={self.thresholds['aggression_fighting_stance']}")
         
         # Per-person keypoint velocity tracking for strike detection
-        self.keypoint_history = defaultdict(lambda: {
-            'wrists': deque(maxlen=10),
-            'ankles': deque(maxlen=10)
-        })
+        self.keypoint_history = {}  # {tid: KeypointTrack}
         
         # Grappling state tracking
         self.grappling_history = defaultdict(int)  # {(tid1, tid2): frame_count}
@@ -93,7 +142,30 @@ class RiskScoringEngine:
         self.strict_mode = True # Always on for this request
         
         self.crowd_limit = 15 # Default fallback
+
+        # Keypoint / bbox arrays of the frame being scored (set by calculate_risk)
+        self._frame_batch = None
+
+        self.diagnostics = diagnostics if diagnostics is not None else scoring_diagnostics
+        self._camera_id = None
+        self.baselines = baselines
+        # Cameras scored from their crowd baseline instead of waiting for
+        # the engine's calibration phase
+        self._baseline_cameras = set()
     
+    def camera_engine(self):
+        """
+        Fresh engine for one camera's state (histories, calibration, risk
+        window) that shares this engine's thresholds, weights, diagnostics
+        and crowd baselines, so changing them here changes them there.
+        """
+        engine = RiskScoringEngine(fps=self.fps, bypass_calibration=self.bypass_calib,
+                                   diagnostics=self.diagnostics, baselines=self.baselines,
+                                   thresholds=self.thresholds)
+        engine.weights = self.weights
+        engine.calibration_duration = self.calibration_duration
+        return engine
+
     def _load_thresholds(self, config_path=None):
         """
         Load thresholds from YAML config file or use defaults.
@@ -121,6 +193,8 @@ class RiskScoringEngine:
             'unattended_time': 8.0,
             'crowd_multiplier': 1.2,
             'proximity_alert': 0.45,
+            'track_max_age': 30,
+            'max_tracks': 1024,
         }
         
         # Try to load from config file
@@ -160,6 +234,10 @@ class RiskScoringEngine:
                     thresholds['aggression_strike'] = config['aggression'].get('strike', defaults['aggression_strike'])
                     thresholds['aggression_fighting_stance'] = config['aggression'].get('fighting_stance', defaults['aggression_fighting_stance'])
                 
+                if 'history' in config:
+                    thresholds['track_max_age'] = config['history'].get('track_max_age', defaults['track_max_age'])
+                    thresholds['max_tracks'] = config['history'].get('max_tracks', defaults['max_tracks'])
+                
                 # Validate thresholds
                 self._validate_thresholds(thresholds)
                 
@@ -201,7 +279,8 @@ class RiskScoringEngine:
         # Distance/multiplier values should be positive
         positive_params = [
             'proximity_escalation', 'temporal_window_size',
-            'loitering_time', 'unattended_time', 'crowd_multiplier'
+            'loitering_time', 'unattended_time', 'crowd_multiplier',
+            'track_max_age', 'max_tracks'
         ]
         
         for param in positive_params:
@@ -210,19 +289,29 @@ class RiskScoringEngine:
                 if value <= 0:
                     raise ValueError(f"Threshold '{param}' must be positive, got {value}")
         
-    def calculate_risk(self, detection_data, context=None):
+    def _weight_vector(self):
+        """self.weights in _FACTOR_ORDER, read per call so weight changes apply."""
+        return tuple(self.weights.get(k, 0) for k in _FACTOR_ORDER)
+
+    def calculate_risk(self, detection_data, context=None, camera_id=None):
         """
         Main pipeline: Detection -> Factor Analysis -> Multi-Signal Validation -> Score
+
+        *camera_id* labels the frame's diagnostics (events and counters) and
+        selects the crowd baseline when the engine has a BaselineStore.
         """
         # 0. Calibration Phase
         import time
         # Prefer context timestamp (from video), fallback to detection timestamp, then system time
         current_time = context.get('timestamp') if (context and context.get('timestamp') is not None) else detection_data.get('timestamp', time.time())
         self._current_timestamp = current_time # Internal state for helpers
+        self._camera_id = camera_id
         if self.start_time is None: self.start_time = current_time
+
+        crowd_limit = self._baseline_crowd_limit(detection_data, context, camera_id, current_time)
         
         elapsed = current_time - self.start_time
-        if elapsed < self.calibration_duration and not self.is_calibrated:
+        if elapsed < self.calibration_duration and not self.is_calibrated and crowd_limit is None:
             self._update_calibration(detection_data)
 
             # Do not suppress clear hazards during calibration.
@@ -237,37 +326,42 @@ class RiskScoringEngine:
                 emergency_factors['fire_smoke'] = fire_conf_now
                 emergency_factors['weapon_detection'] = weapon_conf_now
                 self.risk_history.append(emergency_score)
-                return min(100.0, emergency_score * 100), emergency_factors
+                score = min(100.0, emergency_score * 100)
+                self.diagnostics.record_frame(camera_id, score, emergency_factors)
+                return score, emergency_factors
 
             # Return zeroed dictionary to avoid KeyErrors in callers
             zero_factors = {k: 0.0 for k in self.weights.keys()}
+            self.diagnostics.record_frame(camera_id, 0.0, zero_factors)
             return 0.0, zero_factors
         elif elapsed >= self.calibration_duration and not self.is_calibrated:
             self.is_calibrated = True
             self._finalize_calibration()
 
+        # Convert this frame's poses to arrays once for all pose-based factors;
+        # aggression, strike indicators and pair distances are cached on it.
+        self._frame_batch = PoseBatch(detection_data['poses'])
+
         # Update history
         self._update_history(detection_data['poses'])
         self._update_keypoint_history(detection_data['poses'])
         
-        factors = {}
-        
-        # 1. Analyze Individual Factors
-        factors['weapon_detection'] = self._analyze_weapons(
-            detection_data.get('weapons', []), 
-            detection_data.get('objects', [])
+        poses = detection_data['poses']
+
+        # 1. Analyze Individual Factors, in _FACTOR_ORDER (aligned with
+        # _weight_vector())
+        values = (
+            self._analyze_weapons(detection_data.get('weapons', []), detection_data.get('objects', [])),
+            self._analyze_aggression(poses),
+            self._analyze_fire(detection_data.get('fire', [])),
+            self._check_proximity(poses),
+            self._detect_loitering(detection_data['objects']),
+            self._detect_unattended_objects(detection_data['objects'], poses),
+            self._analyze_crowd_density(poses, crowd_limit),
+            self._apply_context(context) if context else 0.0,
         )
-        factors['aggressive_posture'] = self._analyze_aggression(detection_data['poses'])
-        factors['fire_smoke'] = self._analyze_fire(detection_data.get('fire', []))
-        factors['proximity_violation'] = self._check_proximity(detection_data['poses'])
-        factors['loitering'] = self._detect_loitering(detection_data['objects'])
-        factors['unattended_object'] = self._detect_unattended_objects(detection_data['objects'], detection_data['poses'])
-        factors['crowd_density'] = self._analyze_crowd_density(detection_data['poses'])
-        
-        if context:
-            factors['contextual'] = self._apply_context(context)
-        else:
-            factors['contextual'] = 0.0
+        factors = dict(zip(_FACTOR_ORDER, values))
+        weapon_conf, aggression, fire_conf, proximity, loitering = values[:5]
             
         # 2. Sensitivity Adjustment (NEW)
         # Apply user-defined sensitivity if provided in context
@@ -275,18 +369,16 @@ class RiskScoringEngine:
         # Sensitivity 0.5 = 50% risk, Sensitivity 2.0 = 200% risk (capped)
         
         # 3. ENHANCED Multi-Signal Validation with Suppression Factor Bypass
+        # Factors above 0.4, counted once; the agreement bonus below adjusts
+        # the count for grappling, chasing and contradictions.
+        high_risk_count = sum(1 for v in values if v > 0.4)
+
         # Bypass suppression for high-confidence combat indicators
-        aggression = factors.get('aggressive_posture', 0) or 0
-        weapon_conf = factors.get('weapon_detection', 0) or 0
-        fire_conf = factors.get('fire_smoke', 0) or 0
-        
         if weapon_conf > 0.4 or fire_conf >= self.fire_threat_thresholds['moderate']:
             suppression_factor = 1.0  # Deterministic detector bypass
         elif aggression > 0.7:
             suppression_factor = 1.0  # High aggression bypasses suppression
         else:
-            high_risk_count = sum(1 for v in factors.values() if v is not None and v > 0.4)
-            
             # Enhanced: If aggression > 0.5 but < 0.6, apply max 0.8 suppression (not 0.6)
             if aggression > 0.5:
                 suppression_factor = 0.8
@@ -296,13 +388,12 @@ class RiskScoringEngine:
                 suppression_factor = 1.0
             
         # 4. Calculate Weighted Sum (Aggressive normalization)
-        raw_score = sum((factors[k] or 0) * self.weights.get(k, 0) for k in factors)
+        raw_score = sum(map(operator.mul, values, self._weight_vector()))
         
         # Apply Sensitivity
         raw_score *= (sensitivity * 1.2) # Multiplier for "Smarter/Stricter" request
         
         # WEAPON ESCALATION: 
-        weapon_conf = factors.get('weapon_detection', 0) or 0
         if weapon_conf >= self.weapon_threat_thresholds['critical']: # Hardened to prevent false COCO triggers
             raw_score = max(raw_score, 0.88) # Immediate Serious Alert
             suppression_factor = 1.0 
@@ -311,7 +402,6 @@ class RiskScoringEngine:
             suppression_factor = 1.0
 
         # FIRE ESCALATION:
-        fire_conf = factors.get('fire_smoke', 0) or 0
         if fire_conf >= self.fire_threat_thresholds['critical']:
             raw_score = max(raw_score, 0.92)
             suppression_factor = 1.0
@@ -323,44 +413,52 @@ class RiskScoringEngine:
             suppression_factor = 1.0
         
         # ENHANCED FIGHT DETECTION: Aggression + Proximity Escalation
-        aggression = factors.get('aggressive_posture', 0) or 0
-        proximity = factors.get('proximity_violation', 0) or 0
-        
         # Minimum 70% only for higher-confirmed aggression + close proximity.
         if aggression > 0.7 and proximity > 0.35:
             raw_score = max(raw_score, 0.70)
             suppression_factor = 1.0
-            print(f"DEBUG: High aggression ({aggression:.2f}) + proximity detected. Escalating to 70%+")
+            self.diagnostics.event(camera_id, 'aggression_proximity_escalation',
+                                   'aggression=%.2f proximity=%.2f, raised to 70%%', aggression, proximity)
         
         # Strike + Proximity Escalation: Add a smaller bump only for strong strike velocity.
-        strike_indicators = self._detect_strike_velocity(detection_data['poses'])
+        strike_indicators = self._strike_indicators(poses)
         if len(strike_indicators) > 0 and proximity > 0.3:
             max_velocity = max((v.get('velocity', 0.0) or 0.0) for v in strike_indicators.values())
             if max_velocity > (self.thresholds['strike_velocity'] * 1.25):
                 raw_score += 0.2
-                print(f"DEBUG: Strike motion + proximity detected. Escalating by 0.2")
+                self.diagnostics.event(camera_id, 'strike_proximity_escalation',
+                                       'velocity=%.2f proximity=%.2f, +0.2', max_velocity, proximity)
         
         # 4. Enhanced Grappling Detection
-        grappling_score = self._detect_grappling(detection_data['poses'])
+        agreeing = high_risk_count
+        grappling_score = self._detect_grappling(poses)
         if grappling_score > 0:
             factors['grappling'] = grappling_score
+            if grappling_score > 0.4:
+                agreeing += 1
             raw_score = max(raw_score, 0.65)  # Minimum 65% for grappling
             suppression_factor = 1.0
-            print(f"DEBUG: Grappling/Clinching detected (score: {grappling_score:.2f}). Escalating...")
+            self.diagnostics.event(camera_id, 'grappling', 'score=%.2f', grappling_score)
 
         # Check for Chasing/Following Patterns
-        poses = detection_data['poses']
         chase_score = self._detect_chasing(poses)
         if chase_score > 0.5:
             factors['chasing'] = chase_score
+            agreeing += 1
             raw_score = max(raw_score, 0.5 + (chase_score * 0.3))
 
         # 4. Contradiction Detection (Innovation #23: Safety through Skepticism)
         # High aggression (fast) + High loitering (static) = CONTRADICTION
-        if factors.get('aggressive_posture', 0) > 0.7 and factors.get('loitering', 0) > 0.6:
-            print("DEBUG: Contradiction detected (High Aggression + High Loitering). Reducing scores.")
+        if aggression > 0.7 and loitering > 0.6:
+            self.diagnostics.event(camera_id, 'contradiction', 'aggression=%.2f loitering=%.2f, dampened',
+                                   aggression, loitering)
             factors['aggressive_posture'] *= 0.5
             factors['loitering'] *= 0.5
+            # Both were above 0.4; they may not be any more
+            if factors['aggressive_posture'] <= 0.4:
+                agreeing -= 1
+            if factors['loitering'] <= 0.4:
+                agreeing -= 1
             raw_score *= 0.7 # Global dampening for contradictory signals
 
         # 4.5 Confidence Scoring & Decay (Innovation #5 / #24)
@@ -368,10 +466,9 @@ class RiskScoringEngine:
         is_blurry = any(det.get('is_blurry', False) for det in detection_data.get('objects', []))
         quality_multiplier = 0.7 if is_blurry else 1.0
         if is_blurry:
-             print("DEBUG: Forensic Confidence Decay active (Blurry Frame).")
+            self.diagnostics.event(camera_id, 'blur_decay')
 
-        # Ensure all factor values are numbers (not None)
-        agreement_bonus = sum(1 for v in factors.values() if v is not None and v > 0.4) * 0.1
+        agreement_bonus = agreeing * 0.1
         temporal_bonus = (len(self.risk_history) / self.risk_history.maxlen) * 0.2
         confidence_score = min(1.0, (0.5 + agreement_bonus + temporal_bonus) * quality_multiplier)
 
@@ -395,9 +492,8 @@ class RiskScoringEngine:
         # Require sustained risk for validation (20 frames minimum)
         # Enhanced thresholds for better fight detection
         if len(self.risk_history) >= self.thresholds['temporal_window_size']:
-             # Calculate percentage of frames in history that were high risk (> 0.4)
-             high_risk_frames = sum(1 for r in self.risk_history if r > 0.4)
-             validation_ratio = high_risk_frames / len(self.risk_history)
+             # Percentage of frames in history that were high risk (> 0.4)
+             validation_ratio = self.risk_history.high_count / len(self.risk_history)
              
              if final_risk_score > 0.75:
                  # Critical deterministic threats bypass temporal suppression.
@@ -409,13 +505,448 @@ class RiskScoringEngine:
                      final_risk_score *= 0.7
                      
         # Use mean for smoothed output
-        smoothed_score = np.mean(self.risk_history)
+        smoothed_score = self.risk_history.mean()
         if instant_threat_detected:
             # Keep smoothing but avoid masking active high-confidence hazards.
             smoothed_score = max(smoothed_score, final_risk_score * 0.9)
         
+        # Per-frame feature cache ends with the frame
+        self._frame_batch = None
+
         # Return percentage (0-100)
-        return min(100.0, smoothed_score * 100), factors
+        score = min(100.0, smoothed_score * 100)
+        self.diagnostics.record_frame(camera_id, score, factors)
+        return score, factors
+
+    def score_sequence(self, detections, context=None):
+        """
+        Batch/offline scoring of a whole clip (e.g. re-scoring stored detections).
+
+        Temporal features (track history windows, strike velocities, grappling
+        persistence, temporal validation) are computed with NumPy over the
+        time axis instead of frame by frame.
+
+        Args:
+            detections: DetectionSequence, or calculate_risk()-style detection
+                dicts in frame order
+            context: context dict used for every frame, or a list with one
+                context (or None) per frame
+
+        Returns:
+            (scores, factors): (T,) risk scores (0-100) and a dict of (T,)
+            factor arrays. Frame t equals what calculate_risk() returns for
+            it when the frames are fed in order to a fresh engine with this
+            engine's settings; 'grappling' and 'chasing' are 0 where
+            calculate_risk() leaves them out. The engine's streaming state and
+            crowd baselines are neither used nor changed.
+        """
+        seq = detections if isinstance(detections, DetectionSequence) else DetectionSequence.from_detections(detections)
+        n_frames = len(seq)
+        factors = {k: np.zeros(n_frames) for k in _FACTOR_ORDER + ('grappling', 'chasing')}
+        scores = np.zeros(n_frames)
+        if not n_frames:
+            return scores, factors
+
+        timestamps, contextual, sensitivity = self._sequence_context(seq, context)
+        weapon_conf = self._sequence_weapons(seq)
+        fire_conf = self._sequence_fire(seq)
+        n_poses = np.bincount(seq.pose_frame, minlength=n_frames)
+
+        # 0. Calibration Phase: the frames before `start` only learn the crowd
+        # baseline (and report immediate fire/weapon threats)
+        start, crowd_limit = 0, self.crowd_limit
+        if not self.bypass_calib:
+            done = np.flatnonzero(timestamps - timestamps[0] >= self.calibration_duration)
+            start = int(done[0]) if len(done) else n_frames
+            if 0 < start < n_frames:
+                avg = int(n_poses[:start].sum()) / start
+                crowd_limit = max(5, int(avg * self.thresholds['crowd_multiplier']))
+
+        appended = []   # risk_history values, in order
+        for t in range(start):
+            emergency_score = self._estimate_immediate_threat_score(fire_conf[t], weapon_conf[t])
+            if emergency_score > 0:
+                factors['fire_smoke'][t] = fire_conf[t]
+                factors['weapon_detection'][t] = weapon_conf[t]
+                appended.append(emergency_score)
+                scores[t] = min(100.0, emergency_score * 100)
+        if start == n_frames:
+            return scores, factors
+
+        live = slice(start, n_frames)
+        pose = self._sequence_pose_factors(seq, start, timestamps)
+        f = {
+            'weapon_detection': weapon_conf[live],
+            'aggressive_posture': pose['aggressive_posture'],
+            'fire_smoke': fire_conf[live],
+            'proximity_violation': pose['proximity_violation'],
+            'loitering': pose['loitering'],
+            'unattended_object': self._sequence_unattended(seq)[live],
+            'crowd_density': np.minimum(1.0, n_poses[live] / crowd_limit),
+            'contextual': contextual[live],
+        }
+        sensitivity = sensitivity[live]
+        weapon, fire = f['weapon_detection'], f['fire_smoke']
+        aggression = f['aggressive_posture']
+        proximity = f['proximity_violation']
+
+        # 3. Multi-Signal Validation with Suppression Factor Bypass
+        high_risk_count = sum((v > 0.4).astype(np.int64) for v in f.values())
+        suppression_factor = np.select(
+            [(weapon > 0.4) | (fire >= self.fire_threat_thresholds['moderate']),
+             aggression > 0.7, aggression > 0.5, high_risk_count < 1],
+            [1.0, 1.0, 0.8, 0.6],
+            1.0,
+        )
+
+        # 4. Weighted Sum (same order as calculate_risk)
+        raw_score = np.zeros(n_frames - start)
+        for k, weight in zip(_FACTOR_ORDER, self._weight_vector()):
+            raw_score = raw_score + f[k] * weight
+        raw_score = raw_score * (sensitivity * 1.2)
+
+        def escalate(mask, floor):
+            np.maximum(raw_score, floor, out=raw_score, where=mask)
+            suppression_factor[mask] = 1.0
+
+        # Weapon / fire escalation
+        weapon_critical = weapon >= self.weapon_threat_thresholds['critical']
+        escalate(weapon_critical, 0.88)
+        escalate(~weapon_critical & (weapon >= self.weapon_threat_thresholds['high']), 0.65)
+        fire_critical = fire >= self.fire_threat_thresholds['critical']
+        fire_high = ~fire_critical & (fire >= self.fire_threat_thresholds['high'])
+        escalate(fire_critical, 0.92)
+        escalate(fire_high, 0.78)
+        escalate(~fire_critical & ~fire_high & (fire >= self.fire_threat_thresholds['moderate']), 0.60)
+
+        # Aggression + Proximity, Strike + Proximity
+        escalate((aggression > 0.7) & (proximity > 0.35), 0.70)
+        strike = pose['strike'] & (proximity > 0.3) & (pose['strike_velocity'] > self.thresholds['strike_velocity'] * 1.25)
+        raw_score[strike] += 0.2
+
+        # Grappling, Chasing
+        grappling, chasing = pose['grappling'], pose['chasing']
+        escalate(grappling > 0, 0.65)
+        chase = chasing > 0.5
+        np.maximum(raw_score, 0.5 + chasing * 0.3, out=raw_score, where=chase)
+        f['grappling'] = grappling
+        f['chasing'] = np.where(chase, chasing, 0.0)
+
+        # Contradiction Detection
+        contradiction = (f['aggressive_posture'] > 0.7) & (f['loitering'] > 0.6)
+        f['aggressive_posture'] = np.where(contradiction, f['aggressive_posture'] * 0.5, f['aggressive_posture'])
+        f['loitering'] = np.where(contradiction, f['loitering'] * 0.5, f['loitering'])
+        raw_score[contradiction] *= 0.7
+
+        # 4.5 Confidence Scoring & Decay
+        blurry = np.zeros(n_frames, dtype=bool)
+        blurry[seq.object_frame[seq.object_blurry]] = True
+        quality_multiplier = np.where(blurry[live], 0.7, 1.0)
+        agreement_bonus = sum((v > 0.4).astype(np.int64) for v in f.values()) * 0.1
+        position = len(appended) + np.arange(n_frames - start)   # index in risk_history order
+        temporal_bonus = (np.minimum(position, 20) / 20) * 0.2
+        confidence_score = np.minimum(1.0, (0.5 + agreement_bonus + temporal_bonus) * quality_multiplier)
+
+        instant_threat = (weapon >= self.weapon_threat_thresholds['high']) | (fire >= self.fire_threat_thresholds['moderate'])
+        critical_threat = weapon_critical | fire_critical
+        confidence_score = np.where(instant_threat,
+                                    np.maximum(confidence_score, self.instant_threat_confidence_floor),
+                                    confidence_score)
+        final_risk_score = raw_score * suppression_factor * confidence_score
+
+        # 5. Temporal Validation over the rolling 20-value risk history
+        history = np.concatenate([np.asarray(appended, dtype=np.float64), final_risk_score])
+        size = np.minimum(position + 1, 20)
+        high = np.concatenate([[0], np.cumsum(history > 0.4)])
+        validation_ratio = (high[position + 1] - high[position + 1 - size]) / size
+
+        unsupported = (size >= self.thresholds['temporal_window_size']) & (validation_ratio < self.thresholds['temporal_validation_ratio'])
+        critical = final_risk_score > 0.75
+        final_risk_score = np.where(critical & unsupported & ~critical_threat,
+                                    final_risk_score * self.thresholds['temporal_suppression_max'], final_risk_score)
+        final_risk_score = np.where(~critical & (final_risk_score > 0.4) & unsupported & ~instant_threat,
+                                    final_risk_score * 0.7, final_risk_score)
+
+        smoothed_score = RiskWindow.rolling_means(history.tolist(), self.risk_history.maxlen)[position]
+        smoothed_score = np.where(instant_threat, np.maximum(smoothed_score, final_risk_score * 0.9), smoothed_score)
+
+        scores[live] = np.minimum(100.0, smoothed_score * 100)
+        for k, v in f.items():
+            factors[k][live] = v
+        return scores, factors
+
+    def _sequence_context(self, seq, context):
+        """Per-frame timestamps, contextual factor and sensitivity of score_sequence()."""
+        import time
+        n_frames = len(seq)
+        timestamps = seq.timestamps.copy()
+        missing = np.isnan(timestamps)
+        if missing.any():
+            timestamps[missing] = time.time()
+
+        if isinstance(context, (list, tuple)):
+            if len(context) != n_frames:
+                raise ValueError(f"Expected {n_frames} contexts, got {len(context)}")
+            for t, ctx in enumerate(context):
+                if ctx and ctx.get('timestamp') is not None:
+                    timestamps[t] = ctx['timestamp']
+            contextual = np.array([self._apply_context(ctx) if ctx else 0.0 for ctx in context])
+            sensitivity = np.array([ctx.get('sensitivity', 1.0) if ctx else 1.0 for ctx in context], dtype=np.float64)
+            return timestamps, contextual, sensitivity
+
+        if context and context.get('timestamp') is not None:
+            timestamps[:] = context['timestamp']
+        contextual = np.full(n_frames, self._apply_context(context) if context else 0.0)
+        sensitivity = np.full(n_frames, context.get('sensitivity', 1.0) if context else 1.0, dtype=np.float64)
+        return timestamps, contextual, sensitivity
+
+    def _sequence_weapons(self, seq):
+        """_analyze_weapons() of every frame."""
+        conf = np.zeros(len(seq))
+        np.maximum.at(conf, seq.weapon_frame, seq.weapon_conf)
+        armed = np.isin(seq.object_class, _WEAPON_CLASSES) & (seq.object_conf > 0.45)
+        np.maximum.at(conf, seq.object_frame[armed], seq.object_conf[armed])
+        return conf
+
+    def _sequence_fire(self, seq):
+        """_analyze_fire() of every frame."""
+        conf = np.select([seq.fire_class == 'fire', seq.fire_class == 'smoke'],
+                         [seq.fire_conf, seq.fire_conf * 0.6], seq.fire_conf * 0.4)
+        fire = np.zeros(len(seq))
+        np.maximum.at(fire, seq.fire_frame, conf)
+        return fire
+
+    def _sequence_unattended(self, seq):
+        """_detect_unattended_objects() of every frame."""
+        n_frames = len(seq)
+        result = np.zeros(n_frames)
+        bags = np.flatnonzero(np.isin(seq.object_class, _BAG_CLASSES))
+        if not len(bags):
+            return result
+
+        bag_frame = seq.object_frame[bags]
+        bbox = seq.object_bbox[bags]
+        offsets = seq.frame_offsets(seq.pose_frame)
+        counts = np.diff(offsets)[bag_frame]
+
+        # Distance from each bag to every person of its frame
+        with_people = counts > 0
+        n = counts[with_people]
+        person = np.repeat(offsets[bag_frame[with_people]], n) + (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n))
+        bag_center = (bbox[with_people, :2] + bbox[with_people, 2:]) / 2
+        dists = planar_norm(np.repeat(bag_center, n, axis=0) - seq.centers[person])
+        min_dist = np.minimum.reduceat(dists, np.cumsum(n) - n) if len(dists) else dists
+
+        # Threshold: 3x Bag Height; bags without anyone around count as unattended
+        unattended = np.ones(len(bags), dtype=bool)
+        unattended[with_people] = min_dist > (bbox[with_people, 3] - bbox[with_people, 1]) * 3.0
+        n_bags = np.bincount(bag_frame, minlength=n_frames)
+        n_unattended = np.bincount(bag_frame[unattended], minlength=n_frames)
+        has_bags = n_bags > 0
+        result[has_bags] = n_unattended[has_bags] / n_bags[has_bags]
+        return result
+
+    def _sequence_pose_factors(self, seq, start, timestamps):
+        """
+        History-based and pose-based factors of the frames from *start* on
+        (aggression, proximity, loitering, grappling, chasing, strikes), with
+        the per-track history replayed over the time axis.
+        """
+        n_frames = len(seq) - start
+        first_row = np.searchsorted(seq.pose_frame, start)
+        frame = seq.pose_frame - start          # negative for calibration rows
+        n_rows = len(frame)
+
+        # Track history segments (see track_segments)
+        rows = first_row + np.flatnonzero(seq.track_ids[first_row:] != -1)
+        max_age = self.thresholds['track_max_age']
+        seg = np.full(n_rows, -1, dtype=np.int64)
+        gen = np.full(n_rows, -1, dtype=np.int64)
+        seg[rows], seg_end, gen[rows] = track_segments(
+            frame[rows], seq.track_ids[rows], timestamps[start:], max_age,
+            max_age / self.fps if self.fps else 0.0, self.thresholds['max_tracks'])
+        alive_end = np.append(seg_end, -1)      # seg -1 is never alive
+
+        # Position history: (x, y, t) of every tracked row
+        centers = seq.centers
+        positions = SegmentRows(seg[rows], frame[rows], n_frames)
+        pos_xy = centers[rows][positions.order]
+        pos_t = timestamps[start:][frame[rows]][positions.order]
+
+        def history_window(s, t):
+            """(first, last, length) of the position history of segments *s* at frames *t*."""
+            lo, hi = positions.window(s, t, _POSITION_SAMPLES)
+            alive = (hi >= 0) & (alive_end[s] > t)
+            return lo, hi, np.where(alive, hi - lo + 1, 0)
+
+        strike, velocity = self._sequence_strikes(seq, rows, frame, gen, n_frames, timestamps[start:])
+
+        # Aggression of every person, then per frame
+        scores, eligible = self._aggression_from_masks(posture_masks(seq), strike)
+        live_rows = np.arange(n_rows) >= first_row
+        out = {'strike': np.zeros(n_frames, dtype=bool), 'strike_velocity': np.zeros(n_frames)}
+        aggression = np.zeros(n_frames)
+        use = eligible & live_rows
+        np.maximum.at(aggression, frame[use], scores[use])
+        out['aggressive_posture'] = aggression
+        out['strike'][frame[strike]] = True
+        np.maximum.at(out['strike_velocity'], frame[strike], velocity[strike])
+
+        offsets = np.searchsorted(frame, np.arange(n_frames + 1))
+        n_poses = np.diff(offsets)
+
+        # Proximity
+        radius = self.thresholds['proximity_distance']
+        i, j = frame_pairs(offsets, centers, seq.heights, radius)
+        dist = planar_norm(centers[i] - centers[j])
+        close = dist < ((seq.heights[i] + seq.heights[j]) / 2 * radius)
+        aggressive = (scores[i] > 0.3) | (scores[j] > 0.3)
+        escalated = np.bincount(frame[i[close & aggressive]], minlength=n_frames)
+        baseline = np.bincount(frame[i[close & ~aggressive]], minlength=n_frames)
+        violations = escalated * self.thresholds['proximity_escalation'] + baseline * 1.5
+        total_pairs = n_poses * (n_poses - 1) // 2
+        proximity = np.zeros(n_frames)
+        crowded = n_poses >= 2
+        proximity[crowded] = np.minimum(1.0, violations[crowded] / total_pairs[crowded])
+        out['proximity_violation'] = proximity
+
+        # Grappling (persistence counted per pair of track states)
+        radius = self.thresholds['grappling_distance']
+        i, j = frame_pairs(offsets, centers, seq.heights, radius)
+        dist = planar_norm(centers[i] - centers[j])
+        near = dist < ((seq.heights[i] + seq.heights[j]) / 2 * radius)
+        i, j = i[near], j[near]
+        b1, b2 = seq.bboxes[i], seq.bboxes[j]
+        lo = np.maximum(b1[:, :2], b2[:, :2])
+        hi = np.minimum(b1[:, 2:], b2[:, 2:])
+        overlapping = np.all(hi > lo, axis=1)
+        intersection = np.prod(hi - lo, axis=1)
+        area1 = np.prod(b1[:, 2:] - b1[:, :2], axis=1)
+        area2 = np.prod(b2[:, 2:] - b2[:, :2], axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overlap_ratio = intersection / np.minimum(area1, area2)
+        grappling = overlapping & (overlap_ratio > self.thresholds['grappling_overlap'])
+        i, j = i[grappling], j[grappling]
+        pair_score = np.full(len(i), 0.8)
+        tracked = (gen[i] >= 0) & (gen[j] >= 0)
+        if tracked.any():
+            a, b = gen[i[tracked]], gen[j[tracked]]
+            key = np.minimum(a, b) * (gen.max() + 1) + np.maximum(a, b)
+            order = np.argsort(key, kind='stable')
+            sorted_key = key[order]
+            group_start = np.r_[0, np.flatnonzero(sorted_key[1:] != sorted_key[:-1]) + 1]
+            count = np.empty(len(key), dtype=np.int64)
+            count[order] = np.arange(len(key)) - np.repeat(group_start, np.diff(np.r_[group_start, len(key)])) + 1
+            pair_score[tracked] = np.where(count > 10, 0.9, 0.8)
+        out['grappling'] = np.zeros(n_frames)
+        np.maximum.at(out['grappling'], frame[i], pair_score)
+
+        out['loitering'] = np.zeros(n_frames)
+        out['chasing'] = np.zeros(n_frames)
+        if not len(rows):
+            return out
+
+        # Loitering (person objects with a track id, looked up by track)
+        obj = np.flatnonzero((seq.object_frame >= start) & (seq.object_class == 'person') & seq.object_has_track)
+        obj_frame = seq.object_frame[obj] - start
+        p_count = np.bincount(obj_frame, minlength=n_frames)
+        track_codes = np.unique(seq.track_ids[rows])
+        code = np.searchsorted(track_codes, seq.object_track[obj])
+        known = code < len(track_codes)
+        known[known] = track_codes[code[known]] == seq.object_track[obj][known]
+        appearances = SegmentRows(np.searchsorted(track_codes, seq.track_ids[rows]), frame[rows], n_frames)
+        last_row = appearances.last(np.where(known, code, -1), obj_frame)
+        obj_seg = np.where(last_row >= 0, seg[rows][appearances.order][last_row], -1)
+        lo, hi, length = history_window(obj_seg, obj_frame)
+        history_seconds = pos_t[hi] - pos_t[lo]
+        height = seq.object_bbox[obj, 3] - seq.object_bbox[obj, 1]
+        displacement = planar_norm(pos_xy[hi] - pos_xy[lo])
+        loitering = (length >= 2) & (history_seconds >= self.thresholds['loitering_time']) & (displacement < height * 0.4)
+        loiter_count = np.bincount(obj_frame[loitering], minlength=n_frames)
+        has_people = p_count > 0
+        out['loitering'][has_people] = np.minimum(1.0, loiter_count[has_people] / p_count[has_people])
+
+        out['chasing'] = self._sequence_chasing(seq, rows, seg, frame, n_frames, history_window, pos_xy)
+        return out
+
+    def _sequence_strikes(self, seq, rows, frame, gen, n_frames, timestamps):
+        """
+        _detect_strike_velocity() of every tracked pose: (P,) strike flags and
+        velocities, from the wrist/ankle samples replayed over the time axis.
+        """
+        n_rows = len(frame)
+        strike = np.zeros(n_rows, dtype=bool)
+        velocity = np.zeros(n_rows)
+        if not len(rows):
+            return strike, velocity
+
+        usable = rows[seq.n_keypoints[rows] >= N_KEYPOINTS]
+        for group in (('wrists', (L_WRIST, R_WRIST)), ('ankles', (L_ANKLE, R_ANKLE))):
+            limbs = list(group[1])
+            # Samples in append order: left then right limb of each usable pose
+            visible = (seq.conf[usable][:, limbs] > 0.3).ravel()
+            normalized = (seq.xy[usable][:, limbs] / seq.heights[usable][:, None, None]).reshape(-1, 2)[visible]
+            sample_row = np.repeat(usable, 2)[visible]
+            side = np.tile([LEFT, RIGHT], len(usable))[visible]
+            samples = SegmentRows(gen[sample_row], frame[sample_row], n_frames)
+            xy = normalized[samples.order]
+            side = side[samples.order]
+            t = timestamps[frame[sample_row]][samples.order]
+
+            # Ring of the last _KEYPOINT_SAMPLES samples of each pose's track
+            lo, hi = samples.window(gen[rows], frame[rows], _KEYPOINT_SAMPLES)
+            has = (hi >= 0) & ~strike[rows]
+            q_rows, lo, hi = rows[has], lo[has], hi[has]
+            if not len(q_rows):
+                continue
+            # Most recent earlier sample of the same side with enough time delta
+            back = hi[:, None] - np.arange(1, _KEYPOINT_SAMPLES)[None, :]
+            ok = back >= lo[:, None]
+            back = np.maximum(back, 0)
+            ok &= (side[back] == side[hi][:, None]) & ((t[hi][:, None] - t[back]) > 0.01)
+            found = ok.any(axis=1)
+            previous = back[np.arange(len(back)), np.argmax(ok, axis=1)]
+            displacement = planar_norm(xy[hi] - xy[previous])
+            hit = found & (displacement > self.thresholds['strike_velocity'])
+            strike[q_rows[hit]] = True
+            velocity[q_rows[hit]] = displacement[hit]
+        return strike, velocity
+
+    def _sequence_chasing(self, seq, rows, seg, frame, n_frames, history_window, pos_xy):
+        """_detect_chasing() of every frame."""
+        chasing = np.zeros(n_frames)
+        # Persons with a (non-zero) track id and >= 5 history samples
+        candidates = rows[seq.track_ids[rows] != 0]
+        lo, hi, length = history_window(seg[candidates], frame[candidates])
+        keep = length >= 5
+        candidates, lo, hi = candidates[keep], lo[keep], hi[keep]
+        cand_frame = frame[candidates]
+        n_cand = np.bincount(cand_frame, minlength=n_frames)
+        starts = pos_xy[lo]
+        vec1 = pos_xy[hi] - starts
+        mag1 = np.sqrt(vec1[:, 0] * vec1[:, 0] + vec1[:, 1] * vec1[:, 1])
+
+        # Pursuers: significant movement, in a frame with another candidate
+        if not ((mag1 > 20) & (n_cand[cand_frame] >= 2)).any():
+            return chasing
+        # Same candidate pairs as _detect_chasing, in both directions
+        offsets = np.searchsorted(cand_frame, np.arange(n_frames + 1))
+        centers = seq.centers[candidates]
+        i, j = frame_pairs(offsets, centers, planar_norm(centers - starts), _CHASE_RADIUS)
+        p, q = np.concatenate([i, j]), np.concatenate([j, i])
+        pursuing = mag1[p] > 20
+        p, q = p[pursuing], q[pursuing]
+
+        to_target = centers[q] - centers[p]
+        mag_to = np.sqrt(to_target[:, 0] * to_target[:, 0] + to_target[:, 1] * to_target[:, 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = (to_target[:, 0] * vec1[p, 0] + to_target[:, 1] * vec1[p, 1]) / (mag1[p] * mag_to)
+        toward = (mag_to > 0) & (similarity > 0.8)
+        d = starts[p] - starts[q]
+        d_start = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1])
+        chase = toward & (mag_to < d_start * 0.7)
+        chasing[cand_frame[p[chase]]] = 0.7
+        return chasing
 
     def _analyze_weapons(self, weapons, objects=None):
         """Analyze weapon detections for risk impact with strict validation"""
@@ -480,71 +1011,120 @@ class RiskScoringEngine:
         return min(1.0, threat_score)
 
     def _update_history(self, poses):
-        """Update movement history for tracked persons"""
-        current_ids = set()
+        """Update movement history for tracked persons and evict stale tracks"""
         current_time = self._current_timestamp or 0
-        
-        for pose in poses:
-            if 'track_id' in pose and pose['track_id'] != -1:
-                tid = pose['track_id']
-                center = self._get_bbox_center(pose['bbox'])
-                # Store position with timestamp
-                self.person_history[tid].append((center, current_time))
-                current_ids.add(tid)
-        
-        # Cleanup old IDs
-        for tid in list(self.person_history.keys()):
-            if tid not in current_ids:
-                # Keep history briefly or remove? Remove for now to save memory
-                if len(self.person_history[tid]) > 0:
-                     # Keep strict cleanup for demo
-                     pass 
+        self._frame_index += 1
+        seen = (self._frame_index, current_time)
+
+        batch = self._pose_batch(poses)
+        centers = batch.centers
+        for i in np.flatnonzero(batch.tracked):
+            tid = batch.track_ids[i]
+            history = self.person_history.get(tid)
+            if history is None:
+                history = self.person_history[tid] = TrackRing(_POSITION_SAMPLES, 3)
+            # Store position with timestamp
+            history.append((centers[i, 0], centers[i, 1], current_time))
+            self.person_last_seen[tid] = seen
+            self.person_last_seen.move_to_end(tid)
+
+        self._evict_stale_tracks(current_time)
+
+    def _evict_stale_tracks(self, current_time):
+        """
+        Drop the history of tracks the tracker has given up on.
+
+        A track is stale once it has been unseen for more than track_max_age
+        frames and track_max_age / fps seconds (the engine may be shared by
+        several streams, so frames alone would age tracks too fast). Beyond
+        max_tracks, the least recently seen tracks go first.
+        """
+        max_age = self.thresholds['track_max_age']
+        max_age_sec = max_age / self.fps if self.fps else 0.0
+        last_seen = self.person_last_seen
+        stale = []
+        for tid, (frame, ts) in last_seen.items():
+            if self._frame_index - frame <= max_age or current_time - ts <= max_age_sec:
+                break   # entries are in last-seen order; the rest are newer
+            stale.append(tid)
+        excess = len(last_seen) - len(stale) - self.thresholds['max_tracks']
+        if excess > 0:
+            stale.extend(list(last_seen)[len(stale):len(stale) + excess])
+        if not stale:
+            return
+
+        for tid in stale:
+            del last_seen[tid]
+            self.person_history.pop(tid, None)
+            self.keypoint_history.pop(tid, None)
+        self._evicted_tracks += len(stale)
+        if self.grappling_history:
+            gone = set(stale)
+            for pair in [p for p in self.grappling_history if p[0] in gone or p[1] in gone]:
+                del self.grappling_history[pair]
+
+    def memory_stats(self):
+        """Size of the per-track state, for monitoring."""
+        history_bytes = sum(h.nbytes for h in self.person_history.values())
+        history_bytes += sum(h.nbytes for h in self.keypoint_history.values())
+        return {
+            'tracks': len(self.person_history),
+            'keypoint_tracks': len(self.keypoint_history),
+            'grappling_pairs': len(self.grappling_history),
+            'history_bytes': history_bytes,
+            'evicted_tracks': self._evicted_tracks,
+            'max_tracks': self.thresholds['max_tracks'],
+            'track_max_age': self.thresholds['track_max_age'],
+        }
     
+    def _pose_batch(self, poses):
+        """PoseBatch of *poses*; reuses the current frame's batch inside calculate_risk."""
+        batch = self._frame_batch
+        if batch is None or batch.poses is not poses:
+            batch = PoseBatch(poses)
+        return batch
+
     def _update_keypoint_history(self, poses):
         """
         Update per-keypoint velocity history for strike detection.
         Tracks wrist and ankle positions per person using track_id.
         """
-        for pose in poses:
-            if 'track_id' not in pose or pose['track_id'] == -1:
-                continue
-                
-            tid = pose['track_id']
-            kpts = np.array(pose['keypoints'])
-            conf = np.array(pose['confidence'])
-            
-            # YOLO pose keypoints: 9=L-Wrist, 10=R-Wrist, 15=L-Ankle, 16=R-Ankle
-            if len(kpts) < 17:
-                continue
-                
-            # Get person height for normalization
-            person_height = pose['bbox'][3] - pose['bbox'][1] if 'bbox' in pose else 100
-            
-            # Store normalized wrist positions
-            if conf[9] > 0.3:  # L-Wrist confidence check
-                normalized_pos = kpts[9] / person_height
-                self.keypoint_history[tid]['wrists'].append(('left', normalized_pos, self._current_timestamp))
-                
-            if conf[10] > 0.3:  # R-Wrist confidence check
-                normalized_pos = kpts[10] / person_height
-                self.keypoint_history[tid]['wrists'].append(('right', normalized_pos, self._current_timestamp))
-                
-            # Store normalized ankle positions
-            if len(kpts) > 15 and conf[15] > 0.3:  # L-Ankle
-                normalized_pos = kpts[15] / person_height
-                self.keypoint_history[tid]['ankles'].append(('left', normalized_pos, self._current_timestamp))
-                
-            if len(kpts) > 16 and conf[16] > 0.3:  # R-Ankle
-                normalized_pos = kpts[16] / person_height
-                self.keypoint_history[tid]['ankles'].append(('right', normalized_pos, self._current_timestamp))
-    
+        batch = self._pose_batch(poses)
+        # YOLO pose keypoints: 9=L-Wrist, 10=R-Wrist, 15=L-Ankle, 16=R-Ankle
+        usable = batch.tracked & (batch.n_keypoints >= N_KEYPOINTS)
+        if not usable.any():
+            return
+
+        limbs = [L_WRIST, R_WRIST, L_ANKLE, R_ANKLE]
+        # Positions normalised by person height, and confidence checks, for all persons at once
+        normalized = batch.xy[:, limbs] / batch.heights[:, None, None]
+        visible = batch.conf[:, limbs] > 0.3
+
+        for i in np.flatnonzero(usable):
+            tid = batch.track_ids[i]
+            history = self.keypoint_history.get(tid)
+            if history is None:
+                history = self.keypoint_history[tid] = KeypointTrack(_KEYPOINT_SAMPLES)
+            for j, (group, side) in enumerate((('wrists', LEFT), ('wrists', RIGHT),
+                                               ('ankles', LEFT), ('ankles', RIGHT))):
+                if visible[i, j]:
+                    x, y = normalized[i, j]
+                    history[group].append((side, x, y, self._current_timestamp))
+
+    def _strike_indicators(self, poses):
+        """_detect_strike_velocity(), computed once per frame inside calculate_risk."""
+        batch = self._pose_batch(poses)
+        if 'strike' not in batch.features:
+            batch.features['strike'] = self._detect_strike_velocity(poses)
+        return batch.features['strike']
+
     def _detect_strike_velocity(self, poses):
         """
         Detect strike motion by analyzing rapid limb movements.
         Returns dict of {track_id: {'has_strike': bool, 'velocity': float, 'limb': str}}
         """
         strike_indicators = {}
-        # Same-frame left/right samples get appended back-to-back to the shared deque.
+        # Same-frame left/right samples get appended back-to-back to the shared ring.
         # To avoid "velocity" computed from limb switching, we require a small time delta.
         min_strike_dt_sec = 0.01
         
@@ -553,153 +1133,116 @@ class RiskScoringEngine:
                 continue
                 
             tid = pose['track_id']
-            person_height = pose['bbox'][3] - pose['bbox'][1] if 'bbox' in pose else 100
-            
-            # Check wrist velocity
-            wrist_history = self.keypoint_history[tid]['wrists']
-            if len(wrist_history) >= 2:
-                recent = wrist_history[-1]
-                recent_side = recent[0]
-                # Find the most recent previous sample for the SAME side with enough dt.
-                previous = None
-                for i in range(len(wrist_history) - 2, -1, -1):
-                    cand = wrist_history[i]
-                    if cand[0] != recent_side:
-                        continue
-                    if (recent[2] - cand[2]) <= min_strike_dt_sec:
-                        continue
-                    previous = cand
-                    break
-
-                if previous is not None:
-                    displacement = np.linalg.norm(recent[1] - previous[1])
-                    if displacement > self.thresholds['strike_velocity']:
-                        strike_indicators[tid] = {
-                            'has_strike': True,
-                            'velocity': displacement,
-                            'limb': 'wrist',
-                            'side': recent_side  # 'left' or 'right'
-                        }
-                        continue
+            history = self.keypoint_history.get(tid)
+            if history is None:
+                continue
             
-            # Check ankle velocity (kicks)
-            ankle_history = self.keypoint_history[tid]['ankles']
-            if len(ankle_history) >= 2:
-                recent = ankle_history[-1]
-                recent_side = recent[0]
-                previous = None
-                for i in range(len(ankle_history) - 2, -1, -1):
-                    cand = ankle_history[i]
-                    if cand[0] != recent_side:
-                        continue
-                    if (recent[2] - cand[2]) <= min_strike_dt_sec:
-                        continue
-                    previous = cand
+            # Check wrist velocity, then ankle velocity (kicks)
+            for group, limb in (('wrists', 'wrist'), ('ankles', 'ankle')):
+                strike = self._limb_strike(history[group], limb, min_strike_dt_sec)
+                if strike is not None:
+                    strike_indicators[tid] = strike
                     break
-
-                if previous is not None:
-                    displacement = np.linalg.norm(recent[1] - previous[1])
-                    if displacement > self.thresholds['strike_velocity']:
-                        strike_indicators[tid] = {
-                            'has_strike': True,
-                            'velocity': displacement,
-                            'limb': 'ankle',
-                            'side': recent_side
-                        }
         
         return strike_indicators
 
+    def _limb_strike(self, ring, limb, min_dt):
+        """
+        Strike indicator of one limb group (wrists or ankles), or None.
+
+        Compares the latest sample with the most recent earlier sample of the
+        same side taken more than *min_dt* seconds before it.
+        """
+        if len(ring) < 2:
+            return None
+        rows = ring.rows()
+        recent = rows[-1]
+        previous = np.flatnonzero((rows[:-1, 0] == recent[0]) & ((recent[3] - rows[:-1, 3]) > min_dt))
+        if not len(previous):
+            return None
+
+        displacement = planar_norm(recent[1:3] - rows[previous[-1], 1:3])
+        if displacement <= self.thresholds['strike_velocity']:
+            return None
+        return {
+            'has_strike': True,
+            'velocity': displacement,
+            'limb': limb,
+            'side': 'left' if recent[0] == LEFT else 'right',
+        }
+
     def _analyze_aggression(self, poses):
         """
         ENHANCED FIGHT DETECTION: Aggressive pose detection with NO discrimination.
         Detects ALL combat-like behavior (boxing, sparring, real fights) equally.
         The AI intelligence layer will handle smart discrimination.
         
-        OPTIMIZED: Reduced redundant calculations, cached values.
+        Returns the highest per-person score (see _aggression_scores).
         """
         if not poses:
             return 0.0
-        
+
+        scores, eligible = self._aggression_scores(poses)
+        return np.max(scores[eligible]) if eligible.any() else 0.0
+
+    def _aggression_scores(self, poses):
+        """
+        Per-person aggression scores (0-1) for all poses at once, plus the
+        mask of poses with enough confident keypoints to be scored (others
+        score 0). Features are evaluated as vectorized masks over the
+        frame's (N, 17, 3) keypoint array.
+        """
+        batch = self._pose_batch(poses)
+        if 'aggression' not in batch.features:
+            batch.features['aggression'] = self._score_aggression(batch)
+        return batch.features['aggression']
+
+    def _score_aggression(self, batch):
         # Get strike indicators once (cached)
-        strike_indicators = self._detect_strike_velocity(poses)
-        
-        scores = []
-        for pose in poses:
-            kpts = np.array(pose['keypoints'])
-            conf = np.array(pose['confidence'])
-            
-            # YOLO pose has 17 keypoints, require at least 11 for analysis
-            if len(kpts) < 11 or np.mean(conf) < 0.35:
-                continue
-                
-            aggression = 0.0
-            tid = pose.get('track_id')
-            
-            # Get person height once (cached)
-            person_height = pose['bbox'][3] - pose['bbox'][1] if 'bbox' in pose else 100
-            
-            # Pre-calculate commonly used values
-            ankle_dist = abs(kpts[15][0] - kpts[16][0]) if len(kpts) > 16 else 0
-            wide_stance = ankle_dist > (person_height * 0.3)
-            
-            # FEATURE 1: Raised Arms + Widened Stance (Score: 0.7)
-            left_wrist_up = kpts[9][1] < kpts[5][1]
-            right_wrist_up = kpts[10][1] < kpts[6][1]
-            
-            # Both arms raised + wide stance = 0.7 (AGGRESSIVE - no discrimination)
-            if left_wrist_up and right_wrist_up and wide_stance:
-                aggression += self.thresholds['aggression_raised_arms']  # 0.7
-            elif (left_wrist_up or right_wrist_up) and wide_stance:
-                aggression += 0.5  # One arm raised + stance
-            elif left_wrist_up and right_wrist_up:
-                aggression += 0.6  # Both arms raised
-            
-            # FEATURE 2: Fighting Stance (Hands near head + wide feet) (Score: 0.6)
-            nose = kpts[0]
-            wrist_l = kpts[9]
-            wrist_r = kpts[10]
-            
-            head_proximity_threshold = person_height * 0.25  # 25% of body height
-            hands_near_head = (np.linalg.norm(wrist_l - nose) < head_proximity_threshold or 
-                             np.linalg.norm(wrist_r - nose) < head_proximity_threshold)
-            
-            if hands_near_head and wide_stance:
-                aggression += self.thresholds['aggression_fighting_stance']  # 0.6
-            elif hands_near_head:
-                aggression += 0.4  # Hands near head only
-            
-            # FEATURE 3: Strike Motion Detection (Score: 0.5 + 0.4 if extended)
-            if tid in strike_indicators:
-                aggression += self.thresholds['aggression_strike']  # 0.5 base for strike
-                
-                # Check if arm is extended during strike (cached calculation)
-                shoulder_l = kpts[5]
-                shoulder_r = kpts[6]
-                left_arm_ext = np.linalg.norm(wrist_l - shoulder_l) > (person_height * 0.4)
-                right_arm_ext = np.linalg.norm(wrist_r - shoulder_r) > (person_height * 0.4)
-                
-                if left_arm_ext or right_arm_ext:
-                    aggression += 0.4  # Additional score for extended arm during strike
-            else:
-                # FEATURE 4: Extended Arms (Potential strike/push) - only if no strike detected
-                shoulder_l = kpts[5]
-                shoulder_r = kpts[6]
-                left_arm_ext = np.linalg.norm(wrist_l - shoulder_l) > (person_height * 0.4)
-                right_arm_ext = np.linalg.norm(wrist_r - shoulder_r) > (person_height * 0.4)
-                
-                if left_arm_ext and right_arm_ext:
-                    aggression += 0.5  # Both arms extended (shoving/double punch)
-                elif left_arm_ext or right_arm_ext:
-                    aggression += 0.3  # Single arm extended
-            
-            # FEATURE 5: Wide Stance alone (defensive/ready position)
-            if wide_stance and aggression < 0.3:  # Only if not already counted
-                aggression += 0.3
-            
-            # Accumulate scores up to maximum of 1.0
-            scores.append(min(1.0, aggression))
-            
-        return np.max(scores) if scores else 0.0
+        strike_indicators = self._strike_indicators(batch.poses)
+        has_strike = np.array([tid in strike_indicators for tid in batch.track_ids], dtype=bool)
+        return self._aggression_from_masks(posture_masks(batch), has_strike)
+
+    def _aggression_from_masks(self, m, has_strike):
+        """Per-person aggression scores and eligibility from posture masks + strike flags."""
+        wide = m['wide_stance']
+        both_up = m['left_wrist_up'] & m['right_wrist_up']
+        one_up = m['left_wrist_up'] | m['right_wrist_up']
+        both_ext = m['left_arm_ext'] & m['right_arm_ext']
+        one_ext = m['left_arm_ext'] | m['right_arm_ext']
+
+        # Terms are added in the same order as the per-person rules so the
+        # floating-point sums match them exactly.
+        aggression = np.zeros(len(has_strike))
+
+        # FEATURE 1: Raised Arms + Widened Stance (Score: 0.7)
+        aggression = aggression + np.select(
+            [both_up & wide, one_up & wide, both_up],
+            [self.thresholds['aggression_raised_arms'], 0.5, 0.6],
+            0.0,
+        )
+
+        # FEATURE 2: Fighting Stance (Hands near head + wide feet) (Score: 0.6)
+        aggression = aggression + np.select(
+            [m['hands_near_head'] & wide, m['hands_near_head']],
+            [self.thresholds['aggression_fighting_stance'], 0.4],
+            0.0,
+        )
+
+        # FEATURE 3: Strike Motion Detection (Score: 0.5 + 0.4 if extended)
+        # FEATURE 4: Extended Arms (Potential strike/push) - only if no strike detected
+        aggression = aggression + np.select(
+            [has_strike, both_ext, one_ext],
+            [self.thresholds['aggression_strike'], 0.5, 0.3],
+            0.0,
+        )
+        aggression = aggression + np.where(has_strike & one_ext, 0.4, 0.0)
+
+        # FEATURE 5: Wide Stance alone (defensive/ready position)
+        aggression = aggression + np.where(wide & (aggression < 0.3), 0.3, 0.0)
+
+        eligible = m['eligible']
+        return np.where(eligible, np.minimum(1.0, aggression), 0.0), eligible
 
     def _check_proximity(self, poses):
         """
@@ -708,38 +1251,25 @@ class RiskScoringEngine:
         """
         if len(poses) < 2:
             return 0.0
-            
-        violations = 0
-        total_pairs = 0
-        
+
+        batch = self._pose_batch(poses)
+        total_pairs = len(poses) * (len(poses) - 1) // 2
+
         # Calculate individual aggression scores first for interaction validation
-        aggression_scores = {}
-        for i, pose in enumerate(poses):
-            aggression_scores[i] = self._analyze_aggression([pose])
+        aggression_scores, _ = self._aggression_scores(poses)
+
+        # ENHANCED: 40% of average height threshold (reduced from 60%)
+        # Only pairs near each other can violate it (spatial grid in crowds)
+        i, j, dist = batch.near_pairs(self.thresholds['proximity_distance'])
+        avg_height = (batch.heights[i] + batch.heights[j]) / 2
+        close = dist < (avg_height * self.thresholds['proximity_distance'])
+
+        # ESCALATION: If either person shows aggression > 0.3, apply 3.0x weight
+        aggressive = (aggression_scores[i] > 0.3) | (aggression_scores[j] > 0.3)
+        escalated = int(np.count_nonzero(close & aggressive))
+        baseline = int(np.count_nonzero(close & ~aggressive))   # 1.5 baseline weight
+        violations = escalated * self.thresholds['proximity_escalation'] + baseline * 1.5
 
-        for i in range(len(poses)):
-            for j in range(i+1, len(poses)):
-                p1, p2 = poses[i], poses[j]
-                
-                # Calculate distance between persons
-                dist = self._calculate_distance(p1, p2)
-                
-                h1 = p1['bbox'][3] - p1['bbox'][1]
-                h2 = p2['bbox'][3] - p2['bbox'][1]
-                avg_height = (h1 + h2) / 2
-                
-                # ENHANCED: 40% of average height threshold (reduced from 60%)
-                if dist < (avg_height * self.thresholds['proximity_distance']):
-                    # ESCALATION: If either person shows aggression > 0.3, apply 3.0x weight
-                    if aggression_scores[i] > 0.3 or aggression_scores[j] > 0.3:
-                        violations += self.thresholds['proximity_escalation']  # 3.0
-                    else:
-                        violations += 1.5  # Baseline weight for close proximity
-                
-                total_pairs += 1
-                
-        if total_pairs == 0: return 0.0
-        
         # Return proportional score
         ratio = violations / total_pairs
         return min(1.0, ratio)
@@ -751,60 +1281,48 @@ class RiskScoringEngine:
         """
         if len(poses) < 2:
             return 0.0
-        
-        grappling_detected = False
+
+        batch = self._pose_batch(poses)
+        i, j, dist = batch.near_pairs(self.thresholds['grappling_distance'])
+
+        # Check if distance < 40% of average height
+        avg_height = (batch.heights[i] + batch.heights[j]) / 2
+        near = dist < (avg_height * self.thresholds['grappling_distance'])
+        i, j = i[near], j[near]
+        if not len(i):
+            return 0.0
+
+        # Bounding box overlap ratio (intersection / smaller bbox)
+        b1, b2 = batch.bboxes[i], batch.bboxes[j]
+        lo = np.maximum(b1[:, :2], b2[:, :2])
+        hi = np.minimum(b1[:, 2:], b2[:, 2:])
+        overlapping = np.all(hi > lo, axis=1)
+        intersection = np.prod(hi - lo, axis=1)
+        area1 = np.prod(b1[:, 2:] - b1[:, :2], axis=1)
+        area2 = np.prod(b2[:, 2:] - b2[:, :2], axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overlap_ratio = intersection / np.minimum(area1, area2)
+
+        # Grappling detected when overlap > 60%
+        grappling = overlapping & (overlap_ratio > self.thresholds['grappling_overlap'])
+
         max_grappling_score = 0.0
-        
-        for i in range(len(poses)):
-            for j in range(i+1, len(poses)):
-                p1, p2 = poses[i], poses[j]
-                
-                # Calculate distance
-                dist = self._calculate_distance(p1, p2)
-                
-                h1 = p1['bbox'][3] - p1['bbox'][1]
-                h2 = p2['bbox'][3] - p2['bbox'][1]
-                avg_height = (h1 + h2) / 2
-                
-                # Check if distance < 40% of average height
-                if dist < (avg_height * self.thresholds['grappling_distance']):
-                    # Calculate bounding box overlap (IoU approximation)
-                    bbox1 = p1['bbox']
-                    bbox2 = p2['bbox']
-                    
-                    # Calculate intersection
-                    x1 = max(bbox1[0], bbox2[0])
-                    y1 = max(bbox1[1], bbox2[1])
-                    x2 = min(bbox1[2], bbox2[2])
-                    y2 = min(bbox1[3], bbox2[3])
-                    
-                    if x2 > x1 and y2 > y1:
-                        intersection = (x2 - x1) * (y2 - y1)
-                        area1 = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
-                        area2 = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
-                        
-                        # Calculate overlap ratio (intersection / smaller bbox)
-                        overlap_ratio = intersection / min(area1, area2)
-                        
-                        # Grappling detected when overlap > 60%
-                        if overlap_ratio > self.thresholds['grappling_overlap']:
-                            grappling_detected = True
-                            
-                            # Track grappling persistence
-                            tid1 = p1.get('track_id', -1)
-                            tid2 = p2.get('track_id', -1)
-                            if tid1 != -1 and tid2 != -1:
-                                pair_key = tuple(sorted([tid1, tid2]))
-                                self.grappling_history[pair_key] += 1
-                                
-                                # If grappling persists > 10 frames, maintain elevated score
-                                if self.grappling_history[pair_key] > 10:
-                                    max_grappling_score = max(max_grappling_score, 0.9)
-                                else:
-                                    max_grappling_score = max(max_grappling_score, 0.8)
-                            else:
-                                max_grappling_score = max(max_grappling_score, 0.8)
-        
+        for a, b in zip(i[grappling].tolist(), j[grappling].tolist()):
+            # Track grappling persistence
+            tid1 = poses[a].get('track_id', -1)
+            tid2 = poses[b].get('track_id', -1)
+            if tid1 != -1 and tid2 != -1:
+                pair_key = tuple(sorted([tid1, tid2]))
+                self.grappling_history[pair_key] += 1
+
+                # If grappling persists > 10 frames, maintain elevated score
+                if self.grappling_history[pair_key] > 10:
+                    max_grappling_score = max(max_grappling_score, 0.9)
+                else:
+                    max_grappling_score = max(max_grappling_score, 0.8)
+            else:
+                max_grappling_score = max(max_grappling_score, 0.8)
+
         return max_grappling_score
 
     def _detect_loitering(self, objects):
@@ -820,11 +1338,12 @@ class RiskScoringEngine:
             
             p_count += 1
             tid = obj['track_id']
-            history = self.person_history[tid]
+            history = self.person_history.get(tid)
             
             # Use timestamps instead of frame count for loitering duration
-            if len(history) < 2: continue
-            history_seconds = history[-1][1] - history[0][1]
+            if history is None or len(history) < 2: continue
+            first, last = history.first(), history.last()
+            history_seconds = last[2] - first[2]
             if history_seconds < self.thresholds['loitering_time']:
                 continue
             
@@ -833,9 +1352,7 @@ class RiskScoringEngine:
             height = box[3] - box[1]
             
             # Displacement between start and end of loitering window using timestamps
-            start_pos = np.array(history[0][0])
-            end_pos = np.array(history[-1][0])
-            displacement = np.linalg.norm(end_pos - start_pos)
+            displacement = planar_norm(last[:2] - first[:2])
             
             # Scale-invariant movement check: require "mostly stationary" to count as loitering.
             if displacement < (height * 0.4):
@@ -857,7 +1374,8 @@ class RiskScoringEngine:
             avg = self.baseline['avg_crowd'] / self.baseline['samples']
             # Adaptive crowd limit: 3x average or minimum 5
             self.crowd_limit = max(5, int(avg * self.thresholds['crowd_multiplier']))
-            print(f"DEBUG: Calibration complete. Baseline Avg Crowd: {avg:.1f}, New Limit: {self.crowd_limit}")
+            self.diagnostics.event(self._camera_id, 'calibration_complete',
+                                   'avg_crowd=%.1f crowd_limit=%d', avg, self.crowd_limit)
 
     def _get_factor_confidence(self, name, data):
         """
@@ -884,16 +1402,15 @@ class RiskScoringEngine:
         
         if not poses: return 1.0 # Bags but no people = Risk
         
-        person_centers = [np.array(self._get_bbox_center(p['bbox'])) for p in poses]
+        person_centers = np.array([self._get_bbox_center(p['bbox']) for p in poses], dtype=np.float64)
         
         unattended = 0
         for bag in bags:
-            bag_center = np.array(self._get_center(bag['bbox']))
+            bag_center = np.array(self._get_center(bag['bbox']), dtype=np.float64)
             bag_height = bag['bbox'][3] - bag['bbox'][1]
             
             # Distance to nearest person
-            dists = [np.linalg.norm(bag_center - p) for p in person_centers]
-            min_dist = min(dists)
+            min_dist = planar_norm(bag_center - person_centers).min()
             
             # Threshold: 2x Bag Height
             if min_dist > (bag_height * 3.0): 
@@ -901,9 +1418,37 @@ class RiskScoringEngine:
                 
         return unattended / len(bags)
 
-    def _analyze_crowd_density(self, poses):
+    def _baseline_crowd_limit(self, det, context, camera_id, current_time):
+        """
+        Crowd limit from the camera's baseline (None without one), then add
+        this frame to the baseline. A camera with a known baseline skips the
+        calibration phase, so after a restart it scores normally from its
+        first frame; the engine's own calibration is left to the others.
+        """
+        if self.baselines is None:
+            return None
+        if context and context.get('hour') is not None:
+            hour = int(context['hour']) % 24
+        else:
+            hour = time.localtime(current_time).tm_hour
+        expected = self.baselines.expected(camera_id, hour, current_time)
+        self.baselines.update(camera_id, hour, len(det['poses']), current_time)
+        if expected is None:
+            return None
+        crowd_limit = max(5, int(expected * self.thresholds['crowd_multiplier']))
+        if not self.is_calibrated and camera_id not in self._baseline_cameras:
+            self._baseline_cameras.add(camera_id)
+            self.diagnostics.event(camera_id, 'calibration_restored',
+                                   'avg_crowd=%.1f crowd_limit=%d', expected, crowd_limit)
+        return crowd_limit
+
+    def camera_calibrated(self, camera_id):
+        """True once frames of *camera_id* are scored normally (calibrated engine or known baseline)."""
+        return self.is_calibrated or camera_id in self._baseline_cameras
+
+    def _analyze_crowd_density(self, poses, crowd_limit=None):
         count = len(poses)
-        return min(1.0, count / self.crowd_limit)
+        return min(1.0, count / (crowd_limit or self.crowd_limit))
 
     def _apply_context(self, context):
         score = 0.0
@@ -928,18 +1473,16 @@ class RiskScoringEngine:
             return False  # Assume static if no track info
             
         tid = pose['track_id']
-        history = self.person_history[tid]
+        history = self.person_history.get(tid)
         
-        if len(history) < 5:
+        if history is None or len(history) < 5:
             return False
         
         # Calculate displacement relative to height over the buffer
         person_height = pose['bbox'][3] - pose['bbox'][1] if 'bbox' in pose else 100
         movement_threshold = person_height * 0.2 # 20% of height displacement
         
-        start_pos = np.array(history[0][0])
-        end_pos = np.array(history[-1][0])
-        recent_movement = np.linalg.norm(end_pos - start_pos)
+        recent_movement = np.linalg.norm(history.last()[:2] - history.first()[:2])
         
         return recent_movement > movement_threshold
 
@@ -956,40 +1499,54 @@ class RiskScoringEngine:
         Detect if one person is chasing another by analyzing velocity vectors.
         """
         if len(poses) < 2: return 0.0
-        
-        max_chase = 0.0
-        for i, p1 in enumerate(poses):
-            tid1 = p1.get('track_id')
-            if not tid1 or len(self.person_history[tid1]) < 5: continue
-            
-            # Vector of P1
-            h1 = self.person_history[tid1]
-            vec1 = np.array(h1[-1][0]) - np.array(h1[0][0])
-            
-            for j, p2 in enumerate(poses):
-                if i == j: continue
-                tid2 = p2.get('track_id')
-                if not tid2 or len(self.person_history[tid2]) < 5: continue
-                
-                # Check if P1 is moving TOWARD P2
-                p2_pos = np.array(self._get_bbox_center(p2['bbox']))
-                p1_pos = np.array(self._get_bbox_center(p1['bbox']))
-                to_target = p2_pos - p1_pos
-                
-                # Cosine similarity between P1 movement and vector to P2
-                mag1 = np.linalg.norm(vec1)
-                mag_to = np.linalg.norm(to_target)
-                
-                if mag1 > 20 and mag_to > 0: # Significant movement
-                    similarity = np.dot(vec1, to_target) / (mag1 * mag_to)
-                    if similarity > 0.8: # Moving >80% directly toward them
-                         # Check if distance is closing
-                         d_start = np.linalg.norm(np.array(h1[0][0]) - np.array(self.person_history[tid2][0][0]))
-                         d_end = np.linalg.norm(p1_pos - p2_pos)
-                         if d_end < d_start * 0.7: # Distance closed by 30%
-                             max_chase = max(max_chase, 0.7)
-                             
-        return max_chase
+
+        # Persons with a track id and >= 5 history samples can chase or be chased
+        starts, moves, idx = [], [], []
+        for k, pose in enumerate(poses):
+            tid = pose.get('track_id')
+            history = self.person_history.get(tid) if tid else None
+            if history is None or len(history) < 5:
+                continue
+            first = history.first()
+            idx.append(k)
+            starts.append(first[:2])
+            moves.append(history.last()[:2] - first[:2])
+        if len(idx) < 2:
+            return 0.0
+
+        idx = np.array(idx)
+        starts = np.array(starts, dtype=np.float64)
+        vec1 = np.array(moves, dtype=np.float64)   # movement over the history
+        mag1 = np.sqrt((vec1 * vec1).sum(axis=1))
+
+        # Only persons with significant movement are plausible pursuers
+        if not (mag1 > 20).any():
+            return 0.0
+
+        # Only pairs that moved enough to have closed in can chase (spatial
+        # search in crowds); each pair is checked in both directions
+        centers = self._pose_batch(poses).centers[idx]
+        i, j = candidate_pairs(centers, planar_norm(centers - starts), _CHASE_RADIUS)
+        p, q = np.concatenate([i, j]), np.concatenate([j, i])
+        pursuing = mag1[p] > 20
+        p, q = p[pursuing], q[pursuing]
+
+        # Vector from pursuer P1 to target P2 (current centres)
+        to_target = centers[q] - centers[p]
+        mag_to = np.sqrt(to_target[:, 0] * to_target[:, 0] + to_target[:, 1] * to_target[:, 1])
+
+        # Cosine similarity between P1 movement and vector to P2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = (to_target * vec1[p]).sum(axis=1) / (mag1[p] * mag_to)
+        toward = (mag_to > 0) & (similarity > 0.8)   # Moving >80% directly toward them
+
+        # Check if distance is closing: closed by 30% since the start of P1's / P2's history
+        d = starts[p] - starts[q]
+        d_start = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1])
+        if (toward & (mag_to < d_start * 0.7)).any():
+            return 0.7
+
+        return 0.0
 
     def _get_bbox_center(self, bbox):
         return [(bbox[0] + bbox[2])/2, (bbox[1] + bbox[3])/2]
@@ -1067,23 +1624,22 @@ class RiskScoringEngine:
                 continue
                 
             tid = pose['track_id']
-            history = self.person_history[tid]
+            history = self.person_history.get(tid)
             
             # Require at least 1s of history for quality analysis
-            if len(history) < 2 or (history[-1][1] - history[0][1]) < 1.0:
+            if history is None or len(history) < 2 or (history.last()[2] - history.first()[2]) < 1.0:
                 continue
             
             # Get current person scale for normalization
             height = pose['bbox'][3] - pose['bbox'][1] if 'bbox' in pose else 100
             
+            # Per-step displacement and time delta, rows are (x, y, t)
+            steps = np.diff(history.rows(), axis=0)
+            
             # 1. Analyze Acceleration
-            velocities = []
-            for i in range(1, len(history)):
-                # history[i] is (pos, time)
-                dist = np.linalg.norm(np.array(history[i][0]) - np.array(history[i-1][0]))
-                dt = history[i][1] - history[i-1][1]
-                if dt > 0:
-                    velocities.append(dist / dt)
+            dist = np.sqrt(steps[:, 0] * steps[:, 0] + steps[:, 1] * steps[:, 1])
+            moving = steps[:, 2] > 0
+            velocities = dist[moving] / steps[moving, 2]
             
             if len(velocities) >= 5:
                 recent_vel = np.mean(velocities[-3:])
@@ -1095,25 +1651,17 @@ class RiskScoringEngine:
             
             # 2. Analyze Direction (Filter out normal walking jitter)
             if len(history) >= 10:
-                directions = []
-                for i in range(1, len(history)):
-                    dx = history[i][0][0] - history[i-1][0][0]
-                    dy = history[i][0][1] - history[i-1][0][1]
-                    
-                    if abs(dx) > (height * 0.05) or abs(dy) > (height * 0.05):
-                        angle = np.arctan2(dy, dx)
-                        directions.append(angle)
+                dx, dy = steps[:, 0], steps[:, 1]
+                jitter = height * 0.05
+                significant = (np.abs(dx) > jitter) | (np.abs(dy) > jitter)
+                directions = np.arctan2(dy[significant], dx[significant])
                 
                 if len(directions) >= 6:
-                    reversals = 0
-                    for i in range(1, len(directions)):
-                        angle_diff = abs(directions[i] - directions[i-1])
-                        if angle_diff > np.pi:
-                            angle_diff = 2 * np.pi - angle_diff
-                        
-                        # Look for clear reversals (> 110 degrees)
-                        if angle_diff > (np.pi * 0.6): 
-                            reversals += 1
+                    angle_diff = np.abs(np.diff(directions))
+                    angle_diff = np.where(angle_diff > np.pi, 2 * np.pi - angle_diff, angle_diff)
+                    
+                    # Look for clear reversals (> 110 degrees)
+                    reversals = int(np.count_nonzero(angle_diff > (np.pi * 0.6)))
                     
                     # Require 3 clear reversals for "erratic" label
                     if reversals >= 3:
@@ -0,0 +1,333 @@
+"""
+Whole-clip detections as flat arrays, for RiskScoringEngine.score_sequence.
+
+calculate_risk() takes one frame's detection dict at a time, so re-scoring
+a stored clip that way rebuilds arrays and per-track history frame by
+frame. ``DetectionSequence`` holds the clip as one row per detection
+instead, rows in frame order (detection order within a frame):
+
+    timestamps   (T,)        per frame (NaN when a frame has none)
+    poses        (P, ...)    frame, track id (-1 = untracked), keypoints
+                             (P, 17, 3), bboxes (NaN when missing)
+    objects      (O, ...)    frame, class, confidence, bbox, track id, blur flag
+    weapons      (W, ...)    frame, confidence
+    fire         (F, ...)    frame, class, confidence
+
+The pose arrays use PoseBatch's attribute names, so ``posture_masks`` can
+evaluate every pose of the clip at once.
+
+``frame_pairs`` lists the person pairs of every frame that
+PoseBatch.near_pairs would, for all frames at once. ``track_segments``
+replays the engine's per-track eviction (RiskScoringEngine._evict_stale_tracks)
+over the time axis: every tracked row gets the id of the history segment
+it was appended to, so ring-buffer windows become index ranges into rows
+sorted by segment.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from models.scoring.pose_features import DEFAULT_HEIGHT, GRID_MIN_PERSONS, N_KEYPOINTS, PoseBatch, grid_pairs
+
+
+class DetectionSequence:
+    """Detections of a whole clip as flat per-detection arrays."""
+
+    def __init__(self, timestamps, pose_frame, pose_track, keypoints, n_keypoints, conf_mean, bboxes,
+                 object_frame, object_class, object_conf, object_bbox, object_track, object_has_track,
+                 object_blurry, weapon_frame, weapon_conf, fire_frame, fire_class, fire_conf):
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+
+        self.pose_frame = np.asarray(pose_frame, dtype=np.int64)
+        self.track_ids = np.asarray(pose_track, dtype=np.int64)
+        self.keypoints = np.asarray(keypoints, dtype=np.float64).reshape(-1, N_KEYPOINTS, 3)
+        self.n_keypoints = np.asarray(n_keypoints, dtype=np.int64)
+        self.conf_mean = np.asarray(conf_mean, dtype=np.float64)
+        self.bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        has_bbox = ~np.isnan(self.bboxes).all(axis=1)
+        self.heights = np.where(has_bbox, self.bboxes[:, 3] - self.bboxes[:, 1], DEFAULT_HEIGHT)
+
+        self.object_frame = np.asarray(object_frame, dtype=np.int64)
+        self.object_class = np.asarray(object_class, dtype=str)
+        self.object_conf = np.asarray(object_conf, dtype=np.float64)
+        self.object_bbox = np.asarray(object_bbox, dtype=np.float64).reshape(-1, 4)
+        self.object_track = np.asarray(object_track, dtype=np.int64)
+        self.object_has_track = np.asarray(object_has_track, dtype=bool)
+        self.object_blurry = np.asarray(object_blurry, dtype=bool)
+
+        self.weapon_frame = np.asarray(weapon_frame, dtype=np.int64)
+        self.weapon_conf = np.asarray(weapon_conf, dtype=np.float64)
+
+        self.fire_frame = np.asarray(fire_frame, dtype=np.int64)
+        self.fire_class = np.asarray(fire_class, dtype=str)
+        self.fire_conf = np.asarray(fire_conf, dtype=np.float64)
+
+    @classmethod
+    def from_detections(cls, detections):
+        """
+        Build a sequence from calculate_risk()-style detection dicts.
+
+        Poses without a track id (or with None) are stored as untracked (-1).
+        """
+        timestamps = []
+        poses, pose_frame = [], []
+        objects, object_frame = [], []
+        weapon_frame, weapon_conf = [], []
+        fire_frame, fire_class, fire_conf = [], [], []
+
+        for t, det in enumerate(detections):
+            ts = det.get('timestamp')
+            timestamps.append(np.nan if ts is None else ts)
+            poses.extend(det['poses'])
+            pose_frame.extend([t] * len(det['poses']))
+            objects.extend(det.get('objects', []))
+            object_frame.extend([t] * len(det.get('objects', [])))
+            for w in det.get('weapons', []) or []:
+                weapon_frame.append(t)
+                weapon_conf.append(w['confidence'])
+            for f in det.get('fire', []) or []:
+                fire_frame.append(t)
+                fire_class.append(f.get('class') or '')
+                fire_conf.append(f.get('confidence', 0))
+
+        batch = PoseBatch(poses)
+        pose_track = [-1 if tid is None else tid for tid in batch.track_ids]
+        no_box = [np.nan] * 4
+
+        return cls(
+            timestamps,
+            pose_frame, pose_track, batch.keypoints, batch.n_keypoints, batch.conf_mean, batch.bboxes,
+            object_frame,
+            [o.get('class') or '' for o in objects],
+            [o.get('confidence', 0) for o in objects],
+            np.array([o.get('bbox', no_box) for o in objects], dtype=np.float64).reshape(-1, 4),
+            [o['track_id'] if o.get('track_id') is not None else -1 for o in objects],
+            ['track_id' in o for o in objects],
+            [bool(o.get('is_blurry', False)) for o in objects],
+            weapon_frame, weapon_conf,
+            fire_frame, fire_class, fire_conf,
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def xy(self):
+        return self.keypoints[..., :2]
+
+    @property
+    def conf(self):
+        return self.keypoints[..., 2]
+
+    @property
+    def centers(self):
+        """(P, 2) bbox centres."""
+        return (self.bboxes[:, :2] + self.bboxes[:, 2:]) / 2
+
+    def frame_offsets(self, frames):
+        """(T + 1,) start of each frame's rows in a frame-sorted row array."""
+        return np.searchsorted(frames, np.arange(len(self) + 1))
+
+
+def track_segments(frames, track_ids, timestamps, max_age, max_age_sec, max_tracks):
+    """
+    History segments of the tracked rows of a clip, as RiskScoringEngine
+    builds and evicts them frame by frame.
+
+    Args:
+        frames: (n,) frame index of each tracked row, non-decreasing
+        track_ids: (n,) track id of each row
+        timestamps: (T,) timestamp of each frame
+        max_age, max_age_sec, max_tracks: eviction settings of the engine
+
+    Returns:
+        (seg, seg_end, gen): segment id of the position history each row is
+        appended to; for each segment the frame at the end of which it is
+        evicted (T when it survives the clip); and the id of the row's track
+        state *after* its frame's eviction pass, which keys the keypoint
+        history and grappling counters (both are created after eviction).
+        The two ids only differ when the max_tracks cap evicts a track in a
+        frame where it was seen.
+    """
+    n_frames = len(timestamps)
+    if not len(frames):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    if np.all(np.diff(timestamps) >= 0):
+        result = _track_segments_monotonic(frames, track_ids, timestamps, max_age, max_age_sec, max_tracks)
+        if result is not None:
+            seg, seg_end = result
+            return seg, seg_end, seg
+    return _track_segments_sequential(frames, track_ids, timestamps, max_age, max_age_sec, max_tracks)
+
+
+def _eviction_frames(seen, timestamps, max_age, max_age_sec):
+    """
+    First frame after each *seen* frame at which a track last seen there
+    is stale (more than max_age frames and max_age_sec seconds), or T.
+    Timestamps must be non-decreasing.
+    """
+    n_frames = len(timestamps)
+    by_age = seen + int(np.floor(max_age)) + 1
+
+    # (timestamps[f] - ts) is non-decreasing in f; start from the
+    # searchsorted guess and settle on the exact first frame where the
+    # engine's comparison holds.
+    ts = timestamps[seen]
+    by_time = np.clip(np.searchsorted(timestamps, ts + max_age_sec, side='right'), seen + 1, n_frames)
+    while True:
+        prev = by_time - 1
+        down = (prev > seen) & (timestamps[np.maximum(prev, 0)] - ts > max_age_sec)
+        if not down.any():
+            break
+        by_time[down] -= 1
+    while True:
+        up = (by_time < n_frames) & ~(timestamps[np.minimum(by_time, n_frames - 1)] - ts > max_age_sec)
+        if not up.any():
+            break
+        by_time[up] += 1
+
+    return np.minimum(np.maximum(by_age, by_time), n_frames)
+
+
+def _track_segments_monotonic(frames, track_ids, timestamps, max_age, max_age_sec, max_tracks):
+    """Vectorized track_segments for non-decreasing timestamps; None when max_tracks would evict."""
+    n_frames = len(timestamps)
+
+    # Appearances: distinct (track, frame) rows, grouped by track in frame order
+    order = np.lexsort((frames, track_ids))
+    tids, seen = track_ids[order], frames[order]
+    first_row = np.r_[True, (tids[1:] != tids[:-1]) | (seen[1:] != seen[:-1])]
+    app_tid, app_frame = tids[first_row], seen[first_row]
+
+    # Stale frames are a prefix of the least-recently-seen order here, so a
+    # track is evicted exactly when its eviction frame comes before it is
+    # seen again.
+    evict = _eviction_frames(app_frame, timestamps, max_age, max_age_sec)
+    new = np.r_[True, (app_tid[1:] != app_tid[:-1]) | (evict[:-1] < app_frame[1:])]
+    app_seg = np.cumsum(new) - 1
+    seg_end = evict[np.r_[new[1:], True]]
+
+    # Live tracks after each frame's eviction pass must stay within the cap
+    live = np.zeros(n_frames + 1, dtype=np.int64)
+    np.add.at(live, app_frame[new], 1)
+    np.add.at(live, seg_end, -1)
+    if np.cumsum(live[:n_frames]).max() > max_tracks:
+        return None
+
+    seg = np.empty(len(frames), dtype=np.int64)
+    seg[order] = app_seg[np.cumsum(first_row) - 1]
+    return seg, seg_end
+
+
+def _track_segments_sequential(frames, track_ids, timestamps, max_age, max_age_sec, max_tracks):
+    """track_segments for any timestamps, mirroring _update_history frame by frame."""
+    n_frames = len(timestamps)
+    bounds = np.searchsorted(frames, np.arange(n_frames + 1)).tolist()
+    tids = track_ids.tolist()
+    ts = timestamps.tolist()
+
+    seg = np.empty(len(tids), dtype=np.int64)
+    gen = np.empty(len(tids), dtype=np.int64)
+    seg_end = []
+    segments = {}          # tid -> position history segment
+    states = {}            # tid -> keypoint / grappling state id
+    n_states = 0
+    last_seen = OrderedDict()
+    for f in range(n_frames):
+        lo, hi = bounds[f], bounds[f + 1]
+        for r in range(lo, hi):
+            tid = tids[r]
+            s = segments.get(tid)
+            if s is None:
+                s = segments[tid] = len(seg_end)
+                seg_end.append(n_frames)
+            seg[r] = s
+            last_seen[tid] = (f, ts[f])
+            last_seen.move_to_end(tid)
+
+        # Same rules as RiskScoringEngine._evict_stale_tracks
+        stale = []
+        for tid, (g, tg) in last_seen.items():
+            if f - g <= max_age or ts[f] - tg <= max_age_sec:
+                break
+            stale.append(tid)
+        excess = len(last_seen) - len(stale) - max_tracks
+        if excess > 0:
+            stale.extend(list(last_seen)[len(stale):len(stale) + excess])
+        for tid in stale:
+            del last_seen[tid]
+            seg_end[segments.pop(tid)] = f
+            states.pop(tid, None)
+
+        # Keypoint history and grappling counters of this frame start after
+        # the eviction pass
+        for r in range(lo, hi):
+            tid = tids[r]
+            if tid not in states:
+                states[tid] = n_states
+                n_states += 1
+            gen[r] = states[tid]
+
+    return seg, np.array(seg_end, dtype=np.int64), gen
+
+
+class SegmentRows:
+    """
+    Rows grouped by segment (frame order kept within a segment), for
+    ring-buffer lookups: the last row of a segment at or before a frame,
+    and where the segment starts.
+    """
+
+    def __init__(self, seg, frames, n_frames):
+        self.order = np.argsort(seg, kind='stable')
+        self.seg = seg[self.order]
+        self._span = n_frames + 1
+        self._keys = self.seg * self._span + frames[self.order]
+
+    def last(self, seg, frame):
+        """Sorted position of the last row of *seg* at or before *frame* (-1 if none)."""
+        idx = np.searchsorted(self._keys, seg * self._span + frame, side='right') - 1
+        found = (seg >= 0) & (idx >= 0) & (self.seg[np.maximum(idx, 0)] == seg)
+        return np.where(found, idx, -1)
+
+    def first(self, seg):
+        """Sorted position of the first row of *seg*."""
+        return np.searchsorted(self.seg, seg, side='left')
+
+    def window(self, seg, frame, size):
+        """(lo, hi) sorted positions of the last *size* rows of *seg* up to *frame*; hi = -1 if none."""
+        hi = self.last(seg, frame)
+        lo = np.maximum(self.first(seg), hi - size + 1)
+        return lo, hi
+
+
+def frame_pairs(offsets, centers, heights, radius_factor):
+    """
+    (i, j) row pairs, i < j, of persons in the same frame that
+    PoseBatch.near_pairs(radius_factor) would list, in frame order and
+    row-major order within a frame. *offsets* are the (T + 1,) frame starts
+    of the rows.
+    """
+    counts = np.diff(offsets)
+    found_i, found_j = [], []
+    for n in np.unique(counts[counts >= 2]).tolist():
+        frames = np.flatnonzero(counts == n)
+        if n < GRID_MIN_PERSONS:
+            a, b = np.triu_indices(n, 1)
+            base = offsets[frames][:, None]
+            found_i.append((base + a).ravel())
+            found_j.append((base + b).ravel())
+            continue
+        for f in frames.tolist():
+            lo = offsets[f]
+            i, j = grid_pairs(centers[lo:lo + n], heights[lo:lo + n], radius_factor)
+            found_i.append(i + lo)
+            found_j.append(j + lo)
+    if not found_i:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    i, j = np.concatenate(found_i), np.concatenate(found_j)
+    order = np.lexsort((j, i))
+    return i[order], j[order]
@@ -0,0 +1,166 @@
+"""
+Compact history buffers for RiskScoringEngine.
+
+Each track's samples live in a preallocated float64 ring (one row per
+sample) instead of a deque of tuples and lists, so a full 300-sample
+position history costs 7 KB rather than ~60 KB of Python objects. Rows
+come back oldest first. float64 is kept on purpose: Unix timestamps need
+it for sub-second resolution, and positions stay bit-identical to the
+values the scoring code used before.
+
+Rows used by the engine:
+
+    position history   (x, y, t)              bbox centre per frame
+    keypoint history   (side, x, y, t)        side 0 = left, 1 = right
+
+``RiskWindow`` is the engine's rolling window of recent risk values; it
+keeps the statistics temporal validation needs (values above the high-risk
+level, mean) up to date on append instead of re-scanning the window.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+LEFT, RIGHT = 0.0, 1.0
+
+
+class TrackRing:
+    """Fixed-capacity ring buffer of float64 rows."""
+
+    __slots__ = ('_data', '_start', '_len')
+
+    def __init__(self, capacity, width):
+        self._data = np.empty((capacity, width), dtype=np.float64)
+        self._start = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def append(self, row):
+        """Add a row, overwriting the oldest one when the ring is full."""
+        cap = len(self._data)
+        if self._len < cap:
+            self._data[(self._start + self._len) % cap] = row
+            self._len += 1
+        else:
+            self._data[self._start] = row
+            self._start = (self._start + 1) % cap
+
+    def first(self):
+        return self._data[self._start]
+
+    def last(self):
+        return self._data[(self._start + self._len - 1) % len(self._data)]
+
+    def rows(self):
+        """(len, width) copy of the rows, oldest first."""
+        end = self._start + self._len
+        if end <= len(self._data):
+            return self._data[self._start:end].copy()
+        return np.concatenate([self._data[self._start:], self._data[:end - len(self._data)]])
+
+
+class KeypointTrack:
+    """Wrist and ankle samples of one track (side, x, y, t), for strike detection."""
+
+    __slots__ = ('wrists', 'ankles')
+
+    def __init__(self, capacity=10):
+        self.wrists = TrackRing(capacity, 4)
+        self.ankles = TrackRing(capacity, 4)
+
+    def __getitem__(self, group):
+        return getattr(self, group)
+
+    @property
+    def nbytes(self):
+        return self.wrists.nbytes + self.ankles.nbytes
+
+
+class RiskWindow:
+    """
+    Rolling window of the last *maxlen* risk values (oldest first).
+
+    ``high_count`` (values above *high*) is exact. The mean comes from a
+    running sum that is recomputed with math.fsum every *maxlen* appends,
+    so rounding cannot build up, and it is exactly 0 when every value in
+    the window is.
+    """
+
+    __slots__ = ('_values', 'high', 'high_count', '_sum', '_nonzero', '_until_resum')
+
+    def __init__(self, maxlen=20, high=0.4):
+        self._values = deque(maxlen=maxlen)
+        self.high = high
+        self.clear()
+
+    @property
+    def maxlen(self):
+        return self._values.maxlen
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, index):
+        return self._values[index]
+
+    def __repr__(self):
+        return f"RiskWindow({list(self._values)}, maxlen={self.maxlen})"
+
+    def append(self, value):
+        values = self._values
+        if len(values) == values.maxlen:
+            old = values[0]
+            if old > self.high:
+                self.high_count -= 1
+            if old:
+                self._nonzero -= 1
+            self._sum -= old
+        values.append(value)
+        if value > self.high:
+            self.high_count += 1
+        if value:
+            self._nonzero += 1
+        self._until_resum -= 1
+        if self._until_resum:
+            self._sum += value
+        else:
+            self._sum = math.fsum(values)
+            self._until_resum = values.maxlen
+
+    def clear(self):
+        self._values.clear()
+        self.high_count = 0
+        self._sum = 0.0
+        self._nonzero = 0
+        self._until_resum = self._values.maxlen
+
+    def mean(self):
+        """Mean of the window (0.0 when empty)."""
+        if not self._nonzero:
+            return 0.0
+        return self._sum / len(self._values)
+
+    @classmethod
+    def rolling_means(cls, values, maxlen=20):
+        """mean() after appending each of *values* to an empty window, as (len,) array."""
+        window = cls(maxlen)
+        out = np.empty(len(values))
+        for k, value in enumerate(values):
+            window.append(value)
+            out[k] = window.mean()
+        return out
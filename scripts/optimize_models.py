@@ -8,38 +8,31 @@ except ImportError as e:
     exit(1)
 
 import os
+import sys
 
-def optimize_yolo_to_onnx():
-    """Convert YOLO models to ONNX for faster inference"""
+def optimize_yolo_to_onnx(precision='fp32', calibration_data=None):
+    """Pre-build the detector's cached ONNX exports (see models/detection/backends.py)"""
     print("Optimizing YOLO models...")
-    
-    models = ['yolov8n.pt', 'yolov8n-pose.pt']
-    
-    # Ensure models dir
-    os.makedirs('models', exist_ok=True)
-    
-    for model_name in models:
-        print(f"\nConverting {model_name}...")
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from models.detection.backends import ensure_exported
+    from models.detection.detector import _MODEL_PATHS, _is_lfs_pointer
+
+    for key, weights in _MODEL_PATHS.items():
+        if not os.path.isfile(weights) or _is_lfs_pointer(weights):
+            print(f"\nSkipping {key}: no weights at {weights}")
+            continue
+        print(f"\nConverting {os.path.basename(weights)} ({precision})...")
         try:
-            # Check if exists, else download
-            model = YOLO(model_name) 
-            
-            # Export to ONNX
-            # Ultralytics export handles downloading if needed
-            onnx_path = model.export(format='onnx', simplify=True)
-            
-            print(f"✓ Saved to {onnx_path}")
-            
+            onnx_path = ensure_exported(weights, 'onnxruntime', precision, calibration_data)
+            print(f"✓ Cached at {onnx_path}")
+
             # Verify
-            if os.path.exists(onnx_path):
-                onnx_model = onnx.load(onnx_path)
-                onnx.checker.check_model(onnx_model)
-                
-                # Benchmark check
-                # session = ort.InferenceSession(onnx_path)
-                print(f"  ONNX Export verified")
+            onnx_model = onnx.load(onnx_path)
+            onnx.checker.check_model(onnx_model)
+            print(f"  ONNX Export verified")
         except Exception as e:
-            print(f"Optimization failed for {model_name}: {e}")
+            print(f"Optimization failed for {key}: {e}")
 
 def benchmark_inference():
     """Benchmark inference speeds"""
@@ -77,5 +70,6 @@ def benchmark_inference():
 
 if __name__ == "__main__":
     import numpy as np
-    optimize_yolo_to_onnx()
+    optimize_yolo_to_onnx(sys.argv[1] if len(sys.argv) > 1 else 'fp32',
+                          sys.argv[2] if len(sys.argv) > 2 else None)
     benchmark_inference()
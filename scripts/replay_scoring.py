@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Re-score stored detections with alternative risk thresholds.
+
+Reads the recordings written by the upload pipeline when
+DETECTION_STORE_ENABLED is set (models/detection/detection_store.py) and
+runs them through RiskScoringEngine once per threshold file x sensitivity,
+without re-running any detector. Prints one summary row per run.
+
+Examples:
+    python scripts/replay_scoring.py
+    python scripts/replay_scoring.py --thresholds config/risk_thresholds.yaml strict.yaml \\
+        --sensitivity 0.8 1.0 1.2 --csv sweep.csv
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from models.detection.detection_store import DetectionStore
+from models.scoring.risk_engine import RiskScoringEngine
+
+try:
+    import config
+except Exception:
+    config = None
+
+FIELDS = ['video', 'thresholds', 'sensitivity', 'frames', 'peak_score', 'peak_frame',
+          'mean_score', 'alert_frames', 'alert_events', 'seconds']
+
+
+def _engine(manifest, thresholds_path):
+    engine_args = manifest.get('engine', {})
+    with contextlib.redirect_stdout(io.StringIO()):   # the engine prints its thresholds
+        return RiskScoringEngine(
+            fps=manifest.get('fps') or 30,
+            bypass_calibration=engine_args.get('bypass_calibration', True),
+            config_path=thresholds_path,
+            track_max_age=engine_args.get('track_max_age'),
+        )
+
+
+def _with_sensitivity(ctx, sensitivity):
+    return ctx if sensitivity is None else {**(ctx or {}), 'sensitivity': sensitivity}
+
+
+def replay(store, video_id, thresholds_path, sensitivity, alert_threshold, streaming):
+    """Score one recording; returns a summary row (see FIELDS)."""
+    manifest = store.manifest(video_id)
+    engine = _engine(manifest, thresholds_path)
+    start = time.perf_counter()
+
+    if streaming:
+        frame_index, scores = [], []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for frame, det, ctx in store.iter_frames(video_id):
+                frame_index.append(frame)
+                scores.append(engine.calculate_risk(det, _with_sensitivity(ctx, sensitivity))[0])
+        scores = np.asarray(scores, dtype=np.float64)
+    else:
+        seq, frame_index, contexts = store.load_sequence(video_id)
+        scores, _ = engine.score_sequence(seq, [_with_sensitivity(ctx, sensitivity) for ctx in contexts])
+
+    alerts = scores > alert_threshold
+    onsets = np.diff(np.concatenate([[False], alerts]).astype(np.int8)) == 1
+    peak = int(np.argmax(scores)) if len(scores) else None
+    return {
+        'video': video_id,
+        'thresholds': thresholds_path or 'default',
+        'sensitivity': 'stored' if sensitivity is None else sensitivity,
+        'frames': len(scores),
+        'peak_score': round(float(scores[peak]), 2) if peak is not None else 0.0,
+        'peak_frame': frame_index[peak] if peak is not None else '',
+        'mean_score': round(float(scores.mean()), 2) if len(scores) else 0.0,
+        'alert_frames': int(alerts.sum()),
+        'alert_events': int(onsets.sum()),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def main():
+    default_store = getattr(config, 'DETECTION_STORE_PATH', 'storage/detections')
+    parser = argparse.ArgumentParser(description="Re-score stored detections with alternative risk thresholds.")
+    parser.add_argument("--store", default=default_store, help=f"Detection store directory (default: {default_store}).")
+    parser.add_argument("--video", nargs="*", help="Video ids to replay (default: all recordings).")
+    parser.add_argument("--thresholds", nargs="*", default=[None],
+                        help="Risk threshold YAML files (default: config/risk_thresholds.yaml).")
+    parser.add_argument("--sensitivity", nargs="*", type=float, default=[None],
+                        help="Context sensitivities to sweep (default: the recorded context).")
+    parser.add_argument("--alert-threshold", type=float, default=35.0,
+                        help="Score above which a frame counts as alerting (default: 35, as the upload pipeline).")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Feed frames to calculate_risk() one by one instead of score_sequence().")
+    parser.add_argument("--csv", help="Also write the summary rows to this CSV file.")
+    args = parser.parse_args()
+
+    store = DetectionStore(os.path.abspath(args.store))
+    videos = args.video or store.videos()
+    if not videos:
+        print(f"No recordings in {args.store}. Set DETECTION_STORE_ENABLED=true and process a video first.")
+        return 1
+
+    rows = []
+    print("  ".join(f"{name:>12}" for name in FIELDS))
+    for video_id in videos:
+        for thresholds_path in args.thresholds:
+            for sensitivity in args.sensitivity:
+                row = replay(store, video_id, thresholds_path, sensitivity, args.alert_threshold, args.streaming)
+                rows.append(row)
+                cells = {**row, 'thresholds': os.path.basename(row['thresholds'])}
+                print("  ".join(f"{str(cells[name])[:12]:>12}" for name in FIELDS))
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {len(rows)} rows to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
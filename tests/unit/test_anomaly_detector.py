@@ -0,0 +1,133 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for AnomalyDetector
+
+Batch feature extraction must give the per-frame features (including the
+track speeds), predict_batch the per-frame predictions, and the per-camera
+online models must stay bounded while they keep learning.
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from models.scoring.anomaly_detector import FEATURES, AnomalyDetector
+
+
+def _pose(track_id, x, y=100.0):
+    return {'keypoints': [[x, y]] * 17, 'confidence': [0.8] * 17,
+            'bbox': [x - 20, y - 50, x + 20, y + 50], 'track_id': track_id}
+
+
+def _frames(n_frames=60, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for t in range(n_frames):
+        poses = [_pose(p, 100 * p + 5 * t + rng.normal(0, 2)) for p in range(int(rng.integers(1, 5)))]
+        objects = [{'class': c, 'confidence': 0.6, 'bbox': [0, 0, 10, 10]}
+                   for c in rng.choice(['person', 'backpack', 'car'], int(rng.integers(0, 4)))]
+        frames.append({'poses': poses, 'objects': objects, 'timestamp': t / 15})
+    return frames
+
+
+@pytest.fixture
+def detector():
+    return AnomalyDetector(reservoir_size=64, retrain_every=50, min_samples=40, max_cameras=2)
+
+
+class TestFeatures:
+
+    def test_batch_matches_per_frame(self, detector):
+        frames = _frames()
+        batch = detector.extract_features_batch(frames)
+        rows = np.vstack([detector.extract_features(f, frames[t - 1] if t else None) for t, f in enumerate(frames)])
+
+        assert batch.shape == (len(frames), len(FEATURES))
+        np.testing.assert_allclose(batch, rows, rtol=1e-12)
+
+    def test_frame_features(self, detector):
+        frame = {'poses': [_pose(1, 100), _pose(2, 300)],
+                 'objects': [{'class': 'car'}, {'class': 'car'}, {'class': 'backpack'}]}
+        features = dict(zip(FEATURES, detector.extract_features(frame)[0]))
+
+        assert features['people'] == 2 and features['objects'] == 3 and features['object_types'] == 2
+        assert features['x_variance'] == pytest.approx(np.var([100, 300]))
+        assert features['pose_confidence'] == pytest.approx(0.8)
+        assert features['speed_max'] == 0.0
+        assert detector.extract_features({})[0].tolist() == [0.0] * len(FEATURES)
+
+    def test_track_speeds(self, detector):
+        previous = {'poses': [_pose(1, 100), _pose(2, 200), _pose(3, 300)], 'timestamp': 10.0}
+        # track 1 moves 30 px, track 2 moves 60 px in 0.1 s; track 3 is gone, track 4 is new
+        current = {'poses': [_pose(1, 130), _pose(2, 260), _pose(4, 0)], 'timestamp': 10.1}
+        features = dict(zip(FEATURES, detector.extract_features(current, previous)[0]))
+
+        assert features['speed_mean'] == pytest.approx(450.0)
+        assert features['speed_max'] == pytest.approx(600.0)
+        assert features['speed_std'] == pytest.approx(150.0)
+
+
+class TestPrediction:
+
+    def test_untrained_is_normal(self, detector):
+        is_anomaly, scores = detector.predict_batch(_frames(5))
+        assert not is_anomaly.any() and not scores.any()
+        assert detector.predict(_frames(1)[0]) == (False, 0.0)
+
+    def test_predict_batch_matches_predict(self, detector, capsys):
+        frames = _frames(200)
+        detector.train(frames)
+        is_anomaly, scores = detector.predict_batch(frames)
+
+        expected = [detector.predict(f, frames[t - 1] if t else None) for t, f in enumerate(frames)]
+        assert is_anomaly.tolist() == [a for a, _ in expected]
+        np.testing.assert_allclose(scores, [s for _, s in expected])
+        assert is_anomaly.tolist() == (detector.model.predict(detector.extract_features_batch(frames)) == -1).tolist()
+
+    def test_load_model_rejects_other_feature_count(self, detector, tmp_path):
+        model = AnomalyDetector._new_model().fit(np.zeros((10, 6)))
+        path = tmp_path / 'old.pkl'
+        path.write_bytes(pickle.dumps(model))
+        with pytest.raises(ValueError):
+            detector.load_model(str(path))
+
+
+class TestOnline:
+
+    def test_camera_refits_on_bounded_reservoir(self, detector):
+        frames = _frames(130)
+        for f in frames:
+            detector.observe(f, camera_id='cam1')
+
+        stats = detector.camera_stats()['cam1']
+        assert stats == {'seen': 130, 'reservoir': 64, 'fitted': True}
+        state = detector._cameras['cam1']
+        assert state.since_fit == 40      # first fit at frame 40, refit at 90
+        is_anomaly, score = detector.observe(frames[0], camera_id='cam1')
+        assert isinstance(is_anomaly, bool) and 0.0 <= score <= 1.0
+
+    def test_first_fit_after_min_samples(self, detector):
+        frames = _frames(40)
+        for f in frames[:39]:
+            detector.observe(f, camera_id='cam1')
+        assert not detector.camera_stats()['cam1']['fitted']
+
+        detector.observe(frames[39], camera_id='cam1')
+        assert detector.camera_stats()['cam1']['fitted']
+        assert detector._cameras['cam1'].since_fit == 0
+
+    def test_cameras_are_independent_and_capped(self, detector):
+        for f in _frames(45):
+            detector.observe(f, camera_id='a')
+        detector.observe(_frames(1)[0], camera_id='b')
+        detector.observe(_frames(1)[0], camera_id='c')
+
+        assert sorted(detector.camera_stats()) == ['b', 'c']
+        assert detector.camera_stats()['b']['seen'] == 1
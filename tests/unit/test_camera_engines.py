@@ -0,0 +1,101 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for per-camera risk engines
+
+CameraEngines scoring every live camera with its own RiskScoringEngine
+(calibration, track histories, smoothed score) made from one template, so
+interleaved cameras do not affect each other's scores.
+"""
+
+import pytest
+
+from models.scoring.baselines import BaselineStore
+from models.scoring.camera_engines import CameraEngines
+from models.scoring.risk_engine import RiskScoringEngine
+
+T0 = 1700000000.0
+
+
+def _frame(timestamp, n_people=2, weapon=0.0):
+    poses = [{'keypoints': [[i * 300.0, 10.0]] * 17, 'confidence': [0.9] * 17,
+              'bbox': [i * 300.0, 0.0, i * 300.0 + 40, 100.0], 'track_id': i + 1} for i in range(n_people)]
+    weapons = [{'confidence': weapon, 'bbox': [0, 0, 10, 10]}] if weapon else []
+    return {'poses': poses, 'objects': [], 'weapons': weapons, 'fire': [], 'timestamp': timestamp}
+
+
+def _template(**kwargs):
+    return RiskScoringEngine(fps=15, **kwargs)
+
+
+class TestCameraEngines:
+
+    def test_interleaved_cameras_do_not_affect_each_other(self):
+        calm = [_frame(T0 + t / 15) for t in range(40)]
+        # Below the instant-threat confidence, so the score is the smoothed mean
+        armed = [_frame(T0 + t / 15, weapon=0.45) for t in range(40)]
+
+        engines = CameraEngines(_template(bypass_calibration=True))
+        interleaved = {'calm': [], 'armed': []}
+        for a, b in zip(calm, armed):
+            interleaved['calm'].append(engines.calculate_risk(a, camera_id='calm')[0])
+            interleaved['armed'].append(engines.calculate_risk(b, camera_id='armed')[0])
+
+        # Each camera streamed through an engine of its own
+        calm_engine = _template(bypass_calibration=True).camera_engine()
+        armed_engine = _template(bypass_calibration=True).camera_engine()
+        alone = {
+            'calm': [calm_engine.calculate_risk(f)[0] for f in calm],
+            'armed': [armed_engine.calculate_risk(f)[0] for f in armed],
+        }
+
+        assert interleaved == alone
+
+        # One engine for both would average the armed camera down
+        shared = _template(bypass_calibration=True).camera_engine()
+        blended = [(shared.calculate_risk(a)[0], shared.calculate_risk(b)[0]) for a, b in zip(calm, armed)]
+        assert blended[-1][1] < alone['armed'][-1]
+        assert blended[-1][0] > alone['calm'][-1]
+
+    def test_late_camera_gets_its_own_calibration(self):
+        engines = CameraEngines(_template())
+        for t in range(40):
+            engines.calculate_risk(_frame(T0 + t), camera_id='early')
+        assert engines.engine('early').is_calibrated
+
+        score, factors = engines.calculate_risk(_frame(T0 + 40, weapon=0.45), camera_id='late')
+        assert (score, factors['crowd_density']) == (0.0, 0.0)
+        assert not engines.engine('late').is_calibrated
+
+    def test_engines_share_settings_and_baselines(self):
+        store = BaselineStore()
+        template = _template(bypass_calibration=True, baselines=store)
+        engines = CameraEngines(template)
+        engine = engines.engine('cam1')
+
+        assert engine.thresholds is template.thresholds
+        assert engine.weights is template.weights
+        assert engine.baselines is store
+        template.weights['crowd_density'] = 0.5
+        assert engine._weight_vector() == template._weight_vector()
+
+        engines.calculate_risk(_frame(T0), {'hour': 9}, camera_id='cam1')
+        assert list(store.snapshot()) == ['cam1']
+
+    def test_least_recently_scored_camera_is_dropped(self):
+        engines = CameraEngines(_template(bypass_calibration=True), max_cameras=2)
+        for camera_id in ('a', 'b', 'a', 'c'):
+            engines.calculate_risk(_frame(T0), camera_id=camera_id)
+
+        assert len(engines) == 2
+        assert 'a' in engines and 'c' in engines and 'b' not in engines
+        assert engines.memory_stats()['evicted_cameras'] == 1
+
+    def test_max_cameras_must_be_positive(self):
+        with pytest.raises(ValueError):
+            CameraEngines(_template(), max_cameras=0)
@@ -0,0 +1,157 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for per-camera crowd baselines
+
+Hour-of-day crowd histograms with exponentially decayed bins, and
+RiskScoringEngine skipping calibration for cameras whose baseline is known
+(and only for those).
+"""
+
+import pytest
+
+from models.scoring.baselines import BaselineStore, CrowdBaseline, SECONDS_PER_DAY
+from models.scoring.diagnostics import ScoringDiagnostics
+from models.scoring.risk_engine import RiskScoringEngine
+
+DAY = SECONDS_PER_DAY
+T0 = 1700000000.0
+
+
+def _frame(n_people, timestamp):
+    poses = [{'keypoints': [[i * 50.0, 10.0]] * 17, 'confidence': [0.1] * 17,
+              'bbox': [i * 50.0, 0.0, i * 50.0 + 40, 100.0], 'track_id': i} for i in range(n_people)]
+    return {'poses': poses, 'objects': [], 'weapons': [], 'fire': [], 'timestamp': timestamp}
+
+
+class TestCrowdBaseline:
+
+    def test_mean_is_unbiased_while_learning(self):
+        baseline = CrowdBaseline()
+        for t, count in enumerate([4, 6, 8]):
+            baseline.update(9, count, T0 + t, half_life=DAY)
+        assert baseline.mean[9] == pytest.approx(6.0, rel=1e-4)
+        assert baseline.weight[9] == pytest.approx(3.0, rel=1e-4)
+        assert baseline.mean[10] == 0.0
+
+    def test_old_samples_decay(self):
+        baseline = CrowdBaseline()
+        baseline.update(9, 10, T0, half_life=DAY)
+        baseline.update(9, 2, T0 + DAY, half_life=DAY)      # the old sample now counts half
+        assert baseline.weight[9] == pytest.approx(1.5)
+        assert baseline.mean[9] == pytest.approx(10 + (2 - 10) / 1.5)
+
+    def test_expected_falls_back_to_whole_day(self):
+        baseline = CrowdBaseline()
+        for t in range(10):
+            baseline.update(9, 4, T0 + t, half_life=DAY)
+            baseline.update(10, 8, T0 + t, half_life=DAY)
+        assert baseline.expected(9, T0 + 10, DAY, min_samples=9) == pytest.approx(4.0)
+        assert baseline.expected(3, T0 + 10, DAY, min_samples=9) == pytest.approx(6.0)
+        assert baseline.expected(3, T0 + 10, DAY, min_samples=100) is None
+        # a year later nothing is trusted any more
+        assert baseline.expected(9, T0 + 365 * DAY, DAY, min_samples=9) is None
+
+    def test_dict_round_trip(self):
+        baseline = CrowdBaseline()
+        baseline.update(23, 5, T0, half_life=DAY)
+        restored = CrowdBaseline.from_dict(baseline.to_dict())
+        assert restored.to_dict() == baseline.to_dict()
+        with pytest.raises(ValueError):
+            CrowdBaseline.from_dict({'mean': [0.0], 'weight': [], 'updated': []})
+
+
+class TestBaselineStore:
+
+    def test_dirty_tracking(self):
+        store = BaselineStore(min_samples=1)
+        store.update('cam1', 9, 3, T0)
+        store.update('cam2', 9, 5, T0)
+        assert sorted(store.drain_dirty()) == ['cam1', 'cam2']
+        assert store.drain_dirty() == {}
+
+        store.update('cam1', 9, 3, T0 + 1)
+        changed = store.drain_dirty()
+        store.mark_dirty(changed)
+        assert list(store.drain_dirty()) == ['cam1']
+
+    def test_loaded_baseline_is_not_dirty(self):
+        source = BaselineStore(min_samples=1)
+        source.update('cam1', 9, 7, T0)
+        store = BaselineStore(min_samples=1)
+        store.load('cam1', source.drain_dirty()['cam1'])
+        assert store.drain_dirty() == {}
+        assert store.expected('cam1', 9, T0) == pytest.approx(7.0)
+        assert store.expected('cam2', 9, T0) is None
+
+    def test_camera_cap(self):
+        store = BaselineStore(max_cameras=2)
+        for cam in ('a', 'b', 'a', 'c'):
+            store.update(cam, 0, 1, T0)
+        assert sorted(store.snapshot()) == ['a', 'c']
+        assert sorted(store.drain_dirty()) == ['a', 'c']
+
+
+class TestEngineBaselines:
+
+    def _engine(self, store, lines=None):
+        diag = ScoringDiagnostics(sink=(lines if lines is not None else []).append, max_per_second=1000)
+        return RiskScoringEngine(fps=15, diagnostics=diag, baselines=store)
+
+    def test_known_camera_skips_calibration(self):
+        learned = BaselineStore(min_samples=30)
+        warm = self._engine(learned)
+        for t in range(60):
+            warm.calculate_risk(_frame(4, T0 + t), {'hour': 9}, camera_id='cam1')
+
+        restarted = BaselineStore(min_samples=30)
+        restarted.load('cam1', learned.drain_dirty()['cam1'])
+        lines = []
+        engine = self._engine(restarted, lines)
+        score, factors = engine.calculate_risk(_frame(12, T0 + 100), {'hour': 9}, camera_id='cam1')
+
+        assert engine.camera_calibrated('cam1')
+        # crowd_limit = max(5, int(4 * crowd_multiplier)) instead of 0.0 during calibration
+        limit = max(5, int(4 * engine.thresholds['crowd_multiplier']))
+        assert factors['crowd_density'] == pytest.approx(min(1.0, 12 / limit))
+        assert any('calibration_restored' in line for line in lines)
+
+    def test_unknown_camera_still_calibrates(self):
+        engine = self._engine(BaselineStore(min_samples=1000))
+        score, factors = engine.calculate_risk(_frame(3, T0), {'hour': 9}, camera_id='new')
+        assert (score, factors['crowd_density']) == (0.0, 0.0)
+        assert not engine.camera_calibrated('new')
+        assert 'new' in engine.baselines.snapshot()
+
+    def test_known_camera_does_not_end_calibration_of_others(self):
+        store = BaselineStore(min_samples=5)
+        for t in range(10):
+            store.update('known', 9, 4, T0 + t)
+        engine = self._engine(store)
+
+        assert engine.calculate_risk(_frame(12, T0 + 20), {'hour': 9}, camera_id='known')[1]['crowd_density'] > 0
+        score, factors = engine.calculate_risk(_frame(3, T0 + 21), {'hour': 9}, camera_id='new')
+        assert (score, factors['crowd_density']) == (0.0, 0.0)
+        assert engine.camera_calibrated('known') and not engine.camera_calibrated('new')
+        assert not engine.is_calibrated
+
+    def test_crowd_limit_per_camera(self):
+        store = BaselineStore(min_samples=5)
+        for t in range(10):
+            store.update('quiet', 9, 1, T0 + t)
+            store.update('busy', 9, 40, T0 + t)
+        engine = self._engine(store)
+        quiet = engine.calculate_risk(_frame(10, T0 + 20), {'hour': 9}, camera_id='quiet')[1]
+        busy = engine.calculate_risk(_frame(10, T0 + 21), {'hour': 9}, camera_id='busy')[1]
+        assert quiet['crowd_density'] == 1.0
+        assert busy['crowd_density'] < 0.5
+
+    def test_no_store_keeps_engine_crowd_limit(self):
+        engine = RiskScoringEngine(fps=15, bypass_calibration=True)
+        factors = engine.calculate_risk(_frame(3, T0), camera_id='cam1')[1]
+        assert factors['crowd_density'] == pytest.approx(3 / engine.crowd_limit)
@@ -0,0 +1,125 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for the detection replay store
+
+Detection dicts written by DetectionRecorder must read back unchanged
+(as dicts and as a DetectionSequence), across chunk boundaries, so that
+re-scoring stored detections gives the scores the live run produced.
+"""
+
+import copy
+
+import pytest
+import numpy as np
+
+from models.detection.detection_store import DetectionRecorder, DetectionStore
+from models.scoring.risk_engine import RiskScoringEngine
+from models.scoring.sequence import DetectionSequence
+
+
+def _detections(seed, n_frames=40, n_people=5, float32=True):
+    """Detector-like dicts; values are float32-representable like model outputs when *float32*."""
+    rng = np.random.default_rng(seed)
+    cast = (lambda a: np.asarray(a, dtype=np.float32).astype(np.float64)) if float32 else np.asarray
+    base = rng.uniform(0, 600, (n_people, 2))
+    frames = []
+    for t in range(n_frames):
+        poses, objects = [], []
+        for p in range(n_people):
+            if rng.random() < 0.2:
+                continue
+            h = rng.uniform(80, 300)
+            base[p] += rng.normal(0, 8, 2)
+            x1, y1 = base[p][0] - h / 4, base[p][1] - h / 2
+            bbox = cast([x1, y1, x1 + h / 2, y1 + h]).tolist()
+            kpts = cast(np.stack([rng.uniform(x1, x1 + h / 2, 17), rng.uniform(y1, y1 + h, 17)], 1))
+            pose = {'keypoints': kpts.tolist(), 'confidence': cast(rng.uniform(0, 1, 17)).tolist(), 'bbox': bbox}
+            if rng.random() < 0.9:
+                pose['track_id'] = p
+            poses.append(pose)
+            b = np.asarray(bbox)
+            objects.append({'class': 'person', 'confidence': float(cast(rng.uniform(0.3, 1))), 'bbox': bbox,
+                            'is_blurry': bool(rng.random() < 0.1), 'track_id': p,
+                            'center': ((b[:2] + b[2:]) / 2).tolist()})
+        weapons = [{'class': 'weapon', 'sub_class': 'knife', 'confidence': 0.75, 'bbox': [1.0, 2.0, 30.0, 40.0]}] \
+            if rng.random() < 0.1 else []
+        fire = [{'class': 'smoke', 'confidence': 0.5, 'bbox': [0.0, 0.0, 50.0, 50.0]}] if rng.random() < 0.1 else []
+        frames.append({'objects': objects, 'poses': poses, 'weapons': weapons, 'vehicles': [],
+                       'fire': fire, 'timestamp': 1700000000.0 + t / 15})
+    return frames
+
+
+def _record(root, frames, chunk_frames=16, contexts=None):
+    with DetectionRecorder(str(root), 'clip', fps=15, source='clip.mp4',
+                           engine={'bypass_calibration': True}, chunk_frames=chunk_frames) as recorder:
+        for t, det in enumerate(frames):
+            recorder.add(2 * t, det, contexts[t] if contexts else None)
+    return DetectionStore(str(root))
+
+
+class TestDetectionStore:
+
+    @pytest.mark.parametrize('float32', [True, False])
+    def test_detections_round_trip(self, tmp_path, float32):
+        frames = _detections(0, float32=float32)
+        contexts = [{'hour': 14, 'sensitivity': 1.0 + t / 100} for t in range(len(frames))]
+        store = _record(tmp_path, frames, contexts=contexts)
+
+        replayed = list(store.iter_frames('clip'))
+        assert [f for f, _, _ in replayed] == [2 * t for t in range(len(frames))]
+        assert [det for _, det, _ in replayed] == frames
+        assert [ctx for _, _, ctx in replayed] == contexts
+
+    def test_model_outputs_are_stored_as_float32(self, tmp_path):
+        store = _record(tmp_path, _detections(1), chunk_frames=1000)
+        chunk = next(store.chunks('clip'))
+
+        assert chunk['poses_keypoints'].dtype == np.float32
+        assert chunk['timestamp'].dtype == np.float64
+
+    def test_manifest_lists_chunks(self, tmp_path):
+        store = _record(tmp_path, _detections(2), chunk_frames=16)
+        manifest = store.manifest('clip')
+
+        assert store.videos() == ['clip']
+        assert manifest['complete'] and manifest['frames'] == 40 and manifest['fps'] == 15
+        assert [c['frames'] for c in manifest['chunks']] == [16, 16, 8]
+        assert manifest['chunks'][1]['first_frame'] == 32
+
+    def test_interrupted_recording_is_readable(self, tmp_path):
+        recorder = DetectionRecorder(str(tmp_path), 'live', chunk_frames=4)
+        for t, det in enumerate(_detections(3, n_frames=10)):
+            recorder.add(t, det)
+        store = DetectionStore(str(tmp_path))
+
+        assert not store.manifest('live')['complete']
+        assert len(list(store.iter_frames('live'))) == 8    # flushed chunks only
+
+    def test_sequence_matches_detection_dicts(self, tmp_path):
+        frames = _detections(4)
+        seq, frame_index, _ = _record(tmp_path, frames).load_sequence('clip')
+        expected = DetectionSequence.from_detections(frames)
+
+        assert frame_index == [2 * t for t in range(len(frames))]
+        for name, value in vars(expected).items():
+            np.testing.assert_array_equal(getattr(seq, name), value, err_msg=name)
+
+    def test_replayed_scores_match_live_scores(self, tmp_path):
+        frames = _detections(5, n_frames=60, n_people=8)
+        contexts = [{'hour': 2, 'timestamp': t / 15} for t in range(len(frames))]
+        live = RiskScoringEngine(fps=15, bypass_calibration=True)
+        expected = [live.calculate_risk(copy.deepcopy(det), dict(ctx))[0] for det, ctx in zip(frames, contexts)]
+
+        store = _record(tmp_path, frames, contexts=contexts)
+        seq, _, stored_contexts = store.load_sequence('clip')
+        scores, _ = RiskScoringEngine(fps=15, bypass_calibration=True).score_sequence(seq, stored_contexts)
+        streamed = RiskScoringEngine(fps=15, bypass_calibration=True)
+
+        assert scores.tolist() == expected
+        assert [streamed.calculate_risk(det, ctx)[0] for _, det, ctx in store.iter_frames('clip')] == expected
@@ -0,0 +1,155 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for detector inference backends
+
+Covers export caching (weight-hash keyed paths, cache hits, precision
+variants) with a scripted exporter, int8 calibration images, plus an
+optional real ONNX export of a randomly initialised yolov8n when
+onnxruntime is installed.
+"""
+
+import cv2
+import pytest
+import numpy as np
+
+pytest.importorskip("ultralytics")
+
+import models.detection.backends as backends
+
+
+class FakeExporter:
+    """Stand-in for ultralytics.YOLO that writes a dummy export artifact."""
+
+    exports = []
+
+    def __init__(self, path, *args, **kwargs):
+        self.path = path
+
+    def export(self, format, **kwargs):
+        FakeExporter.exports.append((self.path, format, kwargs))
+        stem = os.path.splitext(self.path)[0]
+        if format == 'openvino':
+            out = stem + '_openvino_model'
+            os.makedirs(out, exist_ok=True)
+            with open(os.path.join(out, 'model.xml'), 'w') as fh:
+                fh.write('<xml/>')
+            return out
+        out = stem + '.onnx'
+        with open(out, 'wb') as fh:
+            fh.write(b'onnx')
+        return out
+
+
+@pytest.fixture
+def weights(tmp_path, monkeypatch):
+    FakeExporter.exports = []
+    monkeypatch.setattr(backends, 'YOLO', FakeExporter)
+    path = tmp_path / 'yolov8n.pt'
+    path.write_bytes(b'weights-v1')
+    return str(path)
+
+
+class TestExportCache:
+
+    def test_torch_uses_weights_directly(self, weights):
+        assert backends.ensure_exported(weights, 'torch') == weights
+        assert FakeExporter.exports == []
+
+    def test_export_is_cached_by_weight_hash(self, weights):
+        first = backends.ensure_exported(weights, 'onnxruntime')
+        second = backends.ensure_exported(weights, 'onnxruntime')
+
+        assert first == second
+        assert os.path.isfile(first)
+        assert backends.weights_hash(weights) in os.path.basename(first)
+        assert first.endswith('.fp32.onnx')
+        assert len(FakeExporter.exports) == 1
+        assert FakeExporter.exports[0][2]['dynamic'] is True
+
+    def test_changed_weights_trigger_new_export(self, weights):
+        first = backends.ensure_exported(weights, 'onnxruntime')
+        with open(weights, 'wb') as fh:
+            fh.write(b'weights-v2-retrained')
+        second = backends.ensure_exported(weights, 'onnxruntime')
+
+        assert first != second
+        assert len(FakeExporter.exports) == 2
+
+    def test_openvino_int8_export(self, weights):
+        target = backends.ensure_exported(weights, 'openvino', 'int8', calibration_data='calib.yaml')
+
+        assert target.endswith('.int8_openvino_model')
+        assert os.path.isdir(target)
+        _, fmt, kwargs = FakeExporter.exports[0]
+        assert fmt == 'openvino'
+        assert kwargs['int8'] is True and kwargs['data'] == 'calib.yaml'
+
+    @pytest.mark.parametrize('backend, precision', [('tensorrt', 'fp32'), ('onnxruntime', 'fp16')])
+    def test_unknown_backend_or_precision_rejected(self, weights, backend, precision):
+        with pytest.raises(ValueError):
+            backends.ensure_exported(weights, backend, precision)
+
+
+def _calibration_dir(tmp_path, count=4):
+    directory = tmp_path / 'calib'
+    directory.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        cv2.imwrite(str(directory / f'{i}.jpg'), rng.integers(0, 255, (240, 320, 3), dtype=np.uint8))
+    (directory / 'notes.txt').write_text('not an image')
+    return str(directory)
+
+
+class TestCalibration:
+
+    def test_image_directory(self, tmp_path):
+        directory = _calibration_dir(tmp_path)
+        paths = backends.calibration_images(directory)
+        assert [os.path.basename(p) for p in paths] == ['0.jpg', '1.jpg', '2.jpg', '3.jpg']
+        assert len(backends.calibration_images(directory, limit=2)) == 2
+
+    def test_reader_letterboxes_every_image(self, tmp_path):
+        paths = backends.calibration_images(_calibration_dir(tmp_path, count=2))
+        reader = backends._CalibrationReader('images', paths + [str(tmp_path / 'missing.jpg')])
+
+        batches = [reader.get_next(), reader.get_next()]
+        assert reader.get_next() is None
+        for batch in batches:
+            x = batch['images']
+            assert x.shape == (1, 3, 640, 640) and x.dtype == np.float32
+            assert 0.0 <= x.min() and x.max() <= 1.0
+
+    def test_empty_directory_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            backends.calibration_images(str(tmp_path))
+
+
+class TestOnnxRuntimeExport:
+
+    @pytest.mark.parametrize('precision', ['fp32', 'int8'])
+    def test_exported_model_runs_batched(self, tmp_path, precision):
+        pytest.importorskip("onnxruntime")
+        onnx = pytest.importorskip("onnx")
+        from ultralytics import YOLO
+
+        weights = str(tmp_path / 'yolov8n.pt')
+        YOLO('yolov8n.yaml').save(weights)   # random init, no download
+
+        path = backends.ensure_exported(weights, 'onnxruntime', precision,
+                                        calibration_data=_calibration_dir(tmp_path))
+        model = YOLO(path, task='detect')
+        frames = [np.zeros((480, 640, 3), dtype=np.uint8)] * 2
+        results = model.predict(frames, verbose=False, device='cpu')
+
+        assert path.endswith(f'.{precision}.onnx')
+        assert len(results) == 2
+        if precision == 'int8':
+            # Static QDQ, not the slow dynamic ConvInteger graph
+            ops = {node.op_type for node in onnx.load(path).graph.node}
+            assert 'QuantizeLinear' in ops and 'ConvInteger' not in ops
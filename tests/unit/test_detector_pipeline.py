@@ -0,0 +1,578 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for the UnifiedDetector pipeline
+
+Runs UnifiedDetector against scripted in-memory models that return real
+Ultralytics ``Results`` objects, so pipeline wiring (fused passes, result
+splitting, tracking) is exercised without downloading YOLO weights.
+"""
+
+import pytest
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("ultralytics")
+
+from ultralytics.engine.results import Results
+
+import models.detection.detector as detector_module
+from models.detection.detector import UnifiedDetector
+from models.detection.preprocess import PreparedFrame, is_blurry
+
+COCO_NAMES = {
+    0: 'person', 1: 'bicycle', 2: 'car', 3: 'motorcycle', 5: 'bus', 7: 'truck',
+    24: 'backpack', 26: 'handbag', 28: 'suitcase', 34: 'baseball bat',
+    43: 'knife', 76: 'scissors',
+}
+
+# (x1, y1, x2, y2, conf, cls) rows the fake yolov8n "sees" on every frame
+SCENE_BOXES = [
+    [100, 100, 180, 300, 0.91, 0],   # person
+    [300, 120, 370, 310, 0.28, 0],   # weak person (below object floor)
+    [400, 200, 600, 320, 0.80, 2],   # car
+    [420, 210, 480, 260, 0.33, 7],   # weak truck (below vehicle floor)
+    [170, 180, 200, 200, 0.62, 43],  # knife
+    [175, 185, 195, 200, 0.38, 76],  # weak scissors (object only)
+    [50, 50, 90, 90, 0.55, 24],      # backpack
+]
+
+
+class FakeYOLO:
+    """Minimal stand-in for ultralytics.YOLO with class/conf filtering."""
+
+    def __init__(self, path, boxes=None, names=None, keypoints=None):
+        self.path = path
+        self.boxes = boxes or []
+        self.names = names or COCO_NAMES
+        self.keypoints = keypoints
+        self.calls = []
+
+    def to(self, device):
+        return self
+
+    def predict(self, source, classes=None, conf=0.25, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        self.calls.append({
+            'classes': classes, 'conf': conf, 'device': kwargs.get('device'), 'frames': len(frames),
+            'shapes': [f.shape for f in frames],
+        })
+        return [self._result(frame, classes, conf) for frame in frames]
+
+    __call__ = predict
+
+    def _result(self, frame, classes, conf):
+        rows = [
+            b for b in self.boxes
+            if b[4] > conf and (classes is None or int(b[5]) in classes)
+        ]
+        boxes = torch.tensor(rows, dtype=torch.float32).reshape(-1, 6)
+        kpts = None
+        if self.keypoints is not None:
+            kpts = torch.tensor(self.keypoints, dtype=torch.float32)[:len(rows)]
+        return Results(frame, path='', names=self.names, boxes=boxes, keypoints=kpts)
+
+
+def _pose_rows():
+    kpts = np.zeros((1, 17, 3), dtype=np.float32)
+    kpts[0, :, 0] = np.linspace(110, 170, 17)
+    kpts[0, :, 1] = np.linspace(110, 290, 17)
+    kpts[0, :, 2] = 0.9
+    return [[100, 100, 180, 300, 0.9, 0]], kpts
+
+
+@pytest.fixture
+def make_detector(monkeypatch):
+    def factory(scene=SCENE_BOXES, fire_boxes=None, **kwargs):
+        pose_boxes, pose_kpts = _pose_rows()
+        models = {
+            detector_module._MODEL_PATHS['object']: FakeYOLO('object', scene),
+            detector_module._MODEL_PATHS['pose']: FakeYOLO(
+                'pose', pose_boxes, names={0: 'person'}, keypoints=pose_kpts
+            ),
+        }
+        monkeypatch.setattr(detector_module, 'YOLO', lambda path, *a, **k: models[path])
+
+        def load_specialist(path, tag, *args, **kwargs):
+            if tag == 'fire' and fire_boxes is not None:
+                return FakeYOLO('fire', fire_boxes, names={0: 'fire', 1: 'smoke'}), 'torch'
+            return None, None
+
+        monkeypatch.setattr(detector_module, '_try_load_model', load_specialist)
+        return UnifiedDetector(device='cpu', **kwargs)
+    return factory
+
+
+def _strip(dets):
+    return [
+        (d['class'], d.get('sub_class'), round(d['confidence'], 4), [round(v, 2) for v in d['bbox']])
+        for d in dets
+    ]
+
+
+class TestFusedCocoPass:
+
+    def test_single_object_model_call_per_frame(self, make_detector):
+        det = make_detector(fused=True)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        det.process_frame(frame)
+        assert len(det.object_model.calls) == 1
+
+    def test_unfused_runs_three_object_passes(self, make_detector):
+        det = make_detector(fused=False)
+        det.process_frame(np.zeros((480, 640, 3), dtype=np.uint8))
+        assert len(det.object_model.calls) == 3
+
+    def test_fused_output_matches_separate_paths(self, make_detector):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        fused = make_detector(fused=True).process_frame(frame)
+        separate = make_detector(fused=False).process_frame(frame)
+
+        for key in ('objects', 'vehicles', 'weapons'):
+            assert _strip(fused[key]) == _strip(separate[key])
+
+    def test_split_applies_per_path_confidence(self, make_detector):
+        result = make_detector(fused=True).process_frame(np.zeros((480, 640, 3), dtype=np.uint8))
+
+        assert sorted(o['class'] for o in result['objects']) == [
+            'backpack', 'knife', 'person', 'scissors'
+        ]
+        assert [v['class'] for v in result['vehicles']] == ['car']
+        assert [w['sub_class'] for w in result['weapons']] == ['knife']
+        assert all('track_id' in o for o in result['objects'])
+
+
+class TestParallelPipeline:
+
+    @pytest.mark.parametrize('fused', [True, False])
+    def test_parallel_matches_sequential(self, make_detector, fused):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        sequential = make_detector(fused=fused).process_frame(frame)
+        parallel = make_detector(fused=fused, parallel=True, max_workers=4).process_frame(frame)
+
+        for key in ('objects', 'vehicles', 'weapons', 'fire'):
+            assert _strip(parallel[key]) == _strip(sequential[key])
+        assert [p.get('track_id') for p in parallel['poses']] == [
+            p.get('track_id') for p in sequential['poses']
+        ]
+
+    def test_model_devices_routes_predict_calls(self, make_detector):
+        det = make_detector(model_devices={'pose': 'cuda:1'})
+        det.process_frame(np.zeros((480, 640, 3), dtype=np.uint8))
+
+        assert det.pose_model.calls[-1]['device'] == 'cuda:1'
+        assert det.object_model.calls[-1]['device'] == 'cpu'
+
+    def test_unknown_model_device_key_rejected(self, make_detector):
+        with pytest.raises(ValueError):
+            make_detector(model_devices={'lidar': 'cpu'})
+
+
+class TestBatchedInference:
+
+    def _frames(self, n):
+        return [np.full((480, 640, 3), i, dtype=np.uint8) for i in range(n)]
+
+    def test_one_model_call_per_chunk(self, make_detector):
+        det = make_detector(batch_size=4)
+        results = det.process_batch(self._frames(6))
+
+        assert len(results) == 6
+        assert len(det.object_model.calls) == 2
+        assert len(det.pose_model.calls) == 2
+
+    @pytest.mark.parametrize('parallel', [False, True])
+    def test_batch_matches_frame_by_frame(self, make_detector, parallel):
+        frames = self._frames(5)
+        single = make_detector(parallel=parallel)
+        expected = [single.process_frame(f) for f in frames]
+        batched = make_detector(parallel=parallel).process_batch(frames, batch_size=3)
+
+        for exp, got in zip(expected, batched):
+            for key in ('objects', 'vehicles', 'weapons', 'fire'):
+                assert _strip(got[key]) == _strip(exp[key])
+            assert [o['track_id'] for o in got['objects']] == [o['track_id'] for o in exp['objects']]
+            assert [p.get('track_id') for p in got['poses']] == [p.get('track_id') for p in exp['poses']]
+
+    def test_empty_batch(self, make_detector):
+        assert make_detector().process_batch([]) == []
+
+
+class TestInferenceBackends:
+
+    def test_failed_export_falls_back_to_torch(self, make_detector, monkeypatch):
+        def broken_export(*args, **kwargs):
+            raise RuntimeError("onnxruntime not installed")
+
+        monkeypatch.setattr(detector_module, 'ensure_exported', broken_export)
+        det = make_detector(backend='onnxruntime')
+
+        assert det.model_backends == {'object': 'torch', 'pose': 'torch'}
+        assert len(det.process_frame(np.zeros((480, 640, 3), dtype=np.uint8))['objects']) == 4
+
+    def test_unknown_backend_rejected(self, make_detector):
+        with pytest.raises(ValueError):
+            make_detector(backend='tensorrt')
+
+
+class TestResultDecoding:
+
+    def _result(self, rows, names=COCO_NAMES, keypoints=None):
+        boxes = torch.tensor(rows, dtype=torch.float32).reshape(-1, 6)
+        kpts = torch.tensor(keypoints, dtype=torch.float32) if keypoints is not None else None
+        return Results(np.zeros((480, 640, 3), dtype=np.uint8), path='', names=names,
+                       boxes=boxes, keypoints=kpts)
+
+    def test_empty_result_decodes_to_empty_lists(self, make_detector):
+        det = make_detector()
+        empty = self._result([])
+        assert det._parse_critical_objects(empty, False) == []
+        assert det._parse_coco_vehicles(empty) == []
+        assert det._parse_coco_weapons(empty) == []
+        assert det._parse_fire(empty) == []
+
+    def test_masks_keep_only_surviving_boxes(self, make_detector):
+        det = make_detector()
+        crowd = [[i, i, i + 40, i + 90, 0.2 + (i % 8) / 10, 0] for i in range(40)]
+        result = self._result(crowd + SCENE_BOXES)
+
+        objects = det._parse_critical_objects(result, False)
+        expected = sum(1 for b in crowd + SCENE_BOXES if b[5] in COCO_NAMES and b[5] not in (1, 2, 3, 5, 7)
+                       and np.float32(b[4]) > 0.30)
+        assert len(objects) == expected
+        assert all(o['confidence'] > 0.30 for o in objects)
+        assert all(isinstance(o['bbox'][0], float) for o in objects)
+
+    def test_weapon_model_filters_by_class_name_and_confidence(self, make_detector):
+        det = make_detector()
+        names = {0: 'Handgun', 1: 'person', 2: 'unknown_blade', 3: 'Knife'}
+        result = self._result([
+            [0, 0, 10, 10, 0.90, 0],
+            [0, 0, 10, 10, 0.95, 1],
+            [0, 0, 10, 10, 0.44, 3],
+            [5, 5, 20, 20, 0.70, 3],
+        ], names=names)
+
+        weapons = det._parse_weapon_model(result)
+        assert [(w['sub_class'], round(w['confidence'], 2)) for w in weapons] == [
+            ('handgun', 0.9), ('knife', 0.7)
+        ]
+
+    def test_poses_without_boxes_get_empty_bbox(self, make_detector):
+        det = make_detector()
+        _, kpts = _pose_rows()
+        result = self._result([], keypoints=kpts)
+
+        poses = det._parse_poses(result)
+        assert len(poses) == 1
+        assert poses[0]['bbox'] == [0, 0, 0, 0]
+        assert len(poses[0]['keypoints']) == 17 and len(poses[0]['confidence']) == 17
+
+
+class TestSpecialistCascade:
+
+    FIRE = [[10, 10, 60, 60, 0.8, 0]]
+
+    def _static(self, n, value=0):
+        return [np.full((480, 640, 3), value, dtype=np.uint8) for _ in range(n)]
+
+    def test_static_empty_scene_runs_specialists_on_duty_cycle(self, make_detector):
+        det = make_detector(scene=[], fire_boxes=self.FIRE,
+                            cascade={'idle_interval': 5, 'hold_frames': 0})
+        results = [det.process_frame(f) for f in self._static(20)]
+
+        assert len(det.fire_model.calls) == 4          # frames 0, 5, 10, 15
+        assert len(det.object_model.calls) == 20       # general pass never gated
+        assert all([d['class'] for d in r['fire']] == ['fire'] for r in results)
+        assert det.cascade.stats()['skips']['fire'] == 16
+
+    def test_people_in_frame_keep_specialists_running(self, make_detector):
+        det = make_detector(fire_boxes=self.FIRE, cascade={'idle_interval': 5, 'hold_frames': 0})
+        for f in self._static(12):
+            det.process_frame(f)
+        assert len(det.fire_model.calls) == 12
+
+    def test_motion_keeps_specialists_running(self, make_detector):
+        det = make_detector(scene=[], fire_boxes=self.FIRE, cascade={'idle_interval': 5, 'hold_frames': 0})
+        frames = [np.full((480, 640, 3), 0 if i % 2 else 200, dtype=np.uint8) for i in range(10)]
+        for f in frames:
+            det.process_frame(f)
+        assert len(det.fire_model.calls) == 10
+
+    def test_hold_frames_delay_idle_duty_cycle(self, make_detector):
+        det = make_detector(scene=[], fire_boxes=self.FIRE, cascade={'idle_interval': 100, 'hold_frames': 3})
+        frames = [np.full((480, 640, 3), 200, dtype=np.uint8)] + self._static(9)
+        for f in frames:
+            det.process_frame(f)
+        # first frame, the motion frame and three hold frames
+        assert len(det.fire_model.calls) == 5
+
+    def test_batched_frames_only_send_selected_frames(self, make_detector):
+        det = make_detector(scene=[], fire_boxes=self.FIRE,
+                            cascade={'idle_interval': 5, 'hold_frames': 0})
+        results = det.process_batch(self._static(20), batch_size=8)
+
+        assert [c['frames'] for c in det.fire_model.calls] == [2, 2]
+        assert len(results) == 20 and all(r['fire'] for r in results)
+
+    def test_cached_detections_are_copies(self, make_detector):
+        det = make_detector(scene=[], fire_boxes=self.FIRE, cascade={'idle_interval': 5, 'hold_frames': 0})
+        first = det.process_frame(self._static(1)[0])
+        first['fire'][0]['confidence'] = -1.0
+        second = det.process_frame(self._static(1)[0])
+        assert second['fire'][0]['confidence'] > 0
+
+
+class PaintedWeaponYOLO(FakeYOLO):
+    """
+    yolov8n stand-in for ROI tests: the weapon-class pass "sees" a knife
+    wherever the red channel is 255, in the coordinates of the image it is
+    given, so crop offsets are exercised; other passes return fixed boxes.
+    """
+
+    def _result(self, frame, classes, conf):
+        if classes is None or not set(classes) <= {34, 43, 76}:
+            return super()._result(frame, classes, conf)
+        ys, xs = np.nonzero(frame[:, :, 2] == 255)
+        rows = []
+        if len(xs):
+            rows = [[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9, 43]]
+        boxes = torch.tensor(rows, dtype=torch.float32).reshape(-1, 6)
+        return Results(frame, path='', names=self.names, boxes=boxes)
+
+
+class TestRoiWeapons:
+
+    PERSONS = [
+        [100, 100, 180, 300, 0.91, 0],
+        [400, 100, 480, 300, 0.85, 0],
+    ]
+
+    @pytest.fixture
+    def roi_detector(self, make_detector, monkeypatch):
+        def factory(scene=None, **kwargs):
+            det = make_detector(roi_weapons=True, **kwargs)
+            det.object_model = PaintedWeaponYOLO('object', scene if scene is not None else self.PERSONS)
+            return det
+        return factory
+
+    def _frame(self, *patches):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        for x0, y0, x1, y1 in patches:
+            frame[y0:y1, x0:x1, 2] = 255
+        return frame
+
+    def test_weapon_boxes_map_back_to_frame_coordinates(self, roi_detector):
+        result = roi_detector().process_frame(self._frame((170, 150, 190, 160)))
+
+        assert [(w['sub_class'], [round(v) for v in w['bbox']]) for w in result['weapons']] == [
+            ('knife', [170, 150, 190, 160])
+        ]
+
+    def test_weapons_away_from_people_are_not_scanned(self, roi_detector):
+        result = roi_detector().process_frame(self._frame((600, 420, 620, 430)))
+        assert result['weapons'] == []
+
+    def test_crops_of_a_chunk_are_batched_into_one_call(self, roi_detector):
+        det = roi_detector()
+        det.process_batch([self._frame((170, 150, 190, 160))] * 3, batch_size=3)
+
+        weapon_calls = [c for c in det.object_model.calls if c['classes'] == list(detector_module._COCO_WEAPON_IDS)]
+        assert [c['frames'] for c in weapon_calls] == [6]   # 3 frames x 2 persons
+
+    def test_overlapping_person_crops_are_deduplicated(self, roi_detector):
+        scene = [[100, 100, 180, 300, 0.91, 0], [120, 110, 200, 310, 0.80, 0]]
+        result = roi_detector(scene=scene).process_frame(self._frame((170, 150, 190, 160)))
+        assert len(result['weapons']) == 1
+
+    def test_parallel_roi_matches_sequential(self, roi_detector):
+        frame = self._frame((170, 150, 190, 160), (440, 200, 450, 230))
+        sequential = roi_detector().process_frame(frame)
+        parallel = roi_detector(parallel=True, max_workers=2).process_frame(frame)
+        assert _strip(parallel['weapons']) == _strip(sequential['weapons'])
+        assert len(parallel['weapons']) == 2
+
+    def test_person_rois_are_padded_and_clipped(self, roi_detector):
+        det = roi_detector()
+        objects = [
+            {'class': 'person', 'confidence': 0.9, 'bbox': [0, 0, 40, 200]},
+            {'class': 'person', 'confidence': 0.8, 'bbox': [600, 400, 610, 410]},
+            {'class': 'backpack', 'confidence': 0.9, 'bbox': [300, 300, 340, 340]},
+        ]
+        rois = det._person_rois((480, 640, 3), objects)
+
+        assert rois[0] == [0, 0, 68, 250]          # padded (width grown to 96), clipped at the origin
+        assert rois[1] == [557, 357, 640, 453]     # grown to min_size 96, clipped at the right edge
+        assert len(rois) == 2
+
+    def test_roi_weapons_respect_cascade_gating(self, roi_detector):
+        det = roi_detector(scene=[], cascade={'idle_interval': 4, 'hold_frames': 0})
+        results = det.process_batch([self._frame((170, 150, 190, 160))] * 8, batch_size=8)
+
+        assert len(results) == 8
+        assert det.cascade.stats()['runs']['weapons'] == 2
+        assert all(r['weapons'] == [] for r in results)
+
+
+class TestStreamContexts:
+
+    def _frames(self, n, shift=0):
+        return [np.full((480, 640, 3), (i + shift) % 255, dtype=np.uint8) for i in range(n)]
+
+    def test_streams_keep_separate_trackers_with_unique_ids(self, make_detector):
+        det = make_detector()
+        a = [det.process_frame(f, stream_id='cam-a') for f in self._frames(3)]
+        b = [det.process_frame(f, stream_id='cam-b') for f in self._frames(3)]
+
+        ids_a = {o['track_id'] for r in a for o in r['objects']}
+        ids_b = {o['track_id'] for r in b for o in r['objects']}
+        assert len(ids_a) == len(ids_b) == 4          # ids stable within each stream
+        assert not ids_a & ids_b                      # and never shared across streams
+        assert set(det.stream_stats()) >= {'default', 'cam-a', 'cam-b'}
+
+    def test_interleaved_streams_match_isolated_runs(self, make_detector):
+        det = make_detector()
+        interleaved = []
+        for f in self._frames(4):
+            interleaved.append(det.process_frame(f, stream_id='cam-a'))
+            det.process_frame(f, stream_id='cam-b')
+
+        alone = make_detector()
+        isolated = [alone.process_frame(f, stream_id='cam-a') for f in self._frames(4)]
+        for got, exp in zip(interleaved, isolated):
+            assert _strip(got['objects']) == _strip(exp['objects'])
+            assert len({o['track_id'] for o in got['objects']}) == len({o['track_id'] for o in exp['objects']})
+
+    def test_idle_streams_are_evicted(self, make_detector):
+        det = make_detector(stream_idle_ttl=0.0)
+        det.process_frame(self._frames(1)[0], stream_id='cam-a')
+        det.stream_context('cam-b')
+
+        assert 'cam-a' not in det.stream_stats()
+        assert 'default' in det.stream_stats()
+
+    def test_release_stream_drops_state(self, make_detector):
+        det = make_detector()
+        det.process_frame(self._frames(1)[0], stream_id='cam-a')
+        det.release_stream('cam-a')
+        assert 'cam-a' not in det.stream_stats()
+
+    def test_cascade_state_is_per_stream(self, make_detector):
+        det = make_detector(scene=[], fire_boxes=TestSpecialistCascade.FIRE,
+                            cascade={'idle_interval': 100, 'hold_frames': 0})
+        for f in self._frames(1) * 3:
+            det.process_frame(f, stream_id='cam-a')
+        det.process_frame(self._frames(1)[0], stream_id='cam-b')
+
+        # cam-a: first frame only; cam-b starts with its own empty cache
+        assert len(det.fire_model.calls) == 2
+
+    def test_concurrent_streams(self, make_detector):
+        det = make_detector(parallel=True, max_workers=4)
+        frames = self._frames(6)
+        expected = [make_detector().process_frame(f) for f in frames]
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            runs = list(pool.map(
+                lambda sid: [det.process_frame(f, stream_id=sid) for f in frames],
+                ['cam-a', 'cam-b', 'cam-c', 'cam-d'],
+            ))
+
+        for run in runs:
+            for got, exp in zip(run, expected):
+                assert _strip(got['objects']) == _strip(exp['objects'])
+
+    def test_process_streams_matches_per_stream_frames(self, make_detector):
+        batched, single = make_detector(), make_detector()
+        for f in self._frames(3):
+            got = batched.process_streams([f, f], ['cam-a', 'cam-b'])
+            exp = [single.process_frame(f, stream_id=sid) for sid in ('cam-a', 'cam-b')]
+            for g, e in zip(got, exp):
+                assert _strip(g['objects']) == _strip(e['objects'])
+                assert [o['track_id'] for o in g['objects']] == [o['track_id'] for o in e['objects']]
+
+    def test_process_streams_is_one_model_call(self, make_detector):
+        det = make_detector()
+        for f in self._frames(2):
+            det.process_streams([f, f, f], ['cam-a', 'cam-b', 'cam-c'])
+        assert [c['frames'] for c in det.object_model.calls] == [3, 3]
+        assert det.stream_stats()['cam-b']['frames'] == 2
+
+    def test_process_streams_rejects_duplicate_streams(self, make_detector):
+        f = self._frames(1)[0]
+        with pytest.raises(ValueError):
+            make_detector().process_streams([f, f], ['cam-a', 'cam-a'])
+
+    def test_process_streams_gates_specialists_per_stream(self, make_detector):
+        det = make_detector(scene=[], fire_boxes=TestSpecialistCascade.FIRE,
+                            cascade={'idle_interval': 100, 'hold_frames': 0})
+        f = self._frames(1)[0]
+        for _ in range(3):
+            det.process_streams([f, f], ['cam-a', 'cam-b'])
+        results = det.process_streams([f, f], ['cam-a', 'cam-c'])
+
+        # first batch for a and b, then only the new camera c
+        assert [c['frames'] for c in det.fire_model.calls] == [2, 1]
+        assert all(r['fire'] for r in results)
+
+
+class TestFramePreprocessing:
+
+    def _hd_frame(self):
+        rng = np.random.default_rng(0)
+        return rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+
+    def test_models_receive_one_model_scale_image(self, make_detector):
+        det = make_detector(fire_boxes=TestSpecialistCascade.FIRE)
+        det.process_frame(self._hd_frame())
+
+        for model in (det.object_model, det.pose_model, det.fire_model):
+            assert [c['shapes'] for c in model.calls] == [[(360, 640, 3)]]
+
+    def test_boxes_and_keypoints_map_back_to_frame_coordinates(self, make_detector):
+        small = make_detector().process_frame(np.zeros((360, 640, 3), dtype=np.uint8))
+        hd = make_detector().process_frame(self._hd_frame())
+
+        def scaled(dets):
+            return [(c, s, p, [v * 3 for v in b]) for c, s, p, b in _strip(dets)]
+
+        for key in ('objects', 'vehicles', 'weapons'):
+            assert _strip(hd[key]) == scaled(small[key])
+        assert np.allclose(np.array(hd['poses'][0]['keypoints']),
+                           np.array(small['poses'][0]['keypoints']) * 3)
+        assert hd['poses'][0]['track_id'] == hd['objects'][0]['track_id']
+
+    def test_small_frames_are_not_copied(self):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        prepared = PreparedFrame(frame)
+        assert prepared.model_image is frame and prepared.scale is None
+        assert prepared.gray.shape == (480, 640)
+
+    def test_blur_check_on_full_resolution_gray(self):
+        sharp = PreparedFrame(self._hd_frame())
+        flat = PreparedFrame(np.full((1080, 1920, 3), 127, dtype=np.uint8))
+
+        assert sharp.gray.shape == (360, 640)
+        assert sharp.full_gray.shape == (1080, 1920)
+        assert not is_blurry(sharp.full_gray)
+        assert is_blurry(flat.full_gray)
+
+    def test_blurry_full_resolution_frame_is_still_flagged(self, make_detector):
+        # Downscaling to model scale sharpens: this frame's Laplacian variance
+        # is ~17 at 1080p but ~490 at 640 px, above BLUR_VARIANCE
+        frame = cv2.GaussianBlur(self._hd_frame(), (9, 9), 0)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        assert cv2.Laplacian(gray, cv2.CV_64F).var() < 100
+
+        det = make_detector()
+        assert det._check_blur(frame)
+        result = det.process_frame(frame)
+        assert result['objects'] and all(o['is_blurry'] for o in result['objects'])
+        assert not any(o['is_blurry'] for o in det.process_frame(self._hd_frame())['objects'])
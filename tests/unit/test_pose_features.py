@@ -0,0 +1,269 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for the struct-of-arrays pose features
+
+PoseBatch conversion (regular and irregular poses), the vectorized posture
+masks, per-person aggression scores of RiskScoringEngine computed for a
+whole crowd at once, and the per-frame feature cache / distance matrix
+shared by the pairwise factors, including the spatial search used for
+crowds (also behind chasing).
+"""
+
+import math
+
+import pytest
+import numpy as np
+
+from models.scoring.pose_features import PoseBatch, posture_masks
+from models.scoring.risk_engine import RiskScoringEngine
+from models.scoring.track_history import TrackRing
+
+
+def _pose(wrists_up=False, wide=False, hands_at_head=False, conf=0.9, track_id=None, x=0.0):
+    kpts = np.array([
+        [100, 50], [95, 55], [105, 55], [90, 60], [110, 60],   # nose, eyes, ears
+        [80, 100], [120, 100],                                 # shoulders
+        [75, 130], [125, 130],                                 # elbows
+        [85, 150], [115, 150],                                 # wrists (down, close to body)
+        [85, 200], [115, 200],                                 # hips
+        [85, 300], [115, 300],                                 # knees
+        [85, 400], [115, 400],                                 # ankles (narrow)
+    ], dtype=float)
+    if wrists_up:
+        kpts[9], kpts[10] = [20, 95], [180, 95]
+    if hands_at_head:
+        kpts[9], kpts[10] = [90, 60], [110, 60]
+    if wide:
+        kpts[15], kpts[16] = [40, 400], [160, 400]
+    kpts[:, 0] += x
+    pose = {
+        'keypoints': kpts.tolist(),
+        'confidence': [conf] * 17,
+        'bbox': [50 + x, 50, 150 + x, 400],
+    }
+    if track_id is not None:
+        pose['track_id'] = track_id
+    return pose
+
+
+@pytest.fixture
+def engine():
+    return RiskScoringEngine(fps=30, bypass_calibration=True)
+
+
+class TestPoseBatch:
+
+    def test_regular_poses_are_stacked(self):
+        batch = PoseBatch([_pose(), _pose(x=300, track_id=4)])
+
+        assert batch.keypoints.shape == (2, 17, 3)
+        assert batch.bboxes.shape == (2, 4)
+        assert batch.heights.tolist() == [350.0, 350.0]
+        assert batch.track_ids == [None, 4]
+        assert batch.tracked.tolist() == [False, True]
+        assert np.allclose(batch.conf, 0.9)
+
+    def test_irregular_poses_are_padded(self):
+        short = {'keypoints': [[1, 2]] * 11, 'confidence': [0.5] * 11}
+        batch = PoseBatch([_pose(), short])
+
+        assert batch.n_keypoints.tolist() == [17, 11]
+        assert batch.heights[1] == 100.0        # no bbox
+        assert np.isnan(batch.bboxes[1]).all()
+        assert (batch.keypoints[1, 11:] == 0).all()
+
+    def test_empty(self):
+        batch = PoseBatch([])
+        assert len(batch) == 0
+        assert all(len(v) == 0 for v in posture_masks(batch).values())
+
+
+class TestPostureMasks:
+
+    def test_masks_for_a_crowd(self):
+        poses = [
+            _pose(),
+            _pose(wrists_up=True, x=200),
+            _pose(wide=True, x=400),
+            _pose(hands_at_head=True, x=600),
+            _pose(conf=0.2, x=800),
+        ]
+        m = posture_masks(PoseBatch(poses))
+
+        assert m['eligible'].tolist() == [True, True, True, True, False]
+        assert m['left_wrist_up'].tolist() == [False, True, False, True, False]
+        assert m['wide_stance'].tolist() == [False, False, True, False, False]
+        assert m['hands_near_head'].tolist() == [False, False, False, True, False]
+
+
+class TestAggressionScores:
+
+    def test_crowd_scores_match_single_pose_scoring(self, engine):
+        rng = np.random.default_rng(0)
+        poses = []
+        for i in range(30):
+            pose = _pose(wrists_up=rng.random() < 0.5, wide=rng.random() < 0.5,
+                         hands_at_head=rng.random() < 0.3, conf=rng.uniform(0.2, 1.0), x=i * 200)
+            poses.append(pose)
+
+        scores, eligible = engine._aggression_scores(poses)
+        single = [engine._analyze_aggression([p]) for p in poses]
+
+        assert scores.tolist() == pytest.approx(single)
+        assert engine._analyze_aggression(poses) == pytest.approx(max(single))
+        assert not scores[~eligible].any()
+
+    def test_raised_arms_and_wide_stance(self, engine):
+        assert engine._analyze_aggression([_pose(wrists_up=True, wide=True)]) >= 0.7
+
+    def test_low_confidence_pose_is_ignored(self, engine):
+        assert engine._analyze_aggression([_pose(wrists_up=True, wide=True, conf=0.2)]) == 0.0
+
+
+class TestFrameFeatureCache:
+
+    def _frame(self, poses, t):
+        return {'poses': poses, 'objects': [], 'weapons': [], 'fire': [], 'timestamp': t}
+
+    def test_strike_and_aggression_computed_once_per_frame(self, engine, monkeypatch):
+        calls = []
+        original = engine._detect_strike_velocity
+        monkeypatch.setattr(engine, '_detect_strike_velocity', lambda poses: calls.append(1) or original(poses))
+
+        poses = [_pose(wrists_up=True, track_id=i, x=i * 60) for i in range(6)]
+        for t in range(3):
+            engine.calculate_risk(self._frame(poses, t / 15))
+
+        assert len(calls) == 3
+        assert engine._frame_batch is None    # cache does not outlive the frame
+
+    def test_pair_distances_match_pairwise_centres(self):
+        poses = [_pose(x=x) for x in (0, 37.5, 410, 1234)]
+        i, j, dist = PoseBatch(poses).near_pairs(0.4)
+
+        assert list(zip(i.tolist(), j.tolist())) == [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)]
+        for a, b, d in zip(i, j, dist):
+            ca = [(poses[a]['bbox'][0] + poses[a]['bbox'][2]) / 2, (poses[a]['bbox'][1] + poses[a]['bbox'][3]) / 2]
+            cb = [(poses[b]['bbox'][0] + poses[b]['bbox'][2]) / 2, (poses[b]['bbox'][1] + poses[b]['bbox'][3]) / 2]
+            assert d == math.sqrt((ca[0] - cb[0]) ** 2 + (ca[1] - cb[1]) ** 2)
+
+    def test_proximity_escalates_for_aggressive_pairs(self, engine):
+        calm = [_pose(), _pose(x=40), _pose(x=2000)]
+        angry = [_pose(wrists_up=True, wide=True), _pose(x=40), _pose(x=2000)]
+
+        assert engine._check_proximity(calm) == pytest.approx(1.5 / 3)
+        assert engine._check_proximity(angry) == pytest.approx(1.0)
+
+    def test_grappling_counts_persistent_pairs(self, engine):
+        poses = [_pose(track_id=1), _pose(track_id=2, x=20), _pose(track_id=3, x=900)]
+        scores = [engine._detect_grappling(poses) for _ in range(11)]
+
+        assert scores[0] == 0.8 and scores[-1] == 0.9
+        assert dict(engine.grappling_history) == {(1, 2): 11}
+
+    def test_chasing_requires_closing_pursuit(self, engine):
+        # Track 1 runs from x=0 toward track 2, which stands still at x=1000
+        engine.person_history = {1: TrackRing(300, 3), 2: TrackRing(300, 3)}
+        for step in range(6):
+            engine.person_history[1].append((step * 100.0, 225.0, step / 15))
+            engine.person_history[2].append((1000.0, 225.0, step / 15))
+        pursuer = _pose(track_id=1, x=400)
+        target = _pose(track_id=2, x=900)
+
+        assert engine._detect_chasing([pursuer, target]) == 0.7
+        assert engine._detect_chasing([_pose(track_id=1, x=1400), target]) == 0.0
+
+
+class TestSpatialGrid:
+
+    def _crowd(self, n, seed, spread=6000):
+        rng = np.random.default_rng(seed)
+        poses = []
+        for _ in range(n):
+            h = rng.uniform(40, 400) if rng.random() < 0.95 else rng.uniform(800, 1500)
+            x, y = rng.uniform(0, spread, 2)
+            poses.append({'keypoints': [[0, 0]] * 17, 'confidence': [0.9] * 17,
+                          'bbox': [x, y, x + h / 3, y + h]})
+        return poses
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_grid_keeps_every_pair_within_threshold(self, seed):
+        batch = PoseBatch(self._crowd(300, seed))
+        i, j, dist = batch.near_pairs(0.4)
+
+        a, b = np.triu_indices(len(batch), 1)
+        d = batch.pair_distances(a, b)
+        close = d < (batch.heights[a] + batch.heights[b]) / 2 * 0.4
+
+        found = list(zip(i.tolist(), j.tolist()))
+        assert set(zip(a[close].tolist(), b[close].tolist())) <= set(found)
+        assert found == sorted(set(found))              # i < j, row-major, no duplicates
+        assert len(found) < len(a) // 20                # far-apart pairs are never generated
+
+    def test_grid_follows_the_longer_axis(self):
+        # A queue along y: sorting on x would pair everyone with everyone
+        poses = self._crowd(60, seed=3)
+        for pose in poses:
+            pose['bbox'][0] = pose['bbox'][0] / 100
+            pose['bbox'][2] = pose['bbox'][0] + 50
+        batch = PoseBatch(poses)
+        i, j, _ = batch.near_pairs(0.4)
+
+        a, b = np.triu_indices(len(batch), 1)
+        close = batch.pair_distances(a, b) < (batch.heights[a] + batch.heights[b]) / 2 * 0.4
+        assert set(zip(a[close].tolist(), b[close].tolist())) <= set(zip(i.tolist(), j.tolist()))
+        assert len(i) < len(a) // 5
+
+    def test_crowd_factors_match_dense_pairs(self, engine, monkeypatch):
+        import models.scoring.pose_features as pose_features
+
+        poses = self._crowd(200, seed=7, spread=2500)
+        for k, pose in enumerate(poses):
+            pose['track_id'] = k
+        grid = (engine._check_proximity(poses), engine._detect_grappling(poses))
+
+        monkeypatch.setattr(pose_features, 'GRID_MIN_PERSONS', 10 ** 9)
+        dense_engine = RiskScoringEngine(fps=30, bypass_calibration=True)
+        dense = (dense_engine._check_proximity(poses), dense_engine._detect_grappling(poses))
+
+        assert grid == dense
+        assert grid[0] > 0
+        assert dict(engine.grappling_history) == dict(dense_engine.grappling_history)
+
+    @pytest.mark.parametrize('seed', range(6))
+    def test_crowd_chasing_matches_dense_pairs(self, monkeypatch, seed):
+        import models.scoring.pose_features as pose_features
+
+        rng = np.random.default_rng(seed)
+        starts = rng.uniform(0, [2000, 1000], (60, 2))
+        ends = starts + rng.normal(0, 15, (60, 2))
+        if seed % 2:
+            # Track 1 closes half the distance to track 2, which stands still
+            starts[1] = starts[0] + [300, 0]
+            ends[0], ends[1] = starts[0] + [150, 0], starts[1]
+
+        def chasing():
+            engine = RiskScoringEngine(fps=30, bypass_calibration=True)
+            engine.person_history = {}
+            poses = []
+            for k, (start, end) in enumerate(zip(starts, ends)):
+                ring = engine.person_history[k + 1] = TrackRing(300, 3)
+                for step in range(5):
+                    x, y = start + (end - start) * step / 4
+                    ring.append((x, y, step / 15))
+                x, y = end
+                poses.append({'keypoints': [[x, y]] * 17, 'confidence': [0.9] * 17,
+                              'bbox': [x - 40, y - 100, x + 40, y + 100], 'track_id': k + 1})
+            return engine._detect_chasing(poses)
+
+        grid = chasing()
+        monkeypatch.setattr(pose_features, 'GRID_MIN_PERSONS', 10 ** 9)
+        assert grid == chasing()
+        if seed % 2:
+            assert grid == 0.7
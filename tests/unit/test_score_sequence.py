@@ -0,0 +1,160 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for batch/offline scoring (RiskScoringEngine.score_sequence)
+
+score_sequence must return, frame for frame, what calculate_risk returns
+when the same detections are streamed through a fresh engine, including
+calibration, track eviction and the max_tracks cap. Also covers the
+DetectionSequence conversion and the vectorized track segmentation.
+"""
+
+import copy
+
+import pytest
+import numpy as np
+
+from models.scoring.risk_engine import RiskScoringEngine
+from models.scoring.sequence import (
+    DetectionSequence, _track_segments_sequential, track_segments,
+)
+
+
+def _clip(seed, n_frames=90, n_people=6, fps=15, spread=300):
+    """Random walkers with jittery keypoints, dropouts and some untracked poses."""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(0, spread, (n_people, 2))
+    frames = []
+    for t in range(n_frames):
+        poses, objects = [], []
+        for p in range(n_people):
+            if rng.random() < 0.15:
+                continue
+            h = rng.uniform(80, 300)
+            base[p] += rng.normal(0, 5 + 40 * (rng.random() < 0.1), 2)
+            x1, y1 = base[p][0] - h / 4, base[p][1] - h / 2
+            kpts = np.stack([rng.uniform(x1, x1 + h / 2, 17), rng.uniform(y1, y1 + h, 17)], 1)
+            bbox = [x1, y1, x1 + h / 2, y1 + h]
+            pose = {'keypoints': kpts.tolist(), 'confidence': rng.uniform(0.1, 1.0, 17).tolist(), 'bbox': bbox}
+            if rng.random() < 0.9:
+                pose['track_id'] = p
+            poses.append(pose)
+            objects.append({'class': 'person', 'confidence': 0.9, 'bbox': bbox, 'track_id': p})
+        if rng.random() < 0.2:
+            objects.append({'class': 'backpack', 'confidence': 0.6, 'bbox': [10, 10, 40, 40]})
+        weapons = [{'class': 'knife', 'confidence': 0.7}] if rng.random() < 0.03 else []
+        frames.append({'poses': poses, 'objects': objects, 'weapons': weapons, 'fire': [], 'timestamp': t / fps})
+    return frames
+
+
+def _engine(kwargs, thresholds=None, calibration_duration=None):
+    engine = RiskScoringEngine(**kwargs)
+    engine.thresholds.update(thresholds or {})
+    if calibration_duration is not None:
+        engine.calibration_duration = calibration_duration
+    return engine
+
+
+def _stream(engine, frames, context=None):
+    scores, factors = [], []
+    for t, frame in enumerate(frames):
+        ctx = context[t] if isinstance(context, list) else context
+        score, f = engine.calculate_risk(copy.deepcopy(frame), copy.deepcopy(ctx))
+        scores.append(score)
+        factors.append(f)
+    return scores, factors
+
+
+def _assert_same(kwargs, frames, context=None, **settings):
+    expected_scores, expected_factors = _stream(_engine(kwargs, **settings), frames, context)
+    scores, factors = _engine(kwargs, **settings).score_sequence(frames, context)
+
+    assert scores.tolist() == expected_scores
+    for t, expected in enumerate(expected_factors):
+        assert {k: factors[k][t] for k in expected} == expected
+        assert all(factors[k][t] == 0 for k in ('grappling', 'chasing') if k not in expected)
+
+
+class TestScoreSequence:
+
+    @pytest.mark.parametrize('seed', range(3))
+    def test_matches_streaming(self, seed):
+        _assert_same({'fps': 15, 'bypass_calibration': True}, _clip(seed))
+
+    def test_matches_streaming_with_calibration(self):
+        _assert_same({'fps': 15}, _clip(3), calibration_duration=2)
+
+    def test_matches_streaming_with_eviction(self):
+        _assert_same({'fps': 15, 'bypass_calibration': True, 'track_max_age': 2}, _clip(4, n_people=10))
+
+    def test_matches_streaming_with_track_cap(self):
+        # fewer slots than people: tracks are evicted in frames they appear in
+        _assert_same({'fps': 15, 'bypass_calibration': True}, _clip(4, n_people=10), thresholds={'max_tracks': 3})
+
+    def test_matches_streaming_with_per_frame_context(self):
+        frames = _clip(5)
+        context = [None if t % 3 else {'timestamp': f['timestamp'], 'sensitivity': 1.2}
+                   for t, f in enumerate(frames)]
+        _assert_same({'fps': 15, 'bypass_calibration': True}, frames, context)
+
+    def test_does_not_touch_streaming_state(self):
+        engine = RiskScoringEngine(fps=15, bypass_calibration=True)
+        engine.score_sequence(_clip(6))
+
+        assert not engine.person_history and not engine.risk_history
+        assert engine.memory_stats()['tracks'] == 0
+
+    def test_empty_clip(self):
+        scores, factors = RiskScoringEngine(bypass_calibration=True).score_sequence([])
+        assert len(scores) == 0 and all(len(v) == 0 for v in factors.values())
+
+
+class TestDetectionSequence:
+
+    def test_from_detections(self):
+        frames = _clip(7, n_frames=5)
+        seq = DetectionSequence.from_detections(frames)
+
+        assert len(seq) == 5
+        assert seq.timestamps.tolist() == [f['timestamp'] for f in frames]
+        assert len(seq.pose_frame) == sum(len(f['poses']) for f in frames)
+        assert seq.keypoints.shape == (len(seq.pose_frame), 17, 3)
+        offsets = seq.frame_offsets(seq.pose_frame)
+        assert np.diff(offsets).tolist() == [len(f['poses']) for f in frames]
+        tracked = [p.get('track_id', -1) for f in frames for p in f['poses']]
+        assert seq.track_ids.tolist() == tracked
+
+
+def _canonical(seg, seg_end, gen):
+    """Relabel segment / state ids by first appearance (the ids themselves are arbitrary)."""
+    _, first_seg, seg_codes = np.unique(seg, return_index=True, return_inverse=True)
+    seg_rank = np.argsort(np.argsort(first_seg))
+    _, first_gen, gen_codes = np.unique(gen, return_index=True, return_inverse=True)
+    gen_rank = np.argsort(np.argsort(first_gen))
+    return seg_rank[seg_codes].tolist(), seg_end[seg[np.sort(first_seg)]].tolist(), gen_rank[gen_codes].tolist()
+
+
+class TestTrackSegments:
+
+    @pytest.mark.parametrize('seed', range(4))
+    def test_vectorized_segments_match_sequential_replay(self, seed):
+        rng = np.random.default_rng(seed)
+        n_frames = 200
+        timestamps = np.cumsum(rng.uniform(0.02, 0.2, n_frames))
+        frames, ids = [], []
+        for t in range(n_frames):
+            present = np.flatnonzero(rng.random(12) < 0.4)
+            frames += [t] * len(present)
+            ids += present.tolist()
+        frames, ids = np.array(frames), np.array(ids)
+
+        fast = track_segments(frames, ids, timestamps, 3, 3 / 15, 1024)
+        slow = _track_segments_sequential(frames, ids, timestamps, 3, 3 / 15, 1024)
+
+        assert _canonical(*fast) == _canonical(*slow)
+        assert len(np.unique(fast[0])) > len(np.unique(ids))    # some tracks were evicted and restarted
@@ -0,0 +1,146 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for the scoring diagnostics channel
+
+Per-camera counters, sampled and rate-limited log lines, lazy message
+formatting, and RiskScoringEngine reporting its escalation events there
+instead of printing them.
+"""
+
+import pytest
+
+from models.scoring.diagnostics import ScoringDiagnostics
+from models.scoring.risk_engine import RiskScoringEngine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Unformattable:
+    def __str__(self):
+        raise AssertionError("message was formatted")
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def lines():
+    return []
+
+
+def _diag(lines, clock, **kwargs):
+    return ScoringDiagnostics(sink=lines.append, clock=clock, **kwargs)
+
+
+class TestScoringDiagnostics:
+
+    def test_counters_per_camera(self, lines, clock):
+        diag = _diag(lines, clock, log=False)
+        diag.record_frame('cam1', 40.0, {'aggressive_posture': 0.5, 'loitering': 0.0})
+        diag.record_frame('cam1', 80.0, {'aggressive_posture': 0.9, 'loitering': 0.2})
+        diag.event('cam1', 'grappling', 'score=%.2f', 0.8)
+        diag.event('cam2', 'blur_decay')
+
+        cam1 = diag.snapshot()['cameras']['cam1']
+        assert cam1['frames'] == 2 and cam1['score_mean'] == 60.0 and cam1['score_max'] == 80.0
+        assert cam1['events'] == {'grappling': 1}
+        assert cam1['factors']['aggressive_posture'] == {'active_frames': 2, 'mean_when_active': 0.7, 'max': 0.9}
+        assert cam1['factors']['loitering']['active_frames'] == 1
+        assert list(diag.snapshot('cam2')['cameras']) == ['cam2']
+        assert lines == []
+
+    def test_disabled_log_never_formats(self, lines, clock):
+        diag = _diag(lines, clock, log=False)
+        for _ in range(100):
+            diag.event('cam', 'grappling', '%s', Unformattable())
+        assert diag.snapshot()['cameras']['cam']['events']['grappling'] == 100
+
+    def test_sampling_per_camera(self, lines, clock):
+        diag = _diag(lines, clock, sample_every=10, max_per_second=1000)
+        for _ in range(25):
+            diag.event('a', 'grappling')
+        for _ in range(5):
+            diag.event('b', 'grappling')
+
+        assert lines == ['[ScoringDiag] camera=a grappling'] * 3 + ['[ScoringDiag] camera=b grappling']
+
+    def test_rate_limit_per_camera_and_event(self, lines, clock):
+        diag = _diag(lines, clock, max_per_second=2)
+        for _ in range(10):
+            diag.event('a', 'grappling', 'score=%.2f', 0.8)
+        diag.event('a', 'blur_decay')
+        clock.now = 1.0
+        for _ in range(10):
+            diag.event('a', 'grappling', 'score=%.2f', 0.8)
+
+        assert lines.count('[ScoringDiag] camera=a grappling: score=0.80') == 4
+        assert '[ScoringDiag] camera=a blur_decay' in lines
+        stats = diag.snapshot()['cameras']['a']
+        assert stats['log_lines'] == 5 and stats['log_dropped'] == 16
+
+    def test_frame_lines_only_when_enabled(self, lines, clock):
+        diag = _diag(lines, clock)
+        diag.record_frame('a', 12.0, {'crowd_density': 0.1})
+        assert lines == []
+
+        diag.configure(log_frames=True)
+        diag.record_frame('a', 12.0, {'crowd_density': 0.1})
+        assert lines == ["[ScoringDiag] camera=a frame: score=12.0 active=['crowd_density']"]
+
+    def test_camera_cap_evicts_least_recent(self, lines, clock):
+        diag = _diag(lines, clock, max_cameras=2)
+        for cam in ('a', 'b', 'a', 'c'):
+            diag.event(cam, 'blur_decay')
+        assert sorted(diag.snapshot()['cameras']) == ['a', 'c']
+
+        diag.reset('a')
+        assert list(diag.snapshot()['cameras']) == ['c']
+
+
+class TestEngineDiagnostics:
+
+    def _pose(self, track_id, x):
+        kpts = [[x + 50, 50]] * 5 + [[x + 30, 100], [x + 70, 100]] + [[x + 25, 130], [x + 75, 130]] \
+            + [[x + 35, 150], [x + 65, 150]] + [[x + 35, 200], [x + 65, 200]] * 2 + [[x + 35, 400], [x + 65, 400]]
+        return {'keypoints': kpts, 'confidence': [0.9] * 17, 'bbox': [x, 50, x + 100, 400], 'track_id': track_id}
+
+    def test_events_go_to_diagnostics_not_stdout(self, lines, clock, capsys):
+        diag = _diag(lines, clock, max_per_second=1000)
+        engine = RiskScoringEngine(fps=15, bypass_calibration=True, diagnostics=diag)
+        capsys.readouterr()
+
+        frame = {'poses': [self._pose(1, 0), self._pose(2, 20)], 'objects': [], 'weapons': [], 'fire': []}
+        for t in range(3):
+            engine.calculate_risk({**frame, 'timestamp': t / 15}, camera_id='cam-7')
+
+        stats = diag.snapshot()['cameras']['cam-7']
+        assert stats['frames'] == 3
+        assert stats['events']['grappling'] == 3
+        assert stats['factors']['grappling']['active_frames'] == 3
+        assert lines[0].startswith('[ScoringDiag] camera=cam-7 grappling: score=')
+        assert capsys.readouterr().out == ''
+
+    def test_calibration_frames_are_counted(self, lines, clock):
+        diag = _diag(lines, clock)
+        engine = RiskScoringEngine(fps=15, diagnostics=diag)
+        engine.calibration_duration = 1
+        for t in range(20):
+            engine.calculate_risk({'poses': [], 'objects': [], 'timestamp': t / 15})
+
+        stats = diag.snapshot()['cameras']['default']
+        assert stats['frames'] == 20
+        assert stats['events'] == {'calibration_complete': 1}
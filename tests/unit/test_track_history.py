@@ -0,0 +1,177 @@
+import sys
+import os
+# Auto-injected to allow imports from project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+"""
+Unit Tests for the bounded per-track history of RiskScoringEngine
+
+TrackRing ordering and wrap-around, eviction of tracks unseen for longer
+than the tracker's max_age, the global track cap and the memory stats,
+plus the incrementally maintained risk-history window.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from models.scoring.risk_engine import RiskScoringEngine
+from models.scoring.track_history import KeypointTrack, RiskWindow, TrackRing
+
+
+def _pose(track_id, x=0.0):
+    kpts = [[x + 100, 50 + 20 * k] for k in range(17)]
+    return {'keypoints': kpts, 'confidence': [0.9] * 17,
+            'bbox': [x + 50, 50, x + 150, 400], 'track_id': track_id}
+
+
+def _frame(poses, t):
+    return {'poses': poses, 'objects': [], 'weapons': [], 'fire': [], 'timestamp': t}
+
+
+class TestTrackRing:
+
+    def test_rows_are_oldest_first_after_wrap(self):
+        ring = TrackRing(4, 3)
+        for k in range(6):
+            ring.append((k, 10 * k, 0.1 * k))
+
+        assert len(ring) == 4
+        assert ring.rows()[:, 0].tolist() == [2, 3, 4, 5]
+        assert ring.first()[0] == 2 and ring.last()[0] == 5
+
+    def test_partial_ring(self):
+        ring = TrackRing(300, 3)
+        ring.append((1.5, 2.5, 3.0))
+
+        assert ring.rows().tolist() == [[1.5, 2.5, 3.0]]
+        assert ring.nbytes == 300 * 3 * 8
+
+    def test_keypoint_track_groups(self):
+        track = KeypointTrack(10)
+        track['wrists'].append((0.0, 0.1, 0.2, 1.0))
+        assert len(track.wrists) == 1 and len(track['ankles']) == 0
+
+
+class TestRiskWindow:
+
+    def test_stats_match_a_rescan(self):
+        rng = random.Random(0)
+        window = RiskWindow(maxlen=20)
+        for k in range(500):
+            window.append(rng.choice([0.0, 0.3, 0.41, rng.random()]))
+            values = list(window)
+            assert len(values) == min(k + 1, 20)
+            assert window.high_count == sum(1 for r in values if r > 0.4)
+            assert window.mean() == pytest.approx(np.mean(values), abs=1e-15)
+
+    def test_mean_is_exactly_zero_once_risk_leaves_the_window(self):
+        window = RiskWindow(maxlen=3)
+        for value in (0.1, 0.2, 0.7, 0.0, 0.0, 0.0):
+            window.append(value)
+        assert window.mean() == 0.0 and window.high_count == 0
+
+    def test_clear_and_deque_protocol(self):
+        window = RiskWindow(maxlen=20)
+        assert window.maxlen == 20 and not window and window.mean() == 0.0
+        window.append(0.5)
+        assert list(window) == [0.5] and window[-1] == 0.5
+        window.clear()
+        assert len(window) == 0 and window.high_count == 0
+
+    def test_rolling_means_replays_appends(self):
+        values = [0.2, 0.9, 0.0, 0.5]
+        window = RiskWindow(maxlen=2)
+        expected = []
+        for value in values:
+            window.append(value)
+            expected.append(window.mean())
+        assert RiskWindow.rolling_means(values, 2).tolist() == expected
+
+
+class TestEviction:
+
+    @pytest.fixture
+    def engine(self):
+        return RiskScoringEngine(fps=30, bypass_calibration=True, track_max_age=5)
+
+    def test_unseen_tracks_are_evicted_after_max_age(self, engine):
+        engine.calculate_risk(_frame([_pose(1), _pose(2, x=600)], 0.0))
+        for k in range(1, 6):
+            engine.calculate_risk(_frame([_pose(2, x=600)], k / 30))
+        assert set(engine.person_history) == {1, 2}     # unseen for exactly max_age frames
+
+        engine.calculate_risk(_frame([_pose(2, x=600)], 6 / 30))
+        assert set(engine.person_history) == {2}
+        assert set(engine.keypoint_history) == {2}
+        assert engine.memory_stats()['evicted_tracks'] == 1
+
+    def test_age_is_also_measured_in_time(self, engine):
+        # Frames arriving faster than fps (e.g. several streams sharing the
+        # engine) must not age a track out before max_age / fps seconds
+        engine.calculate_risk(_frame([_pose(1)], 0.0))
+        for k in range(1, 20):
+            engine.calculate_risk(_frame([], k / 300))
+        assert 1 in engine.person_history
+
+        engine.calculate_risk(_frame([], 1.0))
+        assert engine.person_history == {}
+
+    def test_grappling_pairs_of_evicted_tracks_are_dropped(self, engine):
+        for k in range(3):
+            engine.calculate_risk(_frame([_pose(1), _pose(2, x=20), _pose(3, x=900)], k / 30))
+        assert dict(engine.grappling_history) == {(1, 2): 3}
+
+        for k in range(3, 10):
+            engine.calculate_risk(_frame([_pose(2, x=20), _pose(3, x=900)], k / 30))
+        assert dict(engine.grappling_history) == {}
+
+    def test_track_cap_evicts_least_recently_seen(self):
+        engine = RiskScoringEngine(fps=30, bypass_calibration=True)
+        engine.thresholds['max_tracks'] = 8
+        for k in range(20):
+            engine.calculate_risk(_frame([_pose(k, x=400 * k)], k / 30))
+
+        assert sorted(engine.person_history) == list(range(12, 20))
+        stats = engine.memory_stats()
+        assert stats['tracks'] == 8 and stats['evicted_tracks'] == 12
+        assert stats['history_bytes'] == 8 * (300 * 3 + 2 * 10 * 4) * 8
+
+    def test_long_running_feed_stays_bounded(self, engine):
+        # A new track ID every few frames, as on a 24/7 feed
+        for k in range(600):
+            tid = k // 4
+            engine.calculate_risk(_frame([_pose(tid), _pose(tid + 1, x=600)], k / 30))
+
+        stats = engine.memory_stats()
+        assert stats['tracks'] <= 4
+        assert stats['evicted_tracks'] >= 140
+
+    def test_invalid_history_settings_are_rejected(self):
+        with pytest.raises(ValueError):
+            RiskScoringEngine(track_max_age=0)
+
+    def test_history_settings_load_from_config(self, tmp_path):
+        config = tmp_path / 'thresholds.yaml'
+        config.write_text('history:\n  track_max_age: 12\n  max_tracks: 64\n')
+        engine = RiskScoringEngine(config_path=config)
+
+        assert engine.thresholds['track_max_age'] == 12
+        assert engine.thresholds['max_tracks'] == 64
+        assert engine.memory_stats()['track_max_age'] == 12
+
+
+class TestFactorWeights:
+
+    def _scores(self, engine):
+        return [engine.calculate_risk(_frame([_pose(1), _pose(2, x=60)], k / 30))[0] for k in range(3)]
+
+    def test_weight_changes_after_init_apply(self):
+        baseline = self._scores(RiskScoringEngine(fps=30, bypass_calibration=True))
+        engine = RiskScoringEngine(fps=30, bypass_calibration=True)
+        engine.weights['proximity_violation'] *= 4
+
+        assert all(s > b for s, b in zip(self._scores(engine), baseline))